@@ -21,6 +21,52 @@ from tools.helpers import *
 
 # --- plot main figures ----------------------------------------------------------------------------
 
+def get_mva_curve(ctx, op, mn, variable_name, suffix=''):
+    """
+    :return N, values of the exact MVA prediction for the model with mn workers (see mean_value_analysis.py);
+            None, None if not available; memtier response time of the closed loop = R + Z (Z includes the network)
+            suffix: '' for constant demands, '_load_dependent' for the load-dependent demands
+    """
+    if variable_name not in ['Throughput', 'ResponseTime']:
+        return None, None
+    op_dict = CONFIGURATION['mva_output'].get(ctx['experiment_folder'], {}).get(op, {})
+    for model, result in sorted(op_dict.items()):
+        if extract_metadata(model).get('mn') != str(mn):
+            continue
+        if variable_name == 'Throughput':
+            return result['N'], result['X' + suffix]
+        return result['N'], [r + result['Z'] for r in result['R' + suffix]]
+    return None, None
+
+
+def get_bounds_curves(ctx, op, mn, variable_name):
+    """
+    :return N, lower ABA, upper ABA, lower BJB, upper BJB for the model with mn workers
+            (see performance_bounds.py); None if not available; response times as seen by memtier (R + Z)
+    """
+    if variable_name not in ['Throughput', 'ResponseTime']:
+        return None
+    op_dict = CONFIGURATION['bounds_output'].get(ctx['experiment_folder'], {}).get(op, {})
+    key = 'X' if variable_name == 'Throughput' else 'R'
+    for model, result in sorted(op_dict.items()):
+        if extract_metadata(model).get('mn') != str(mn):
+            continue
+        offset = 0.0 if key == 'X' else result['Z']
+        curves = [result['N']]
+        for name in ['ABA_' + key + '_lower', 'ABA_' + key + '_upper', 'BJB_' + key + '_lower', 'BJB_' + key + '_upper']:
+            curves.append([v + offset for v in result[name]])
+        return curves
+    return None
+
+
+def plot_bounds(ax, curves, color, label):
+    """draws the ABA envelope (filled) and the BJB (dotted lines) of get_bounds_curves()"""
+    n, aba_lower, aba_upper, bjb_lower, bjb_upper = curves
+    ax.fill_between(n, aba_lower, aba_upper, color=color, alpha=PLOT_BOUNDS_ALPHA, linewidth=0, label='ABA: ' + label)
+    ax.plot(n, bjb_lower, ':', color=color, linewidth=1, label='BJB: ' + label)
+    ax.plot(n, bjb_upper, ':', color=color, linewidth=1)
+
+
 def plot_numclients_vs_variable(ctx, datasets, app_name, variable_name):
     """
     plots numclients vs variable (throughput / response time) and expected variable from app data
@@ -137,6 +183,16 @@ def plot_numclients_vs_variable(ctx, datasets, app_name, variable_name):
                 ax.errorbar(x, y_lists[0][op + '_expected'], sd_lists[0][op + '_expected'],
                             color=lighten_color(PLOT_COLORS[color], PLOT_ADJUST_LUMINOSITY_FOR_EXPECTED), fmt=':x', capsize=3, elinewidth=1, markeredgewidth=1,
                             label=expected_label + op)
+            if app_name == 'memtier':
+                mva_x, mva_y = get_mva_curve(ctx, op, 0, variable_name)
+                if mva_x is not None:
+                    ax.plot(mva_x, mva_y, '--', color=PLOT_COLORS[color], linewidth=1, label='MVA: ' + op)
+                mva_x, mva_y = get_mva_curve(ctx, op, 0, variable_name, '_load_dependent')
+                if mva_x is not None:
+                    ax.plot(mva_x, mva_y, '-.', color=PLOT_COLORS[color], linewidth=1, label='MVA load-dep.: ' + op)
+                bounds = get_bounds_curves(ctx, op, 0, variable_name)
+                if bounds is not None:
+                    plot_bounds(ax, bounds, PLOT_COLORS[color], op)
             color += 1
 
         if y_max < 1.0:
@@ -196,6 +252,18 @@ def plot_numclients_vs_variable(ctx, datasets, app_name, variable_name):
                     ax.errorbar(x, y_lists[mn][op + '_expected'], sd_lists[mn][op + '_expected'],
                                 color=lighten_color(PLOT_COLORS[color], PLOT_ADJUST_LUMINOSITY_FOR_EXPECTED), fmt=':x', capsize=3, elinewidth=1, markeredgewidth=1,
                                 label=expected_label + str(mn) + ' workers (WT=' + (str(int(mn / int(mc))) if int(mc) > 0 else '0') + ')')
+                if app_name == 'memtier':
+                    mva_x, mva_y = get_mva_curve(ctx, op, mn, variable_name)
+                    if mva_x is not None:
+                        ax.plot(mva_x, mva_y, '--', color=PLOT_COLORS[color], linewidth=1,
+                                label='MVA: ' + str(mn) + ' workers')
+                    mva_x, mva_y = get_mva_curve(ctx, op, mn, variable_name, '_load_dependent')
+                    if mva_x is not None:
+                        ax.plot(mva_x, mva_y, '-.', color=PLOT_COLORS[color], linewidth=1,
+                                label='MVA load-dep.: ' + str(mn) + ' workers')
+                    bounds = get_bounds_curves(ctx, op, mn, variable_name)
+                    if bounds is not None:
+                        plot_bounds(ax, bounds, PLOT_COLORS[color], str(mn) + ' workers')
 
             if y_max < 1.0:
                 y_max = 1.0
@@ -1104,11 +1172,100 @@ def plot_percentiles(ctx, datasets, app_name):
                 plt.close()
 
 
+def plot_preview(ctx, estimates):
+    """
+    plots numclients vs throughput and response time of the preview estimates (-q and -f flags)
+    mean and standard error of the subsample; one line for each combination of the varying parameters
+    """
+    prefix = ctx['prefix']
+    experiment = 'r_' + ctx['experiment_folder']
+    preview_figures_path = os.path.join(ctx['output_folder'], ctx['experiment_folder'], FIGURES_FOLDER, 'preview')
+    make_path(preview_figures_path)
+
+    # parameters that vary between the configurations (besides op and number of clients) label the lines
+    label_keys = []
+    for key in ['cc', 'ci', 'ct', 'ck', 'mc', 'mt', 'ms', 'sc', 'st']:
+        if len(set([str(e['metadata'][key]) for e in estimates.values()])) > 1:
+            label_keys.append(key)
+
+    for op in sorted(set([e['metadata']['op'] for e in estimates.values()])):
+        lines = {}
+        for e in estimates.values():
+            if e['metadata']['op'] != op:
+                continue
+            label = ', '.join([key + ' ' + str(e['metadata'][key]) for key in label_keys])
+            create_or_get_template(lines, label, []).append(e)
+        mapped_op = PLOT_LABELS_OP_MAPPING[op]
+
+        for variable_name, key in [('Throughput', 'X'), ('ResponseTime', 'R')]:
+            fig, ax = plt.subplots()
+            for color, label in enumerate(sorted(lines)):
+                points = sorted(lines[label], key=lambda e: e['cn'])
+                ax.errorbar([e['cn'] for e in points], [e[key] for e in points], [e[key + '_se'] for e in points],
+                            color=PLOT_COLORS[color % len(PLOT_COLORS)], fmt='-o', capsize=3, elinewidth=1, markeredgewidth=1,
+                            label=label if len(label) > 0 else mapped_op)
+            ax.set_ylim(ymin=0)
+            ax.set_xlim(xmin=0)
+            ax.grid(which='major', axis='both')
+            ax.legend(loc='best', prop={'size': 8})
+            plt.xlabel('Total number of clients')
+            plt.ylabel(PLOT_LABELS_VARIABLE_NAME_MAPPING[variable_name] + ' [' + PLOT_LABELS_VARIABLE_UNITS_MAPPING[variable_name] + ']')
+            plt.title('Preview ' + PLOT_LABELS_VARIABLE_NAME_MAPPING[variable_name] + ': ' + mapped_op)
+            filename = os.path.join(preview_figures_path, prefix + experiment + '_preview_x_numclients_y_' + variable_name
+                                    + '_op_' + mapped_op + '.pdf')
+            plt.tight_layout()
+            plt.savefig(filename)
+            plt.close()
+
+
+def plot_sweep(ctx, rows):
+    """
+    plots numclients vs throughput and response time of the configuration sweep (-w flag)
+    one line for each mt (M/M/m model) with its interactive law bound (dotted); mc, sc, ck as SWEEP_PLOT_FIXED
+    """
+    prefix = ctx['prefix']
+    experiment = 'r_' + ctx['experiment_folder']
+    sweep_figures_path = os.path.join(ctx['output_folder'], ctx['experiment_folder'], FIGURES_FOLDER, 'sweep')
+    make_path(sweep_figures_path)
+
+    fixed = {k: v for k, v in SWEEP_PLOT_FIXED.items()}
+    if not any([all([row[k] == v for k, v in fixed.items()]) for row in rows]):
+        fixed = {k: rows[0][k] for k in fixed}
+    fixed_text = ', '.join([k + ' ' + str(v) for k, v in sorted(fixed.items())])
+
+    for op in sorted(set([row['op'] for row in rows])):
+        lines = {}
+        for row in rows:
+            if row['op'] == op and all([row[k] == v for k, v in fixed.items()]):
+                create_or_get_template(lines, row['mt'], []).append(row)
+        mapped_op = PLOT_LABELS_OP_MAPPING[op]
+
+        for variable_name, bound_name in [('Throughput', 'X_upper'), ('ResponseTime', 'R_lower')]:
+            fig, ax = plt.subplots()
+            for color, mt in enumerate(sorted(lines)):
+                points = sorted(lines[mt], key=lambda row: row['cn'])
+                x = [row['cn'] for row in points]
+                ax.plot(x, [row[variable_name] for row in points], '-o', color=PLOT_COLORS[color % len(PLOT_COLORS)],
+                        markersize=3, label='mt ' + str(mt))
+                ax.plot(x, [row[bound_name] for row in points], ':', color=PLOT_COLORS[color % len(PLOT_COLORS)],
+                        linewidth=1)
+            ax.set_ylim(ymin=0)
+            ax.set_xlim(xmin=0)
+            ax.grid(which='major', axis='both')
+            ax.legend(loc='best', prop={'size': 8})
+            plt.xlabel('Total number of clients')
+            plt.ylabel(PLOT_LABELS_VARIABLE_NAME_MAPPING[variable_name] + ' [' + PLOT_LABELS_VARIABLE_UNITS_MAPPING[variable_name] + ']')
+            plt.title('Sweep ' + PLOT_LABELS_VARIABLE_NAME_MAPPING[variable_name] + ': ' + mapped_op + ', ' + fixed_text)
+            filename = os.path.join(sweep_figures_path, prefix + experiment + '_sweep_x_numclients_y_' + variable_name
+                                    + '_op_' + mapped_op + '.pdf')
+            plt.tight_layout()
+            plt.savefig(filename)
+            plt.close()
+
+
 # --- plot figures ---------------------------------------------------------------------------------
 
-def plot_figures(ctx, datasets):
-    """Creates all the plots for the experiments. Note: selection of plots is tailored to the experiment."""
-    print('### plotting figures ###')
+def prepare_figures_paths(ctx):
     figures_path = os.path.join(ctx['output_folder'], ctx['experiment_folder'], FIGURES_FOLDER)
     detailed_figures_path = os.path.join(figures_path, 'detailed')
     more_detailed_figures_path = os.path.join(detailed_figures_path, 'more_detailed')
@@ -1117,40 +1274,95 @@ def plot_figures(ctx, datasets):
     ctx['detailed_figures_path'] = detailed_figures_path
     ctx['more_detailed_figures_path'] = more_detailed_figures_path
 
-    # follow the figure matrix to create the defined plots
-    exp = ctx['experiment_folder']
-
-    # system tools data: dstat, ping (see stats summary for iperf)
-    print('    plotting dstat and ping detail figures')
-    plot_dstat(ctx, datasets)
-    plort_ping(ctx, datasets)
 
-    # memtier
+def plot_memtier_figures(ctx, datasets, detail_datasets):
+    """
+    :param detail_datasets: datasets used for the figures of individual experiment keys (detailed figures
+                            and histograms); allows restricting them to a selection of experiment keys
+    """
+    exp = ctx['experiment_folder']
     print('    plotting memtier main figures')
     if exp in FIGURES_MATRIX['plot_memtier_numclients_vs_variables']:
         plot_memtier_numclients_vs_variables(ctx, datasets)
     plot_percentiles(ctx, datasets, 'memtier')
-    plot_histograms(ctx, datasets, 'memtier', 'ResponseTime')
+    plot_histograms(ctx, detail_datasets, 'memtier', 'ResponseTime')
 
     print('    plotting memtier detail figures (time vs variables for each experiment key)')
-    plot_detailed_time_vs_variable(ctx, datasets, 'memtier')
+    plot_detailed_time_vs_variable(ctx, detail_datasets, 'memtier')
 
-    if exp in FIGURES_MATRIX['no_middleware_involved']:
-        print('    no middleware data in this experiment')
-        return
 
-    # middleware
+def plot_mw_figures(ctx, datasets, detail_datasets):
+    """:param detail_datasets: see plot_memtier_figures()"""
+    exp = ctx['experiment_folder']
     print('    plotting middleware main figures')
     if exp in FIGURES_MATRIX['plot_middleware_numclients_vs_variables']:
         plot_middleware_numclients_vs_variables(ctx, datasets)
     plot_percentiles(ctx, datasets, 'mw')
-    plot_histograms(ctx, datasets, 'mw', 'ResponseTime')
+    plot_histograms(ctx, detail_datasets, 'mw', 'ResponseTime')
 
     print('    plotting middleware detail figures (time vs variables for each experiment key)')
-    plot_detailed_time_vs_variable(ctx, datasets, 'mw')
-    plot_histograms(ctx, datasets, 'mw', 'QueueingTime', True)
-    plot_histograms(ctx, datasets, 'mw', 'ServiceTime', True)
-    plot_histograms(ctx, datasets, 'mw', 'ServerRtt1', True)
+    plot_detailed_time_vs_variable(ctx, detail_datasets, 'mw')
+    plot_histograms(ctx, detail_datasets, 'mw', 'QueueingTime', True)
+    plot_histograms(ctx, detail_datasets, 'mw', 'ServiceTime', True)
+    plot_histograms(ctx, detail_datasets, 'mw', 'ServerRtt1', True)
     if exp not in FIGURES_MATRIX['middleware_uses_only_one_server']:
-        plot_histograms(ctx, datasets, 'mw', 'ServerRtt2', True)
-        plot_histograms(ctx, datasets, 'mw', 'ServerRtt3', True)
+        plot_histograms(ctx, detail_datasets, 'mw', 'ServerRtt2', True)
+        plot_histograms(ctx, detail_datasets, 'mw', 'ServerRtt3', True)
+
+
+def plot_figures(ctx, datasets):
+    """Creates all the plots for the experiments. Note: selection of plots is tailored to the experiment."""
+    print('### plotting figures ###')
+    prepare_figures_paths(ctx)
+
+    # follow the figure matrix to create the defined plots
+    exp = ctx['experiment_folder']
+
+    # system tools data: dstat, ping (see stats summary for iperf)
+    print('    plotting dstat and ping detail figures')
+    plot_dstat(ctx, datasets)
+    plort_ping(ctx, datasets)
+
+    # memtier
+    plot_memtier_figures(ctx, datasets, datasets)
+
+    if exp in FIGURES_MATRIX['no_middleware_involved']:
+        print('    no middleware data in this experiment')
+        return
+
+    # middleware
+    plot_mw_figures(ctx, datasets, datasets)
+
+
+# configuration parameters of the experiment keys without op (and without run and iteration keys)
+UPDATE_SHARED_FIGURE_KEYS = ['cc', 'ci', 'ct', 'cv', 'ck', 'cr', 'mc', 'mt', 'ms', 'sc', 'st']
+
+
+def plot_updated_figures(ctx, datasets, updated_exp_keys):
+    """
+    Creates only the figures affected by an incremental update (see processing/incremental_update.py):
+    figures across all experiment keys of the updated apps and the figures of the individual experiment keys
+    that share a figure with an updated experiment key (same configuration parameters UPDATE_SHARED_FIGURE_KEYS,
+    i.e. the experiment keys of the same configuration with any op; e.g. the histograms merge set and get).
+    :param updated_exp_keys: dict app name -> set of updated experiment keys
+    """
+    print('### plotting updated figures ###')
+    prepare_figures_paths(ctx)
+    experiment = 'r_' + ctx['experiment_folder']
+    run = datasets[experiment]
+    for app_name, exp_keys in sorted(updated_exp_keys.items()):
+        if len(exp_keys) == 0:
+            continue
+        app = run['app_' + app_name]
+        shared_exp_keys = set()
+        for exp_key in exp_keys:
+            metadata = app[exp_key]['metadata']
+            for other_exp_key, other_exp_data in app.items():
+                if all([str(other_exp_data['metadata'].get(k)) == str(metadata.get(k)) for k in UPDATE_SHARED_FIGURE_KEYS]):
+                    shared_exp_keys.add(other_exp_key)
+        detail_datasets = {experiment: {'app_' + app_name: {k: app[k] for k in shared_exp_keys}}}
+        print('    {app}: {count} experiment keys'.format(app=app_name, count=len(shared_exp_keys)))
+        if app_name == 'memtier':
+            plot_memtier_figures(ctx, datasets, detail_datasets)
+        else:
+            plot_mw_figures(ctx, datasets, detail_datasets)
@@ -5,10 +5,32 @@ developed and tested with Python 3.6 (anaconda) on macOS 10.13 using PyCharm
 (no guarantees for other python versions or operating systems)
 
 usage from within scripts/data_processing folder:
-python3 process_raw_data.py path_to_run_folder [-p prefix] [-e experiment]*
-    -p and -e are optional
+python3 process_raw_data.py path_to_run_folder [-p prefix] [-e experiment]* [-x] [-o] [-t] [-u path_to_replaced_file]* [-q [-f]] [-s variant]* [-l] [-w] [-c target]*
+    -p, -e, -x, -o, -t, -u, -q, -f, -s, -l, -w, and -c are optional
     -p shall only be used once
     -e can be used several times with different experiments each
+    -x excludes some parts from printing/plotting to save space
+    -o excludes suspect outlier iterations from the statistics (see processing/outlier_detection.py)
+    -t tolerant mode: missing instance iterations (e.g. a lost memtier file set) do not stop the processing
+       of the experiment; they are excluded from mean, SD, and percentiles (real n is reported for each
+       variable) and listed in the summary
+    -u incremental update of the database json file of a previous run with a replaced memtier or middleware
+       file set (any file of the set, e.g. a repeated iteration); only the affected aggregates and figures
+       are updated (see processing/incremental_update.py); can be used several times; not with -x
+    -q preview mode: approximate throughput and response time for each configuration from a subsample of
+       instances and iterations within seconds; no database, histograms or figures (see processing/preview.py)
+    -f plots figures of the preview estimates (only with -q)
+    -s discrete-event simulation of the middleware for each measured configuration: as measured and with the
+       given variant of the configuration parameters, e.g. -s mt_256_sc_5 (see processing/middleware_simulation.py);
+       can be used several times; -s measured simulates the measured configurations only; not with -q
+    -l load-balancing policy simulation: round-robin, join-shortest-queue, power-of-two-choices and key-aware server
+       choice with the measured request mix and server RTT distributions (see processing/load_balancing_simulation.py);
+       not with -q
+    -w configuration sweep: closed-form evaluation of the grid SWEEP_GRID (cn x mc x mt x sc x ck x op) based on
+       the measured data; evaluated points are memoized (see processing/configuration_sweep.py); not with -q
+    -c capacity planning: cheapest configurations (mc, mt, sc, ms) that meet a throughput and response time
+       target, e.g. -c x_30_r_2 (30 kop/s, mean <= 2 ms) or -c x_30_r_5_p_99_op_read_ck_6 (p99 <= 5 ms for
+       multi-gets with 6 keys); see processing/capacity_planner.py; can be used several times; not with -q
 
 processed data and figures will be written into this run folder separate for each experiment in this folder
 next to its raw_data folder.
@@ -49,7 +71,7 @@ Multiple layers of keys are used:
 - run_key (note: typically only one runID is processed at a time)
   \- short application key: based on app
       # for memtier and mw
-      \- experiment key: based on runID, iteration, client load (cn: cc, ci, ct, cv, op, ck), middleware capacity
+      \- experiment key: based on runID, iteration, client load (cn: cc, ci, ct, cv, op, ck; cr: open-loop rate), middleware capacity
                          (mn: mc, mt), and server capacity (sn: sc, st)
          \- metadata :: the metadata dict
          \- total_request_count
@@ -57,6 +79,17 @@ Multiple layers of keys are used:
          \- instance-iteration matrix :: allows check that all iterations of all instances have been loaded
             \- instance :: "1"-"6", or "all"
                \- iteration :: array index 0-3 -> count
+         \- outlier_detection :: robust detection of outlier iterations (see processing/outlier_detection.py)
+            \- scores
+               \- variable: list with a score for each iteration (median of the abs. modified z-scores of the instances)
+            \- suspect_iterations: list of iteration indices (0-3)
+            \- suspect_cells: list of dicts with variable, instance, iteration, and z (modified z-score)
+         \- valid_iterations (optional) :: list of bool for each iteration; False for iterations excluded
+            from mean, SD, and the aggregated percentiles (see -o flag); all iterations are valid if missing
+         \- missing_cells (optional, tolerant mode -t) :: missing cells of the instance-iteration matrix
+            \- instance :: list of missing iteration indices (0-3); excluded from mean and SD of this instance;
+                          iterations with any missing cell are excluded from the aggregated 'all' instance
+                          (see get_valid_iterations())
 
          \- windows (each, stable_avg, all_avg)
             \- window-nr: nr; or stable_avg or overall_avg
@@ -69,6 +102,9 @@ Multiple layers of keys are used:
                         \- mean: mean of the values in the list [calculated]
                         \- sd: SD of the values in the list [calculated]
                         \- n: number of values used for mean and sd [calculated]
+                  note: the network-normalized variables (ClientNetworkRtt, NetworkFreeResponseTime,
+                  NetworkFreeServerRtt1-3) are calculated using the ping data [calculated]
+                  (see processing/network_normalization.py)
 
          \- histograms (full run)
             \- raw_bins (data from the middleware / memtier) :: organized for ease of import (mainly memtier)
@@ -148,6 +184,159 @@ Multiple layers of keys are used:
             \- sd: SD of the values in the list [calculated]
             \- n: number of values used for mean and sd [calculated]
 
+  \- mva :: mean value analysis of the closed network models (see processing/mean_value_analysis.py)
+     \- op-type: set, get, mixed
+        \- model: e.g. mn_16
+           \- demands: dict station -> service demand (ms)
+           \- Z, Z_source: think time (ms) and its source
+           \- client_numbers: measured numbers of clients of the model
+           \- N: list of populations 1 .. max. number of clients
+           \- X, R: exact MVA predictions for N (kop/s, ms); Q: dict station -> list of queue lengths
+           \- X_schweitzer, R_schweitzer: approximate MVA predictions for N
+           \- X_load_dependent, R_load_dependent: MVA predictions for N with the load-dependent demands
+  \- multiclass_mva :: multi-class MVA of mixed get/set workloads (see processing/multiclass_mva.py)
+     \- model: e.g. mn_16 (all ops)
+        \- classes: list of the class names (set, get_<k>)
+        \- parameters: dict class -> Z, S_net, S_proc, V_server, S_server, ServerRtt, X_measured, source
+        \- stations: list of the station names; demands: dict class -> list of the demands (ms)
+        \- delays: dict class -> pure delay of the server RTT (ms)
+        \- N, set_ratio: number of clients and fraction of set clients of each population mix
+        \- X, R: dict class -> list of throughput (kop/s) and response time (ms) for the mixes
+        \- X_total, R_total, request_set_ratio: overall throughput, response time and fraction of set requests
+  \- distributions :: fitted distributions of the middleware histograms (see processing/distribution_fitting.py)
+     \- configuration: e.g. op_write_cn_6_mn_16
+        \- fits
+           \- variable: ServiceTime, QueueingTime, ServerRtt1, ServerRtt2, ServerRtt3
+              \- mean, scv: mean (ms) and squared coefficient of variation of the histogram
+              \- ks: dict family -> Kolmogorov-Smirnov distance (None if not applicable)
+              \- family: best fitting family (exponential, Erlang, hyperexponential, lognormal)
+        \- queueing: lambda, m, S, scv, rho, W_MMm, W_AC (Allen-Cunneen), W_measured (ms)
+  \- open_system :: analysis of open-loop runs (see processing/open_system.py); only with open-loop runs (cr)
+     \- configurations
+        \- configuration: group, offered_load, X (kop/s), throughput_ratio (X / offered_load), drop (1 - ratio),
+           R, percentiles (p95, p99; ms; None if n/a), R_growth (relative; None if not evaluable),
+           queue_growth (requests; None without middleware), status (ok, drop, backlog, n/e)
+     \- groups
+        \- configuration group (without cn and cr): configurations (by offered load), sustainable_load, collapse_load
+  \- forced_flow :: forced flow law across client, middleware and server tiers (see processing/forced_flow.py)
+     \- flows
+        \- flow: middleware, server_requests, server_keys, server_balance
+           \- checked, flagged: number of experiment keys (stable windows average)
+           \- windows_checked, windows_flagged: number of stable windows and iterations
+     \- experiments
+        \- experiment key
+           \- visits: servers, set, get (visits of the servers per request), keys_per_get
+           \- stable
+              \- flow: expected, measured (kop/s), relative (measured / expected - 1), flagged
+           \- windows_flagged
+              \- flow: list of the flagged window numbers
+  \- law_consistency :: Little's law and utilization law per middleware window (see processing/law_consistency.py)
+     \- laws
+        \- law: queue, workers, utilization
+           \- checked, checked_stable: number of checked cells (window, instance, iteration)
+           \- violations_stable, violations_other: number of violations in the stable and in the other windows
+     \- experiments
+        \- experiment key
+           \- violations_stable, violations_other: see laws
+           \- violations: list of dicts with law, window, instance, iteration, stable, lhs, rhs
+  \- fork_join :: fork-join latency prediction (see processing/fork_join.py)
+     \- reference: configuration providing the ServerRtt and QueueingTime histograms
+     \- key_costs: middleware, server (ms per key), q_0 (keys per server request of the reference)
+     \- set
+        \- number of servers: S, R (dicts with mean and percentiles p50, p95, p99 in ms)
+     \- get
+        \- non-sharded, sharded
+           \- number of keys
+              \- number of servers: S, R (see set)
+     \- validation
+        \- configuration
+           \- op (get, set): ServiceTime_measured, ServiceTime_predicted (mean, ms)
+  \- response_surface :: response surface regression (see processing/response_surface.py)
+     \- op: write, read, mixed
+        \- factors: list of the varying configuration parameters; coding: factor -> [center, half range] of log2
+        \- median_levels: factor -> level used for factors missing in what-if points
+        \- terms, term_names: terms of the model (lists of factor indices; [] for I)
+        \- n, df, t: number of configurations, degrees of freedom, t-value of the prediction intervals
+        \- responses
+           \- Throughput, ResponseTime, p99: b, cov, s2, mean_inverse_weight (see predict_response_surface()),
+              R2, loo_rmse, loo_relative
+        \- predictions: list of dicts with point and values (response -> y, lo, hi)
+  \- knees :: saturation knee detection (see processing/knee_detection.py)
+     \- op: set, get, mixed
+        \- model: e.g. mn_16
+           \- client_numbers: list of the measured numbers of clients
+           \- Throughput, ResponseTime, combined: knee and ci (list lower, upper) of the breakpoint
+           \- N_uc: detected knee rounded to the closest measured number of clients
+           \- N_uc_override: N_uc_override of LAWS_AND_MODELING_INPUT (None if not defined; replaces N_uc)
+           \- N*: interactive law bound of the asymptotic bounds (None if n/a)
+  \- sla :: SLA surface and throughput/latency Pareto frontier (see processing/sla_analysis.py)
+     \- thresholds: list of the SLA thresholds T (ms)
+     \- evaluable: dict metric -> list of bool (one for each threshold; False: beyond the histogram limit)
+     \- configurations
+        \- configuration: e.g. op_write_cn_6_mn_16
+           \- X, cn: throughput (kop/s) and number of clients
+           \- latency: dict metric (mean, p95, p99) -> memtier response time (ms; None if in the overflow bin)
+     \- surface
+        \- configuration group: e.g. op_write_mn_16 (all configurations without cn)
+           \- metric: list (one for each threshold) of dicts with the max. throughput X and its cn (None if n/a
+                      or not evaluable)
+     \- pareto
+        \- op: write, read, mixed
+           \- metric: list of the non-dominated configurations by increasing throughput
+  \- demand_curves :: load-dependent service demands of the MVA stations (see processing/load_dependent_demands.py)
+     \- op-type: set, get, mixed
+        \- model: e.g. mn_16
+           \- client_numbers, N: as for mva
+           \- stations
+              \- station: e.g. middleware,workerthread
+                 \- source: origin of the demand samples
+                 \- samples: list of demand samples (ms) for the client numbers (None if n/a)
+                 \- a, b, R2, n: fitted curve D(n) = a + b n, coefficient of determination, number of samples
+                 \- D_min: smallest sample (lower limit of the curve)
+                 \- D: list of the fitted demands (ms) for N
+  \- simulation (optional, -s flag) :: discrete-event simulation of the middleware (see processing/middleware_simulation.py)
+     \- configuration: e.g. op_write_cn_6_mn_16
+        \- simulated (as measured) or variant (e.g. mt_256_sc_5)
+           \- variable: Throughput, ResponseTime, QueueingTime, ServiceTime, WorkerUtilization, QueueLen
+  \- load_balancing (optional, -l flag) :: load-balancing policy simulation (see processing/load_balancing_simulation.py)
+     \- configuration: e.g. op_read_cn_6_mn_16
+        \- mix: measured or a mix of LOAD_BALANCING_KEY_MIXES
+           \- policy: round_robin, join_shortest_queue, power_of_two, key_aware
+              \- Throughput, ResponseTime, percentiles (p50, p95, p99)
+              \- key_share, outstanding_keys: lists (one for each server)
+              \- skew: max / mean of the outstanding keys
+  \- bounds :: asymptotic and balanced job bounds (see processing/performance_bounds.py)
+     \- op-type: set, get, mixed
+        \- model: e.g. mn_16
+           \- D, D_max, D_avg, M, Z, N*: input of the bounds
+           \- client_numbers, N: as for mva
+           \- ABA_X_lower, ABA_X_upper, ABA_R_lower, ABA_R_upper: asymptotic bounds for N
+           \- BJB_X_lower, BJB_X_upper, BJB_R_lower, BJB_R_upper: balanced job bounds for N
+  \- bottlenecks :: resources ranked by utilization (see processing/bottleneck_analysis.py)
+     \- link_capacities: dict VM type -> max. iperf bandwidth (Mbit/s)
+     \- op-type: set, get, mixed
+        \- model: e.g. mn_16
+           \- client_numbers, X: measured numbers of clients and memtier throughput (kop/s)
+           \- resources
+              \- resource: e.g. middleware worker threads, server CPU
+                 \- U, D: lists of utilization and demand (ms) for the client numbers
+           \- ranking: list of resource names sorted by utilization for each client number
+           \- bottleneck, second: lists of resource names for the client numbers
+           \- QueueLen, ServerRttMax: lists of the middleware indicators (None without middleware)
+           \- shifts: list of dicts with cn_from, cn_to, from, to
+  \- factorial (FACTORIAL_DESIGNS only, e.g. e610) :: 2^k r analysis (see processing/factorial_analysis.py)
+     \- factors: dict A, B, C -> factor key and levels
+     \- confidence: confidence level of the CI
+     \- op: write, read
+        \- model: additive, multiplicative
+           \- variable: Throughput, ResponseTime
+              \- columns: I, A, B, C, AB, AC, BC, ABC
+              \- effects, ci_lower, ci_upper, significant: lists in the order of the columns
+                 (multiplicative: factors 10^q)
+              \- variation: dict error and columns (without I) -> percent of SST
+              \- y: measured values (2^k configurations in standard order x r iterations)
+              \- r, s_e, s_q, df, t
+
 Note re **variable** data type implemented above in the windows:
 Such a variable holds raw data of 2 dimensions: instances and iterations. It basically forms a 2D tensor (matrix)
 that is aggregated in the instance dimension (sum or weighted mean dependent on variable) and aggregated
@@ -179,6 +368,19 @@ References
             https://www.itl.nist.gov/div898/software/dataplot/refman2/ch2/weigmean.pdf
 [Dataplot2] Dataplot reference manual: weighted standard deviation.
             https://www.itl.nist.gov/div898/software/dataplot/refman2/ch2/weightsd.pdf
+[Croux1992]    Croux C, Rousseeuw PJ. Time-efficient algorithms for two highly robust estimators of scale.
+               Computational Statistics 1992; 1:411-428
+[Iglewicz1993] Iglewicz B, Hoaglin DC. How to detect and handle outliers. ASQC Quality Press, 1993
+[Welford1962]  Welford BP. Note on a method for calculating corrected sums of squares and products.
+               Technometrics 1962; 4(3):419-420
+[Reiser1980]   Reiser M, Lavenberg SS. Mean-value analysis of closed multichain queuing networks.
+               Journal of the ACM 1980; 27(2):313-322
+[Schweitzer1979]  Schweitzer PJ. Approximate analysis of multiclass closed networks of queues.
+                  Proceedings of the International Conference on Stochastic Control and Optimization, 1979
+[Banks2010]       Banks J, Carson JS, Nelson BL, Nicol DM. Discrete-event system simulation. 5th ed.
+                  Prentice Hall, 2010
+[Lazowska1984]    Lazowska ED, Zahorjan J, Graham GS, Sevcik KC. Quantitative system performance.
+                  Prentice-Hall, 1984
 """
 
 import os
@@ -190,6 +392,14 @@ from processing.memtier import *
 from processing.middleware import *
 from processing.system_tools import *
 from processing.aggregation_and_statistics import *
+from processing.outlier_detection import *
+from processing.network_normalization import *
+from processing.incremental_update import *
+from processing.preview import *
+from processing.middleware_simulation import *
+from processing.load_balancing_simulation import *
+from processing.configuration_sweep import *
+from processing.capacity_planner import *
 from plotting.figure_plotting import *
 
 
@@ -219,8 +429,7 @@ def main():
             print('\n### skipping experiment {exp} ###'.format(exp=entry))
             continue
         ctx['experiment_folder'] = entry
-        ctx['throughput_cache'] = {}  # op -> model -> cn -> throughput value
-        ctx['global_cache'] = {}      # op -> model -> other variables that need caching
+        ctx['ol_graph'] = {}  # op -> model -> operational laws graph (see tools/operational_laws.py)
         # a separate database json file is stored for each experiment
         # however, the can be merged into one database, if desired
         # include the manually defined operational laws and modeling parameters
@@ -231,6 +440,15 @@ def main():
         CONFIGURATION['laws_and_modeling_output'] = {
             entry: {}
         }
+        CONFIGURATION['laws_and_modeling_values'] = {
+            entry: {}
+        }
+        CONFIGURATION['mva_output'] = {
+            entry: {}
+        }
+        CONFIGURATION['bounds_output'] = {
+            entry: {}
+        }
         datasets = {
             'db': DB_NAME,
             'api': DB_API,
@@ -238,6 +456,25 @@ def main():
             'experiments': [entry],
             'configuration': CONFIGURATION
         }
+        if ctx['preview']:
+            print('\n### preview of experiment {exp} ###'.format(exp=entry))
+            estimates = preview(ctx)
+            if ctx['preview_figures'] and len(estimates) > 0:
+                plot_preview(ctx, estimates)
+            print_warnings_and_errors(ctx, datasets)
+            continue
+
+        if entry in ctx['update_files']:
+            print('\n### updating experiment {exp} ###'.format(exp=entry))
+            if load_database(ctx, datasets):
+                updated_exp_keys = update_iterations(ctx, datasets, ctx['update_files'][entry])
+                if updated_exp_keys is not None:
+                    write_key_stats(ctx, datasets)
+                    plot_updated_figures(ctx, datasets, updated_exp_keys)
+                    write_database(ctx, datasets)
+            print_warnings_and_errors(ctx, datasets)
+            continue
+
         print('\n### processing experiment {exp} ###'.format(exp=entry))
         process_middleware(ctx, datasets)
         process_memtier(ctx, datasets)
@@ -246,9 +483,21 @@ def main():
         process_dstat(ctx, datasets)
         if check_data(ctx, datasets):
             aggregate(ctx, datasets)
+            normalize_network_latency(ctx, datasets)
+            detect_outlier_iterations(ctx, datasets)
             calc_statistics(ctx, datasets)
             aggregate_percentiles(ctx, datasets)
             write_key_stats(ctx, datasets)
+            if len(ctx['simulation_variants']) > 0:
+                simulate_middleware(ctx, datasets)
+            if ctx['load_balancing']:
+                simulate_load_balancing_policies(ctx, datasets)
+            if ctx['sweep']:
+                sweep_rows = run_configuration_sweep(ctx, datasets)
+                if len(sweep_rows) > 0:
+                    plot_sweep(ctx, sweep_rows)
+            if len(ctx['capacity_targets']) > 0:
+                write_capacity_plans(ctx, datasets)
             plot_figures(ctx, datasets)
             write_database(ctx, datasets)
         print_warnings_and_errors(ctx, datasets)
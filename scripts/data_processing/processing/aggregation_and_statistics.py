@@ -14,6 +14,22 @@ import sys
 
 from tools.config import *
 from tools.helpers import *
+from tools.operational_laws import *
+from processing.mean_value_analysis import *
+from processing.queueing_models import *
+from processing.performance_bounds import *
+from processing.factorial_analysis import *
+from processing.bottleneck_analysis import *
+from processing.load_dependent_demands import *
+from processing.multiclass_mva import *
+from processing.distribution_fitting import *
+from processing.sla_analysis import *
+from processing.knee_detection import *
+from processing.response_surface import *
+from processing.fork_join import *
+from processing.law_consistency import *
+from processing.forced_flow import *
+from processing.open_system import *
 
 
 # --- processing :: aggregates  and statistics -----------------------------------------------------
@@ -120,25 +136,12 @@ def aggregate_app_instances(ctx, app, app_name):
                 total_count = 0
                 for instance_name, instance in variable.items():
                     for iteration_id, iteration in instance.items():
-                        ignored_count_in_iteration = 0
-                        for time_count in iteration:
-                            time = time_count[0]
-                            count = time_count[1]
-                            if count == 0:
-                                continue
-                            total_count += count
-                            bin_nr = int(float(time) / HISTOGRAM_TIME_RESOLUTION)
-                            if bin_nr > HISTOGRAM_MAX_BIN_NR:
-                                ignored_values.append(str(time) + ' ms, count ' + str(count))
-                                ignored_count += count
-                                ignored_count_in_iteration += count
-                                continue
+                        bins, iteration_ignored_values, iteration_ignored_count, iteration_total_count = bin_raw_histogram_iteration(iteration)
+                        for bin_nr, count in enumerate(bins):
                             processed_all_instance[bin_nr]['values'][iteration_id] += count
-
-                        # as learned in exercise session:
-                        # not only report the "ignored values" beyond the cutoff value of the histogram
-                        # but also show them in the last bin
-                        processed_all_instance[HISTOGRAM_MAX_BIN_NR]['values'][iteration_id] += ignored_count_in_iteration
+                        ignored_values.extend(iteration_ignored_values)
+                        ignored_count += iteration_ignored_count
+                        total_count += iteration_total_count
 
                 list_name = 'ignored_values_' + op_name + '_' + variable_name
                 count_name = list_name + '_count'
@@ -159,9 +162,60 @@ def aggregate_app_instances(ctx, app, app_name):
                     percent = 100.0 * float(ignored_count) / float(total_count)
                 meta[percent_name] = percent
                 # for later convenience while printing, the info texts are inserted "print-ready"
-                ctx['info'].append('  - histogram for {app} {op} {variable} {config}:\n    {ignored} of total {total} ({percent:5.1f}%) requests were above the defined cutoff {cutoff} ms. They are shown in the last histogram bin.\n'
-                                   .format(app=app_name, op=op_name, variable=variable_name, config=exp_key, ignored=ignored_count, total=total_count, percent=percent, cutoff=HISTOGRAM_MAX_TIME))
+                ctx['info'].append(get_histogram_info_text(app_name, op_name, variable_name, exp_key, meta))
+
+    add_derived_variables(app)
+
+
+def bin_raw_histogram_iteration(iteration):
+    """
+    Collects the raw [time, count] data of one instance and iteration into the processed bins.
+    :return bins (count for each bin), ignored_values (list of str), ignored_count, total_count
+    """
+    bins = [0] * (HISTOGRAM_MAX_BIN_NR + 1)
+    ignored_values = []
+    ignored_count = 0
+    total_count = 0
+    for time_count in iteration:
+        time = time_count[0]
+        count = time_count[1]
+        if count == 0:
+            continue
+        total_count += count
+        bin_nr = int(float(time) / HISTOGRAM_TIME_RESOLUTION)
+        if bin_nr > HISTOGRAM_MAX_BIN_NR:
+            ignored_values.append(str(time) + ' ms, count ' + str(count))
+            ignored_count += count
+            continue
+        bins[bin_nr] += count
+
+    # as learned in exercise session:
+    # not only report the "ignored values" beyond the cutoff value of the histogram
+    # but also show them in the last bin
+    bins[HISTOGRAM_MAX_BIN_NR] += ignored_count
+    return bins, ignored_values, ignored_count, total_count
+
+
+def get_histogram_info_prefix(app_name, op_name, variable_name, exp_key):
+    return '  - histogram for {app} {op} {variable} {config}:'.format(app=app_name, op=op_name, variable=variable_name, config=exp_key)
+
+
+def get_histogram_info_text(app_name, op_name, variable_name, exp_key, meta):
+    """:return print-ready info text about the requests above the histogram cutoff"""
+    list_name = 'ignored_values_' + op_name + '_' + variable_name
+    return get_histogram_info_prefix(app_name, op_name, variable_name, exp_key) + \
+        '\n    {ignored} of total {total} ({percent:5.1f}%) requests were above the defined cutoff {cutoff} ms. They are shown in the last histogram bin.\n' \
+        .format(ignored=meta[list_name + '_count'], total=meta[list_name + '_total'], percent=meta[list_name + '_percent'], cutoff=HISTOGRAM_MAX_TIME)
+
 
+def add_derived_variables(app):
+    """adds the expected values from the interactive response time law and the per client values"""
+    for exp_key, exp_data in app.items():
+        add_derived_variables_for_exp(exp_data)
+
+
+def add_derived_variables_for_exp(exp_data):
+    """adds the derived variables to the 'all' instance of the 'both' op in all windows of exp_data"""
     # apply interactive response time law to calculate expectations for response time and throughput
     # note: see measured ClientRTTAndProcessingTime in middleware that is used as thinking time Z
     # also: this calculation makes only sense for the aggregate of all instances
@@ -175,77 +229,87 @@ def aggregate_app_instances(ctx, app, app_name):
     # looking at them separately in mixed workloads would not make sense with the very limited
     # available data from memtier. In this respect, most experiments are run with separate
     # write / read workloads, which allows checking them separately, too.
-    for exp_key, exp_data in app.items():
-        metadata = exp_data['metadata']
-        cn = float(metadata['cn'])
-        windows = exp_data['windows']
-        for window_name, window in windows.items():
-            op = window['both']
-            X_values = op['Throughput']['all']['values']      # in 1000 op/s
-            R_values = op['ResponseTime']['all']['values']    # in ms
+    #
+    # note: open-loop runs (rate-limited clients, see cr) have no thinking time; the interactive law does
+    # not apply. Instead, the offered load is added and the expected throughput follows from flow balance
+    # X = lambda [Jain1991] (see processing/open_system.py for the analysis of these runs).
+    metadata = exp_data['metadata']
+    cn = float(metadata['cn'])
+    windows = exp_data['windows']
+    for window_name, window in windows.items():
+        op = window['both']
+        X_values = op['Throughput']['all']['values']      # in 1000 op/s
+        R_values = op['ResponseTime']['all']['values']    # in ms
+
+        if is_open_loop(metadata):
+            for var_name in ['OfferedLoad', 'ExpectedThroughput']:
+                values = create_or_get_list(create_or_get_dict(create_or_get_dict(op, var_name), 'all'), 'values', 0.0)
+                for i in range(len(X_values)):
+                    values[i] = metadata['offered_load']
+            continue
 
-            if 'ThinkingTimeZ' in op:
-                Z_values = op['ThinkingTimeZ']['all']['values']   # in ms
+        if 'ThinkingTimeZ' in op:
+            Z_values = op['ThinkingTimeZ']['all']['values']   # in ms
+        else:
+            Z_values = op['ClientRTTAndProcessingTime']['all']['values']
+
+        # expected throughput: X = N / (R + Z) [Jain1991] page 563
+        # adjust for ms to s conversion and op/s to 1000 op/s cancel each other out
+        exp_throughput_variable = create_or_get_dict(op, 'ExpectedThroughput')
+        exp_throughput_instance = create_or_get_dict(exp_throughput_variable, 'all')
+        exp_throughput_values = create_or_get_list(exp_throughput_instance, 'values', 0.0)
+        iterations = len(R_values)
+        for i in range(iterations):
+            rz = R_values[i] + Z_values[i]
+            if rz == 0.0:
+                exp_throughput_values[i] = sys.float_info.max  # alternatively float("inf")
             else:
-                Z_values = op['ClientRTTAndProcessingTime']['all']['values']
-
-            # expected throughput: X = N / (R + Z) [Jain1991] page 563
-            # adjust for ms to s conversion and op/s to 1000 op/s cancel each other out
-            exp_throughput_variable = create_or_get_dict(op, 'ExpectedThroughput')
-            exp_throughput_instance = create_or_get_dict(exp_throughput_variable, 'all')
-            exp_throughput_values = create_or_get_list(exp_throughput_instance, 'values', 0.0)
-            iterations = len(R_values)
-            for i in range(iterations):
-                rz = R_values[i] + Z_values[i]
-                if rz == 0.0:
-                    exp_throughput_values[i] = sys.float_info.max  # alternatively float("inf")
-                else:
-                    exp_throughput_values[i] = cn / float(rz)
-
-            # expected response time: R = (N/X) - Z [Jain1991] page 563
-            # adjust for ms to s conversion and op/s to 1000 op/s cancel each other out
-            exp_responsetime_variable = create_or_get_dict(op, 'ExpectedResponseTime')
-            exp_responsetime_instance = create_or_get_dict(exp_responsetime_variable, 'all')
-            exp_responsetime_values = create_or_get_list(exp_responsetime_instance, 'values', 0.0)
-            for i in range(iterations):
-                x = X_values[i]
-                if x == 0.0:
-                    exp_responsetime_values[i] = sys.float_info.max  # alternatively float("inf")
-                else:
-                    exp_responsetime_values[i] = (cn / x) - Z_values[i]
+                exp_throughput_values[i] = cn / float(rz)
+
+        # expected response time: R = (N/X) - Z [Jain1991] page 563
+        # adjust for ms to s conversion and op/s to 1000 op/s cancel each other out
+        exp_responsetime_variable = create_or_get_dict(op, 'ExpectedResponseTime')
+        exp_responsetime_instance = create_or_get_dict(exp_responsetime_variable, 'all')
+        exp_responsetime_values = create_or_get_list(exp_responsetime_instance, 'values', 0.0)
+        for i in range(iterations):
+            x = X_values[i]
+            if x == 0.0:
+                exp_responsetime_values[i] = sys.float_info.max  # alternatively float("inf")
+            else:
+                exp_responsetime_values[i] = (cn / x) - Z_values[i]
 
     # add additional helper variables as learned during the Q/A session:
     # Throughput/client and ResponseTime/client
-    for exp_key, exp_data in app.items():
-        metadata = exp_data['metadata']
-        cn = float(metadata['cn'])
-        windows = exp_data['windows']
-        for window_name, window in windows.items():
-            op = window['both']
-            X_values = op['Throughput']['all']['values']      # in 1000 op/s
-            R_values = op['ResponseTime']['all']['values']    # in ms
-
-            # Throughput/client
-            X_per_client_variable = create_or_get_dict(op, 'ThroughputPerClient')
-            X_per_client_instance = create_or_get_dict(X_per_client_variable, 'all')
-            X_per_client_values = create_or_get_list(X_per_client_instance, 'values', 0.0)
-            iterations = len(X_values)
-            for i in range(iterations):
-                X_per_client_values[i] = X_values[i] / cn
-
-            # ResponseTime/client
-            R_per_client_variable = create_or_get_dict(op, 'ResponseTimePerClient')
-            R_per_client_instance = create_or_get_dict(R_per_client_variable, 'all')
-            R_per_client_values = create_or_get_list(R_per_client_instance, 'values', 0.0)
-            iterations = len(X_values)
-            for i in range(iterations):
-                R_per_client_values[i] = R_values[i] / cn
-
-
-def aggregate_percentiles_for_app(ctx, datasets, app_name):
+    metadata = exp_data['metadata']
+    cn = float(metadata['cn'])
+    windows = exp_data['windows']
+    for window_name, window in windows.items():
+        op = window['both']
+        X_values = op['Throughput']['all']['values']      # in 1000 op/s
+        R_values = op['ResponseTime']['all']['values']    # in ms
+
+        # Throughput/client
+        X_per_client_variable = create_or_get_dict(op, 'ThroughputPerClient')
+        X_per_client_instance = create_or_get_dict(X_per_client_variable, 'all')
+        X_per_client_values = create_or_get_list(X_per_client_instance, 'values', 0.0)
+        iterations = len(X_values)
+        for i in range(iterations):
+            X_per_client_values[i] = X_values[i] / cn
+
+        # ResponseTime/client
+        R_per_client_variable = create_or_get_dict(op, 'ResponseTimePerClient')
+        R_per_client_instance = create_or_get_dict(R_per_client_variable, 'all')
+        R_per_client_values = create_or_get_list(R_per_client_instance, 'values', 0.0)
+        iterations = len(X_values)
+        for i in range(iterations):
+            R_per_client_values[i] = R_values[i] / cn
+
+
+def aggregate_percentiles_for_app(ctx, datasets, app_name, exp_keys=None):
     """
     Aggregates percentiles; must be called after calculating statistics to have mean values available
     that are copied into the dict as a convenience for later creating the plots.
+    :param exp_keys: optional selection of experiment keys (incremental update); all if None
     """
     print('    aggregate percentiles for', app_name)
     experiment = 'r_' + ctx['experiment_folder']
@@ -254,6 +318,8 @@ def aggregate_percentiles_for_app(ctx, datasets, app_name):
 
     # Aggregate histogram data to generate aggregated summary percentiles
     for exp_key, exp_data in app.items():
+        if exp_keys is not None and exp_key not in exp_keys:
+            continue
         histograms = exp_data['histograms']
         metadata = exp_data['metadata']
         run_op = metadata['op']
@@ -280,9 +346,12 @@ def aggregate_percentiles_for_app(ctx, datasets, app_name):
                 max = 0.0
                 total_count = 0
                 for instance_name, instance in variable.items():
+                    valid_iterations = get_valid_iterations(exp_data, instance_name)
                     for iteration_id, iteration in instance.items():
                         if len(iteration) == 0:
                             continue
+                        if not valid_iterations[iteration_id]:
+                            continue
                         time = iteration[0][0]
                         if time < min:
                             min = time
@@ -345,37 +414,11 @@ def calc_statistics(ctx, datasets):
     count = 0
     windows_count = 0
     histograms_count = 0
-    experiment_name = ctx['experiment_folder']
     for exp_data in ctx['exp_mean_and_sd']:
-        windows = exp_data['windows']
-        windows_count += len(windows)
-        for window_nr, window_data in windows.items():
-            for op_name, op_data in window_data.items():
-                for variable_name, variable in op_data.items():
-                    for instance_name, instance in variable.items():
-                        values = instance['values']
-                        # arithmetic mean and sd over the values of the iterations/repetitions
-                        mean, sd, n = calc_mean_and_sd(values)
-                        instance['mean'] = mean
-                        instance['sd'] = sd
-                        instance['n'] = n
-                        count += 1
-
-        histograms = exp_data['histograms']['processed_bins']
-        for op_name, op_data in histograms.items():
-            if op_name == 'meta':
-                continue
-            for variable_name, variable in op_data.items():
-                histograms_count += 1
-                instance = variable['all']
-                for bin_name, bin_data in instance.items():
-                    values = bin_data['values']
-                    # arithmetic mean and sd over the values of the iterations/repetitions
-                    mean, sd, n = calc_mean_and_sd(values)
-                    bin_data['mean'] = mean
-                    bin_data['sd'] = sd
-                    bin_data['n'] = n
-                    count += 1
+        exp_count, exp_windows_count, exp_histograms_count = calc_exp_statistics(exp_data)
+        count += exp_count
+        windows_count += exp_windows_count
+        histograms_count += exp_histograms_count
 
     print('    mean and SD for {count} random variables in {windows} windows and {histograms} histograms in {exp} experiment data collections'
           .format(count=count, windows=windows_count, histograms=histograms_count, exp=len(ctx['exp_mean_and_sd'])))
@@ -394,11 +437,55 @@ def calc_statistics(ctx, datasets):
     ctx['sys_mean_and_sd'] = []
 
 
+def calc_exp_statistics(exp_data):
+    """
+    Calculates mean and SD of all variables in the windows and histogram bins of exp_data.
+    :return count of random variables, count of windows, count of histograms
+    """
+    count = 0
+    valid_iterations = get_valid_iterations(exp_data)
+    instance_valid_iterations = {}  # instance name -> valid iterations of this instance (see tolerant mode)
+    windows = exp_data['windows']
+    for window_nr, window_data in windows.items():
+        for op_name, op_data in window_data.items():
+            for variable_name, variable in op_data.items():
+                for instance_name, instance in variable.items():
+                    if instance_name not in instance_valid_iterations:
+                        instance_valid_iterations[instance_name] = get_valid_iterations(exp_data, instance_name)
+                    values = instance['values']
+                    # arithmetic mean and sd over the values of the iterations/repetitions
+                    mean, sd, n = calc_mean_and_sd(values, instance_valid_iterations[instance_name])
+                    instance['mean'] = mean
+                    instance['sd'] = sd
+                    instance['n'] = n
+                    count += 1
+
+    histograms_count = 0
+    histograms = exp_data['histograms']['processed_bins']
+    for op_name, op_data in histograms.items():
+        if op_name == 'meta':
+            continue
+        for variable_name, variable in op_data.items():
+            histograms_count += 1
+            instance = variable['all']
+            for bin_name, bin_data in instance.items():
+                values = bin_data['values']
+                # arithmetic mean and sd over the values of the iterations/repetitions
+                mean, sd, n = calc_mean_and_sd(values, valid_iterations)
+                bin_data['mean'] = mean
+                bin_data['sd'] = sd
+                bin_data['n'] = n
+                count += 1
+    return count, len(windows), histograms_count
+
+
 # --- check data completeness ----------------------------------------------------------------------
 
 def check_data(ctx, datasets):
     """
     checks the data of the current experiment folder; note: must follow before data aggregation
+    in tolerant mode (-t flag), missing cells of the instance-iteration matrix are stored in 'missing_cells'
+    of the exp_data and excluded from the statistics instead of stopping the processing
     :return True if all OK; False otherwise
     """
     print('### checking data ###')
@@ -422,20 +509,38 @@ def check_app_data(ctx, run, app_name):
     warning = ctx['warning']
     error = ctx['error']
     experiment_name = ctx['experiment_folder']
+    missing_cells_count = 0
     for exp_name, exp_data in app.items():
         n_instances = exp_data['n_instances']
         instance_iteration_matrix = exp_data['instance_iteration_matrix']
         if len(instance_iteration_matrix) != n_instances:
-            error.append('{app} exp {exp}: expected {expected} instances, found {found}'
-                         .format(app=app_name, exp=exp_name, expected=n_instances, found=len(instance_iteration_matrix)))
-            ok = False
+            if ctx['tolerant']:
+                # instances are numbered 1..n; all iterations of a missing instance are missing cells
+                for instance_id in range(1, n_instances + 1):
+                    create_or_get_list(instance_iteration_matrix, str(instance_id), 0)
+            else:
+                error.append('{app} exp {exp}: expected {expected} instances, found {found}'
+                             .format(app=app_name, exp=exp_name, expected=n_instances, found=len(instance_iteration_matrix)))
+                ok = False
 
         for instance_name, instance in instance_iteration_matrix.items():
             for i, ic in enumerate(instance):
                 if ic != 1:
                     warning.append('{app} exp {exp} instance {instance}: missing iteration {iteration}'
                                    .format(app=app_name, exp=exp_name, instance=instance_name, iteration=i))
-                    ok = False
+                    if ctx['tolerant']:
+                        missing_cells = create_or_get_dict(exp_data, 'missing_cells')
+                        create_or_get_template(missing_cells, instance_name, []).append(i)
+                        missing_cells_count += 1
+                    else:
+                        ok = False
+
+        if ctx['tolerant'] and sum(get_valid_iterations(exp_data)) < 2:
+            warning.append('{app} exp {exp}: less than 2 complete iterations; SD of the aggregated instances not available'
+                           .format(app=app_name, exp=exp_name))
+    if missing_cells_count > 0:
+        print('    {count} missing instance iterations excluded from the statistics (tolerant mode, see -t flag)'
+              .format(count=missing_cells_count))
     return ok
 
 
@@ -472,9 +577,10 @@ def write_memtier_or_mw_stats_for_window(ctx, window, window_name, app_name, map
             print_op_name = op_name
         for var_name in sorted(op_data):
             var_data = op_data[var_name]
+            var_instance_order = instance_order
             if len(var_data) == 2:
-                instance_order = ['all']
-            for instance_name in instance_order:
+                var_instance_order = ['all']
+            for instance_name in var_instance_order:
                 if instance_name not in var_data:
                     continue
                 instance_data = var_data[instance_name]
@@ -491,36 +597,34 @@ def write_memtier_or_mw_stats_for_window(ctx, window, window_name, app_name, map
                               sd=sd, unit=unit, n=instance_data['n']),
                       file=f)
 
-                # add throughput X and response time R to the model data and throughput to lookup cache
+                # add throughput X and response time R to the model data
                 if window_name == 'stable' and app_name == 'memtier' and instance_name == 'all':
                     if var_name == 'Throughput':
-                        add_ol_variable(ctx, config_dict, 'X', '{mean:6.3f} ± {sd:6.3f} {unit}, n={n}'
-                                        .format(mean=mean, sd=sd, unit=unit, n=instance_data['n']), mean)
-
-                        cache_op_dict = create_or_get_dict(ctx['throughput_cache'],
-                                                           PLOT_LABELS_OP_MAPPING[config_dict['op']])
-                        cache_models = get_experiment_models(ctx['experiment_folder'], config_dict['op'])
-                        for cache_model in cache_models:
-                            cache_model_dict = extract_metadata(cache_model)
-                            if metadata_matches_requested_config(config_dict, cache_model_dict):
-                                cache_output_dict = create_or_get_dict(cache_op_dict, cache_model)
-                                cache_output_dict[config_dict['cn']] = mean
-
+                        add_ol_variable(ctx, config_dict, 'X', mean, sd=sd, unit=unit, n=instance_data['n'])
                     elif var_name == 'ResponseTime':
-                        add_ol_variable(ctx, config_dict, 'R', '{mean:6.3f} ± {sd:6.3f} {unit}, n={n}'
-                                        .format(mean=mean, sd=sd, unit=unit, n=instance_data['n']), mean)
+                        add_ol_variable(ctx, config_dict, 'R', mean, sd=sd, unit=unit, n=instance_data['n'])
 
-            if len(instance_order) > 1:
+            if len(var_instance_order) > 1:
                 print('', file=f)
     print('', file=f)
 
 
+def get_excluded_text(valid_iterations, missing_iterations, iteration):
+    if valid_iterations[iteration]:
+        return ''
+    if iteration in missing_iterations:
+        return ' (excluded missing data)'
+    return ' (excluded outlier)'
+
+
 def write_memtier_or_mw_stats(ctx, datasets, app_name, config, f):
     exp_data, mapped_op_name = get_experiment_data(ctx, datasets, app_name, config)
     config_dict = extract_metadata(config)
     windows = exp_data['windows']
     stable_avg = windows['stable_avg']
     overall_avg = windows['overall_avg']
+    valid_iterations = get_valid_iterations(exp_data)
+    missing_iterations = get_missing_iterations(exp_data)
 
     # note: most of the time, the actual data from 'both' is shown.
     # Some values (like system data in mw) is only stored in both.
@@ -550,9 +654,9 @@ def write_memtier_or_mw_stats(ctx, datasets, app_name, config, f):
             instance_data = var_data['all']
             unit = PLOT_LABELS_VARIABLE_UNITS_MAPPING[var_name]
             for iteration, value in enumerate(instance_data['values']):
-                print('  {op}, {var}, instance {instance} iteration {iteration}: {value:6.3f} {unit}'
+                print('  {op}, {var}, instance {instance} iteration {iteration}: {value:6.3f} {unit}{excluded}'
                       .format(op=print_op_name, var=var_name, instance='all', iteration=iteration+1,
-                              value=value, unit=unit), file=f)
+                              value=value, unit=unit, excluded=get_excluded_text(valid_iterations, missing_iterations, iteration)), file=f)
     print('', file=f)
 
     print('* min/max/percentiles from entire run; mean from stable windows (see above)', file=f)
@@ -593,35 +697,33 @@ def scan_memtier_windows(ctx, datasets):
                     continue
                 exists = True
                 windows = exp_data['windows']
+                valid_iterations = get_valid_iterations(exp_data)
                 for window_nr in range(MEMTIER_STABLE_BEGIN, MEMTIER_STABLE_END):
                     window_data = windows[str(window_nr)]
                     both = window_data['both']
                     x_values = both['Throughput']['all']['values']
-                    for x in x_values:
-                        if x > X_max:
+                    for i, x in enumerate(x_values):
+                        if valid_iterations[i] and x > X_max:
                             X_max = x
                     r_values = both['ResponseTime']['all']['values']
-                    for r in r_values:
-                        if 0.0 < r < R_min:
+                    for i, r in enumerate(r_values):
+                        if valid_iterations[i] and 0.0 < r < R_min:
                             R_min = r
             if not exists:
                 continue
-            add_ol_variable(ctx, config_dict, 'X_max', '{v:6.3f} kop/s'.format(v=X_max), X_max)  # X is stored in kop/s
+            add_ol_variable(ctx, config_dict, 'X_max', X_max)  # X is stored in kop/s
             D_max = 1.0 / X_max
-            add_ol_variable(ctx, config_dict, 'D_max', '{v:6.3f} ms'.format(v=D_max), D_max)
-            add_ol_variable(ctx, config_dict, 'R_min', '{v:6.3f} ms'.format(v=R_min), R_min)
+            add_ol_variable(ctx, config_dict, 'D_max', D_max)
+            add_ol_variable(ctx, config_dict, 'R_min', R_min)
             D = R_min
-            add_ol_variable(ctx, config_dict, 'D_byRmin', '{v:6.3f} ms'.format(v=D), D)
+            add_ol_variable(ctx, config_dict, 'D_byRmin', D)
             n_star = D/D_max
-            add_ol_variable(ctx, config_dict, 'N*_DbyRmin', '{v:6.3f}'.format(v=n_star), n_star)  # N* = (D+Z)/D_max
-            # additional copy the manually defined N_uc
-            n_uc = CONFIGURATION['laws_and_modeling_input'][ctx['experiment_folder']][PLOT_LABELS_OP_MAPPING[op_key]]['models'][model]['N_uc']
-            add_ol_variable(ctx, config_dict, 'N_uc', n_uc, n_uc)
+            add_ol_variable(ctx, config_dict, 'N*_DbyRmin', n_star)  # N* = (D+Z)/D_max
             # manually defined max. network bandwidth (in Mbit/s)
             bandwidth_limit = CONFIGURATION['laws_and_modeling_input'][ctx['experiment_folder']][PLOT_LABELS_OP_MAPPING[op_key]]['models'][model]['bandwidth_limit']
-            add_ol_variable(ctx, config_dict, 'network_bandwidth_limit', '{value} Mbit/s'.format(value=bandwidth_limit), bandwidth_limit)
+            add_ol_variable(ctx, config_dict, 'network_bandwidth_limit', bandwidth_limit)
             x_network_limit = float(bandwidth_limit * 1000) / (8.0 * float(DATA_SIZE_FOR_LIMIT_CALCULATION))  # to have kop/s
-            add_ol_variable(ctx, config_dict, 'X_network_limit', '{value:6.3f} kop/s'.format(value=x_network_limit), x_network_limit)
+            add_ol_variable(ctx, config_dict, 'X_network_limit', x_network_limit)
 
 
 def write_memtier_stats(ctx, datasets, config, f):
@@ -634,9 +736,11 @@ def write_memtier_stats(ctx, datasets, config, f):
     windows = exp_data['windows']
     stable_avg = windows['stable_avg']
     config_dict = extract_metadata(config)
-    # add S_client = ExpectedResponseTime - ResponseTime
+    # add S_client = ExpectedResponseTime - ResponseTime (closed-loop runs only)
+    if 'ExpectedResponseTime' not in stable_avg['both']:
+        return
     s_client = stable_avg['both']['ExpectedResponseTime']['all']['mean'] - stable_avg['both']['ResponseTime']['all']['mean']
-    add_ol_variable(ctx, config_dict, 'S_client', '{v:6.3f} ms'.format(v=s_client), s_client)
+    add_ol_variable(ctx, config_dict, 'S_client', s_client)
 
 
 def write_mw_stats(ctx, datasets, config, f):
@@ -651,13 +755,13 @@ def write_mw_stats(ctx, datasets, config, f):
     config_dict = extract_metadata(config)
     # add S_middleware = PreprocessingTime + ProcessingTime
     s_middleware = stable_avg['both']['PreprocessingTime']['all']['mean'] + stable_avg['both']['ProcessingTime']['all']['mean']
-    add_ol_variable(ctx, config_dict, 'S_middleware', '{v:6.3f} ms'.format(v=s_middleware), s_middleware)
+    add_ol_variable(ctx, config_dict, 'S_middleware', s_middleware)
     # add S_middleware,clientthread and S_middleware,workerthread
-    # note: all V_ and D_ values are calculated inside of add_ol_variable()
+    # note: all V_, D_ and U_ values are derived in the operational laws graph (see tools/operational_laws.py)
     s_middleware_clientthread = stable_avg['both']['PreprocessingTime']['all']['mean']
-    add_ol_variable(ctx, config_dict, 'S_middleware,clientthread', '{v:6.3f} ms'.format(v=s_middleware_clientthread), s_middleware_clientthread)
+    add_ol_variable(ctx, config_dict, 'S_middleware,clientthread', s_middleware_clientthread)
     s_middleware_workerthread = stable_avg['both']['ProcessingTime']['all']['mean']
-    add_ol_variable(ctx, config_dict, 'S_middleware,workerthread', '{v:6.3f} ms'.format(v=s_middleware_workerthread), s_middleware_workerthread)
+    add_ol_variable(ctx, config_dict, 'S_middleware,workerthread', s_middleware_workerthread)
     # add more parameters
     scan_memtier_windows(ctx, datasets)
 
@@ -760,7 +864,7 @@ def write_min_max_mean_overall_ping_stats(ctx, datasets, f):
               file=f)
 
         # add min to OL output
-        add_ol_variable(ctx, None, 'S_' + connection_name, '{rtt:6.3f} ms'.format(rtt=minimum_rtt), minimum_rtt)
+        add_ol_variable(ctx, None, 'S_' + connection_name, minimum_rtt)
 
 
 def write_ping_stats(ctx, datasets, config_nr, configs_count, config, f):
@@ -806,6 +910,7 @@ def write_ping_stats(ctx, datasets, config_nr, configs_count, config, f):
 
 def write_laws_and_modeling_output(ctx, f):
     """Writes the collected OL and modeling output sorted by content"""
+    render_ol_output(ctx)
     ol_dict = CONFIGURATION['laws_and_modeling_output'][ctx['experiment_folder']]
     print('\n\n--------------------------------------------------------------------------------', file=f)
     print('Variables for operational law and models', file=f)
@@ -816,19 +921,6 @@ def write_laws_and_modeling_output(ctx, f):
     print('-- corresponding to 1 µs -- is a very short period of time.', file=f)
     print('This applies in particular to the negative values there that are explained by such noise', file=f)
     print('and do not reflect true S_client, of course.\n', file=f)
-    # do some additional processing
-    # - calculate U_server if D_server exists
-    for op_name, op_data in ol_dict.items():
-        for model_name, model_data in op_data.items():
-            if 'D_server' not in model_data:
-                continue
-            d_server = ctx['global_cache'][op_name][model_name]['D_server']
-            for cn_str, x in ctx['throughput_cache'][op_name][model_name].items():
-                u_server = x * d_server
-                config_dict = extract_metadata(model_name)
-                config_dict['cn'] = cn_str
-                config_dict['op'] = op_name
-                add_ol_variable(ctx, config_dict, 'U_server', '{value:6.3f}'.format(value=u_server), u_server)
     # actual printing
     for op_name, op_data in ol_dict.items():
         for model_name, model in op_data.items():
@@ -855,6 +947,66 @@ def extend_law_and_modeling_input(ctx):
                 model_data['invV_middleware,clientthread'] = int(model_data['invV_middleware'] / 8)
 
 
+def write_outlier_stats(ctx, datasets, f):
+    """Writes the suspect outlier iterations found by detect_outlier_iterations()"""
+    print('\n\n--------------------------------------------------------------------------------', file=f)
+    print('Outlier iterations', file=f)
+    print('--------------------------------------------------------------------------------\n', file=f)
+    print('Modified z-scores (median over the iterations of each instance, MAD pooled over instances and iterations)', file=f)
+    print('of the stable windows average; score of an iteration: median of the absolute z-scores of all instances.', file=f)
+    print('Suspect iterations: score > {threshold} in any of {variables}; {action}.\n'
+          .format(threshold=OUTLIER_DETECTION_THRESHOLD, variables=', '.join(OUTLIER_DETECTION_VARIABLES),
+                  action='excluded from the statistics (-o flag)' if ctx['exclude_outliers'] else 'reported only (see -o flag)'), file=f)
+    experiment = 'r_' + ctx['experiment_folder']
+    run = datasets[experiment]
+    count = 0
+    for app_name in ['memtier', 'mw']:
+        app = run['app_' + app_name]
+        for exp_key in sorted(app):
+            exp_data = app[exp_key]
+            if 'outlier_detection' not in exp_data:
+                continue
+            detection = exp_data['outlier_detection']
+            valid_iterations = get_valid_iterations(exp_data)
+            for iteration in detection['suspect_iterations']:
+                count += 1
+                scores = ', '.join(['{var} {score:.1f}'.format(var=var_name, score=detection['scores'][var_name][iteration])
+                                    for var_name in sorted(detection['scores'])])
+                print('  {app} {exp}, iteration {iteration}: {scores}{excluded}'
+                      .format(app=app_name, exp=exp_key, iteration=iteration + 1, scores=scores,
+                              excluded='' if valid_iterations[iteration] else ' (excluded)'), file=f)
+    if count == 0:
+        print('  no suspect iterations', file=f)
+
+
+def write_missing_cells_stats(ctx, datasets, f):
+    """Writes the missing instance iterations of tolerant mode (see check_app_data() and -t flag)"""
+    experiment = 'r_' + ctx['experiment_folder']
+    run = datasets[experiment]
+    lines = []
+    for app_name in ['memtier', 'mw']:
+        app = run['app_' + app_name]
+        for exp_key in sorted(app):
+            exp_data = app[exp_key]
+            for instance_name, iterations in sorted(exp_data.get('missing_cells', {}).items()):
+                lines.append('  {app} {exp}, instance {instance}: iterations {iterations}'
+                             .format(app=app_name, exp=exp_key, instance=instance_name,
+                                     iterations=', '.join([str(i + 1) for i in sorted(iterations)])))
+    if not ctx['tolerant'] and len(lines) == 0:
+        return
+
+    print('\n\n--------------------------------------------------------------------------------', file=f)
+    print('Missing instance iterations', file=f)
+    print('--------------------------------------------------------------------------------\n', file=f)
+    print('Tolerant mode (-t flag): missing cells are excluded from mean and SD of their instance; iterations', file=f)
+    print('with any missing cell are excluded from the aggregated instances (all) and marked in the listings above.', file=f)
+    print('n of each variable shows the count of the used iterations.\n', file=f)
+    if len(lines) == 0:
+        print('  no missing instance iterations', file=f)
+    for line in lines:
+        print(line, file=f)
+
+
 def write_info_warning_error_texts(ctx, f):
     print('\n\n--------------------------------------------------------------------------------', file=f)
     print('info, warning and error texts', file=f)
@@ -911,6 +1063,26 @@ def write_key_stats(ctx, datasets):
             write_ping_stats(ctx, datasets, config_nr, len(configurations), config, f)
             write_dstat_stats(ctx, datasets, config_nr, len(configurations), config, f)
 
+        write_outlier_stats(ctx, datasets, f)
+        write_missing_cells_stats(ctx, datasets, f)
+        write_law_consistency(ctx, datasets, f)
+        write_forced_flow_validation(ctx, datasets, f)
+
+        # models based on the collected operational laws variables
+        write_load_dependent_demands(ctx, datasets, f)
+        calc_mva_predictions(ctx, datasets)
+        calc_performance_bounds(ctx, datasets)
+        detect_saturation_knees(ctx, datasets, f)
+        write_queueing_model_stats(ctx, datasets, f)
+        write_multiclass_mva(ctx, datasets, f)
+        write_distribution_fits(ctx, datasets, f)
+        write_factorial_analysis(ctx, datasets, f)
+        write_bottleneck_analysis(ctx, datasets, f)
+        write_sla_analysis(ctx, datasets, f)
+        write_open_system_analysis(ctx, datasets, f)
+        write_response_surfaces(ctx, datasets, f)
+        write_fork_join_predictions(ctx, datasets, f)
+
         # laws and modeling must come last to allow all other modules to add content to this data compartment
         # no errors are added there; thus print info/warning/error first for easier lookup of the information
         write_info_warning_error_texts(ctx, f)
@@ -0,0 +1,193 @@
+"""
+secondary processing: bottleneck identification across the tiers
+
+For each configuration (grouped by the models of LAWS_AND_MODELING_INPUT, ordered by the number of clients cn),
+the utilization U of each resource is calculated from the stable phase:
+- <vm> CPU: dstat total CPU usage per active VM (sum of the VMs / number of VMs in the metadata; dstat runs
+  on all VMs, the idle ones are not averaged in)
+- <vm> network: max(receive, send) per VM (dstat; sum of the VMs / number of VMs) relative to the link
+  capacity of this VM type (max. iperf bandwidth of the connections of this VM type, Mbit/s)
+- middleware net-thread and middleware worker threads: ClientListenerUtilization and WorkerUtilization
+  of the middleware (stable windows average)
+with vm in client, middleware, server (BOTTLENECK_VM_TYPES). The demand of each resource follows
+from the utilization law D = U / X with the memtier throughput X (ms; kop/s and ms cancel each other out)
+[Jain1991, Ch. 33]. The resources are ranked by utilization: bottleneck and second bottleneck;
+QueueLen of the middleware and the max. ServerRtt are reported as additional indicators.
+A bottleneck shift is reported between consecutive numbers of clients of a model.
+
+The results are stored in the database (run key 'bottlenecks') and written into the summary.
+
+see main program in ../process_raw_data.py for information
+
+version 2018-12-24
+"""
+
+import re
+
+from tools.config import *
+from tools.helpers import *
+from processing.mean_value_analysis import get_model_configurations
+
+
+# --- processing :: bottleneck analysis ------------------------------------------------------------
+
+def get_link_capacities(ctx, datasets):
+    """:return dict VM type -> link capacity (Mbit/s; max. iperf bandwidth of its connections)"""
+    capacities = {}
+    iperf = datasets['r_' + ctx['experiment_folder']].get('app_iperf', {})
+    for type_name, type_data in iperf.items():
+        for connection_name, connection_data in type_data.items():
+            letters = set(re.findall('[a-z]', connection_name))
+            for vm_name, vm_type in BOTTLENECK_VM_TYPES.items():
+                if vm_type['letter'] in letters and connection_data['mean'] > capacities.get(vm_name, 0.0):
+                    capacities[vm_name] = connection_data['mean']
+    return capacities
+
+
+def get_dstat_stable_mean(vm_data, config_nr, configs_count, variable_name, sum_instances=False):
+    """
+    :return mean of the variable over the stable dstat windows of the configuration (all instance); None if n/a
+    sum_instances: sum of the instances instead of the all instance (for variables aggregated by avg)
+    """
+    delta = int(len(vm_data) / configs_count)
+    base = config_nr * delta
+    values = []
+    for window_nr in range(base + BOTTLENECK_DSTAT_STABLE_BEGIN, base + BOTTLENECK_DSTAT_STABLE_END):
+        if window_nr in vm_data and variable_name in vm_data[window_nr]:
+            variable = vm_data[window_nr][variable_name]
+            if sum_instances:
+                values.append(sum([instance['mean'] for instance_name, instance in variable.items()
+                                   if instance_name != 'all']))
+            else:
+                values.append(variable['all']['mean'])
+    if len(values) == 0:
+        return None
+    return sum(values) / len(values)
+
+
+def get_mw_stable_all_mean(stable, variable_name):
+    if variable_name not in stable:
+        return None
+    return stable[variable_name]['all']['mean']
+
+
+def calc_configuration_utilizations(ctx, datasets, config, capacities):
+    """:return dict with throughput X, utilization of each resource and the indicators; None if not available"""
+    memtier_data, mapped_op_name = get_experiment_data(ctx, datasets, 'memtier', config)
+    if memtier_data is None:
+        return None
+    x = memtier_data['windows']['stable_avg']['both']['Throughput']['all']['mean']
+    metadata = memtier_data['metadata']
+    result = {'X': x, 'U': {}, 'QueueLen': None, 'ServerRttMax': None}
+
+    configurations = get_experiment_configurations(ctx['experiment_folder'])
+    config_nr = get_configuration_nr(ctx, memtier_data)
+    dstat = datasets['r_' + ctx['experiment_folder']].get('app_dstat', {})
+    for vm_name, vm_type in BOTTLENECK_VM_TYPES.items():
+        if vm_name not in dstat or config_nr < 0:
+            continue
+        vm_count = max(1, int(metadata.get(vm_type['count_key'], '1')))
+        cpu = get_dstat_stable_mean(dstat[vm_name], config_nr, len(configurations), 'total', sum_instances=True)
+        if cpu is not None:
+            result['U'][vm_name + ' CPU'] = min(1.0, cpu / vm_count / 100.0)
+        receive = get_dstat_stable_mean(dstat[vm_name], config_nr, len(configurations), 'receive')
+        send = get_dstat_stable_mean(dstat[vm_name], config_nr, len(configurations), 'send')
+        if receive is not None and send is not None and capacities.get(vm_name, 0.0) > 0.0:
+            # MB/s -> Mbit/s
+            result['U'][vm_name + ' network'] = 8.0 * max(receive, send) / vm_count / capacities[vm_name]
+
+    if ctx['experiment_folder'] not in FIGURES_MATRIX['no_middleware_involved']:
+        mw_data, mapped_op_name = get_experiment_data(ctx, datasets, 'mw', config)
+        if mw_data is not None:
+            stable = mw_data['windows']['stable_avg']['both']
+            for resource_name, variable_name in BOTTLENECK_MIDDLEWARE_RESOURCES.items():
+                u = get_mw_stable_all_mean(stable, variable_name)
+                if u is not None:
+                    result['U'][resource_name] = u
+            result['QueueLen'] = get_mw_stable_all_mean(stable, 'QueueLen')
+            result['ServerRttMax'] = get_mw_stable_all_mean(stable, 'ServerRttMax')
+    return result
+
+
+def calc_model_bottlenecks(ctx, datasets, op_key, model, capacities):
+    """:return dict with the utilizations, demands, ranking and shifts of the model; None if not available"""
+    rows = []
+    for cn, config in get_model_configurations(ctx, op_key, model):
+        row = calc_configuration_utilizations(ctx, datasets, config, capacities)
+        if row is None or len(row['U']) == 0:
+            continue
+        row['cn'] = cn
+        row['ranking'] = sorted(row['U'], key=lambda name: (-row['U'][name], name))
+        rows.append(row)
+    if len(rows) == 0:
+        return None
+
+    resources = sorted(set([name for row in rows for name in row['U']]))
+    result = {
+        'client_numbers': [row['cn'] for row in rows],
+        'X': [row['X'] for row in rows],
+        'resources': {},
+        'ranking': [row['ranking'] for row in rows],
+        'bottleneck': [row['ranking'][0] for row in rows],
+        'second': [row['ranking'][1] if len(row['ranking']) > 1 else None for row in rows],
+        'QueueLen': [row['QueueLen'] for row in rows],
+        'ServerRttMax': [row['ServerRttMax'] for row in rows],
+        'shifts': []
+    }
+    for name in resources:
+        u = [row['U'].get(name) for row in rows]
+        d = [None if u_i is None or row['X'] <= 0.0 else u_i / row['X'] for u_i, row in zip(u, rows)]
+        result['resources'][name] = {'U': u, 'D': d}
+    for i in range(1, len(rows)):
+        if result['bottleneck'][i] != result['bottleneck'][i - 1]:
+            result['shifts'].append({'cn_from': rows[i - 1]['cn'], 'cn_to': rows[i]['cn'],
+                                     'from': result['bottleneck'][i - 1], 'to': result['bottleneck'][i]})
+    return result
+
+
+def format_optional(value, template):
+    return '{v:>6s}'.format(v='n/a') if value is None else template.format(v=value)
+
+
+def write_bottleneck_analysis(ctx, datasets, f):
+    """Identifies bottleneck and second bottleneck of all configurations (see module documentation)"""
+    print('    bottleneck analysis')
+    capacities = get_link_capacities(ctx, datasets)
+    bottlenecks = {}
+    input_dict = CONFIGURATION['laws_and_modeling_input'][ctx['experiment_folder']]
+    for op_key in input_dict:
+        for model in input_dict[op_key]['models']:
+            result = calc_model_bottlenecks(ctx, datasets, op_key, model, capacities)
+            if result is not None:
+                create_or_get_dict(bottlenecks, op_key)[model] = result
+    bottlenecks['link_capacities'] = capacities
+    create_or_get_dict(datasets, 'r_' + ctx['experiment_folder'])['bottlenecks'] = bottlenecks
+
+    print('\n\n--------------------------------------------------------------------------------', file=f)
+    print('Bottleneck analysis', file=f)
+    print('--------------------------------------------------------------------------------\n', file=f)
+    print('resources ranked by utilization U (stable phase); demand D = U / X (utilization law)', file=f)
+    print('link capacities: ' + ', '.join(['{vm} {c:.1f} Mbit/s'.format(vm=vm, c=c) for vm, c in sorted(capacities.items())]), file=f)
+    for op_key in input_dict:
+        for model in input_dict[op_key]['models']:
+            if model not in bottlenecks.get(op_key, {}):
+                continue
+            result = bottlenecks[op_key][model]
+            print('\n  {op} {model}'.format(op=op_key, model=model), file=f)
+            print('    {cn:>4s} {x:>8s} | {b:<26s} {u1:>6s} {d1:>7s} | {s:<26s} {u2:>6s} | {q:>8s} {rtt:>9s}'
+                  .format(cn='cn', x='X', b='bottleneck', u1='U', d1='D ms', s='second bottleneck', u2='U',
+                          q='QueueLen', rtt='RTT max'), file=f)
+            for i, cn in enumerate(result['client_numbers']):
+                first = result['bottleneck'][i]
+                second = result['second'][i]
+                print('    {cn:4d} {x:8.3f} | {b:<26s} {u1:6.3f} {d1:>7s} | {s:<26s} {u2} | {q:>8s} {rtt:>9s}'
+                      .format(cn=cn, x=result['X'][i], b=first, u1=result['resources'][first]['U'][i],
+                              d1=format_optional(result['resources'][first]['D'][i], '{v:7.4f}'), s=second or 'n/a',
+                              u2=format_optional(None if second is None else result['resources'][second]['U'][i], '{v:6.3f}'),
+                              q=format_optional(result['QueueLen'][i], '{v:8.2f}'),
+                              rtt=format_optional(result['ServerRttMax'][i], '{v:6.3f} ms')), file=f)
+            if len(result['shifts']) == 0:
+                print('    no bottleneck shift', file=f)
+            for shift in result['shifts']:
+                print('    bottleneck shift between cn {cn_from} and {cn_to}: {b_from} -> {b_to}'
+                      .format(cn_from=shift['cn_from'], cn_to=shift['cn_to'], b_from=shift['from'], b_to=shift['to']), file=f)
@@ -0,0 +1,263 @@
+"""
+secondary processing: capacity planner (-c flag)
+
+Searches the cheapest configurations (mc, mt, sc of PLANNER_SPACE; ms for multi-gets) that meet a target throughput
+and a response time SLA (mean or percentile), e.g. -c x_30_r_2 (30 kop/s, mean response time <= 2 ms)
+or -c x_30_r_5_p_99_op_read_ck_6 (p99 <= 5 ms for sharded / non-sharded multi-gets with 6 keys).
+The target load is an open arrival rate lambda = x; the response time is the view of memtier.
+
+Base of the model: measured configuration of the op with the smallest number of clients (see get_sweep_base())
+and its operational laws model.
+
+1) cheap analytic bounds with the measured demands D_ (operational laws output), scaled to the candidate:
+   - worker threads: mc mt / S_w (S_w of the candidate; see configuration_sweep.py for the scaling by sc, ck, ms)
+   - net-threads: mc / S_middleware,clientthread
+   - servers: 1 / D_server for set (replicated), sc / (sc_measured D_server) for get
+   X_bound = min(...) >= x and R_min = S_net + S_w + d_net <= r are required; d_net: measured memtier minus
+   middleware response time (network)
+2) refined model for the remaining candidates: M/M/1 net-thread and M/M/m worker pool (Erlang-C) for
+   each middleware with lambda / mc; percentiles: P(W > t) = C exp(-(m mu - lambda) t) and the service time
+   S_proc + max of k server RTTs from the empirical RTT histograms (F^-1(q^(1/k))); the percentile of the sum
+   is bounded by the sum of the (1 + q) / 2 percentiles (conservative)
+
+Search: candidates (mc, sc, ms) in order of cost (PLANNER_VM_COSTS); pruning by the bounds with the largest mt;
+feasibility is monotone in mt, thus the smallest feasible mt is found by binary search. Service times and
+RTT quantiles are cached for each (sc, ms). The search stops when PLANNER_RESULTS configurations are found
+and the next candidate is more expensive. Headroom: X_bound / x - 1 and SLA - predicted response time.
+
+Results are printed and written to processed/<exp>_capacity_plan.txt.
+
+Units: times in ms; throughput in kop/s.
+
+see main program in ../process_raw_data.py for information
+
+version 2018-12-21
+"""
+
+import math
+import os
+
+import numpy as np
+
+from tools.config import *
+from tools.helpers import *
+from tools.operational_laws import *
+from processing.configuration_sweep import get_sweep_base
+from processing.mean_value_analysis import get_model_configurations
+from processing.middleware_simulation import get_histogram_distribution, pool_distributions
+from processing.queueing_models import calc_mmm_metrics
+
+
+# --- processing :: capacity planner ---------------------------------------------------------------
+
+def get_harmonic_number(k):
+    """:return harmonic number H_k"""
+    return sum([1.0 / i for i in range(1, k + 1)])
+
+
+def get_distribution_quantile(distribution, q):
+    """:return q-quantile (0 < q < 1) of a histogram distribution (see sample_distribution()); linear within the bin"""
+    values, probabilities, resolution = distribution
+    cumulative = np.cumsum(probabilities)
+    i = min(int(np.searchsorted(cumulative, q)), len(values) - 1)
+    below = cumulative[i - 1] if i > 0 else 0.0
+    fraction = (q - below) / probabilities[i] if probabilities[i] > 0.0 else 0.0
+    return float(values[i] + min(max(fraction, 0.0), 1.0) * resolution)
+
+
+def get_planner_base(ctx, datasets, op):
+    """:return dict with the base model of the op (see module documentation); None if not available"""
+    base = get_sweep_base(ctx, datasets).get(op)
+    if base is None:
+        return None
+    op_key = PLOT_LABELS_OP_MAPPING[op]
+    input_dict = CONFIGURATION['laws_and_modeling_input'][ctx['experiment_folder']]
+    if op_key not in input_dict:
+        return None
+    for model in sorted(input_dict[op_key]['models']):
+        for cn, config in get_model_configurations(ctx, op_key, model):
+            exp_data, mapped_op_name = get_experiment_data(ctx, datasets, 'mw', config)
+            if exp_data is None or exp_data['metadata']['op'] != op:
+                continue
+            if 'base_config' in base and base['base_cn'] <= cn:
+                continue
+            base['base_config'] = config
+            base['base_cn'] = cn
+            base['model'] = model
+            base['exp_data'] = exp_data
+    if 'base_config' not in base:
+        return None
+
+    exp_data = base['exp_data']
+    metadata = exp_data['metadata']
+    base['mc'] = int(metadata['mc'])
+    base['mt'] = int(metadata['mt'])
+    base['sc'] = int(metadata['sc']) * int(metadata['st'])
+    cn = base['base_cn']
+    base['S_client_thread'] = get_ol_value(ctx, op_key, base['model'], 'S_middleware,clientthread', cn) or base['S_net']
+    base['D_server'] = get_ol_value(ctx, op_key, base['model'], 'D_server', cn)
+
+    memtier_data, mapped_op_name = get_experiment_data(ctx, datasets, 'memtier', base['base_config'])
+    base['d_net'] = 0.0
+    if memtier_data is not None:
+        memtier_r = memtier_data['windows']['stable_avg']['both']['ResponseTime']['all']['mean']
+        mw_r = exp_data['windows']['stable_avg']['both']['ResponseTime']['all']['mean']
+        base['d_net'] = max(0.0, memtier_r - mw_r)
+
+    distributions = [get_histogram_distribution(exp_data, 'ServerRtt' + str(k)) for k in range(1, base['sc'] + 1)]
+    distributions = [d for d in distributions if d is not None]
+    base['rtt_distribution'] = pool_distributions(distributions) if len(distributions) > 0 else None
+    return base
+
+
+def get_server_count_per_request(op, target, sc, sharded):
+    """:return number of servers a request waits for (set: all; sharded multi-get: min(ck, sc); otherwise 1)"""
+    if op == 'write':
+        return sc
+    if op == 'read' and sharded and target['ck'] > 1:
+        return min(target['ck'], sc)
+    return 1
+
+
+def plan_capacity(ctx, datasets, target):
+    """:return list of result dicts (cheapest first) for the target; None if no base model is available"""
+    op = target['op'] if target['op'] is not None else sorted(get_sweep_base(ctx, datasets))[0]
+    base = get_planner_base(ctx, datasets, op)
+    if base is None:
+        return None, op
+    lam = target['x']
+    q = None if target['p'] is None else target['p'] / 100.0
+    half_q = None if q is None else (1.0 + q) / 2.0
+    service_cache = {}
+
+    def service(sc, sharded):
+        """:return mean and (1 + q) / 2 quantile of the worker service time; cached"""
+        key = (sc, sharded)
+        if key not in service_cache:
+            k = get_server_count_per_request(op, target, sc, sharded)
+            if op == 'mixed':
+                k_get = get_server_count_per_request('read', target, sc, sharded)
+                mean = base['S_proc'] + base['r'] * (SIMULATION_MIXED_SET_RATIO * get_harmonic_number(sc) +
+                                                     (1.0 - SIMULATION_MIXED_SET_RATIO) * get_harmonic_number(k_get))
+                k = sc
+            else:
+                mean = base['S_proc'] + base['r'] * get_harmonic_number(k)
+            quantile = None
+            if half_q is not None and base['rtt_distribution'] is not None:
+                quantile = base['S_proc'] + get_distribution_quantile(base['rtt_distribution'], half_q ** (1.0 / k))
+            service_cache[key] = (mean, quantile)
+        return service_cache[key]
+
+    def bound(mc, mt, sc, sharded):
+        s_w, s_w_q = service(sc, sharded)
+        bounds = [mc * mt / s_w, mc / base['S_client_thread']]
+        if base['D_server'] is not None and base['D_server'] > 0.0:
+            if op == 'write':
+                bounds.append(1.0 / base['D_server'])
+            else:
+                bounds.append(sc / (base['sc'] * base['D_server']))
+        return min(bounds), base['S_net'] + s_w + base['d_net']
+
+    def evaluate(mc, mt, sc, sharded):
+        """:return dict with the prediction; None if not feasible"""
+        x_bound, r_min = bound(mc, mt, sc, sharded)
+        if x_bound < lam or r_min > target['r']:
+            return None
+        s_w, s_w_q = service(sc, sharded)
+        rho_net = lam / mc * base['S_net']
+        mmm = calc_mmm_metrics([lam / mc], [1.0 / s_w], [mt])
+        if rho_net >= 1.0 or np.isnan(mmm['R'][0]):
+            return None
+        net = base['S_net'] / (1.0 - rho_net)
+        mean = net + mmm['R'][0] + base['d_net']
+        predicted = mean
+        if half_q is not None:
+            c = mmm['C'][0]
+            rate = mt / s_w - lam / mc
+            w_q = max(0.0, math.log(c / (1.0 - half_q)) / rate) if c > 0.0 else 0.0
+            predicted = net + w_q + (s_w_q if s_w_q is not None else s_w) + base['d_net']
+        if predicted > target['r']:
+            return None
+        return {
+            'mc': mc, 'mt': mt, 'sc': sc, 'ms': 'true' if sharded else 'false',
+            'cost': mc * PLANNER_VM_COSTS['mc'] + sc * PLANNER_VM_COSTS['sc'],
+            'X_bound': x_bound,
+            'X_headroom': x_bound / lam - 1.0,
+            'R_mean': mean,
+            'R_predicted': predicted,
+            'R_headroom': target['r'] - predicted,
+            'rho': float(mmm['rho'][0])
+        }
+
+    ms_values = [False, True] if op != 'write' and target['ck'] > 1 else [False]
+    candidates = [(mc * PLANNER_VM_COSTS['mc'] + sc * PLANNER_VM_COSTS['sc'], mc, sc, sharded)
+                  for mc in PLANNER_SPACE['mc'] for sc in PLANNER_SPACE['sc'] for sharded in ms_values]
+    mt_values = sorted(PLANNER_SPACE['mt'])
+    results = []
+    evaluated = 0
+    for cost, mc, sc, sharded in sorted(candidates):
+        if len(results) >= PLANNER_RESULTS and cost > results[-1]['cost']:
+            break
+        # pruning with the best case (largest mt)
+        x_bound, r_min = bound(mc, mt_values[-1], sc, sharded)
+        if x_bound < lam or r_min > target['r']:
+            continue
+        # binary search of the smallest feasible mt
+        lower = 0
+        upper = len(mt_values) - 1
+        best = evaluate(mc, mt_values[upper], sc, sharded)
+        evaluated += 1
+        if best is None:
+            continue
+        while lower < upper:
+            middle = (lower + upper) // 2
+            result = evaluate(mc, mt_values[middle], sc, sharded)
+            evaluated += 1
+            if result is None:
+                lower = middle + 1
+            else:
+                upper = middle
+                best = result
+        results.append(best)
+        results.sort(key=lambda r: (r['cost'], r['mt'], -r['R_headroom']))
+    ctx['info'].append('  - capacity plan {name}: {n} candidates evaluated with the refined model\n'
+                       .format(name=target['name'], n=evaluated))
+    return results[:PLANNER_RESULTS], op
+
+
+def write_capacity_plans(ctx, datasets):
+    """Runs the capacity planner for all targets of the -c flag; prints and writes the results"""
+    print('### capacity planning ###')
+    if ctx['experiment_folder'] in FIGURES_MATRIX['no_middleware_involved']:
+        ctx['info'].append('capacity planning skipped: no middleware involved in this experiment\n')
+        return
+    lines = ['Capacity plan for experiment {exp} (see capacity_planner.py); cost: {costs}'
+             .format(exp=ctx['experiment_folder'], costs=', '.join([k + ' ' + str(v) for k, v in sorted(PLANNER_VM_COSTS.items())]))]
+    for target in ctx['capacity_targets']:
+        results, op = plan_capacity(ctx, datasets, target)
+        sla = 'mean' if target['p'] is None else 'p{p:g}'.format(p=target['p'])
+        lines.append('')
+        lines.append('target {name}: X >= {x:.3f} kop/s, {sla} response time <= {r:.3f} ms, op {op}, ck {ck}'
+                     .format(name=target['name'], x=target['x'], sla=sla, r=target['r'], op=op, ck=target['ck']))
+        if results is None:
+            lines.append('  no measured base model for op {op}'.format(op=op))
+            continue
+        if len(results) == 0:
+            lines.append('  no configuration of the planner space meets the target')
+            continue
+        for r in results:
+            percentile = '' if target['p'] is None else ', {sla} {rp:7.3f} ms'.format(sla=sla, rp=r['R_predicted'])
+            lines.append('  mc {mc:2d}, mt {mt:3d}, sc {sc:2d}, ms {ms:5s}: cost {cost:5.1f}; X bound {x:7.3f} kop/s '
+                         '(headroom {xh:6.1%}); R mean {rm:7.3f} ms{percentile} (headroom {rh:6.3f} ms); rho {rho:5.3f}'
+                         .format(mc=r['mc'], mt=r['mt'], sc=r['sc'], ms=r['ms'], cost=r['cost'], x=r['X_bound'],
+                                 xh=r['X_headroom'], rm=r['R_mean'], percentile=percentile, rh=r['R_headroom'],
+                                 rho=r['rho']))
+
+    processed_path = os.path.join(ctx['output_folder'], ctx['experiment_folder'], PROCESSED_FOLDER)
+    make_path(processed_path)
+    plan_file = os.path.join(processed_path, ctx['prefix'] + ctx['experiment_folder'] + CAPACITY_PLAN_SUFFIX)
+    with open(plan_file, 'w') as f:
+        for line in lines:
+            print(line, file=f)
+    for line in lines:
+        print('    ' + line)
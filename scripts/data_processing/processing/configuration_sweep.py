@@ -0,0 +1,286 @@
+"""
+secondary processing: configuration sweep with closed-form models (-w flag)
+
+Evaluates the grid SWEEP_GRID (cn x mc x mt x sc x ck x op) far beyond the measured configurations.
+The model parameters are taken from the measured middleware data of the experiment (for each op, the
+configuration with the smallest number of clients; least contention):
+- Z: ClientRTTAndProcessingTime; S_net: PreprocessingTime (net-thread); S_proc: ProcessingTime (worker)
+- r: mean server RTT (mean of ServerRtt<k>); assumed exponential, thus the expected maximum of k replies
+  is r H_k (harmonic number H_k) [Jain1991]
+- operational laws of the model of this configuration (see aggregation_and_statistics.py): X_max and R_min of
+  memtier (measured), D_server (server demand; D_max = 1 / X_max if the model does not map it)
+Worker service time of a grid point: S_w = S_proc + r H_k with k = sc for set (replicated), k = 1 for get
+(non-sharded) and k = min(ck, sc) for sharded multi-gets; mixed uses SIMULATION_MIXED_SET_RATIO.
+Server demand of a grid point: D_server scaled by the server visits per request and server, i.e. 1 for a set
+(replicated to all servers) and k / sc for a get, relative to the measured configuration.
+
+Each grid point is evaluated by
+- interactive law bounds [Jain1991]: X_cap = min(mc mt / S_w, mc / S_net, 1 / D_server of the point);
+  R_min: measured R_min - Z, shifted by the difference of S_w to the measured configuration;
+  X <= min(N / (R_min + Z), X_cap), R >= max(R_min, N / X_cap - Z)
+- M/M/m with Erlang-C for each worker pool (m = mt, mu = 1 / S_w) and M/M/1 for each net-thread,
+  arrival rate X / mc, plus the delay R_min - S_net - S_w that is not modeled (>= 0; e.g. network), thus
+  R(0) = R_min as measured; the throughput follows from the fixed point X = N / (Z + R(X)) of the
+  interactive law (bisection on [0, X_cap); vectorized for all points of a chunk); the response time is at
+  least N / X - Z (interactive law at the capacity of the servers)
+
+Chunks of grid points are evaluated in a process pool (SWEEP_PROCESSES). Each evaluated point is memoized
+on disk (processed/<exp>_sweep_cache.json) with its id_str (e.g. op_write_cn_96_mc_2_mt_16_sc_3_ck_1;
+see database/datastore.py) as key; the cache is only used if the model parameters (and SWEEP_MODEL_VERSION)
+are unchanged.
+Thus, a sweep with an additional value in any dimension only evaluates the new points.
+
+The compact table (processed/<exp>_sweep.tsv) holds one line for each grid point; plot_sweep() renders it
+like the measured numclients figures.
+
+Units: times in ms; throughput in kop/s.
+
+see main program in ../process_raw_data.py for information
+
+version 2018-12-20
+"""
+
+import itertools
+import json
+import multiprocessing
+import os
+
+import numpy as np
+
+from tools.config import *
+from tools.helpers import *
+from database.datastore import DataStore
+from processing.queueing_models import calc_mmm_metrics
+from processing.mean_value_analysis import get_model_configurations
+from tools.operational_laws import *
+
+
+# --- processing :: configuration sweep ------------------------------------------------------------
+
+SWEEP_DIMENSIONS = ['op', 'cn', 'mc', 'mt', 'sc', 'ck']
+SWEEP_OUTPUT_VARIABLES = ['X_cap', 'X_upper', 'R_lower', 'Throughput', 'ResponseTime', 'QueueingTime',
+                          'WorkerUtilization', 'QueueLen']
+SWEEP_TYPE_MAP = 'cn_i_mc_i_mt_i_sc_i_ck_i'
+SWEEP_BISECTION_ITERATIONS = 100
+SWEEP_MODEL_VERSION = 2  # part of the cache fingerprint; increase if evaluate_sweep_points() changes
+
+
+def get_sweep_id_str(point):
+    """:return id_str of the grid point (see database/datastore.py)"""
+    return '_'.join([k + '_' + str(point[k]) for k in SWEEP_DIMENSIONS])
+
+
+def get_sweep_laws(ctx, op, config):
+    """:return dict with X_max, R_min and D_server of the model of the configuration (see module documentation)"""
+    op_key = PLOT_LABELS_OP_MAPPING[op]
+    input_dict = CONFIGURATION['laws_and_modeling_input'].get(ctx['experiment_folder'], {})
+    laws = {'X_max': None, 'R_min': None, 'D_server': None}
+    if op_key not in input_dict:
+        return laws
+    for model in sorted(input_dict[op_key]['models']):
+        if config not in [c for cn, c in get_model_configurations(ctx, op_key, model)]:
+            continue
+        for name in laws:
+            laws[name] = get_ol_value(ctx, op_key, model, name)
+        break
+    if laws['D_server'] is None and laws['X_max'] is not None and laws['X_max'] > 0.0:
+        laws['D_server'] = 1.0 / laws['X_max']
+    return laws
+
+
+def get_sweep_base(ctx, datasets):
+    """:return dict op -> model parameters from the measured middleware data (see module documentation)"""
+    base = {}
+    smallest_cn = {}
+    for config in get_experiment_configurations(ctx['experiment_folder']):
+        exp_data, mapped_op_name = get_experiment_data(ctx, datasets, 'mw', config)
+        if exp_data is None:
+            continue
+        metadata = exp_data['metadata']
+        op = metadata['op']
+        cn = int(metadata['cn'])
+        if op in smallest_cn and smallest_cn[op] <= cn:
+            continue
+        measured = exp_data['windows']['stable_avg']['both']
+        servers = int(metadata['sc']) * int(metadata['st'])
+        rtt = [measured['ServerRtt' + str(k)]['all']['mean'] for k in range(1, servers + 1)
+               if 'ServerRtt' + str(k) in measured]
+        if len(rtt) == 0:
+            continue
+        smallest_cn[op] = cn
+        base[op] = {
+            'Z': measured['ClientRTTAndProcessingTime']['all']['mean'],
+            'S_net': measured['PreprocessingTime']['all']['mean'],
+            'S_proc': measured['ProcessingTime']['all']['mean'],
+            'r': sum(rtt) / len(rtt),
+            'sharded': str(metadata['ms']).lower() == 'true',
+            'sc': servers,
+            'ck': int(metadata['ck'])
+        }
+        base[op].update(get_sweep_laws(ctx, op, config))
+    return base
+
+
+def calc_harmonic_numbers(k):
+    """:return numpy array with the harmonic numbers H_k for the array k"""
+    h = np.cumsum(1.0 / np.arange(1, int(k.max()) + 1))
+    return h[k - 1]
+
+
+def calc_sweep_service_times(op, sc, ck, s_proc, r, sharded):
+    """:return numpy arrays worker service time S_w and server visits per request and server (see module documentation)"""
+    get_servers = np.where(sharded & (ck > 1), np.minimum(ck, sc), 1)
+    set_ratio = np.array([{'write': 1.0, 'read': 0.0}.get(o, SIMULATION_MIXED_SET_RATIO) for o in op])
+    s_w = s_proc + r * (set_ratio * calc_harmonic_numbers(sc) + (1.0 - set_ratio) * calc_harmonic_numbers(get_servers))
+    visits = set_ratio + (1.0 - set_ratio) * get_servers / sc
+    return s_w, visits
+
+
+def evaluate_sweep_points(args):
+    """
+    evaluates a chunk of grid points (vectorized); runs in the process pool
+    :param args: [list of points (dicts), base dict op -> parameters]
+    :return list of [id_str, result dict]
+    """
+    points, base = args
+    fallback_op = sorted(base)[0]
+    params = [base.get(p['op'], base[fallback_op]) for p in points]
+    n = np.array([p['cn'] for p in points], dtype=float)
+    mc = np.array([p['mc'] for p in points], dtype=float)
+    mt = np.array([p['mt'] for p in points], dtype=int)
+    sc = np.array([p['sc'] for p in points], dtype=int)
+    ck = np.array([p['ck'] for p in points], dtype=int)
+    z = np.array([b['Z'] for b in params])
+    s_net = np.array([b['S_net'] for b in params])
+    s_proc = np.array([b['S_proc'] for b in params])
+    r = np.array([b['r'] for b in params])
+    sharded = np.array([b['sharded'] for b in params])
+    ops = [p['op'] for p in points]
+    base_ops = [p['op'] if p['op'] in base else fallback_op for p in points]
+
+    s_w, visits = calc_sweep_service_times(ops, sc, ck, s_proc, r, sharded)
+    base_s_w, base_visits = calc_sweep_service_times(base_ops, np.array([b['sc'] for b in params]),
+                                                     np.array([b['ck'] for b in params]), s_proc, r, sharded)
+
+    # measured capacity of the servers (or of the system), scaled by the server visits per request and server
+    d_server = np.array([np.nan if b['D_server'] is None else b['D_server'] for b in params]) * visits / base_visits
+    x_cap = np.minimum(mc * mt / s_w, mc / s_net)
+    x_cap = np.where(np.isfinite(d_server) & (d_server > 0.0), np.minimum(x_cap, 1.0 / d_server), x_cap)
+    # measured minimal response time (memtier) without Z, shifted to the worker service time of the point
+    r_measured = np.array([np.nan if b['R_min'] is None else b['R_min'] for b in params])
+    r_min = np.where(np.isfinite(r_measured), np.maximum(r_measured - z, 0.0) + s_w - base_s_w, s_net + s_w)
+    r_min = np.maximum(r_min, s_net + s_w)
+    x_upper = np.minimum(n / (r_min + z), x_cap)
+    r_lower = np.maximum(r_min, n / x_cap - z)
+
+    delay = np.maximum(r_min - s_net - s_w, 0.0)
+
+    def response_time(x):
+        lam = x / mc
+        mmm = calc_mmm_metrics(lam, 1.0 / s_w, mt)
+        rho_net = lam * s_net
+        return s_net / (1.0 - rho_net) + mmm['R'] + delay, mmm
+
+    # bisection of N / (Z + R(X)) - X on [0, X_cap); R(X) -> inf for X -> X_cap
+    lower = np.zeros(len(points))
+    upper = x_cap * (1.0 - 1e-12)
+    for i in range(SWEEP_BISECTION_ITERATIONS):
+        x = 0.5 * (lower + upper)
+        rt, mmm = response_time(x)
+        positive = n / (z + rt) > x
+        lower = np.where(positive, x, lower)
+        upper = np.where(positive, upper, x)
+    x = lower
+    rt, mmm = response_time(x)
+    rt = np.maximum(rt, n / x - z)
+
+    results = []
+    for i, point in enumerate(points):
+        results.append([get_sweep_id_str(point), {
+            'X_cap': float(x_cap[i]),
+            'X_upper': float(x_upper[i]),
+            'R_lower': float(r_lower[i]),
+            'Throughput': float(x[i]),
+            'ResponseTime': float(rt[i]),
+            'QueueingTime': float(mmm['W'][i]),
+            'WorkerUtilization': float(mmm['rho'][i]),
+            'QueueLen': float(mmm['Nq'][i])
+        }])
+    return results
+
+
+def load_sweep_cache(cache_file, fingerprint):
+    """:return DataStore with the memoized points; empty if not available or if the model parameters changed"""
+    store = DataStore()
+    if os.path.isfile(cache_file):
+        with open(cache_file) as f:
+            try:
+                cache = json.load(f)
+            except json.decoder.JSONDecodeError:
+                cache = {}
+        if cache.get('fingerprint') == fingerprint:
+            for id_str, result in cache['points'].items():
+                store.put(id_str, result)
+    store.config_meta_data_type_map(SWEEP_TYPE_MAP)
+    return store
+
+
+def write_sweep_cache(cache_file, fingerprint, store):
+    with open(cache_file, 'w') as f:
+        json.dump({'fingerprint': fingerprint, 'points': {id_str: item.value for id_str, item in store.store.items()}},
+                  f, sort_keys=True)
+
+
+def write_sweep_table(table_file, rows):
+    """writes the compact table: one line for each grid point (tab separated)"""
+    with open(table_file, 'w') as f:
+        print('\t'.join(SWEEP_DIMENSIONS + SWEEP_OUTPUT_VARIABLES), file=f)
+        for row in rows:
+            print('\t'.join([str(row[k]) for k in SWEEP_DIMENSIONS] +
+                            ['{v:.6f}'.format(v=row[k]) for k in SWEEP_OUTPUT_VARIABLES]), file=f)
+
+
+def run_configuration_sweep(ctx, datasets):
+    """
+    Evaluates the grid SWEEP_GRID (see module documentation)
+    :return list of dicts (one for each grid point with dimensions and results); empty list if not available
+    """
+    print('### configuration sweep ###')
+    if ctx['experiment_folder'] in FIGURES_MATRIX['no_middleware_involved']:
+        ctx['info'].append('configuration sweep skipped: no middleware involved in this experiment\n')
+        return []
+    base = get_sweep_base(ctx, datasets)
+    if len(base) == 0:
+        ctx['warning'].append('configuration sweep: no measured middleware data with server RTT available')
+        return []
+    for op in SWEEP_GRID['op']:
+        if op not in base:
+            ctx['info'].append('  - configuration sweep: op {op} not measured; parameters of op {fallback} are used\n'
+                               .format(op=op, fallback=sorted(base)[0]))
+
+    processed_path = os.path.join(ctx['output_folder'], ctx['experiment_folder'], PROCESSED_FOLDER)
+    make_path(processed_path)
+    prefix = ctx['prefix'] + ctx['experiment_folder']
+    cache_file = os.path.join(processed_path, prefix + SWEEP_CACHE_SUFFIX)
+    fingerprint = json.dumps({'model_version': SWEEP_MODEL_VERSION, 'base': base}, sort_keys=True)
+    store = load_sweep_cache(cache_file, fingerprint)
+
+    points = [dict(zip(SWEEP_DIMENSIONS, values)) for values in itertools.product(*[SWEEP_GRID[k] for k in SWEEP_DIMENSIONS])]
+    missing = [p for p in points if store.get(get_sweep_id_str(p)) is None]
+    print('    {total} grid points: {cached} memoized, {missing} to evaluate'
+          .format(total=len(points), cached=len(points) - len(missing), missing=len(missing)))
+    if len(missing) > 0:
+        chunks = [[missing[i:i + SWEEP_CHUNK_SIZE], base] for i in range(0, len(missing), SWEEP_CHUNK_SIZE)]
+        with multiprocessing.Pool(SWEEP_PROCESSES) as pool:
+            for results in pool.imap_unordered(evaluate_sweep_points, chunks):
+                for id_str, result in results:
+                    store.put(id_str, result)
+        write_sweep_cache(cache_file, fingerprint, store)
+
+    rows = []
+    for point in points:
+        row = dict(point)
+        row.update(store.get(get_sweep_id_str(point)).value)
+        rows.append(row)
+    write_sweep_table(os.path.join(processed_path, prefix + SWEEP_TABLE_SUFFIX), rows)
+    return rows
@@ -0,0 +1,225 @@
+"""
+secondary processing: distribution fitting of the middleware histograms and M/G/1 / M/G/m predictions
+
+For each middleware configuration and each variable of DISTRIBUTION_FIT_VARIABLES, the histogram
+(all instances, valid iterations; see get_histogram_distribution()) is summarized by its mean m and
+squared coefficient of variation c^2 = Var / m^2 (bin centers). The moments of all histograms are calculated at once
+(padded numpy arrays). Families with the same mean (and c^2 where possible) are fitted by moments:
+- exponential: rate 1/m (c^2 = 1)
+- Erlang-k: k = round(1 / c^2) phases of rate k/m (c^2 < 1 only)
+- hyperexponential H2 with balanced means [Allen1990]: p = (1 + sqrt((c^2 - 1) / (c^2 + 1))) / 2,
+  rates 2p/m and 2(1 - p)/m (c^2 > 1 only)
+- lognormal: sigma^2 = ln(1 + c^2), mu = ln(m) - sigma^2 / 2; CDF with the rational approximation of erf
+  [Abramowitz1964, 7.1.26] (absolute error < 1.5e-7; numpy only)
+The best family has the smallest Kolmogorov-Smirnov distance between its CDF and the empirical CDF
+of the histogram (upper bin limits); evaluated for all histograms at once.
+
+Waiting time predictions for the queue of each middleware (arrival rate lambda = X / mc, m = mt workers,
+service time S and c_s^2 of the fitted ServiceTime; Poisson arrivals: c_a^2 = DISTRIBUTION_FIT_ARRIVAL_SCV):
+- M/M/m: W from Erlang-C (see queueing_models.py)
+- Allen-Cunneen G/G/m approximation [Allen1990]: W = W_M/M/m (c_a^2 + c_s^2) / 2;
+  for m = 1 and c_a^2 = 1, this is the exact Pollaczek-Khinchine formula of M/G/1 [Jain1991, Ch. 31]
+These are compared with the measured QueueingTime (stable windows average).
+
+The results are stored in the database (run key 'distributions') and written into the summary.
+
+Units: times in ms; rates in kop/s.
+
+see main program in ../process_raw_data.py for information
+
+References
+[Abramowitz1964]  Abramowitz M, Stegun IA. Handbook of mathematical functions. National Bureau of Standards, 1964
+[Allen1990]  Allen AO. Probability, statistics, and queueing theory with computer science applications.
+             2nd ed. Academic Press, 1990
+
+version 2018-12-27
+"""
+
+import numpy as np
+
+from tools.config import *
+from tools.helpers import *
+from processing.middleware_simulation import get_histogram_distribution
+from processing.queueing_models import calc_mmm_metrics
+
+
+# --- processing :: distribution fitting -----------------------------------------------------------
+
+DISTRIBUTION_FAMILIES = ['exponential', 'Erlang', 'hyperexponential', 'lognormal']
+
+# a5 ... a1 and constant term 0 of the polynomial in t (highest power first, see np.polyval)
+ERF_COEFFICIENTS = [1.061405429, -1.453152027, 1.421413741, -0.284496736, 0.254829592, 0.0]
+
+
+def calc_erf(z):
+    """:return numpy array of erf(z) (elementwise; rational approximation, see module documentation)"""
+    a = np.abs(z)
+    t = 1.0 / (1.0 + 0.3275911 * a)
+    return np.sign(z) * (1.0 - np.polyval(ERF_COEFFICIENTS, t) * np.exp(-a * a))
+
+
+def calc_histogram_moments(x, p):
+    """
+    :param x: numpy array (histograms x bins) of the bin values; p: probabilities (0 for padding)
+    :return numpy arrays mean and squared coefficient of variation c^2 of the histograms
+    """
+    mean = (x * p).sum(axis=1)
+    variance = ((x - mean[:, np.newaxis]) ** 2 * p).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scv = np.where(mean > 0.0, variance / (mean * mean), np.nan)
+    return mean, scv
+
+
+def calc_family_cdfs(x, mean, scv):
+    """:return dict family -> numpy array (histograms x bins) of the CDF at x; NaN if not applicable"""
+    m = mean[:, np.newaxis]
+    c2 = scv[:, np.newaxis]
+    cdfs = {}
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        cdfs['exponential'] = 1.0 - np.exp(-x / m)
+
+        k = np.clip(np.round(1.0 / c2), 1, DISTRIBUTION_FIT_MAX_ERLANG_K)
+        kx = k * x / m
+        term = np.exp(-kx)
+        tail = np.zeros(x.shape)
+        for n in range(int(DISTRIBUTION_FIT_MAX_ERLANG_K)):
+            tail += np.where(n < k, term, 0.0)
+            term = term * kx / (n + 1)
+        cdfs['Erlang'] = np.where(c2 < 1.0, 1.0 - tail, np.nan)
+
+        p = 0.5 * (1.0 + np.sqrt(np.maximum(c2 - 1.0, 0.0) / (c2 + 1.0)))
+        h2 = 1.0 - p * np.exp(-2.0 * p * x / m) - (1.0 - p) * np.exp(-2.0 * (1.0 - p) * x / m)
+        cdfs['hyperexponential'] = np.where(c2 > 1.0, h2, np.nan)
+
+        sigma2 = np.log(1.0 + c2)
+        mu = np.log(m) - 0.5 * sigma2
+        z = (np.log(np.maximum(x, 1e-12)) - mu) / np.sqrt(2.0 * sigma2)
+        cdfs['lognormal'] = np.where(sigma2 > 0.0, 0.5 * (1.0 + calc_erf(z)), np.nan)
+    return cdfs
+
+
+def fit_distributions(distributions):
+    """
+    fits the families to all histograms at once (see module documentation)
+    :param distributions: list of [values, probabilities, resolution] (see get_histogram_distribution())
+    :return list of dicts with mean, scv, ks (family -> KS distance; None if not applicable) and family
+    """
+    bins = max([len(d[0]) for d in distributions])
+    x = np.zeros((len(distributions), bins))
+    p = np.zeros((len(distributions), bins))
+    upper = np.zeros((len(distributions), bins))
+    mask = np.zeros((len(distributions), bins), dtype=bool)
+    for i, (values, probabilities, resolution) in enumerate(distributions):
+        x[i, :len(values)] = values + 0.5 * resolution
+        p[i, :len(values)] = probabilities
+        upper[i, :len(values)] = values + resolution
+        mask[i, :len(values)] = True
+    mean, scv = calc_histogram_moments(x, p)
+    empirical = np.cumsum(p, axis=1)
+    ks = {}
+    for family, cdf in calc_family_cdfs(upper, mean, scv).items():
+        ks[family] = np.where(mask, np.abs(cdf - empirical), 0.0).max(axis=1)
+
+    results = []
+    for i in range(len(distributions)):
+        family_ks = {f: None if np.isnan(ks[f][i]) else float(ks[f][i]) for f in DISTRIBUTION_FAMILIES}
+        candidates = [f for f in DISTRIBUTION_FAMILIES if family_ks[f] is not None]
+        results.append({
+            'mean': float(mean[i]),
+            'scv': None if np.isnan(scv[i]) else float(scv[i]),
+            'ks': family_ks,
+            'family': min(candidates, key=lambda f: family_ks[f]) if len(candidates) > 0 else None
+        })
+    return results
+
+
+def calc_queueing_predictions(rows):
+    """adds the M/M/m and Allen-Cunneen waiting times to the rows (one for each configuration; see module documentation)"""
+    mmm = calc_mmm_metrics([row['lambda'] for row in rows], [1.0 / row['S'] for row in rows], [row['m'] for row in rows])
+    for i, row in enumerate(rows):
+        w = float(mmm['W'][i])
+        row['rho'] = float(mmm['rho'][i])
+        row['W_MMm'] = None if np.isnan(w) else w
+        row['W_AC'] = None if np.isnan(w) or row['scv'] is None else w * (DISTRIBUTION_FIT_ARRIVAL_SCV + row['scv']) / 2.0
+
+
+def calc_distribution_fits(ctx, datasets):
+    """:return dict configuration -> fits and queueing predictions (see module documentation)"""
+    series = []
+    rows = []
+    results = {}
+    for config in get_experiment_configurations(ctx['experiment_folder']):
+        exp_data, mapped_op_name = get_experiment_data(ctx, datasets, 'mw', config)
+        if exp_data is None:
+            continue
+        for variable_name in DISTRIBUTION_FIT_VARIABLES:
+            distribution = get_histogram_distribution(exp_data, variable_name)
+            if distribution is not None:
+                series.append([config, variable_name, distribution])
+        results[config] = {'fits': {}}
+    if len(series) == 0:
+        return {}
+
+    for (config, variable_name, distribution), fit in zip(series, fit_distributions([s[2] for s in series])):
+        results[config]['fits'][variable_name] = fit
+
+    for config, result in results.items():
+        service = result['fits'].get('ServiceTime')
+        if service is None or service['mean'] <= 0.0:
+            continue
+        exp_data, mapped_op_name = get_experiment_data(ctx, datasets, 'mw', config)
+        metadata = exp_data['metadata']
+        measured = exp_data['windows']['stable_avg']['both']
+        rows.append({
+            'config': config,
+            'lambda': measured['Throughput']['all']['mean'] / max(1, int(metadata['mc'])),
+            'm': int(metadata['mt']),
+            'S': service['mean'],
+            'scv': service['scv'],
+            'W_measured': measured['QueueingTime']['all']['mean']
+        })
+    if len(rows) > 0:
+        calc_queueing_predictions(rows)
+    for row in rows:
+        results[row.pop('config')]['queueing'] = row
+    return results
+
+
+def format_optional_time(value):
+    return '{v:>8s}'.format(v='unstable') if value is None else '{v:8.3f}'.format(v=value)
+
+
+def write_distribution_fits(ctx, datasets, f):
+    """Fits the middleware histograms and writes the M/G/m waiting time predictions (see module documentation)"""
+    if ctx['experiment_folder'] in FIGURES_MATRIX['no_middleware_involved']:
+        return
+    print('    distribution fitting')
+    results = calc_distribution_fits(ctx, datasets)
+    create_or_get_dict(datasets, 'r_' + ctx['experiment_folder'])['distributions'] = results
+    if len(results) == 0:
+        return
+
+    print('\n\n--------------------------------------------------------------------------------', file=f)
+    print('Distribution fitting of the middleware histograms and M/G/m waiting times', file=f)
+    print('--------------------------------------------------------------------------------\n', file=f)
+    print('mean, squared coefficient of variation c^2 and best family (smallest Kolmogorov-Smirnov distance)', file=f)
+    print('waiting time W in the queue of each middleware: M/M/m, Allen-Cunneen (M/G/1: Pollaczek-Khinchine), measured', file=f)
+    for config in get_experiment_configurations(ctx['experiment_folder']):
+        if config not in results:
+            continue
+        result = results[config]
+        print('\n  {config}'.format(config=config), file=f)
+        for variable_name in DISTRIBUTION_FIT_VARIABLES:
+            if variable_name not in result['fits']:
+                continue
+            fit = result['fits'][variable_name]
+            ks = ', '.join(['{f} {v:.3f}'.format(f=family, v=fit['ks'][family])
+                            for family in DISTRIBUTION_FAMILIES if fit['ks'][family] is not None])
+            c2 = '{v:>6s}'.format(v='n/a') if fit['scv'] is None else '{v:6.3f}'.format(v=fit['scv'])
+            print('    {v:<14s} mean {m:7.3f} ms, c^2 {c2}, best {family:<16s} (KS: {ks})'
+                  .format(v=variable_name, m=fit['mean'], c2=c2, family=str(fit['family']), ks=ks), file=f)
+        if 'queueing' in result:
+            q = result['queueing']
+            print('    queue: lambda {lam:7.3f} kop/s, m {m:3d}, rho {rho:5.3f}; W M/M/m {w_mmm}, W Allen-Cunneen {w_ac}, '
+                  'W measured {w:8.3f} ms'.format(lam=q['lambda'], m=q['m'], rho=q['rho'], w_mmm=format_optional_time(q['W_MMm']),
+                                                  w_ac=format_optional_time(q['W_AC']), w=q['W_measured']), file=f)
@@ -0,0 +1,294 @@
+"""
+secondary processing: 2^k r factorial analysis
+
+Replaces the spreadsheets in data/e610_2kr_analysis. For each experiment of FACTORIAL_DESIGNS,
+the sign table of the k factors (2 levels each) is built with the columns I, A, B, C, AB, AC, BC, ABC, ...
+and the rows in standard order (first factor changes fastest). The responses y are the r iterations of the
+stable windows average (all instances) of each variable and op of the design [Jain1991, Ch. 18]:
+- effects: q = S^T y_mean / 2^k with the sign table S
+- allocation of variation: SST = SSY - SS0 = sum SS_j + SSE with SS_j = 2^k r q_j^2
+  and SSE = sum of the squared residuals of the iterations
+- standard deviation of the effects: s_q = s_e / sqrt(2^k r) with s_e = sqrt(SSE / (2^k (r - 1)))
+- confidence intervals: q -/+ t s_q with the two-sided t-value for 1 - alpha (FACTORIAL_CONFIDENCE) and
+  2^k (r - 1) degrees of freedom; an effect is not significant if the interval includes 0
+  (note: the example in Jain1991, p. 310, uses the one-sided t-value by mistake)
+- additive model on the values and multiplicative model on log10 of the values; the effects and
+  confidence intervals of the multiplicative model are reported as factors 10^q (not significant if
+  the interval includes 1)
+
+All ops, variables and models of an experiment are stacked into one array and solved together (numpy).
+The t-value is the quantile of the Student t distribution by bisection of its cumulative distribution function
+based on the regularized incomplete beta function (continued fraction) [Press2002, Ch. 6.4].
+
+If iterations are excluded (-o or -t flags), the first r valid iterations of each configuration are used
+with r = smallest count of valid iterations of all configurations.
+
+The results are stored in the database (run key 'factorial') and written into the summary.
+
+see main program in ../process_raw_data.py for information
+
+version 2018-12-22
+"""
+
+import itertools
+import math
+
+import numpy as np
+
+from tools.config import *
+from tools.helpers import *
+
+
+# --- processing :: 2^k r factorial analysis -------------------------------------------------------
+
+FACTORIAL_BETA_MAX_ITERATIONS = 200
+FACTORIAL_BETA_EPSILON = 3e-16
+FACTORIAL_T_BISECTION_ITERATIONS = 100
+
+
+def calc_incomplete_beta_continued_fraction(a, b, x):
+    """:return continued fraction of the incomplete beta function (modified Lentz's method) [Press2002]"""
+    tiny = 1e-300
+    qab = a + b
+    qap = a + 1.0
+    qam = a - 1.0
+    c = 1.0
+    d = 1.0 - qab * x / qap
+    d = 1.0 / (tiny if abs(d) < tiny else d)
+    h = d
+    for m in range(1, FACTORIAL_BETA_MAX_ITERATIONS + 1):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (tiny if abs(d) < tiny else d)
+        c = 1.0 + aa / c
+        c = tiny if abs(c) < tiny else c
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (tiny if abs(d) < tiny else d)
+        c = 1.0 + aa / c
+        c = tiny if abs(c) < tiny else c
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < FACTORIAL_BETA_EPSILON:
+            break
+    return h
+
+
+def calc_regularized_incomplete_beta(a, b, x):
+    """:return regularized incomplete beta function I_x(a, b) for 0 <= x <= 1 [Press2002]"""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    log_front = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1.0 - x)
+    if x < (a + 1.0) / (a + b + 2.0):
+        return math.exp(log_front) * calc_incomplete_beta_continued_fraction(a, b, x) / a
+    return 1.0 - math.exp(log_front) * calc_incomplete_beta_continued_fraction(b, a, 1.0 - x) / b
+
+
+def calc_student_t_cdf(t, df):
+    """:return cumulative distribution function of the Student t distribution with df degrees of freedom"""
+    tail = 0.5 * calc_regularized_incomplete_beta(0.5 * df, 0.5, df / (df + t * t))
+    return 1.0 - tail if t >= 0.0 else tail
+
+
+def calc_student_t_value(confidence, df):
+    """:return two-sided t-value for the confidence level (e.g. 0.95) and df degrees of freedom (bisection)"""
+    p = 0.5 + 0.5 * confidence
+    lower = 0.0
+    upper = 1.0
+    while calc_student_t_cdf(upper, df) < p:
+        upper *= 2.0
+    for i in range(FACTORIAL_T_BISECTION_ITERATIONS):
+        middle = 0.5 * (lower + upper)
+        if calc_student_t_cdf(middle, df) < p:
+            lower = middle
+        else:
+            upper = middle
+    return 0.5 * (lower + upper)
+
+
+def build_sign_table(k):
+    """
+    :return list of the column names (I, A, B, C, AB, ..., in this order) and the sign table
+            (numpy array, 2^k rows in standard order x 2^k columns)
+    """
+    names = [chr(ord('A') + i) for i in range(k)]
+    rows = 2 ** k
+    levels = np.array([[1.0 if (row >> i) & 1 else -1.0 for i in range(k)] for row in range(rows)])
+    columns = ['I']
+    table = [np.ones(rows)]
+    for order in range(1, k + 1):
+        for combination in itertools.combinations(range(k), order):
+            columns.append(''.join([names[i] for i in combination]))
+            table.append(np.prod(levels[:, list(combination)], axis=1))
+    return columns, np.column_stack(table)
+
+
+def calc_factorial_effects(y, signs, confidence):
+    """
+    2^k r analysis of several responses at once (see module documentation)
+    :param y: numpy array (responses x 2^k configurations x r iterations); already log10 for multiplicative models
+    :param signs: sign table of build_sign_table()
+    :return dict of numpy arrays (first dimension: responses): q, SS (columns of the sign table; SS[:, 0] is SS0),
+            SST, SSE, variation (percent; index 0: error, then the effects without I), s_e, s_q, delta (CI half width);
+            and the scalars df and t
+    """
+    n = signs.shape[0]
+    r = y.shape[2]
+    y_mean = y.mean(axis=2)
+    q = y_mean.dot(signs) / n
+    ss = n * r * q * q
+    ssy = (y * y).sum(axis=(1, 2))
+    sst = ssy - ss[:, 0]
+    sse = ((y - y_mean[:, :, np.newaxis]) ** 2).sum(axis=(1, 2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variation = 100.0 * np.column_stack([sse, ss[:, 1:]]) / sst[:, np.newaxis]
+    df = n * (r - 1)
+    s_e = np.sqrt(sse / df)
+    s_q = s_e / math.sqrt(n * r)
+    t = calc_student_t_value(confidence, df)
+    return {'q': q, 'SS': ss, 'SST': sst, 'SSE': sse, 'variation': variation, 's_e': s_e, 's_q': s_q,
+            'delta': t * s_q, 'df': df, 't': t}
+
+
+def get_factorial_configurations(design, op):
+    """:return list of config strings (2^k, standard order) for the op"""
+    configurations = []
+    for row in range(2 ** len(design['factors'])):
+        config = 'op_' + op
+        for i, factor in enumerate(design['factors']):
+            config += '_' + factor['key'] + '_' + factor['levels'][(row >> i) & 1]
+        configurations.append(config)
+    return configurations
+
+
+def collect_factorial_responses(ctx, datasets, design, op):
+    """:return numpy array (variables x 2^k x r) of the measured iterations; None if not available"""
+    columns = []
+    for config in get_factorial_configurations(design, op):
+        exp_data, mapped_op_name = get_experiment_data(ctx, datasets, design['app'], config)
+        if exp_data is None:
+            ctx['warning'].append('2^k r analysis: configuration {config} not available'.format(config=config))
+            return None
+        valid_iterations = get_valid_iterations(exp_data)
+        stable = exp_data['windows']['stable_avg']['both']
+        column = []
+        for var in design['variables']:
+            if var not in stable:
+                ctx['warning'].append('2^k r analysis: variable {var} not available for {config}'.format(var=var, config=config))
+                return None
+            values = stable[var]['all']['values']
+            column.append([v for i, v in enumerate(values) if i < len(valid_iterations) and valid_iterations[i]])
+        columns.append(column)
+    r = min([len(values) for column in columns for values in column])
+    if r < 2:
+        ctx['warning'].append('2^k r analysis: less than 2 valid iterations for op {op}'.format(op=op))
+        return None
+    if max([len(values) for column in columns for values in column]) > r:
+        ctx['info'].append('  - 2^k r analysis of op {op}: r = {r} (excluded iterations)\n'.format(op=op, r=r))
+    return np.array([[values[:r] for values in column] for column in columns]).transpose(1, 0, 2)
+
+
+def calc_factorial_analysis(ctx, datasets):
+    """
+    2^k r analysis of the current experiment if defined in FACTORIAL_DESIGNS (see module documentation)
+    :return result dict op -> model -> variable (also stored in the database); None if not available
+    """
+    design = FACTORIAL_DESIGNS.get(ctx['experiment_folder'])
+    if design is None:
+        return None
+    print('    2^k r factorial analysis')
+    columns, signs = build_sign_table(len(design['factors']))
+
+    stacked = []
+    keys = []
+    for op in design['ops']:
+        y = collect_factorial_responses(ctx, datasets, design, op)
+        if y is None:
+            continue
+        for model in FACTORIAL_MODELS:
+            if model == 'multiplicative':
+                if np.any(y <= 0.0):
+                    ctx['warning'].append('2^k r analysis: multiplicative model of op {op} skipped (values <= 0)'.format(op=op))
+                    continue
+                y_model = np.log10(y)
+            else:
+                y_model = y
+            for i, var in enumerate(design['variables']):
+                stacked.append(y_model[i])
+                keys.append([op, model, var, y[i]])
+    if len(stacked) == 0:
+        return None
+
+    # responses with the same r are solved together in one array
+    r_values = set([a.shape[1] for a in stacked])
+    results = {}
+    for r in sorted(r_values):
+        indices = [i for i, a in enumerate(stacked) if a.shape[1] == r]
+        effects = calc_factorial_effects(np.array([stacked[i] for i in indices]), signs, FACTORIAL_CONFIDENCE)
+        for j, i in enumerate(indices):
+            op, model, var, y = keys[i]
+            q = effects['q'][j]
+            lower = q - effects['delta'][j]
+            upper = q + effects['delta'][j]
+            if model == 'multiplicative':
+                q, lower, upper = 10.0 ** q, 10.0 ** lower, 10.0 ** upper
+                significant = (lower > 1.0) | (upper < 1.0)
+            else:
+                significant = lower * upper > 0.0
+            create_or_get_dict(create_or_get_dict(results, op), model)[var] = {
+                'columns': columns,
+                'effects': [float(v) for v in q],
+                'ci_lower': [float(v) for v in lower],
+                'ci_upper': [float(v) for v in upper],
+                'significant': [bool(v) for v in significant],
+                'variation': dict(zip(['error'] + columns[1:], [float(v) for v in effects['variation'][j]])),
+                'y': y.tolist(),
+                'r': r,
+                's_e': float(effects['s_e'][j]),
+                's_q': float(effects['s_q'][j]),
+                'df': effects['df'],
+                't': effects['t']
+            }
+    results['factors'] = dict(zip([chr(ord('A') + i) for i in range(len(design['factors']))],
+                                  [f['key'] + ' ' + '/'.join(f['levels']) for f in design['factors']]))
+    results['confidence'] = FACTORIAL_CONFIDENCE
+    create_or_get_dict(datasets, 'r_' + ctx['experiment_folder'])['factorial'] = results
+    return results
+
+
+def write_factorial_analysis(ctx, datasets, f):
+    """Calculates and writes the 2^k r analysis (see module documentation)"""
+    results = calc_factorial_analysis(ctx, datasets)
+    if results is None:
+        return
+    print('\n\n--------------------------------------------------------------------------------', file=f)
+    print('2^k r factorial analysis', file=f)
+    print('--------------------------------------------------------------------------------\n', file=f)
+    print('factors: ' + ', '.join([name + ' = ' + text for name, text in sorted(results['factors'].items())]), file=f)
+    print('effects q of the sign table (multiplicative model: factors 10^q) with {c:.0%} CI (* not significant)'
+          .format(c=results['confidence']), file=f)
+    print('allocation of variation in percent of SST (error: SSE)', file=f)
+    for op in sorted(results):
+        if op in ['factors', 'confidence']:
+            continue
+        for model in FACTORIAL_MODELS:
+            if model not in results[op]:
+                continue
+            for var, result in sorted(results[op][model].items()):
+                print('\n  op {op}, {model} model, {var} (r = {r}, s_e = {s_e:.4g}, df = {df}, t = {t:.4f})'
+                      .format(op=op, model=model, var=var, r=result['r'], s_e=result['s_e'], df=result['df'],
+                              t=result['t']), file=f)
+                print('    {name:>6s} {q:>12s} {lower:>12s} {upper:>12s} {variation:>10s}'
+                      .format(name='', q='effect', lower='CI lower', upper='CI upper', variation='variation'), file=f)
+                for i, name in enumerate(result['columns']):
+                    variation = '' if name == 'I' else '{v:9.3f}%'.format(v=result['variation'][name])
+                    print('    {name:>6s} {q:12.4f} {lower:12.4f} {upper:12.4f} {variation:>10s}{significant}'
+                          .format(name=name, q=result['effects'][i], lower=result['ci_lower'][i],
+                                  upper=result['ci_upper'][i], variation=variation,
+                                  significant='' if result['significant'][i] else ' *'), file=f)
+                print('    {name:>6s} {q:>12s} {lower:>12s} {upper:>12s} {variation:9.3f}%'
+                      .format(name='error', q='', lower='', upper='', variation=result['variation']['error']), file=f)
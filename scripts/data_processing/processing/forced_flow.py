@@ -0,0 +1,224 @@
+"""
+secondary processing: forced flow law validation across client, middleware and server tiers
+
+The visit ratios of the tiers follow from the configuration (see DESIGN_AND_TECHNICAL_NOTES, 4.2):
+- set: forwarded to all sn = sc st servers (replication), 1 key each: V_server = sn
+- non-sharded get: one server (round robin): V_server = 1
+- sharded get with ck keys: min(ck, sn) servers: V_server = min(ck, sn)
+- keys: sn per set, ck per get
+With the forced flow law X_i = V_i X [Jain1991], the expected flows are (X in kop/s, op both, all instances):
+- middleware:      Throughput (mw) = Throughput (memtier)
+- server_requests: sum of ServerUsage<i> = sn X_set + V_server,get X_get
+- server_keys:     sum of ServerKeys<i> = sn X_set + ck X_get
+- server_balance:  ServerUsage<i> = sum of ServerUsage<i> / sn for each server i (round robin);
+                   relative deviation: max_i |ServerUsage<i> - mean| / mean
+Each tier is compared with the tier above, i.e. the server flows use the measured throughputs X_set and X_get of the
+middleware; thus, discrepancies are localized (dropped requests, miscounted replies).
+
+All experiment keys are handled at once as tensors (exp_key, window, iteration) with the stable windows average
+in window index 0. Memtier window w corresponds to middleware window w + FORCED_FLOW_MEMTIER_WINDOW_OFFSET.
+The relative discrepancy measured / expected - 1 is flagged if its absolute value is larger than
+FORCED_FLOW_TOLERANCE (stable windows average; reported as warning) or FORCED_FLOW_WINDOW_TOLERANCE (each
+stable window of the middleware and iteration; counted). Expected flows below LAW_CHECK_MIN_THROUGHPUT, invalid
+iterations and missing cells are skipped.
+
+The results are stored in the database (run key 'forced_flow') and written into the summary.
+
+see main program in ../process_raw_data.py for information
+
+References
+[Jain1991]  Jain R. The art of computer systems performance analysis. Wiley, 1991
+
+version 2019-01-04
+"""
+
+import warnings
+
+import numpy as np
+
+from tools.config import *
+from tools.helpers import *
+
+
+# --- processing :: forced flow law ----------------------------------------------------------------
+
+FORCED_FLOW_NAMES = ['middleware', 'server_requests', 'server_keys', 'server_balance']
+FORCED_FLOW_WARNING = 'forced flow law violated'
+
+
+def is_forced_flow_text(text):
+    """:return True if the warning text was added by the forced flow validation (replaced in incremental updates)"""
+    return FORCED_FLOW_WARNING in text
+
+
+def build_flow_tensor(app, exp_keys, op_name, variable_name, n_windows, offset=0):
+    """
+    :return: tensor (numpy array) with shape (exp_keys, 1 + n_windows, iterations) of the aggregated instance 'all';
+             index 0: stable windows average; index 1 + w: window w - offset of the app;
+             missing values (incl. other ops and exp_keys) and invalid iterations are NaN
+    """
+    tensor = np.full((len(exp_keys), 1 + n_windows, MAX_ITERATIONS), np.nan)
+    for e, exp_key in enumerate(exp_keys):
+        if exp_key not in app:
+            continue
+        exp_data = app[exp_key]
+        for name, windows in exp_data['windows'].items():
+            if name == 'stable_avg':
+                index = 0
+            elif name.isdigit() and 0 <= int(name) + offset < n_windows:
+                index = 1 + int(name) + offset
+            else:
+                continue
+            variable = windows.get(op_name, {}).get(variable_name, {})
+            if 'all' in variable:
+                values = variable['all']['values']
+                tensor[e, index, :len(values)] = values
+        for iteration, valid in enumerate(get_valid_iterations(exp_data)[:MAX_ITERATIONS]):
+            if not valid:
+                tensor[e, :, iteration] = np.nan
+    return tensor
+
+
+def get_visit_ratios(exp_data):
+    """:return dict with servers, visits of the servers per set and per get, and keys per get (see module documentation)"""
+    metadata = exp_data['metadata']
+    servers = int(metadata['sn'])
+    ck = int(metadata['ck'])
+    sharded = str(metadata['ms']).lower() == 'true'
+    return {
+        'servers': servers,
+        'set': servers,
+        'get': min(ck, servers) if sharded else 1,
+        'keys_per_get': ck
+    }
+
+
+def calc_forced_flows(mw, memtier, exp_keys, visits, n_windows):
+    """:return dict flow -> (expected, measured) tensors (exp_keys, 1 + n_windows, iterations)"""
+    def mw_flow(op_name, variable_name):
+        return build_flow_tensor(mw, exp_keys, op_name, variable_name, n_windows)
+
+    def per_exp_key(name):
+        return np.array([v[name] for v in visits], dtype=float)[:, np.newaxis, np.newaxis]
+
+    x_set = np.nan_to_num(mw_flow('set', 'Throughput'))
+    x_get = np.nan_to_num(mw_flow('get', 'Throughput'))
+    servers = max([v['servers'] for v in visits])
+    usage = np.stack([mw_flow('both', 'ServerUsage' + str(i)) for i in range(1, servers + 1)])
+    keys = np.stack([mw_flow('both', 'ServerKeys' + str(i)) for i in range(1, servers + 1)])
+    used = np.array([[i < v['servers'] for v in visits] for i in range(servers)])[:, :, np.newaxis, np.newaxis]
+    usage = np.where(used, usage, np.nan)
+    keys = np.where(used, keys, np.nan)
+
+    with warnings.catch_warnings():
+        # NaN of missing values and padding are expected
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        usage_total = np.nansum(usage, axis=0)
+        usage_mean = np.nanmean(usage, axis=0)
+        balance = np.nanmax(np.abs(usage - usage_mean[np.newaxis]), axis=0)
+        return {
+            'middleware': (build_flow_tensor(memtier, exp_keys, 'both', 'Throughput', n_windows,
+                                             offset=FORCED_FLOW_MEMTIER_WINDOW_OFFSET),
+                           mw_flow('both', 'Throughput')),
+            'server_requests': (per_exp_key('set') * x_set + per_exp_key('get') * x_get, usage_total),
+            'server_keys': (per_exp_key('set') * x_set + per_exp_key('keys_per_get') * x_get, np.nansum(keys, axis=0)),
+            # relative deviation from the mean of the servers: expected flow mean, measured flow mean + max deviation
+            'server_balance': (usage_mean, usage_mean + balance)
+        }
+
+
+def calc_forced_flow_validation(ctx, run):
+    """:return dict with the forced flow validation (see module documentation); None if n/a"""
+    mw = run.get('app_mw', {})
+    memtier = run.get('app_memtier', {})
+    exp_keys = sorted([exp_key for exp_key in mw if 'both' in mw[exp_key]['windows']['stable_avg']])
+    if len(exp_keys) == 0:
+        return None
+    n_windows = max([int(name) + 1 for exp_key in exp_keys for name in mw[exp_key]['windows'] if name.isdigit()])
+    visits = [get_visit_ratios(mw[exp_key]) for exp_key in exp_keys]
+    flows = calc_forced_flows(mw, memtier, exp_keys, visits, n_windows)
+
+    stable = np.zeros(1 + n_windows, dtype=bool)
+    stable[1 + LAW_CHECK_STABLE_BEGIN:1 + LAW_CHECK_STABLE_END] = True
+    result = {'flows': {}, 'experiments': {}}
+    relative = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        for flow, (expected, measured) in flows.items():
+            checked = np.isfinite(expected) & np.isfinite(measured) & (expected >= LAW_CHECK_MIN_THROUGHPUT)
+            relative[flow] = np.where(checked, measured / expected - 1.0, np.nan)
+    for flow in FORCED_FLOW_NAMES:
+        expected, measured = flows[flow]
+        windows = relative[flow][:, stable]
+        # stable windows average: mean of the valid iterations
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            expected_avg = np.nanmean(np.where(np.isfinite(relative[flow][:, 0]), expected[:, 0], np.nan), axis=1)
+            measured_avg = np.nanmean(np.where(np.isfinite(relative[flow][:, 0]), measured[:, 0], np.nan), axis=1)
+            relative_avg = measured_avg / expected_avg - 1.0
+        flagged_windows = np.abs(np.nan_to_num(windows)) > FORCED_FLOW_WINDOW_TOLERANCE
+        result['flows'][flow] = {
+            'checked': int(np.isfinite(relative_avg).sum()),
+            'flagged': int((np.abs(np.nan_to_num(relative_avg)) > FORCED_FLOW_TOLERANCE).sum()),
+            'windows_checked': int(np.isfinite(windows).sum()),
+            'windows_flagged': int(flagged_windows.sum())
+        }
+        for e, exp_key in enumerate(exp_keys):
+            exp_dict = create_or_get_dict(result['experiments'], exp_key)
+            exp_dict['visits'] = visits[e]
+            if not np.isfinite(relative_avg[e]):
+                continue
+            flagged = bool(abs(relative_avg[e]) > FORCED_FLOW_TOLERANCE)
+            create_or_get_dict(exp_dict, 'stable')[flow] = {
+                'expected': float(expected_avg[e]),
+                'measured': float(measured_avg[e]),
+                'relative': float(relative_avg[e]),
+                'flagged': flagged
+            }
+            create_or_get_dict(exp_dict, 'windows_flagged')[flow] = \
+                sorted(set([int(w) + LAW_CHECK_STABLE_BEGIN for w, iteration in np.argwhere(flagged_windows[e])]))
+            if flagged:
+                ctx['warning'].append(('mw exp {exp}: ' + FORCED_FLOW_WARNING + ' ({flow}: measured {m:.3f}, expected {x:.3f}, {r:+.1%})')
+                                      .format(exp=exp_key, flow=flow, m=measured_avg[e], x=expected_avg[e], r=relative_avg[e]))
+    return result
+
+
+def write_forced_flow_validation(ctx, datasets, f):
+    """Validates the forced flow law across the tiers (see module documentation) and writes it into the summary"""
+    if ctx['experiment_folder'] in FIGURES_MATRIX['no_middleware_involved']:
+        return
+    print('    forced flow law validation')
+    run = create_or_get_dict(datasets, 'r_' + ctx['experiment_folder'])
+    ctx['warning'] = [t for t in ctx['warning'] if not is_forced_flow_text(t)]
+    result = calc_forced_flow_validation(ctx, run)
+    if result is None:
+        return
+    run['forced_flow'] = result
+
+    print('\n\n--------------------------------------------------------------------------------', file=f)
+    print('Forced flow law validation (client, middleware and server tiers)', file=f)
+    print('--------------------------------------------------------------------------------\n', file=f)
+    print('middleware: X mw = X memtier; server_requests: sum ServerUsage = sn X_set + V_get X_get;', file=f)
+    print('server_keys: sum ServerKeys = sn X_set + ck X_get; server_balance: max. deviation of ServerUsage<i> from the mean.', file=f)
+    print('Relative discrepancy measured / expected - 1 of the stable windows average (* flagged: > {t:.0%});'
+          .format(t=FORCED_FLOW_TOLERANCE), file=f)
+    print('(n w): number of stable windows with discrepancy > {t:.0%} in any iteration.\n'.format(t=FORCED_FLOW_WINDOW_TOLERANCE), file=f)
+    print('  {flow:<16s} {checked:>8s} {flagged:>8s} {wc:>16s} {wf:>16s}'
+          .format(flow='flow', checked='checked', flagged='flagged', wc='windows checked', wf='windows flagged'), file=f)
+    for flow in FORCED_FLOW_NAMES:
+        d = result['flows'][flow]
+        print('  {flow:<16s} {checked:8d} {flagged:8d} {wc:16d} {wf:16d}'
+              .format(flow=flow, checked=d['checked'], flagged=d['flagged'], wc=d['windows_checked'], wf=d['windows_flagged']), file=f)
+
+    print('\n  {exp:<80s} {v:>9s}'.format(exp='experiment key', v='V set/get') +
+          ''.join([' {flow:>17s}'.format(flow=flow) for flow in FORCED_FLOW_NAMES]), file=f)
+    for exp_key, d in result['experiments'].items():
+        line = '  {exp:<80s} {s:>4d}/{g:<4d}'.format(exp=exp_key, s=d['visits']['set'], g=d['visits']['get'])
+        for flow in FORCED_FLOW_NAMES:
+            if flow not in d.get('stable', {}):
+                line += ' {v:>17s}'.format(v='-')
+                continue
+            s = d['stable'][flow]
+            line += ' {r:>+7.1%}{star:1s} ({w:3d} w)'.format(r=s['relative'], star='*' if s['flagged'] else '',
+                                                             w=len(d['windows_flagged'][flow]))
+        print(line, file=f)
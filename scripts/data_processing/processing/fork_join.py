@@ -0,0 +1,311 @@
+"""
+secondary processing: fork-join latency prediction for sharded multi-gets and replicated sets
+
+A worker of the middleware waits for the slowest of the server replies of a request: all sc servers for
+sets (replicated), min(k, sc) servers for sharded multi-gets with k keys, and one server otherwise
+(see DESIGN_AND_TECHNICAL_NOTES, 4.2). The worker service time is thus
+  S = (mw processing a + c_mw k) + max over the used servers i of (RTT_i + c_srv (q_i - q_0))
+with q_i keys sent to server i. Histogram algebra on a common grid (FORK_JOIN_RESOLUTION up to
+FORK_JOIN_MAX_TIME; all distributions as numpy arrays):
+- max of independent distributions: CDF_max = product of the CDFs
+- sum of independent distributions: convolution of the probability mass functions (FFT)
+- constant costs: shift of the distribution (linear interpolation between grid points)
+- round-robin choice of the (first) server: mixture over the servers
+The middleware response time R = QueueingTime + S is the convolution of S with the measured QueueingTime
+histogram (at the load of the reference configuration).
+
+Input from the measured middleware configurations of the experiment:
+- reference: configuration with the smallest number of clients (least contention) and the fewest keys;
+  RTT_i: ServerRtt<i> histograms (see get_histogram_distribution()); servers beyond the measured ones
+  use the pooled distribution; q_0: keys per server request of the reference (ServerKeys<i> / ServerUsage<i>)
+- per-key costs (least squares slopes over all measured configurations with gets; 0 if the measured key counts
+  do not differ): c_mw of the middleware processing vs. keys per get request; c_srv of the mean ServerRtt vs.
+  keys per server request
+- a: middleware processing PreprocessingTime + ProcessingTime (without the server times; see
+  DESIGN_AND_TECHNICAL_NOTES) of the configuration with the fewest clients and keys of each op (c_mw k subtracted
+  for gets); if only one op was measured, the other one uses the same a with one key
+The op windows of a configuration follow its op (read: get, write: set, mixed: both); windows without requests
+(Throughput 0) are skipped.
+
+Predictions: gets (non-sharded and sharded) for FORK_JOIN_KEY_COUNTS x FORK_JOIN_SERVER_COUNTS and sets for
+FORK_JOIN_SERVER_COUNTS: mean and percentiles FORK_JOIN_PERCENTILES of S and R. Each measured configuration
+and op is predicted as validation (mean ServiceTime).
+
+The results are stored in the database (run key 'fork_join') and written into the summary.
+
+Units: times in ms.
+
+see main program in ../process_raw_data.py for information
+
+version 2019-01-02
+"""
+
+import numpy as np
+
+from tools.config import *
+from tools.helpers import *
+from processing.middleware_simulation import get_histogram_distribution, pool_distributions
+
+
+# --- processing :: fork-join histogram algebra ----------------------------------------------------
+
+FORK_JOIN_BINS = int(round(FORK_JOIN_MAX_TIME / FORK_JOIN_RESOLUTION))
+
+
+def to_grid(distribution):
+    """:return probability mass function on the grid for a distribution of get_histogram_distribution()"""
+    values, probabilities, resolution = distribution
+    pmf = np.zeros(FORK_JOIN_BINS)
+    width = max(1, int(round(resolution / FORK_JOIN_RESOLUTION)))
+    first = np.minimum((np.asarray(values) / FORK_JOIN_RESOLUTION).round().astype(int), FORK_JOIN_BINS - 1)
+    for offset in range(width):
+        np.add.at(pmf, np.minimum(first + offset, FORK_JOIN_BINS - 1), np.asarray(probabilities) / width)
+    return pmf
+
+
+def shift_pmf(pmf, delay):
+    """:return distribution of X + delay (delay >= 0; linear interpolation between grid points)"""
+    steps = max(0.0, delay) / FORK_JOIN_RESOLUTION
+    whole = int(steps)
+    fraction = steps - whole
+    result = np.zeros(FORK_JOIN_BINS)
+    for offset, weight in [(whole, 1.0 - fraction), (whole + 1, fraction)]:
+        if weight <= 0.0:
+            continue
+        if offset >= FORK_JOIN_BINS:
+            result[-1] += weight
+            continue
+        result[offset:] += weight * pmf[:FORK_JOIN_BINS - offset]
+        result[-1] += weight * pmf[FORK_JOIN_BINS - offset:].sum()
+    return result
+
+
+def max_pmf(pmfs):
+    """:return distribution of the maximum of independent random variables (numpy array: variables x grid)"""
+    cdf = np.cumsum(pmfs, axis=-1).prod(axis=-2)
+    return np.diff(cdf, axis=-1, prepend=0.0)
+
+
+def convolve_pmf(pmf_a, pmf_b):
+    """:return distribution of the sum of two independent random variables (FFT; overflow in the last bin)"""
+    n = 2 * FORK_JOIN_BINS
+    result = np.fft.irfft(np.fft.rfft(pmf_a, n) * np.fft.rfft(pmf_b, n), n)
+    result = np.maximum(result, 0.0)
+    overflow = result[FORK_JOIN_BINS:].sum()
+    result = result[:FORK_JOIN_BINS]
+    result[-1] += overflow
+    return result
+
+
+def describe_pmf(pmf):
+    """:return dict with mean and percentiles (FORK_JOIN_PERCENTILES; upper grid limits) of the distribution"""
+    total = pmf.sum()
+    cdf = np.cumsum(pmf) / total
+    result = {'mean': float((pmf * (np.arange(FORK_JOIN_BINS) + 0.5)).sum() / total * FORK_JOIN_RESOLUTION)}
+    for p in FORK_JOIN_PERCENTILES:
+        result['p' + str(p)] = float((np.argmax(cdf >= p / 100.0 - 1e-12) + 1) * FORK_JOIN_RESOLUTION)
+    return result
+
+
+def get_keys_per_server_request(window, servers):
+    """:return mean keys per server request and mean RTT of the used servers of the window; None, None if n/a"""
+    keys = []
+    rtt = []
+    for i in range(1, servers + 1):
+        usage = window.get('ServerUsage' + str(i), {}).get('all', {}).get('mean', 0.0)
+        if usage <= 0.0 or 'ServerRtt' + str(i) not in window:
+            continue
+        keys.append(window.get('ServerKeys' + str(i), {}).get('all', {}).get('mean', usage) / usage)
+        rtt.append(window['ServerRtt' + str(i)]['all']['mean'])
+    if len(keys) == 0:
+        return None, None
+    return sum(keys) / len(keys), sum(rtt) / len(rtt)
+
+
+def fit_slope(x, y):
+    """:return least squares slope of y vs. x; 0 if the x values do not differ"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(x) < 2 or np.ptp(x) < 1e-9:
+        return 0.0
+    dx = x - x.mean()
+    return float((dx * (y - y.mean())).sum() / (dx * dx).sum())
+
+
+def get_fork_join_ops(stable, mapped_op_name):
+    """:return list of the op windows (get, set) with requests of the configuration (op of the configuration; both for mixed)"""
+    ops = [mapped_op_name] if mapped_op_name in ['get', 'set'] else ['set', 'get']
+    return [op for op in ops if op in stable and stable[op]['Throughput']['all']['mean'] > 0.0]
+
+
+def get_processing_time(rows):
+    """:return middleware processing (Pre- + ProcessingTime) and keys of the row with the fewest clients and keys; None if n/a"""
+    if len(rows) == 0:
+        return None
+    row = min(rows, key=lambda r: (r['cn'], r['ck'], r['config']))
+    return row['processing'], row['ck']
+
+
+def collect_fork_join_input(ctx, datasets):
+    """:return dict with reference, rows of the measured configurations and ops, and per-key costs; None if n/a"""
+    rows = []
+    for config in get_experiment_configurations(ctx['experiment_folder']):
+        exp_data, mapped_op_name = get_experiment_data(ctx, datasets, 'mw', config)
+        if exp_data is None:
+            continue
+        metadata = exp_data['metadata']
+        windows = exp_data['windows']['stable_avg']
+        servers = int(metadata['sc']) * int(metadata['st'])
+        for op_name in get_fork_join_ops(windows, mapped_op_name):
+            q, rtt = get_keys_per_server_request(windows[op_name], servers)
+            if q is None:
+                continue
+            rows.append({
+                'config': config,
+                'exp_data': exp_data,
+                'cn': int(metadata['cn']),
+                'ck': int(metadata['ck']) if op_name == 'get' else 1,
+                'op_name': op_name,
+                'servers': servers,
+                'sharded': str(metadata['ms']).lower() == 'true',
+                'processing': windows[op_name]['PreprocessingTime']['all']['mean'] +
+                              windows[op_name]['ProcessingTime']['all']['mean'],
+                'service': windows[op_name]['ServiceTime']['all']['mean'],
+                'q': q,
+                'rtt': rtt
+            })
+    if len(rows) == 0:
+        return None
+
+    gets = [row for row in rows if row['op_name'] == 'get']
+    sets = [row for row in rows if row['op_name'] == 'set']
+    c_mw = max(0.0, fit_slope([row['ck'] for row in gets], [row['processing'] for row in gets]))
+    c_srv = max(0.0, fit_slope([row['q'] for row in gets], [row['rtt'] for row in gets]))
+    reference = min(rows, key=lambda row: (row['cn'], row['ck'], row['op_name'] != 'get', row['config']))
+    distributions = []
+    for i in range(1, reference['servers'] + 1):
+        distribution = get_histogram_distribution(reference['exp_data'], 'ServerRtt' + str(i))
+        if distribution is not None:
+            distributions.append(distribution)
+    queueing = get_histogram_distribution(reference['exp_data'], 'QueueingTime')
+    if len(distributions) == 0 or queueing is None:
+        return None
+    # a of gets and sets from their own configurations; one key (c_mw) apart if only one of the ops was measured
+    processing_get = get_processing_time(gets)
+    processing_set = get_processing_time(sets)
+    if processing_get is not None:
+        a_get = processing_get[0] - c_mw * processing_get[1]
+        a_set = processing_set[0] if processing_set is not None else a_get + c_mw
+    else:
+        a_set = processing_set[0]
+        a_get = a_set - c_mw
+    return {
+        'reference': reference['config'],
+        'rows': rows,
+        'c_mw': c_mw,
+        'c_srv': c_srv,
+        'q_0': reference['q'],
+        'a_get': a_get,
+        'a_set': a_set,
+        'rtt': [to_grid(d) for d in distributions],
+        'rtt_pooled': to_grid(pool_distributions(distributions)),
+        'queueing': to_grid(queueing)
+    }
+
+
+def get_server_rtt(model, i, keys):
+    """:return RTT distribution of server i (0-based) for a request with the given number of keys"""
+    pmf = model['rtt'][i] if i < len(model['rtt']) else model['rtt_pooled']
+    return shift_pmf(pmf, model['c_srv'] * max(0.0, keys - model['q_0']))
+
+
+def predict_service_time(model, op, keys, servers, sharded):
+    """:return distribution of the worker service time S (see module documentation)"""
+    if op == 'set':
+        return shift_pmf(max_pmf(np.array([get_server_rtt(model, i, 1) for i in range(servers)])), model['a_set'])
+    used = min(keys, servers) if sharded else 1
+    split = [keys // used + (1 if j < keys % used else 0) for j in range(used)]
+    # round-robin start server: mixture over all start positions
+    waits = np.array([max_pmf(np.array([get_server_rtt(model, (start + j) % servers, split[j]) for j in range(used)]))
+                      for start in range(servers)])
+    return shift_pmf(waits.mean(axis=0), model['a_get'] + model['c_mw'] * keys)
+
+
+def describe_prediction(model, service):
+    return {'S': describe_pmf(service), 'R': describe_pmf(convolve_pmf(model['queueing'], service))}
+
+
+def calc_fork_join_predictions(ctx, datasets):
+    """:return dict with the predictions and the validation (see module documentation); None if n/a"""
+    model = collect_fork_join_input(ctx, datasets)
+    if model is None:
+        return None
+    result = {
+        'reference': model['reference'],
+        'key_costs': {'middleware': model['c_mw'], 'server': model['c_srv'], 'q_0': model['q_0']},
+        'set': {},
+        'get': {'non-sharded': {}, 'sharded': {}},
+        'validation': {}
+    }
+    for servers in FORK_JOIN_SERVER_COUNTS:
+        result['set'][str(servers)] = describe_prediction(model, predict_service_time(model, 'set', 1, servers, False))
+    for mode, sharded in [('non-sharded', False), ('sharded', True)]:
+        for keys in FORK_JOIN_KEY_COUNTS:
+            key_dict = create_or_get_dict(result['get'][mode], str(keys))
+            for servers in FORK_JOIN_SERVER_COUNTS:
+                key_dict[str(servers)] = describe_prediction(model, predict_service_time(model, 'get', keys, servers, sharded))
+    for row in model['rows']:
+        predicted = describe_pmf(predict_service_time(model, row['op_name'], row['ck'], row['servers'], row['sharded']))
+        create_or_get_dict(result['validation'], row['config'])[row['op_name']] = {
+            'ServiceTime_measured': row['service'],
+            'ServiceTime_predicted': predicted['mean']
+        }
+    return result
+
+
+def write_fork_join_predictions(ctx, datasets, f):
+    """Predicts the fork-join latencies (see module documentation) and writes them into the summary"""
+    if ctx['experiment_folder'] in FIGURES_MATRIX['no_middleware_involved']:
+        return
+    print('    fork-join latency prediction')
+    result = calc_fork_join_predictions(ctx, datasets)
+    if result is None:
+        return
+    create_or_get_dict(datasets, 'r_' + ctx['experiment_folder'])['fork_join'] = result
+
+    percentile_names = ['p' + str(p) for p in FORK_JOIN_PERCENTILES]
+    print('\n\n--------------------------------------------------------------------------------', file=f)
+    print('Fork-join latency prediction (histogram algebra)', file=f)
+    print('--------------------------------------------------------------------------------\n', file=f)
+    print('reference {ref}; per-key costs: middleware {c_mw:.5f} ms, server {c_srv:.5f} ms (q_0 = {q:.2f} keys)'
+          .format(ref=result['reference'], c_mw=result['key_costs']['middleware'], c_srv=result['key_costs']['server'],
+                  q=result['key_costs']['q_0']), file=f)
+    print('worker service time S and middleware response time R = QueueingTime + S (ms)', file=f)
+    header = '    {k:>4s} {s:>3s} | '.format(k='keys', s='sc') + \
+             ' '.join(['{n:>8s}'.format(n='S ' + n) for n in ['mean'] + percentile_names]) + ' | ' + \
+             ' '.join(['{n:>8s}'.format(n='R ' + n) for n in ['mean'] + percentile_names])
+
+    def line(keys, servers, prediction):
+        return '    {k:>4s} {s:3d} | '.format(k=keys, s=servers) + \
+               ' '.join(['{v:8.3f}'.format(v=prediction['S'][n]) for n in ['mean'] + percentile_names]) + ' | ' + \
+               ' '.join(['{v:8.3f}'.format(v=prediction['R'][n]) for n in ['mean'] + percentile_names])
+
+    print('\n  set (replicated to all servers)', file=f)
+    print(header, file=f)
+    for servers in FORK_JOIN_SERVER_COUNTS:
+        print(line('-', servers, result['set'][str(servers)]), file=f)
+    for mode in ['non-sharded', 'sharded']:
+        print('\n  {mode} get'.format(mode=mode), file=f)
+        print(header, file=f)
+        for keys in FORK_JOIN_KEY_COUNTS:
+            for servers in FORK_JOIN_SERVER_COUNTS:
+                print(line(str(keys), servers, result['get'][mode][str(keys)][str(servers)]), file=f)
+
+    print('\n  validation: mean ServiceTime of the measured configurations (get or set window)', file=f)
+    for config, ops in result['validation'].items():
+        for op, validation in ops.items():
+            measured = validation['ServiceTime_measured']
+            predicted = validation['ServiceTime_predicted']
+            print('    {config:<36s} {op:<3s} measured {m:7.3f}  predicted {p:7.3f}  ({e:+6.1%})'
+                  .format(config=config, op=op, m=measured, p=predicted,
+                          e=(predicted - measured) / measured if measured > 0.0 else 0.0), file=f)
@@ -0,0 +1,441 @@
+"""
+secondary processing: incremental update of the database
+
+When one iteration of one configuration failed and was repeated, only the files of this instance and iteration
+(one memtier or middleware file set) need to be imported again. The database json file of the previous run is
+loaded and the aggregates are updated by deltas instead of processing the entire experiment again:
+- 'all' instance of the windows variables: weighted sum (mean * sum of the throughput weights) or sum
+  of the replaced iteration; the contribution of the old values of the instance is replaced
+- memtier stable_avg window of the instance: average of its stable windows
+- processed histogram bins and ignored values of the histogram cutoff: old counts of the instance are replaced
+- mean and SD of all values that changed: Welford state restored from mean, SD, and n (see update_mean_and_sd());
+  a file set filling a missing cell of the tolerant mode (-t flag) gets a full recalculation of its experiment key
+Derived variables, network-normalized latencies and aggregated percentiles are recalculated for the
+affected experiment keys only. Outlier detection runs again for all experiment keys (pooled MAD);
+experiment keys with a change of their valid iterations get a full recalculation of mean and SD.
+Only the figures affected by the update are plotted again (see plot_updated_figures()).
+The summary is written again from the database (no parsing); it is cheap in comparison with parsing and plotting
+but depends on all configurations (operational laws).
+
+usage: -u path_to_any_file_of_the_replaced_file_set (see ../process_raw_data.py); the database json file of
+the experiment must exist (i.e. the previous run must not have used -x)
+
+see main program in ../process_raw_data.py for information
+
+version 2018-12-16
+"""
+
+import json
+import os
+
+from tools.config import *
+from tools.helpers import *
+from processing.memtier import *
+from processing.middleware import *
+from processing.aggregation_and_statistics import *
+from processing.network_normalization import *
+from processing.outlier_detection import *
+
+
+# --- processing :: incremental update -------------------------------------------------------------
+
+UPDATE_FILE_SUFFIXES = {
+    'memtier': [MEMTIER_STDERR_SUFFIX, MEMTIER_STDOUT_SUFFIX, MEMTIER_JSON_SUFFIX],
+    'mw': [MW_WINDOWS_SUFFIX, MW_HISTOGRAMS_SUFFIX, MW_JSON_SUFFIX, MW_LOG_SUFFIX]
+}
+
+
+def int_keys(d):
+    """json converts int keys into str keys: converts them back (e.g. iteration index, bin nr, ping window nr)"""
+    return {(int(k) if k.isdigit() else k): v for k, v in d.items()}
+
+
+def restore_int_keys(run):
+    """restores the int keys of the database after loading from json; see documentation of the database"""
+    for app_name, app in run.items():
+        if app_name in ['app_ping', 'app_dstat']:
+            for name, data in app.items():
+                app[name] = int_keys(data)
+        elif app_name in ['app_memtier', 'app_mw']:
+            for exp_key, exp_data in app.items():
+                histograms = exp_data['histograms']
+                for op_name, op_data in histograms['raw_bins'].items():
+                    for variable_name, variable in op_data.items():
+                        for instance_name, instance in variable.items():
+                            variable[instance_name] = int_keys(instance)
+                for op_name, op_data in histograms['processed_bins'].items():
+                    if op_name == 'meta':
+                        continue
+                    for variable_name, variable in op_data.items():
+                        variable['all'] = int_keys(variable['all'])
+                for op_name, op_data in exp_data['percentiles'].items():
+                    for instance_name, instance in op_data.items():
+                        op_data[instance_name] = int_keys(instance)
+                if 'json' in exp_data:
+                    for instance_name, instance in exp_data['json'].items():
+                        exp_data['json'][instance_name] = int_keys(instance)
+
+
+def load_database(ctx, datasets):
+    """
+    loads the database json file of the current experiment into datasets (replacing the data of the experiment);
+    the info, warning and error texts of the database are moved into ctx
+    :return True if OK; False otherwise
+    """
+    print('### loading database of processed data from json file ###')
+    processed_path = os.path.join(ctx['output_folder'], ctx['experiment_folder'], PROCESSED_FOLDER)
+    db_file = os.path.join(processed_path, ctx['experiment_folder'] + DATABASE_SUFFIX)
+    if not os.path.isfile(db_file):
+        ctx['error'].append('incremental update: database {name} not found; run the full processing first (without -x)'
+                            .format(name=db_file))
+        return False
+    with open(db_file) as f:
+        try:
+            db = json.load(f)
+        except json.decoder.JSONDecodeError:
+            ctx['error'].append('incremental update: could not decode the database {name}'.format(name=db_file))
+            return False
+
+    experiment = 'r_' + ctx['experiment_folder']
+    if experiment not in db:
+        ctx['error'].append('incremental update: no data of {exp} in the database {name}'.format(exp=experiment, name=db_file))
+        return False
+    run = db[experiment]
+    restore_int_keys(run)
+    datasets[experiment] = run
+    for name in ['info', 'warning', 'error']:
+        ctx[name].extend(db.get(name, []))
+    return True
+
+
+def get_update_file_set(file):
+    """:return file path without suffix, app name; None, None if the file is not part of a memtier or mw file set"""
+    for app_name, suffixes in UPDATE_FILE_SUFFIXES.items():
+        for suffix in suffixes:
+            if file.endswith(suffix):
+                return remove_suffix(file, suffix), app_name
+    return None, None
+
+
+def import_file_set(ctx, without_suffix, app_name, metadata):
+    """imports the file set into a new, empty database; :return this scratch database"""
+    scratch = {}
+    if app_name == 'memtier':
+        process_memtier_stderr(ctx, scratch, without_suffix + MEMTIER_STDERR_SUFFIX, metadata)
+        process_memtier_json(ctx, scratch, without_suffix + MEMTIER_JSON_SUFFIX, metadata)
+        process_memtier_stdout(ctx, scratch, without_suffix + MEMTIER_STDOUT_SUFFIX, metadata)
+    else:
+        process_middleware_windows(ctx, scratch, without_suffix + MW_WINDOWS_SUFFIX, metadata)
+        process_middleware_histograms(ctx, scratch, without_suffix + MW_HISTOGRAMS_SUFFIX, metadata)
+        process_middleware_json(ctx, scratch, without_suffix + MW_JSON_SUFFIX, metadata)
+        process_middleware_log(ctx, scratch, without_suffix + MW_LOG_SUFFIX, metadata)
+    ctx['exp_mean_and_sd'] = []  # statistics are updated incrementally
+    return scratch
+
+
+def collect_iteration_values(exp_data, iteration):
+    """:return dict path -> value of the iteration for all windows variables and processed histogram bins"""
+    result = {}
+    for window_name, window in exp_data['windows'].items():
+        for op_name, op in window.items():
+            for variable_name, variable in op.items():
+                for instance_name, instance in variable.items():
+                    result[(window_name, op_name, variable_name, instance_name)] = instance['values'][iteration]
+    for op_name, op_data in exp_data['histograms']['processed_bins'].items():
+        if op_name == 'meta':
+            continue
+        for variable_name, variable in op_data.items():
+            for bin_nr, bin_data in variable['all'].items():
+                result[('processed_bins', op_name, variable_name, bin_nr)] = bin_data['values'][iteration]
+    return result
+
+
+def replace_instance_values(exp_data, scratch_exp, instance_name, iteration):
+    """
+    copies the values of the instance and iteration from the scratch import into the database;
+    values of the instance that are missing in the new import are set to 0.0 (as during a full import)
+    :return dict window name -> op name -> list of the imported variable names
+    """
+    imported = {}
+    calculated_variables = get_network_normalization_variable_names()
+    scratch_windows = scratch_exp['windows']
+    for window_name, scratch_window in scratch_windows.items():
+        window = create_or_get_dict(exp_data['windows'], window_name)
+        for op_name, scratch_op in scratch_window.items():
+            op = create_or_get_dict(window, op_name)
+            for variable_name, scratch_variable in scratch_op.items():
+                if instance_name not in scratch_variable:
+                    continue
+                variable = create_or_get_dict(op, variable_name)
+                instance = create_or_get_dict(variable, instance_name)
+                values = create_or_get_list(instance, 'values', 0.0)
+                values[iteration] = scratch_variable[instance_name]['values'][iteration]
+                imported_window = create_or_get_dict(imported, window_name)
+                create_or_get_template(imported_window, op_name, []).append(variable_name)
+
+    for window_name, window in exp_data['windows'].items():
+        if window_name not in scratch_windows:
+            continue
+        for op_name, op in window.items():
+            imported_variables = imported.get(window_name, {}).get(op_name, [])
+            for variable_name, variable in op.items():
+                if variable_name in imported_variables or instance_name not in variable:
+                    continue
+                if variable_name in calculated_variables:
+                    continue
+                variable[instance_name]['values'][iteration] = 0.0
+                create_or_get_dict(imported, window_name)
+                create_or_get_template(imported[window_name], op_name, []).append(variable_name)
+    return imported
+
+
+def update_memtier_stable_avg(exp_data, instance_name, iteration, imported):
+    """recalculates the stable_avg window of the instance (see aggregate_app_stable_windows()); adds to imported"""
+    windows = exp_data['windows']
+    stable_avg_window = windows['stable_avg']
+    inv_divisor = 1.0 / float(MEMTIER_STABLE_END - MEMTIER_STABLE_BEGIN)
+    imported_stable = create_or_get_dict(imported, 'stable_avg')
+    for op_name, op_variables in imported[str(MEMTIER_STABLE_BEGIN)].items():
+        stable_avg_op = create_or_get_dict(stable_avg_window, op_name)
+        for variable_name in op_variables:
+            total = 0.0
+            for i in range(MEMTIER_STABLE_BEGIN, MEMTIER_STABLE_END):
+                total += windows[str(i)][op_name][variable_name][instance_name]['values'][iteration]
+            stable_avg_variable = create_or_get_dict(stable_avg_op, variable_name)
+            stable_avg_instance = create_or_get_dict(stable_avg_variable, instance_name)
+            create_or_get_list(stable_avg_instance, 'values', 0.0)[iteration] = total * inv_divisor
+            create_or_get_template(imported_stable, op_name, []).append(variable_name)
+
+
+def update_all_instances(exp_data, instance_name, iteration, imported, old_values):
+    """
+    delta update of the aggregated 'all' instance of the imported variables (see aggregate_app_instances()):
+    weighted mean: the weighted sum (mean * weight sum) is adjusted by the old and new contribution of the instance
+    sum: the sum is adjusted by the difference of the old and new value of the instance
+    """
+    for window_name, imported_window in imported.items():
+        window = exp_data['windows'][window_name]
+        for op_name, variable_names in imported_window.items():
+            op = window[op_name]
+            if 'Throughput' not in op:
+                continue
+            weights = op['Throughput']
+            if instance_name not in weights:
+                continue
+            w_old = old_values.get((window_name, op_name, 'Throughput', instance_name), 0.0)
+            w_new = weights[instance_name]['values'][iteration]
+            weight_sum = 0.0
+            for name, instance in weights.items():
+                if name != 'all' and instance['values'][iteration] > 0.0:
+                    weight_sum += instance['values'][iteration]
+            old_weight_sum = weight_sum - max(w_new, 0.0) + max(w_old, 0.0)
+
+            for variable_name in variable_names:
+                variable = op[variable_name]
+                instance_all = create_or_get_dict(variable, 'all')
+                all_values = create_or_get_list(instance_all, 'values', 0.0)
+                x_old = old_values.get((window_name, op_name, variable_name, instance_name), 0.0)
+                x_new = variable[instance_name]['values'][iteration]
+                if not AGGREGATE_INSTANCES_BY_AVG[variable_name]:
+                    all_values[iteration] += x_new - x_old
+                    continue
+                weighted_sum = all_values[iteration] * old_weight_sum
+                if w_old > 0.0:
+                    weighted_sum -= w_old * x_old
+                if w_new > 0.0:
+                    weighted_sum += w_new * x_new
+                all_values[iteration] = weighted_sum / weight_sum if weight_sum > 0.0 else 0.0
+
+
+def update_histograms(ctx, exp_data, scratch_exp, app_name, exp_key, instance_name, iteration):
+    """replaces the raw histogram of the instance and iteration and updates the processed bins by delta"""
+    histograms = exp_data['histograms']
+    raw_bins = histograms['raw_bins']
+    processed_bins = histograms['processed_bins']
+    meta = create_or_get_dict(processed_bins, 'meta')
+    run_op = exp_data['metadata']['op']
+    bin_template = {}
+    create_or_get_list(bin_template, 'values', 0)
+
+    for op_name, scratch_op_data in scratch_exp['histograms']['raw_bins'].items():
+        op_data = create_or_get_dict(raw_bins, op_name)
+        for variable_name, scratch_variable in scratch_op_data.items():
+            variable = create_or_get_dict(op_data, variable_name)
+            instance = create_or_get_dict(variable, instance_name)
+            old_iteration = instance.get(iteration, [])
+            new_iteration = scratch_variable.get(instance_name, {}).get(iteration, [])
+            instance[iteration] = new_iteration
+
+            # only aggregated data that is actually available (see aggregate_app_instances())
+            if run_op == 'read' and op_name == 'set':
+                continue
+            if run_op == 'write' and op_name == 'get':
+                continue
+
+            old_bins, old_ignored_values, old_ignored_count, old_total_count = bin_raw_histogram_iteration(old_iteration)
+            new_bins, new_ignored_values, new_ignored_count, new_total_count = bin_raw_histogram_iteration(new_iteration)
+            processed_op = create_or_get_dict(processed_bins, op_name)
+            processed_variable = create_or_get_dict(processed_op, variable_name)
+            processed_all_instance = create_or_get_dict(processed_variable, 'all')
+            for bin_nr in range(HISTOGRAM_MAX_BIN_NR + 1):
+                bin_data = create_or_get_template(processed_all_instance, bin_nr, bin_template)
+                bin_data['values'][iteration] += new_bins[bin_nr] - old_bins[bin_nr]
+
+            list_name = 'ignored_values_' + op_name + '_' + variable_name
+            ignored_values = meta.get(list_name, [])
+            for value in old_ignored_values:
+                if value in ignored_values:
+                    ignored_values.remove(value)
+            ignored_values.extend(new_ignored_values)
+            meta[list_name] = sorted(ignored_values)
+            meta[list_name + '_count'] = meta.get(list_name + '_count', 0) - old_ignored_count + new_ignored_count
+            meta[list_name + '_total'] = meta.get(list_name + '_total', 0) - old_total_count + new_total_count
+            total_count = meta[list_name + '_total']
+            meta[list_name + '_percent'] = 100.0 * float(meta[list_name + '_count']) / float(total_count) if total_count > 0 else 0.0
+
+            prefix = get_histogram_info_prefix(app_name, op_name, variable_name, exp_key)
+            ctx['info'] = [t for t in ctx['info'] if not t.startswith(prefix)]
+            ctx['info'].append(get_histogram_info_text(app_name, op_name, variable_name, exp_key, meta))
+
+
+def replace_instance_percentiles_and_json(exp_data, scratch_exp, instance_name, iteration):
+    percentiles = exp_data['percentiles']
+    for op_name, scratch_op_data in scratch_exp.get('percentiles', {}).items():
+        if instance_name not in scratch_op_data or iteration not in scratch_op_data[instance_name]:
+            continue
+        op_data = create_or_get_dict(percentiles, op_name)
+        instance = create_or_get_dict(op_data, instance_name)
+        instance[iteration] = scratch_op_data[instance_name][iteration]
+    if 'json' in scratch_exp:
+        json_dicts = create_or_get_dict(exp_data, 'json')
+        instance = create_or_get_dict(json_dicts, instance_name)
+        instance[iteration] = scratch_exp['json'][instance_name][iteration]
+
+
+def update_statistics(exp_data, iteration, old_values):
+    """
+    updates mean and SD of all changed values of the iteration (Welford); instances without statistics
+    (e.g. new or recalculated 'all' instances) get a full calculation
+    :return count of updated random variables
+    """
+    instance_valid_iterations = {}  # instance name -> valid iterations of this instance (see tolerant mode)
+    count = 0
+    new_values = collect_iteration_values(exp_data, iteration)
+    for path, new_value in new_values.items():
+        if path[0] == 'processed_bins':
+            instance_name = 'all'
+            instance = exp_data['histograms']['processed_bins'][path[1]][path[2]]['all'][path[3]]
+        else:
+            instance_name = path[3]
+            instance = exp_data['windows'][path[0]][path[1]][path[2]][path[3]]
+        if instance_name not in instance_valid_iterations:
+            instance_valid_iterations[instance_name] = get_valid_iterations(exp_data, instance_name)
+        valid_iterations = instance_valid_iterations[instance_name]
+        if 'mean' not in instance or path not in old_values:
+            instance['mean'], instance['sd'], instance['n'] = calc_mean_and_sd(instance['values'], valid_iterations)
+            count += 1
+        elif valid_iterations[iteration] and old_values[path] != new_value:
+            update_mean_and_sd(instance, old_values[path], new_value)
+            count += 1
+    return count
+
+
+def remove_missing_cell(ctx, exp_data, app_name, exp_key, instance_name, iteration):
+    """
+    removes the cell from the missing cells of the tolerant mode (see check_app_data()), if listed
+    :return True if the cell was missing; False otherwise
+    """
+    missing_cells = exp_data.get('missing_cells', {})
+    if iteration not in missing_cells.get(instance_name, []):
+        return False
+    missing_cells[instance_name].remove(iteration)
+    if len(missing_cells[instance_name]) == 0:
+        del missing_cells[instance_name]
+    if len(missing_cells) == 0:
+        del exp_data['missing_cells']
+    text = 'app_{app} exp {exp} instance {instance}: missing iteration {iteration}'.format(app=app_name, exp=exp_key, instance=instance_name, iteration=iteration)
+    ctx['warning'] = [t for t in ctx['warning'] if t != text]
+    return True
+
+
+def update_file_set(ctx, datasets, file, updated_exp_keys):
+    """:return True if OK; False otherwise"""
+    without_suffix, app_name = get_update_file_set(file)
+    if without_suffix is None:
+        ctx['error'].append('incremental update: {name} is not part of a memtier or middleware file set'.format(name=file))
+        return False
+    metadata = parse_filename(file)
+    calc_metadata_keys(metadata)
+    run = datasets[metadata['run_key']]
+    app = run[metadata['short_app_key']]
+    exp_key = metadata['exp_key']
+    if exp_key not in app:
+        ctx['error'].append('incremental update: experiment key {exp} of {name} not found in the database'.format(exp=exp_key, name=file))
+        return False
+    exp_data = app[exp_key]
+    instance_name = metadata['id']
+    iteration = metadata['iteration_index']
+    print('    {app} {exp}, instance {instance}, iteration {iteration}'
+          .format(app=app_name, exp=exp_key, instance=instance_name, iteration=iteration + 1))
+
+    # texts of the previous import of this file set are replaced
+    for name in ['warning', 'error']:
+        ctx[name] = [t for t in ctx[name] if without_suffix not in t]
+
+    old_values = collect_iteration_values(exp_data, iteration)
+    scratch = import_file_set(ctx, without_suffix, app_name, metadata)
+    scratch_exp = scratch[metadata['run_key']][metadata['short_app_key']][exp_key]
+
+    imported = replace_instance_values(exp_data, scratch_exp, instance_name, iteration)
+    if app_name == 'memtier':
+        update_memtier_stable_avg(exp_data, instance_name, iteration, imported)
+    update_all_instances(exp_data, instance_name, iteration, imported, old_values)
+    add_derived_variables_for_exp(exp_data)
+    normalize_network_latency_for_exp(ctx, datasets, app_name, exp_data)
+    update_histograms(ctx, exp_data, scratch_exp, app_name, exp_key, instance_name, iteration)
+    replace_instance_percentiles_and_json(exp_data, scratch_exp, instance_name, iteration)
+    create_or_get_list(exp_data['instance_iteration_matrix'], instance_name, 0)[iteration] = 1
+    if remove_missing_cell(ctx, exp_data, app_name, exp_key, instance_name, iteration):
+        # the valid iterations of the aggregated instances changed: no delta update possible
+        count, windows_count, histograms_count = calc_exp_statistics(exp_data)
+        print('        missing cell filled: mean and SD recalculated for {count} random variables'.format(count=count))
+    else:
+        count = update_statistics(exp_data, iteration, old_values)
+        print('        mean and SD updated for {count} random variables'.format(count=count))
+    updated_exp_keys[app_name].add(exp_key)
+    return True
+
+
+def update_iterations(ctx, datasets, files):
+    """
+    Incremental update of the database with the replaced file sets (see module documentation)
+    :return dict app name -> set of updated experiment keys (for plot_updated_figures());
+            None in case of an error
+    """
+    print('### incremental update of {count} replaced file sets ###'.format(count=len(files)))
+    experiment = 'r_' + ctx['experiment_folder']
+    run = datasets[experiment]
+    updated_exp_keys = {'memtier': set(), 'mw': set()}
+    for file in files:
+        if not update_file_set(ctx, datasets, file, updated_exp_keys):
+            return None
+
+    # outlier detection with pooled MAD over all experiment keys: run again and compare valid iterations
+    old_valid_iterations = {}
+    for app_name in ['memtier', 'mw']:
+        for exp_key, exp_data in run['app_' + app_name].items():
+            old_valid_iterations[(app_name, exp_key)] = get_valid_iterations(exp_data)
+            exp_data.pop('valid_iterations', None)
+    ctx['warning'] = [t for t in ctx['warning'] if not is_outlier_detection_text(t)]
+    detect_outlier_iterations(ctx, datasets)
+    for app_name in ['memtier', 'mw']:
+        for exp_key, exp_data in run['app_' + app_name].items():
+            if old_valid_iterations[(app_name, exp_key)] != get_valid_iterations(exp_data):
+                print('    valid iterations changed: full recalculation of mean and SD for {app} {exp}'.format(app=app_name, exp=exp_key))
+                calc_exp_statistics(exp_data)
+                updated_exp_keys[app_name].add(exp_key)
+
+    for app_name, exp_keys in updated_exp_keys.items():
+        if len(exp_keys) > 0:
+            aggregate_percentiles_for_app(ctx, datasets, app_name, exp_keys)
+    return updated_exp_keys
@@ -0,0 +1,185 @@
+"""
+secondary processing: automatic detection of the saturation knee N_uc
+
+For each model of LAWS_AND_MODELING_INPUT, the memtier throughput X(n) and response time R(n) (stable windows,
+valid iterations) of the measured numbers of clients n are fitted by a continuous two-segment
+piecewise-linear function (hinge) with breakpoint k:
+  y(n) = a + b n + c max(0, n - k)
+For each candidate breakpoint of a grid (KNEE_DETECTION_GRID_POINTS values between the second and the
+second-last measured n), the least squares coefficients follow from the pseudo-inverse of the design matrix;
+the breakpoint with the smallest residual sum of squares is the knee. All candidates of all bootstrap
+replicates are evaluated at once.
+- X knee: the throughput stops growing (saturation)
+- R knee: the response time starts growing linearly with n (interactive response time law R = N / X - Z)
+- N_uc (detected): mean of X knee and R knee
+The interactive law bound N* = (D + Z) / D_max of the asymptotic bounds (see performance_bounds.py) is
+reported as reference.
+
+Confidence intervals: bootstrap of the iterations [Efron1993]; for each replicate, the iterations of each
+configuration are resampled with replacement (paired for X and R) and the knees are detected again;
+percentile interval of KNEE_DETECTION_CONFIDENCE. The random generator is seeded for reproducible results.
+
+The detected knee is added to the operational laws output (N_uc_detected) and, rounded to the closest measured
+number of clients, used as N_uc. An optional N_uc_override of a model in LAWS_AND_MODELING_INPUT replaces it
+(also for models without enough measured numbers of clients); a warning is logged if the override is outside
+the confidence interval of the detected knee. The results are stored in the database (run key 'knees') and
+written into the summary.
+
+see main program in ../process_raw_data.py for information
+
+References
+[Efron1993]  Efron B, Tibshirani RJ. An introduction to the bootstrap. Chapman & Hall, 1993
+
+version 2018-12-29
+"""
+
+import numpy as np
+
+from tools.config import *
+from tools.helpers import *
+from tools.operational_laws import *
+from processing.mean_value_analysis import get_model_configurations
+
+
+# --- processing :: knee detection -----------------------------------------------------------------
+
+KNEE_OVERRIDE_WARNING = 'N_uc_override outside of the knee confidence interval'
+
+
+def is_knee_override_text(text):
+    """:return True if the warning text was added by the knee detection (replaced in incremental updates)"""
+    return KNEE_OVERRIDE_WARNING in text
+
+
+def get_iteration_values(ctx, datasets, config, variable_name):
+    """:return list of the stable windows values of the valid iterations of the memtier variable; None if n/a"""
+    exp_data, mapped_op_name = get_experiment_data(ctx, datasets, 'memtier', config)
+    if exp_data is None:
+        return None
+    values = exp_data['windows']['stable_avg']['both'][variable_name]['all']['values']
+    valid_iterations = get_valid_iterations(exp_data)
+    values = [v for i, v in enumerate(values) if i >= len(valid_iterations) or valid_iterations[i]]
+    if len(values) == 0:
+        return None
+    return values
+
+
+def fit_hinge_breakpoints(n, y, candidates):
+    """
+    vectorized least squares fit of the hinge function (see module documentation) for all candidates and series
+    :param n: numpy array (points) of the numbers of clients
+    :param y: numpy array (series x points)
+    :param candidates: numpy array of the candidate breakpoints
+    :return numpy array (series) of the breakpoints with the smallest residual sum of squares
+    """
+    design = np.stack([np.ones((len(candidates), len(n))),
+                       np.broadcast_to(n, (len(candidates), len(n))),
+                       np.maximum(0.0, n[np.newaxis, :] - candidates[:, np.newaxis])], axis=2)
+    pseudo_inverse = np.linalg.pinv(design)
+    coefficients = np.einsum('kpm,sm->skp', pseudo_inverse, y)
+    fitted = np.einsum('kmp,skp->skm', design, coefficients)
+    sse = ((fitted - y[:, np.newaxis, :]) ** 2).sum(axis=2)
+    return candidates[np.argmin(sse, axis=1)]
+
+
+def calc_model_knee(ctx, datasets, op_key, model, random_state):
+    """:return dict with the detected knees and their confidence intervals; None if not available"""
+    client_numbers = []
+    samples = {'Throughput': [], 'ResponseTime': []}
+    for cn, config in get_model_configurations(ctx, op_key, model):
+        x = get_iteration_values(ctx, datasets, config, 'Throughput')
+        r = get_iteration_values(ctx, datasets, config, 'ResponseTime')
+        if x is None or r is None or len(x) != len(r):
+            continue
+        client_numbers.append(cn)
+        samples['Throughput'].append(x)
+        samples['ResponseTime'].append(r)
+    if len(client_numbers) < KNEE_DETECTION_MIN_POINTS:
+        return None
+
+    n = np.asarray(client_numbers, dtype=float)
+    candidates = np.unique(np.linspace(n[1], n[-2], KNEE_DETECTION_GRID_POINTS))
+    replicates = KNEE_DETECTION_BOOTSTRAP_REPLICATES
+    y = {name: np.zeros((replicates + 1, len(n))) for name in samples}
+    for j in range(len(n)):
+        iterations = len(samples['Throughput'][j])
+        resampled = random_state.randint(0, iterations, size=(replicates, iterations))
+        for name in samples:
+            values = np.asarray(samples[name][j], dtype=float)
+            y[name][0, j] = values.mean()
+            y[name][1:, j] = values[resampled].mean(axis=1)
+
+    knees = {name: fit_hinge_breakpoints(n, y[name], candidates) for name in samples}
+    knees['combined'] = 0.5 * (knees['Throughput'] + knees['ResponseTime'])
+    alpha = 0.5 * (1.0 - KNEE_DETECTION_CONFIDENCE)
+    result = {'client_numbers': client_numbers}
+    for name, values in knees.items():
+        result[name] = {
+            'knee': float(values[0]),
+            'ci': [float(np.percentile(values[1:], 100.0 * alpha)), float(np.percentile(values[1:], 100.0 * (1.0 - alpha)))]
+        }
+    result['N_uc'] = min(client_numbers, key=lambda cn: abs(cn - result['combined']['knee']))
+    bounds = CONFIGURATION['bounds_output'].get(ctx['experiment_folder'], {}).get(op_key, {}).get(model)
+    result['N*'] = None if bounds is None else bounds['N*']
+    return result
+
+
+def detect_saturation_knees(ctx, datasets, f):
+    """
+    Detects the saturation knee of all models (see module documentation) and writes it into the summary;
+    must be called after calc_performance_bounds() and before write_laws_and_modeling_output()
+    """
+    print('    saturation knee detection')
+    random_state = np.random.RandomState(KNEE_DETECTION_SEED)
+    ctx['warning'] = [t for t in ctx['warning'] if not is_knee_override_text(t)]
+    knees = {}
+    input_dict = CONFIGURATION['laws_and_modeling_input'][ctx['experiment_folder']]
+    for op_key, op_data in input_dict.items():
+        for model, model_data in op_data['models'].items():
+            config_dict = extract_metadata(model)
+            config_dict['op'] = op_key
+            n_uc_override = model_data.get('N_uc_override')
+            if n_uc_override is not None:
+                add_ol_variable(ctx, config_dict, 'N_uc_override', n_uc_override)
+            result = calc_model_knee(ctx, datasets, op_key, model, random_state)
+            if result is None:
+                if n_uc_override is not None:
+                    add_ol_variable(ctx, config_dict, 'N_uc', n_uc_override)
+                continue
+            result['N_uc_override'] = n_uc_override
+            create_or_get_dict(knees, op_key)[model] = result
+
+            add_ol_variable(ctx, config_dict, 'N_uc_detected', result['combined']['knee'],
+                            lo=result['combined']['ci'][0], hi=result['combined']['ci'][1])
+            if n_uc_override is None:
+                add_ol_variable(ctx, config_dict, 'N_uc', result['N_uc'])
+                continue
+            add_ol_variable(ctx, config_dict, 'N_uc', n_uc_override)
+            lo, hi = result['combined']['ci']
+            if not lo <= n_uc_override <= hi:
+                ctx['warning'].append(('knee detection {op} {model}: ' + KNEE_OVERRIDE_WARNING +
+                                       ' ({n} not in [{lo:.1f}, {hi:.1f}], detected knee {k:.1f})')
+                                      .format(op=op_key, model=model, n=n_uc_override, lo=lo, hi=hi,
+                                              k=result['combined']['knee']))
+    create_or_get_dict(datasets, 'r_' + ctx['experiment_folder'])['knees'] = knees
+    if len(knees) == 0:
+        return
+
+    print('\n\n--------------------------------------------------------------------------------', file=f)
+    print('Saturation knee detection', file=f)
+    print('--------------------------------------------------------------------------------\n', file=f)
+    print('breakpoint of piecewise-linear fits of X(n) and R(n); {c:.0f}% bootstrap confidence intervals '
+          '({b} replicates of the iterations)'.format(c=100.0 * KNEE_DETECTION_CONFIDENCE, b=KNEE_DETECTION_BOOTSTRAP_REPLICATES), file=f)
+    print('  {op:<6s} {model:<24s} | {x:>22s} | {r:>22s} | {c:>22s} | {n:>5s} {m:>6s} {star:>7s}'
+          .format(op='op', model='model', x='X knee [CI]', r='R knee [CI]', c='detected [CI]',
+                  n='N_uc', m='over.', star='N*'), file=f)
+    for op_key in knees:
+        for model, result in knees[op_key].items():
+            columns = ['{k:6.1f} [{lo:6.1f}, {hi:6.1f}]'.format(k=result[name]['knee'], lo=result[name]['ci'][0],
+                                                                 hi=result[name]['ci'][1])
+                       for name in ['Throughput', 'ResponseTime', 'combined']]
+            override = '-' if result['N_uc_override'] is None else str(result['N_uc_override'])
+            n_star = '-' if result['N*'] is None else '{v:7.1f}'.format(v=result['N*'])
+            print('  {op:<6s} {model:<24s} | {x} | {r} | {c} | {n:5d} {m:>6s} {star:>7s}'
+                  .format(op=op_key, model=model, x=columns[0], r=columns[1], c=columns[2],
+                          n=result['N_uc'], m=override, star=n_star), file=f)
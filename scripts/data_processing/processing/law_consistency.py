@@ -0,0 +1,208 @@
+"""
+secondary processing: consistency check of Little's law and the utilization law per window
+
+The middleware reports the queue and worker thread state and the time intervals of each 1 s window
+independently (see DESIGN_AND_TECHNICAL_NOTES, 7.2). In each window, the operational laws [Jain1991]
+must hold for each middleware instance (op both; X in kop/s, times in ms):
+- queue (Little's law):   QueueLen = X QueueingTime
+- workers (Little's law): mt - WaitingWorkersCount = X (ServiceTime - PreprocessingTime)
+  i.e. the busy workers hold a job from dequeueing until the reply is sent
+- utilization law:        WorkerUtilization = X ProcessingTime / mt
+  i.e. time waiting for the servers does not count as busy (ProcessingTime excludes ServersNettoResponseTime)
+All windows of all experiment keys are handled at once as a 5D tensor
+(exp_key, variable, window, instance, iteration). A law is violated in a window if
+  |lhs - rhs| > LAW_CHECK_ABSOLUTE_TOLERANCE[law] + LAW_CHECK_RELATIVE_TOLERANCE max(|lhs|, |rhs|)
+Windows with throughput below LAW_CHECK_MIN_THROUGHPUT, invalid iterations and missing cells are skipped.
+
+Violations within the stable windows of the middleware (LAW_CHECK_STABLE_BEGIN to LAW_CHECK_STABLE_END)
+point to instrumentation bugs or pauses (e.g. GC) and are reported as warnings; violations in the
+warm-up and cool-down windows are expected to some extent (requests spanning window borders) and are
+only counted. The results are stored in the database (run key 'law_consistency') and written into the summary.
+
+see main program in ../process_raw_data.py for information
+
+References
+[Jain1991]  Jain R. The art of computer systems performance analysis. Wiley, 1991
+
+version 2019-01-03
+"""
+
+import warnings
+
+import numpy as np
+
+from tools.config import *
+from tools.helpers import *
+
+
+# --- processing :: law consistency ----------------------------------------------------------------
+
+LAW_CHECK_VARIABLES = ['Throughput', 'QueueLen', 'QueueingTime', 'WaitingWorkersCount', 'ServiceTime',
+                       'PreprocessingTime', 'ProcessingTime', 'WorkerUtilization']
+LAW_CHECK_LAWS = ['queue', 'workers', 'utilization']
+LAW_CHECK_WARNING = 'operational laws violated'
+
+
+def is_law_consistency_text(text):
+    """:return True if the warning text was added by the law consistency check (replaced in incremental updates)"""
+    return LAW_CHECK_WARNING in text
+
+
+def get_window_numbers(exp_data):
+    """:return sorted list of the window numbers (int) of the middleware windows"""
+    return sorted([int(name) for name in exp_data['windows'] if name.isdigit()])
+
+
+def build_window_tensor(app, exp_keys, variable_names):
+    """
+    :return: tensor (numpy array) with shape (exp_keys, variables, windows, instances, iterations) of the
+             window values of op both of the individual instances (not 'all'); missing values, invalid iterations
+             and missing cells are NaN;
+             instance names for each exp_key
+    """
+    instance_names = []
+    n_windows = 0
+    for exp_key in exp_keys:
+        exp_data = app[exp_key]
+        instance_names.append(sorted([name for name in exp_data['windows']['stable_avg']['both']['Throughput']
+                                      if name != 'all']))
+        n_windows = max([n_windows] + [w + 1 for w in get_window_numbers(exp_data)])
+    n_instances = max([len(names) for names in instance_names])
+
+    tensor = np.full((len(exp_keys), len(variable_names), n_windows, n_instances, MAX_ITERATIONS), np.nan)
+    for e, exp_key in enumerate(exp_keys):
+        exp_data = app[exp_key]
+        for w in get_window_numbers(exp_data):
+            op = exp_data['windows'][str(w)].get('both', {})
+            for v, variable_name in enumerate(variable_names):
+                variable = op.get(variable_name, {})
+                for i, instance_name in enumerate(instance_names[e]):
+                    if instance_name in variable:
+                        values = variable[instance_name]['values']
+                        tensor[e, v, w, i, :len(values)] = values
+        for i, instance_name in enumerate(instance_names[e]):
+            valid_iterations = get_valid_iterations(exp_data, instance_name)
+            for iteration, valid in enumerate(valid_iterations[:MAX_ITERATIONS]):
+                if not valid:
+                    tensor[e, :, :, i, iteration] = np.nan
+    return tensor, instance_names
+
+
+def calc_law_sides(tensor, worker_threads):
+    """
+    :param tensor: see build_window_tensor() with the variables LAW_CHECK_VARIABLES
+    :param worker_threads: numpy array (exp_keys) of the number of worker threads per middleware (mt)
+    :return dict law -> (lhs, rhs) with tensors of shape (exp_keys, windows, instances, iterations)
+    """
+    v = {name: tensor[:, k] for k, name in enumerate(LAW_CHECK_VARIABLES)}
+    mt = np.asarray(worker_threads, dtype=float)[:, np.newaxis, np.newaxis, np.newaxis]
+    x = v['Throughput']
+    return {
+        'queue': (v['QueueLen'], x * v['QueueingTime']),
+        'workers': (mt - v['WaitingWorkersCount'], x * (v['ServiceTime'] - v['PreprocessingTime'])),
+        'utilization': (v['WorkerUtilization'], x * v['ProcessingTime'] / mt)
+    }
+
+
+def check_laws(sides, throughput):
+    """:return dict law -> (checked, violated) boolean tensors (see module documentation)"""
+    result = {}
+    with warnings.catch_warnings():
+        # NaN of missing values and padding are expected
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        active = throughput >= LAW_CHECK_MIN_THROUGHPUT
+        for law, (lhs, rhs) in sides.items():
+            checked = active & np.isfinite(lhs) & np.isfinite(rhs)
+            tolerance = LAW_CHECK_ABSOLUTE_TOLERANCE[law] + \
+                LAW_CHECK_RELATIVE_TOLERANCE * np.fmax(np.abs(lhs), np.abs(rhs))
+            result[law] = (checked, checked & (np.abs(lhs - rhs) > tolerance))
+    return result
+
+
+def calc_law_consistency(ctx, app):
+    """:return dict with the law consistency results (see module documentation); None if n/a"""
+    exp_keys = sorted([exp_key for exp_key in app if 'both' in app[exp_key]['windows']['stable_avg']])
+    if len(exp_keys) == 0:
+        return None
+    tensor, instance_names = build_window_tensor(app, exp_keys, LAW_CHECK_VARIABLES)
+    sides = calc_law_sides(tensor, [int(app[exp_key]['metadata']['mt']) for exp_key in exp_keys])
+    checks = check_laws(sides, tensor[:, LAW_CHECK_VARIABLES.index('Throughput')])
+    stable = np.zeros(tensor.shape[2], dtype=bool)
+    stable[LAW_CHECK_STABLE_BEGIN:LAW_CHECK_STABLE_END] = True
+    stable = stable[np.newaxis, :, np.newaxis, np.newaxis]
+
+    result = {'laws': {}, 'experiments': {}}
+    for law in LAW_CHECK_LAWS:
+        checked, violated = checks[law]
+        result['laws'][law] = {
+            'checked': int(checked.sum()),
+            'checked_stable': int((checked & stable).sum()),
+            'violations_stable': int((violated & stable).sum()),
+            'violations_other': int((violated & ~stable).sum())
+        }
+    for e, exp_key in enumerate(exp_keys):
+        violations = []
+        for law in LAW_CHECK_LAWS:
+            lhs, rhs = sides[law]
+            for w, i, iteration in np.argwhere(checks[law][1][e]):
+                violations.append({
+                    'law': law,
+                    'window': int(w),
+                    'instance': instance_names[e][i],
+                    'iteration': int(iteration),
+                    'stable': bool(LAW_CHECK_STABLE_BEGIN <= w < LAW_CHECK_STABLE_END),
+                    'lhs': float(lhs[e, w, i, iteration]),
+                    'rhs': float(rhs[e, w, i, iteration])
+                })
+        violations.sort(key=lambda d: (d['window'], d['instance'], d['iteration'], d['law']))
+        stable_count = len([d for d in violations if d['stable']])
+        if stable_count > 0:
+            ctx['warning'].append(('mw exp {exp}: ' + LAW_CHECK_WARNING + ' in {n} stable window cells (see law consistency)')
+                                  .format(exp=exp_key, n=stable_count))
+        result['experiments'][exp_key] = {
+            'violations_stable': stable_count,
+            'violations_other': len(violations) - stable_count,
+            'violations': violations
+        }
+    return result
+
+
+def write_law_consistency(ctx, datasets, f):
+    """Checks Little's law and the utilization law in all middleware windows (see module documentation)"""
+    if ctx['experiment_folder'] in FIGURES_MATRIX['no_middleware_involved']:
+        return
+    print('    law consistency per window')
+    run = create_or_get_dict(datasets, 'r_' + ctx['experiment_folder'])
+    ctx['warning'] = [t for t in ctx['warning'] if not is_law_consistency_text(t)]
+    result = calc_law_consistency(ctx, run.get('app_mw', {}))
+    if result is None:
+        return
+    run['law_consistency'] = result
+
+    print('\n\n--------------------------------------------------------------------------------', file=f)
+    print('Operational laws consistency per window (middleware)', file=f)
+    print('--------------------------------------------------------------------------------\n', file=f)
+    print('queue: QueueLen = X QueueingTime; workers: mt - WaitingWorkersCount = X (ServiceTime - PreprocessingTime);', file=f)
+    print('utilization: WorkerUtilization = X ProcessingTime / mt; each window, instance and iteration (op both).', file=f)
+    print('Violation: |lhs - rhs| > abs. tolerance + {rel:.0%} max(|lhs|, |rhs|); stable windows {b} to {e} (exclusive).\n'
+          .format(rel=LAW_CHECK_RELATIVE_TOLERANCE, b=LAW_CHECK_STABLE_BEGIN, e=LAW_CHECK_STABLE_END), file=f)
+    print('  {law:<12s} {tol:>9s} {checked:>8s} {stable:>13s} {other:>8s}'
+          .format(law='law', tol='abs. tol.', checked='checked', stable='stable viol.', other='other'), file=f)
+    for law in LAW_CHECK_LAWS:
+        d = result['laws'][law]
+        share = d['violations_stable'] / d['checked_stable'] if d['checked_stable'] > 0 else 0.0
+        print('  {law:<12s} {tol:9.3f} {checked:8d} {stable:6d} ({share:4.1%}) {other:8d}'
+              .format(law=law, tol=LAW_CHECK_ABSOLUTE_TOLERANCE[law], checked=d['checked'],
+                      stable=d['violations_stable'], share=share, other=d['violations_other']), file=f)
+
+    flagged = [(exp_key, d) for exp_key, d in result['experiments'].items() if d['violations_stable'] > 0]
+    if len(flagged) == 0:
+        print('\n  no violations in the stable windows', file=f)
+        return
+    print('\n  flagged stable windows (max. {n} listed per experiment key)'.format(n=LAW_CHECK_MAX_LISTED_WINDOWS), file=f)
+    for exp_key, d in flagged:
+        print('  {exp}: {n} violations'.format(exp=exp_key, n=d['violations_stable']), file=f)
+        for v in [v for v in d['violations'] if v['stable']][:LAW_CHECK_MAX_LISTED_WINDOWS]:
+            print('    window {w:3d}, instance {i}, iteration {it}: {law:<12s} lhs {lhs:9.4f}  rhs {rhs:9.4f}'
+                  .format(w=v['window'], i=v['instance'], it=v['iteration'] + 1, law=v['law'],
+                          lhs=v['lhs'], rhs=v['rhs']), file=f)
@@ -0,0 +1,364 @@
+"""
+secondary processing: simulation of load-balancing policies of the middleware (-l flag)
+
+The middleware uses a round-robin counter in each worker thread to choose the server of a get request
+(see DESIGN_AND_TECHNICAL_NOTES, 4.2). With mixed key counts, the number of keys sent to each server
+may differ and cause a (cyclic) load imbalance. This discrete-event simulation replays the measured request
+mix and the measured server RTT distributions of each middleware configuration with at least 2 servers under
+the policies of LOAD_BALANCING_POLICIES:
+- round_robin: as implemented (one counter per worker; workers start at different servers)
+- join_shortest_queue: server with the fewest outstanding requests (queued or in service)
+- power_of_two: the better one of two random servers [Mitzenmacher2001]
+- key_aware: server with the fewest outstanding keys
+Sharded multi-gets with k keys use the min(k, servers) chosen servers (round-robin: consecutive servers);
+the keys are split evenly. Sets are replicated to all servers (not affected by the policy).
+
+Model:
+- N = cn closed-loop clients, split evenly to the mc middlewares; think time: exponential with the measured mean
+  of ClientRTTAndProcessingTime; the requests are enqueued PreprocessingTime after their arrival
+  (net-thread contention is not modeled)
+- mt worker threads per middleware take the requests from the queue of their middleware (FIFO); ProcessingTime
+  before the requests are sent to the servers; the worker waits for all replies
+- servers: FIFO stations with LOAD_BALANCING_SERVER_THREADS threads (memcached worker threads); the lowest
+  measured RTT of each server (ServerRtt<k> histogram) is its network round trip, the remainder of the RTT
+  samples is the service time of a request with the average number of keys of this server
+  (ServerKeys<k> / ServerUsage<k>), scaled linearly with the number of keys
+- request mix of LOAD_BALANCING_KEY_MIXES: measured (fraction of sets of the set and get windows, key counts
+  of the get_<k> windows) or uniform over the given key counts
+All policies use the same random numbers (common random numbers; drawn in advance) for a fair comparison.
+SIMULATION_WARMUP_FRACTION of the requests are discarded (see middleware_simulation.py).
+
+Output for each configuration, mix and policy:
+- Throughput; ResponseTime (received at the middleware to finished): mean and percentiles of
+  LOAD_BALANCING_PERCENTILES
+- load skew: key share of each server; max / mean of the time-average number of outstanding keys per server
+The measured Throughput and ResponseTime of the middleware are listed for comparison. Mixes with sets only
+are not simulated (not affected by the policy).
+
+The results are written into a summary file and into the database (run key 'load_balancing').
+
+Units: times in ms; throughput in kop/s.
+
+see main program in ../process_raw_data.py for information
+
+References
+[Mitzenmacher2001]  Mitzenmacher M. The power of two choices in randomized load balancing.
+                    IEEE Transactions on Parallel and Distributed Systems 2001; 12(10):1094-1104
+
+version 2018-12-31
+"""
+
+import collections
+import heapq
+import os
+import random
+import time
+
+import numpy as np
+
+from tools.config import *
+from tools.helpers import *
+from processing.middleware_simulation import sample_distribution, get_histogram_distribution, pool_distributions
+
+
+# --- processing :: load-balancing simulation ------------------------------------------------------
+
+# event types; the order defines the processing order of simultaneous events
+EVENT_ARRIVAL = 0
+EVENT_ENQUEUED = 1
+EVENT_DISPATCH = 2
+EVENT_SERVER_DONE = 3
+EVENT_REPLY = 4
+
+
+def choose_servers(policy, servers, used, worker_round_robin, w, outstanding, outstanding_keys, rng):
+    """:return list of the used servers for a get request (see module documentation)"""
+    if policy == 'round_robin':
+        start = worker_round_robin[w]
+        worker_round_robin[w] = (start + used) % servers
+        return [(start + i) % servers for i in range(used)]
+    offset = rng.randrange(servers)
+    if policy == 'power_of_two':
+        candidates = rng.sample(range(servers), min(servers, 2 * used))
+        return sorted(candidates, key=lambda j: (outstanding[j], (j - offset) % servers))[:used]
+    load = outstanding_keys if policy == 'key_aware' else outstanding
+    return sorted(range(servers), key=lambda j: (load[j], (j - offset) % servers))[:used]
+
+
+def simulate_load_balancing(params, policy, n_requests, seed):
+    """
+    simulates the middlewares with the shared servers for one policy (see module documentation)
+    :param params: dict with clients, middlewares, workers, servers, server_threads, sharded, set_ratio, key_counts,
+                   key_probabilities, think_time, preprocessing_time, processing_time, network_delays,
+                   service_distributions, average_keys
+    :return dict with the results; None if not available
+    """
+    np_rng = np.random.RandomState(seed)
+    rng = random.Random(seed)
+    clients = params['clients']
+    middlewares = params['middlewares']
+    servers = params['servers']
+    total = n_requests + clients
+    pre = params['preprocessing_time']
+    processing = params['processing_time']
+    delays = params['network_delays']
+
+    # random numbers in advance (identical for all policies)
+    if params['think_time'] > 0.0:
+        think = np_rng.exponential(params['think_time'], total).tolist()
+    else:
+        think = [0.0] * total
+    is_set = (np_rng.uniform(0.0, 1.0, total) < params['set_ratio']).tolist()
+    keys = np_rng.choice(params['key_counts'], size=total, p=params['key_probabilities']).tolist()
+    service = []
+    for j in range(servers):
+        samples = sample_distribution(np_rng, params['service_distributions'][j], 2 * total) - delays[j]
+        service.append((np.maximum(samples, 0.0) / params['average_keys'][j]).tolist())
+    service_next = [0] * servers
+
+    # state
+    received = [0.0] * total
+    finished = [-1.0] * total
+    pending = [0] * total
+    worker_of = [0] * total
+    client_of = [0] * total
+    queues = [collections.deque() for m in range(middlewares)]
+    idle_workers = [list(range(params['workers'])) for m in range(middlewares)]
+    worker_round_robin = [w % servers for w in range(params['workers'] * middlewares)]
+    outstanding = [0] * servers
+    outstanding_keys = [0] * servers
+    busy_threads = [0] * servers
+    server_queues = [collections.deque() for j in range(servers)]
+    keys_served = [0] * servers
+    key_area = [0.0] * servers
+    key_last = [0.0] * servers
+    events = [(think[c], EVENT_ARRIVAL, c, 0) for c in range(clients)]
+    heapq.heapify(events)
+    next_request = 0
+    next_think = clients
+
+    warmup = int(SIMULATION_WARMUP_FRACTION * n_requests)
+    t_begin = -1.0
+    t_end = float('inf')
+
+    heappush = heapq.heappush
+    heappop = heapq.heappop
+
+    def start_server_job(t, j, rid, q):
+        busy_threads[j] += 1
+        value = service[j][service_next[j] % len(service[j])] * q
+        service_next[j] += 1
+        heappush(events, (t + value, EVENT_SERVER_DONE, j, (rid, q)))
+
+    def change_keys(t, j, delta):
+        if t_begin >= 0.0 and t <= t_end:
+            key_area[j] += outstanding_keys[j] * (t - max(key_last[j], t_begin))
+        key_last[j] = t
+        outstanding_keys[j] += delta
+
+    def start_worker(t, m, w, rid):
+        worker_of[rid] = m * params['workers'] + w
+        heappush(events, (t + processing, EVENT_DISPATCH, rid, 0))
+
+    while events:
+        t, event, a, b = heappop(events)
+        if event == EVENT_ARRIVAL:
+            rid = next_request
+            next_request += 1
+            if rid == warmup:
+                t_begin = t
+            if rid == total - 1:
+                t_end = t
+            received[rid] = t
+            client_of[rid] = a
+            heappush(events, (t + pre, EVENT_ENQUEUED, rid, 0))
+        elif event == EVENT_ENQUEUED:
+            m = client_of[a] % middlewares
+            if idle_workers[m]:
+                start_worker(t, m, idle_workers[m].pop(), a)
+            else:
+                queues[m].append(a)
+        elif event == EVENT_DISPATCH:
+            rid = a
+            if is_set[rid]:
+                jobs = [(j, 1) for j in range(servers)]
+            else:
+                k = keys[rid]
+                used = min(k, servers) if params['sharded'] else 1
+                chosen = choose_servers(policy, servers, used, worker_round_robin, worker_of[rid],
+                                        outstanding, outstanding_keys, rng)
+                jobs = [(j, k // used + (1 if i < k % used else 0)) for i, j in enumerate(chosen)]
+            pending[rid] = len(jobs)
+            for j, q in jobs:
+                outstanding[j] += 1
+                change_keys(t, j, q)
+                if busy_threads[j] < params['server_threads']:
+                    start_server_job(t, j, rid, q)
+                else:
+                    server_queues[j].append((rid, q))
+        elif event == EVENT_SERVER_DONE:
+            j = a
+            busy_threads[j] -= 1
+            if server_queues[j]:
+                start_server_job(t, j, *server_queues[j].popleft())
+            heappush(events, (t + delays[j], EVENT_REPLY, j, b))
+        else:
+            j = a
+            rid, q = b
+            outstanding[j] -= 1
+            change_keys(t, j, -q)
+            if t_begin >= 0.0 and t <= t_end:
+                keys_served[j] += q
+            pending[rid] -= 1
+            if pending[rid] > 0:
+                continue
+            finished[rid] = t
+            if next_think < total:
+                heappush(events, (t + think[next_think], EVENT_ARRIVAL, client_of[rid], 0))
+                next_think += 1
+            m, w = divmod(worker_of[rid], params['workers'])
+            if queues[m]:
+                start_worker(t, m, w, queues[m].popleft())
+            else:
+                idle_workers[m].append(w)
+
+    duration = t_end - t_begin
+    response_times = np.array([f - r for r, f in zip(received, finished) if t_begin <= f <= t_end])
+    if len(response_times) == 0 or duration <= 0.0:
+        return None
+    key_level = np.array(key_area) / duration
+    result = {
+        'Throughput': len(response_times) / duration,
+        'ResponseTime': float(response_times.mean()),
+        'percentiles': dict(zip(['p' + str(p) for p in LOAD_BALANCING_PERCENTILES],
+                                [float(v) for v in np.percentile(response_times, LOAD_BALANCING_PERCENTILES)])),
+        'key_share': [float(v) for v in np.array(keys_served) / max(1, sum(keys_served))],
+        'outstanding_keys': [float(v) for v in key_level],
+        'skew': float(key_level.max() / key_level.mean()) if key_level.mean() > 0.0 else 1.0
+    }
+    return result
+
+
+def get_request_mix(exp_data, mix):
+    """:return set ratio, key counts and their probabilities of the request mix (see module documentation)"""
+    measured = exp_data['windows']['stable_avg']
+    x_set = measured['set']['Throughput']['all']['mean'] if 'set' in measured else 0.0
+    x_get = measured['get']['Throughput']['all']['mean'] if 'get' in measured else 0.0
+    if x_set + x_get > 0.0:
+        set_ratio = x_set / (x_set + x_get)
+    else:
+        set_ratio = {'set': 1.0, 'get': 0.0}.get(PLOT_LABELS_OP_MAPPING[exp_data['metadata']['op']], SIMULATION_MIXED_SET_RATIO)
+    if mix is not None:
+        return set_ratio, list(mix), [1.0 / len(mix)] * len(mix)
+    key_counts = []
+    rates = []
+    for op_name in measured:
+        if op_name.startswith('get_'):
+            key_counts.append(int(op_name[len('get_'):]))
+            rates.append(max(0.0, measured[op_name]['Throughput']['all']['mean']))
+    if sum(rates) <= 0.0:
+        return set_ratio, [int(exp_data['metadata']['ck'])], [1.0]
+    return set_ratio, key_counts, [r / sum(rates) for r in rates]
+
+
+def get_load_balancing_params(exp_data, mix):
+    """:return dict of parameters for simulate_load_balancing(); None if not available (e.g. only one server)"""
+    metadata = exp_data['metadata']
+    servers = int(metadata['sc']) * int(metadata['st'])
+    if servers < 2:
+        return None
+    measured = exp_data['windows']['stable_avg']['both']
+    distributions = []
+    average_keys = []
+    for k in range(1, servers + 1):
+        distribution = get_histogram_distribution(exp_data, 'ServerRtt' + str(k))
+        if distribution is not None:
+            distributions.append(distribution)
+        usage = measured.get('ServerUsage' + str(k), {}).get('all', {}).get('mean', 0.0)
+        keys = measured.get('ServerKeys' + str(k), {}).get('all', {}).get('mean', 0.0)
+        average_keys.append(keys / usage if usage > 0.0 and keys > 0.0 else 1.0)
+    if len(distributions) == 0:
+        return None
+    while len(distributions) < servers:
+        distributions.append(pool_distributions(distributions))
+    set_ratio, key_counts, key_probabilities = get_request_mix(exp_data, mix)
+    mc = max(1, int(metadata['mc']))
+    return {
+        'clients': int(metadata['cn']),
+        'middlewares': mc,
+        'workers': int(metadata['mt']),
+        'servers': servers,
+        'server_threads': LOAD_BALANCING_SERVER_THREADS,
+        'sharded': str(metadata['ms']).lower() == 'true',
+        'set_ratio': set_ratio,
+        'key_counts': key_counts,
+        'key_probabilities': key_probabilities,
+        'think_time': measured['ClientRTTAndProcessingTime']['all']['mean'],
+        'preprocessing_time': measured['PreprocessingTime']['all']['mean'],
+        'processing_time': measured['ProcessingTime']['all']['mean'],
+        'network_delays': [float(d[0][0]) for d in distributions],
+        'service_distributions': distributions,
+        'average_keys': average_keys
+    }
+
+
+def simulate_load_balancing_policies(ctx, datasets):
+    """
+    Simulates the load-balancing policies for each measured middleware configuration with at least 2 servers
+    (see module documentation); the results are written into a summary file and into the database
+    """
+    print('### simulating load-balancing policies ###')
+    if ctx['experiment_folder'] in FIGURES_MATRIX['no_middleware_involved']:
+        ctx['info'].append('load-balancing simulation skipped: no middleware involved in this experiment\n')
+        return
+    run = create_or_get_dict(datasets, 'r_' + ctx['experiment_folder'])
+    results = create_or_get_dict(run, 'load_balancing')
+
+    percentile_names = ['p' + str(p) for p in LOAD_BALANCING_PERCENTILES]
+    lines = [
+        'Load-balancing policy simulation for experiment {exp} ({n} requests per configuration, mix and policy; '
+        'see load_balancing_simulation.py)'.format(exp=ctx['experiment_folder'], n=LOAD_BALANCING_REQUESTS),
+        'X in kop/s; R (mean, percentiles) in ms from received at the middleware to finished; '
+        'skew: max / mean of the outstanding keys per server',
+        ''
+    ]
+    start = time.time()
+    simulated_requests = 0
+    for config in get_experiment_configurations(ctx['experiment_folder']):
+        exp_data, mapped_op_name = get_experiment_data(ctx, datasets, 'mw', config)
+        if exp_data is None:
+            continue
+        if get_load_balancing_params(exp_data, None) is None:
+            continue
+        measured = exp_data['windows']['stable_avg']['both']
+        lines.append('{config}: measured X {x:8.3f}  R {r:7.3f}'.format(config=config, x=measured['Throughput']['all']['mean'],
+                                                                       r=measured['ResponseTime']['all']['mean']))
+        for mix_name, mix in LOAD_BALANCING_KEY_MIXES.items():
+            params = get_load_balancing_params(exp_data, mix)
+            if params['set_ratio'] >= 1.0:
+                lines.append('  mix {mix}: sets only (replicated to all servers; not affected by the policy)'.format(mix=mix_name))
+                continue
+            lines.append('  mix {mix} (sets {s:.0%}, keys {keys})'
+                         .format(mix=mix_name, s=params['set_ratio'], keys=', '.join([str(k) for k in params['key_counts']])))
+            for policy in LOAD_BALANCING_POLICIES:
+                result = simulate_load_balancing(params, policy, LOAD_BALANCING_REQUESTS, SIMULATION_SEED)
+                if result is None:
+                    continue
+                simulated_requests += LOAD_BALANCING_REQUESTS
+                create_or_get_dict(create_or_get_dict(results, config), mix_name)[policy] = result
+                lines.append('    {policy:<20s} X {x:8.3f}  R {r:7.3f}  '.format(policy=policy, x=result['Throughput'],
+                                                                                 r=result['ResponseTime']) +
+                             '  '.join(['{p} {v:7.3f}'.format(p=p, v=result['percentiles'][p]) for p in percentile_names]) +
+                             '  skew {skew:5.3f}  key share {share}'
+                             .format(skew=result['skew'], share=' / '.join(['{v:.1%}'.format(v=v) for v in result['key_share']])))
+        lines.append('')
+
+    duration = time.time() - start
+    lines.append('{n} requests simulated in {t:.1f} s'.format(n=simulated_requests, t=duration))
+    processed_path = os.path.join(ctx['output_folder'], ctx['experiment_folder'], PROCESSED_FOLDER)
+    make_path(processed_path)
+    summary_file = os.path.join(processed_path, ctx['prefix'] + ctx['experiment_folder'] + LOAD_BALANCING_SUMMARY_SUFFIX)
+    with open(summary_file, 'w') as f:
+        for line in lines:
+            print(line, file=f)
+    print('    {n} requests simulated in {t:.1f} s'.format(n=simulated_requests, t=duration))
@@ -0,0 +1,191 @@
+"""
+secondary processing: load-dependent service demand curves
+
+The service demands of the MVA stations (see MVA_STATIONS) are not constant: PreprocessingTime, ProcessingTime
+and the server RTT grow with the number of clients due to CPU contention on the middleware and server VMs.
+For each model of LAWS_AND_MODELING_INPUT and each station, the demand samples D_k(n) are collected for the
+measured numbers of clients n (stable windows average):
+- stations with per-configuration demands in the operational laws graph (D_middleware,clientthread and
+  D_middleware,workerthread): these demands
+- stations with a model-wide demand only (e.g. D_server = D_max): the model-wide demand scaled by the relative
+  growth of the middleware variables of DEMAND_CURVE_SCALING (e.g. mean of ServerRtt<k>) with respect to the
+  configuration with the smallest number of clients
+- otherwise: constant demand (get_mva_demands())
+
+Fitted curve: D_k(n) = a_k + b_k n (least squares), solved in one vectorized step for all stations of
+all models (missing samples are masked). Series with fewer than DEMAND_CURVE_MIN_POINTS samples are constant
+(mean of the samples; b_k = 0); stations without samples keep the constant demand of the MVA. The curve is evaluated for n clamped to the measured range and never falls below
+the smallest sample of its series (no extrapolation beyond the measured configurations).
+
+The curves (coefficients and the fitted demands for N = 1 .. max. number of clients) are stored in the
+database (run key 'demand_curves') and used by the load-dependent MVA (see mean_value_analysis.py).
+
+Units: demands in ms.
+
+see main program in ../process_raw_data.py for information
+
+version 2018-12-25
+"""
+
+import numpy as np
+
+from tools.config import *
+from tools.helpers import *
+from tools.operational_laws import *
+from processing.mean_value_analysis import get_model_configurations, get_mva_demands
+
+
+# --- processing :: load-dependent service demands -------------------------------------------------
+
+def get_scaling_variable_mean(ctx, datasets, config, prefix):
+    """:return mean of the middleware variables prefix<k> (k = 1, 2, ...; stable windows, all instances); None if n/a"""
+    if ctx['experiment_folder'] in FIGURES_MATRIX['no_middleware_involved']:
+        return None
+    exp_data, mapped_op_name = get_experiment_data(ctx, datasets, 'mw', config)
+    if exp_data is None:
+        return None
+    measured = exp_data['windows']['stable_avg']['both']
+    values = []
+    k = 1
+    while prefix + str(k) in measured:
+        values.append(measured[prefix + str(k)]['all']['mean'])
+        k += 1
+    if len(values) == 0:
+        return None
+    return sum(values) / len(values)
+
+
+def collect_demand_samples(ctx, datasets, op_key, model):
+    """
+    :return list of client numbers, dict station -> list of demand samples (ms; None if n/a), dict station -> source
+            for the stations of the MVA model (see module documentation)
+    """
+    configurations = get_model_configurations(ctx, op_key, model)
+    client_numbers = [cn for cn, config in configurations]
+    samples = {}
+    sources = {}
+    for station, d in get_mva_demands(ctx, op_key, model).items():
+        name = 'D_' + station
+        if station in MVA_STATIONS and evaluate_ol_node(ctx, op_key, model, name, 'all') is None:
+            samples[station] = [get_ol_value(ctx, op_key, model, name, cn) for cn in client_numbers]
+            sources[station] = name
+            continue
+        prefix = DEMAND_CURVE_SCALING.get(station)
+        scaling = [None if prefix is None else get_scaling_variable_mean(ctx, datasets, config, prefix)
+                   for cn, config in configurations]
+        if len(scaling) > 0 and scaling[0] is not None and scaling[0] > 0.0:
+            samples[station] = [None if s is None else d * s / scaling[0] for s in scaling]
+            sources[station] = '{name} scaled by {prefix}<k>'.format(name=name, prefix=prefix)
+        else:
+            samples[station] = [d] * len(client_numbers)
+            sources[station] = 'constant'
+    return client_numbers, samples, sources
+
+
+def fit_demand_curves(n, d):
+    """
+    vectorized least squares fit of D(n) = a + b n for all series at once
+    :param n: numpy array (series x points) of the numbers of clients
+    :param d: numpy array (series x points) of the demand samples; NaN for missing samples
+    :return numpy arrays a, b, R^2 and number of samples for the series
+    """
+    mask = ~np.isnan(d)
+    count = mask.sum(axis=1)
+    safe_count = np.maximum(count, 1)
+    n_mean = np.where(mask, n, 0.0).sum(axis=1) / safe_count
+    d_mean = np.where(mask, d, 0.0).sum(axis=1) / safe_count
+    dn = np.where(mask, n - n_mean[:, np.newaxis], 0.0)
+    dd = np.where(mask, d - d_mean[:, np.newaxis], 0.0)
+    s_nn = (dn * dn).sum(axis=1)
+    s_nd = (dn * dd).sum(axis=1)
+    s_dd = (dd * dd).sum(axis=1)
+    fitted = (count >= DEMAND_CURVE_MIN_POINTS) & (s_nn > 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        b = np.where(fitted, s_nd / s_nn, 0.0)
+        r2 = np.where(fitted & (s_dd > 0.0), s_nd * s_nd / (s_nn * s_dd), np.nan)
+    a = d_mean - b * n_mean
+    return a, b, r2, count
+
+
+def evaluate_demand_curve(curve, client_numbers, populations):
+    """:return numpy array of the fitted demand for the populations (clamped; see module documentation)"""
+    n = np.clip(np.asarray(populations, dtype=float), client_numbers[0], client_numbers[-1])
+    d = curve['a'] + curve['b'] * n
+    return np.maximum(d, curve['D_min'])
+
+
+def calc_load_dependent_demands(ctx, datasets):
+    """:return dict op -> model -> demand curves of the stations (see module documentation)"""
+    series = []
+    curves = {}
+    input_dict = CONFIGURATION['laws_and_modeling_input'][ctx['experiment_folder']]
+    for op_key, op_data in input_dict.items():
+        for model in op_data['models']:
+            client_numbers, samples, sources = collect_demand_samples(ctx, datasets, op_key, model)
+            if len(client_numbers) == 0 or len(samples) == 0:
+                continue
+            create_or_get_dict(curves, op_key)[model] = {
+                'client_numbers': client_numbers,
+                'N': list(range(1, client_numbers[-1] + 1)),
+                'stations': {}
+            }
+            for station in sorted(samples):
+                series.append([op_key, model, station, client_numbers, samples[station], sources[station]])
+    if len(series) == 0:
+        return curves
+
+    points = max([len(s[3]) for s in series])
+    n = np.full((len(series), points), np.nan)
+    d = np.full((len(series), points), np.nan)
+    for i, s in enumerate(series):
+        n[i, :len(s[3])] = s[3]
+        d[i, :len(s[4])] = [np.nan if v is None else v for v in s[4]]
+    a, b, r2, count = fit_demand_curves(n, d)
+
+    for i, (op_key, model, station, client_numbers, values, source) in enumerate(series):
+        measured = [v for v in values if v is not None]
+        if len(measured) == 0:
+            continue
+        curve = {
+            'source': source,
+            'samples': values,
+            'a': float(a[i]),
+            'b': float(b[i]),
+            'R2': None if np.isnan(r2[i]) else float(r2[i]),
+            'n': int(count[i]),
+            'D_min': min(measured)
+        }
+        curve['D'] = [float(v) for v in evaluate_demand_curve(curve, client_numbers, curves[op_key][model]['N'])]
+        curves[op_key][model]['stations'][station] = curve
+    return curves
+
+
+def write_load_dependent_demands(ctx, datasets, f):
+    """
+    Fits the load-dependent demand curves of all models (see module documentation) and writes them into the summary;
+    must be called before calc_mva_predictions()
+    """
+    print('    load-dependent service demands')
+    curves = calc_load_dependent_demands(ctx, datasets)
+    create_or_get_dict(datasets, 'r_' + ctx['experiment_folder'])['demand_curves'] = curves
+    if len(curves) == 0:
+        return
+
+    print('\n\n--------------------------------------------------------------------------------', file=f)
+    print('Load-dependent service demands', file=f)
+    print('--------------------------------------------------------------------------------\n', file=f)
+    print('least squares fit D(n) = a + b n of the demand samples (ms) of the MVA stations for the measured n', file=f)
+    for op_key in curves:
+        for model, model_curves in curves[op_key].items():
+            client_numbers = model_curves['client_numbers']
+            print('\n  {op} {model}'.format(op=op_key, model=model), file=f)
+            print('    {s:<26s} {a:>8s} {b:>10s} {r2:>6s} {n:>3s} {d_lo:>9s} {d_hi:>9s}  {src}'
+                  .format(s='station', a='a ms', b='b ms', r2='R^2', n='n',
+                          d_lo='D(' + str(client_numbers[0]) + ')', d_hi='D(' + str(client_numbers[-1]) + ')',
+                          src='source'), file=f)
+            for station, curve in sorted(model_curves['stations'].items()):
+                d = evaluate_demand_curve(curve, client_numbers, [client_numbers[0], client_numbers[-1]])
+                r2 = '{v:>6s}'.format(v='n/a') if curve['R2'] is None else '{v:6.3f}'.format(v=curve['R2'])
+                print('    {s:<26s} {a:8.5f} {b:10.3e} {r2} {n:3d} {d_lo:9.5f} {d_hi:9.5f}  {src}'
+                      .format(s=station, a=curve['a'], b=curve['b'], r2=r2, n=curve['n'],
+                              d_lo=d[0], d_hi=d[1], src=curve['source']), file=f)
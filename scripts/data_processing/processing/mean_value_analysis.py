@@ -0,0 +1,237 @@
+"""
+secondary processing: mean value analysis (MVA) of a closed queueing network
+
+Each model of LAWS_AND_MODELING_INPUT (e.g. set mn_16) is modeled as closed interactive system:
+N clients with think time Z and one queueing station for each of MVA_STATIONS. The parameters are
+taken from the operational laws graph (see tools/operational_laws.py):
+- service demands D_<station> of the configuration with the smallest number of clients (least contention);
+  if none of the stations is available (e.g. no middleware, no mapping to D_server), the bottleneck
+  demand D_max serves as single station
+- think time Z: MVA_THINK_TIME_VARIABLE of the middleware (stable windows average) of the same configuration;
+  without middleware, Z is estimated by the interactive response time law Z = N/X - R [Jain1991]
+
+Predictions of throughput X(N) and response time R(N) for N = 1 .. max. number of clients of the model:
+- exact MVA [Reiser1980]: recursion over N; vectorized over the stations
+- approximate MVA [Schweitzer1979, Bard1979]: Q_k(N-1) = (N-1)/N * Q_k(N); fixed-point iteration
+  vectorized over all populations N at once
+- load-dependent MVA: exact MVA recursion with the demands D_k(N) of the fitted load-dependent demand curves
+  at each population N (see load_dependent_demands.py); stations without a curve keep their constant demand
+
+The predictions for the measured numbers of clients are added to the operational laws output (MVA_ prefix);
+the entire curves are stored in CONFIGURATION['mva_output'] and in the database (run key 'mva') and overlaid on the memtier numclients
+figures of throughput and response time. Must be called after write_load_dependent_demands().
+
+Units: demands, Z and R in ms; X in kop/s (N / ms).
+
+see main program in ../process_raw_data.py for information
+
+References
+[Bard1979]        Bard Y. Some extensions to multiclass queueing network analysis. Proceedings of the 3rd
+                  International Symposium on Modelling and Performance Evaluation of Computer Systems, 1979
+[Reiser1980]      Reiser M, Lavenberg SS. Mean-value analysis of closed multichain queuing networks.
+                  Journal of the ACM 1980; 27(2):313-322
+[Schweitzer1979]  Schweitzer PJ. Approximate analysis of multiclass closed networks of queues.
+                  Proceedings of the International Conference on Stochastic Control and Optimization, 1979
+
+version 2018-12-18
+"""
+
+import numpy as np
+
+from tools.config import *
+from tools.helpers import *
+from tools.operational_laws import *
+
+
+# --- processing :: mean value analysis ------------------------------------------------------------
+
+OP_KEY_TO_CONFIGURATION_PREFIX = {
+    'set': 'op_write_',
+    'get': 'op_read_',
+    'mixed': 'op_mixed_'
+}
+
+
+def solve_exact_mva(demands, think_time, n_max):
+    """
+    exact MVA for a closed network with single-server queueing stations and a delay (think time)
+    :param demands: service demands of the stations (ms); or numpy array (n_max x stations) with the demands
+                    for each population N = 1 .. n_max (load-dependent demands)
+    :param think_time: Z (ms)
+    :param n_max: maximum number of clients N
+    :return numpy arrays X (kop/s), R (ms) with length n_max for N = 1 .. n_max; queue lengths Q (n_max x stations)
+    """
+    demands = np.asarray(demands, dtype=float)
+    if demands.ndim == 1:
+        demands = np.repeat(demands[np.newaxis, :], n_max, axis=0)
+    X = np.zeros(n_max)
+    R = np.zeros(n_max)
+    Q = np.zeros((n_max, demands.shape[1]))
+    q = np.zeros(demands.shape[1])
+    for n in range(1, n_max + 1):
+        r_k = demands[n - 1] * (1.0 + q)
+        r = r_k.sum()
+        x = n / (think_time + r)
+        q = x * r_k
+        X[n - 1] = x
+        R[n - 1] = r
+        Q[n - 1] = q
+    return X, R, Q
+
+
+def solve_schweitzer_mva(demands, think_time, populations):
+    """
+    Bard-Schweitzer approximate MVA; all populations are solved at once (vectorized fixed-point iteration)
+    :param populations: list of numbers of clients N (> 0)
+    :return numpy arrays X (kop/s), R (ms) for the populations; queue lengths Q (populations x stations); iterations
+    """
+    demands = np.asarray(demands, dtype=float)[np.newaxis, :]
+    n = np.asarray(populations, dtype=float)[:, np.newaxis]
+    q = np.repeat(n / float(demands.shape[1]), demands.shape[1], axis=1)
+    factor = (n - 1.0) / n
+    for iteration in range(1, MVA_SCHWEITZER_MAX_ITERATIONS + 1):
+        r_k = demands * (1.0 + factor * q)
+        r = r_k.sum(axis=1, keepdims=True)
+        x = n / (think_time + r)
+        q_new = x * r_k
+        converged = np.max(np.abs(q_new - q)) < MVA_SCHWEITZER_TOLERANCE
+        q = q_new
+        if converged:
+            break
+    r_k = demands * (1.0 + factor * q)
+    r = r_k.sum(axis=1)
+    x = n[:, 0] / (think_time + r)
+    return x, r, q, iteration
+
+
+def get_model_configurations(ctx, op_key, model):
+    """:return list of [cn, configuration] of the model sorted by the number of clients cn"""
+    model_dict = extract_metadata(model)
+    result = []
+    for config in CONFIGURATION['laws_and_modeling_input'][ctx['experiment_folder']][op_key]['configurations']:
+        config_dict = extract_metadata(config)
+        if metadata_matches_requested_config(config_dict, model_dict):
+            result.append([int(config_dict['cn']), OP_KEY_TO_CONFIGURATION_PREFIX[op_key] + config])
+    return sorted(result)
+
+
+def get_mva_demands(ctx, op_key, model):
+    """:return dict station -> service demand (ms); see module documentation"""
+    demands = {}
+    for station in MVA_STATIONS:
+        d = get_ol_value(ctx, op_key, model, 'D_' + station)
+        if d is not None and d > 0.0:
+            demands[station] = d
+    if len(demands) == 0:
+        d = get_ol_value(ctx, op_key, model, 'D_max')
+        if d is not None and d > 0.0:
+            demands['bottleneck'] = d
+    return demands
+
+
+def get_load_dependent_demands(ctx, datasets, op_key, model, stations, demands, n_max):
+    """:return numpy array (n_max x stations) with the demands of the fitted curves for N = 1 .. n_max; None if n/a"""
+    curves = datasets['r_' + ctx['experiment_folder']].get('demand_curves', {}).get(op_key, {}).get(model)
+    if curves is None:
+        return None
+    columns = []
+    for station in stations:
+        if station in curves['stations']:
+            columns.append(np.asarray(curves['stations'][station]['D'][:n_max]))
+        else:
+            columns.append(np.full(n_max, demands[station]))
+    return np.stack(columns, axis=1)
+
+
+def get_mva_think_time(ctx, datasets, op_key, model, cn, config):
+    """:return think time Z (ms) for the configuration of the model with cn clients, source description"""
+    if ctx['experiment_folder'] not in FIGURES_MATRIX['no_middleware_involved']:
+        exp_data, mapped_op_name = get_experiment_data(ctx, datasets, 'mw', config)
+        if exp_data is not None:
+            op = exp_data['windows']['stable_avg']['both']
+            if MVA_THINK_TIME_VARIABLE in op:
+                return op[MVA_THINK_TIME_VARIABLE]['all']['mean'], MVA_THINK_TIME_VARIABLE
+
+    # interactive response time law: Z = N/X - R (ms and kop/s cancel each other out)
+    x = get_ol_value(ctx, op_key, model, 'X', cn)
+    r = get_ol_value(ctx, op_key, model, 'R', cn)
+    if x is None or r is None or x <= 0.0:
+        return None, None
+    return max(0.0, float(cn) / x - r), 'interactive law N/X - R'
+
+
+def calc_mva_model(ctx, datasets, op_key, model):
+    """:return dict with input and predictions of the model; None if the input is not available"""
+    configurations = get_model_configurations(ctx, op_key, model)
+    if len(configurations) == 0:
+        return None
+    client_numbers = [cn for cn, config in configurations]
+    demands = get_mva_demands(ctx, op_key, model)
+    if len(demands) == 0:
+        ctx['warning'].append('MVA {op} {model}: no service demands available'.format(op=op_key, model=model))
+        return None
+    z, z_source = get_mva_think_time(ctx, datasets, op_key, model, configurations[0][0], configurations[0][1])
+    if z is None:
+        ctx['warning'].append('MVA {op} {model}: no think time available'.format(op=op_key, model=model))
+        return None
+
+    stations = sorted(demands)
+    demand_values = [demands[station] for station in stations]
+    n_max = client_numbers[-1]
+    X, R, Q = solve_exact_mva(demand_values, z, n_max)
+    populations = list(range(1, n_max + 1))
+    X_approx, R_approx, Q_approx, iterations = solve_schweitzer_mva(demand_values, z, populations)
+    if iterations == MVA_SCHWEITZER_MAX_ITERATIONS:
+        ctx['warning'].append('MVA {op} {model}: approximate MVA did not converge'.format(op=op_key, model=model))
+    load_dependent_demands = get_load_dependent_demands(ctx, datasets, op_key, model, stations, demands, n_max)
+    if load_dependent_demands is None:
+        X_ld, R_ld = X, R
+    else:
+        X_ld, R_ld, Q_ld = solve_exact_mva(load_dependent_demands, z, n_max)
+
+    return {
+        'demands': demands,
+        'Z': z,
+        'Z_source': z_source,
+        'client_numbers': client_numbers,
+        'N': populations,
+        'X': [float(v) for v in X],
+        'R': [float(v) for v in R],
+        'Q': {station: [float(v) for v in Q[:, k]] for k, station in enumerate(stations)},
+        'X_schweitzer': [float(v) for v in X_approx],
+        'R_schweitzer': [float(v) for v in R_approx],
+        'X_load_dependent': [float(v) for v in X_ld],
+        'R_load_dependent': [float(v) for v in R_ld]
+    }
+
+
+def calc_mva_predictions(ctx, datasets):
+    """
+    Solves the MVA for all models of the current experiment (see module documentation) and adds the predictions
+    to the operational laws output; must be called after the operational laws variables have been collected
+    """
+    print('    mean value analysis')
+    mva_dict = create_or_get_dict(CONFIGURATION['mva_output'], ctx['experiment_folder'])
+    create_or_get_dict(datasets, 'r_' + ctx['experiment_folder'])['mva'] = mva_dict
+    input_dict = CONFIGURATION['laws_and_modeling_input'][ctx['experiment_folder']]
+    for op_key, op_data in input_dict.items():
+        for model in op_data['models']:
+            result = calc_mva_model(ctx, datasets, op_key, model)
+            if result is None:
+                continue
+            create_or_get_dict(mva_dict, op_key)[model] = result
+
+            config_dict = extract_metadata(model)
+            config_dict['op'] = op_key
+            add_ol_variable(ctx, config_dict, 'MVA_Z', result['Z'], source=result['Z_source'])
+            for station, d in result['demands'].items():
+                add_ol_variable(ctx, config_dict, 'MVA_D_' + station, d)
+            for cn in result['client_numbers']:
+                config_dict['cn'] = str(cn)
+                i = cn - 1
+                add_ol_variable(ctx, config_dict, 'MVA_X', result['X'][i])
+                add_ol_variable(ctx, config_dict, 'MVA_R', result['R'][i])
+                add_ol_variable(ctx, config_dict, 'MVA_X_Schweitzer', result['X_schweitzer'][i])
+                add_ol_variable(ctx, config_dict, 'MVA_R_Schweitzer', result['R_schweitzer'][i])
+                add_ol_variable(ctx, config_dict, 'MVA_X_LoadDependent', result['X_load_dependent'][i])
+                add_ol_variable(ctx, config_dict, 'MVA_R_LoadDependent', result['R_load_dependent'][i])
@@ -0,0 +1,349 @@
+"""
+secondary processing: discrete-event simulation of the middleware (-s flag)
+
+Topology as implemented in the middleware (see ClientThread and WorkerThread):
+- N closed-loop clients; each client sends its next request after a think time
+- one net-thread (ClientThread) per middleware reads and parses the requests (FIFO, one at a time)
+  and enqueues them into the queue (LinkedTransferQueue)
+- mt worker threads (WorkerThread) take the requests from the queue (FIFO) and process them:
+  - set: replicated to all sc servers; the worker waits for all replies
+  - get and non-sharded multi-get: one server; round-robin server choice of each worker
+    (workers start at different servers)
+  - sharded multi-get: keys split over min(ck, sc) servers starting at the round-robin server;
+    the worker waits for all replies
+- mc middlewares are simulated as independent systems with N / mc clients each (memtier instances are
+  split evenly to the middlewares); the servers are modeled by their measured RTT distributions
+
+Input taken from the processed run (each measured middleware configuration):
+- server RTT: empirical distributions of the histograms ServerRtt<k> (all instances, valid iterations);
+  additional servers (sc larger than measured) use the pooled distribution of all measured servers
+- think time Z: exponential with the measured mean of ClientRTTAndProcessingTime
+  (only window means are recorded by the middleware)
+- net-thread time: PreprocessingTime; worker time without waiting for the servers: ProcessingTime (means)
+All random numbers are drawn in advance (numpy, vectorized); the event loop (heapq) only keeps the
+state and the time stamps. SIMULATION_WARMUP_FRACTION of the requests are discarded; the measurement
+ends when the last request is sent (no drain phase).
+
+Output variables as reported by the middleware (stable windows view):
+- Throughput (all middlewares), ResponseTime (received to finished), QueueingTime (enqueued to dequeued),
+  ServiceTime (ResponseTime - QueueingTime)
+- WorkerUtilization: like the middleware, waiting for the servers does not count as busy
+- QueueLen: time average of the queue length
+
+Each measured configuration is simulated as measured (validation) and with each variant of the -s flag
+(e.g. -s mt_256_sc_5: parameters of the configuration are replaced by the given values).
+
+Units: times in ms; throughput in kop/s.
+
+see main program in ../process_raw_data.py for information
+
+References
+[Banks2010]  Banks J, Carson JS, Nelson BL, Nicol DM. Discrete-event system simulation. 5th ed.
+             Prentice Hall, 2010
+
+version 2018-12-20
+"""
+
+import collections
+import heapq
+import os
+import time
+
+import numpy as np
+
+from tools.config import *
+from tools.helpers import *
+
+
+# --- processing :: middleware simulation ----------------------------------------------------------
+
+SIMULATION_OUTPUT_VARIABLES = ['Throughput', 'ResponseTime', 'QueueingTime', 'ServiceTime', 'WorkerUtilization', 'QueueLen']
+
+# event types; the order defines the processing order of simultaneous events
+EVENT_ARRIVAL = 0
+EVENT_ENQUEUED = 1
+EVENT_FINISHED = 2
+
+
+def sample_distribution(rng, distribution, size):
+    """
+    :param distribution: [values, probabilities, resolution] of a histogram; values are the lower bin limits
+    :return numpy array with size samples (uniform within the bins)
+    """
+    values, probabilities, resolution = distribution
+    return rng.choice(values, size=size, p=probabilities) + rng.uniform(0.0, resolution, size)
+
+
+def simulate_middleware_system(params, n_requests, seed):
+    """
+    simulates one middleware with its clients and servers (see module documentation)
+    :param params: dict with clients, workers, servers, set_ratio, keys, sharded, think_time, preprocessing_time,
+                   processing_time, rtt_distributions (list of distributions; see sample_distribution())
+    :return dict variable name -> simulated mean (throughput of this middleware)
+    """
+    rng = np.random.RandomState(seed)
+    clients = params['clients']
+    workers = params['workers']
+    servers = params['servers']
+    pre = params['preprocessing_time']
+    processing = params['processing_time']
+    keys = params['keys']
+    total = n_requests + clients
+
+    # random numbers in advance
+    if params['think_time'] > 0.0:
+        think = rng.exponential(params['think_time'], total).tolist()
+    else:
+        think = [0.0] * total
+    is_set = (rng.uniform(0.0, 1.0, total) < params['set_ratio']).tolist()
+    distributions = params['rtt_distributions']
+    rtt = np.empty((total, servers))
+    for k in range(servers):
+        rtt[:, k] = sample_distribution(rng, distributions[min(k, len(distributions) - 1)], total)
+    set_service = (processing + rtt.max(axis=1)).tolist()
+    rtt = rtt.tolist()
+    used_servers = min(keys, servers) if params['sharded'] and keys > 1 else 1
+
+    # state
+    received = [0.0] * total
+    enqueued = [0.0] * total
+    dequeued = [0.0] * total
+    finished = [0.0] * total
+    worker_of = [0] * total
+    round_robin = [w % servers for w in range(workers)]
+    idle_workers = list(range(workers - 1, -1, -1))
+    queue = collections.deque()
+    events = [(think[c], EVENT_ARRIVAL, c) for c in range(clients)]
+    heapq.heapify(events)
+    next_request = 0
+    next_think = clients
+    net_free = 0.0
+
+    warmup = int(SIMULATION_WARMUP_FRACTION * n_requests)
+    t_begin = -1.0
+    t_end = float('inf')
+    busy = 0.0
+    queue_area = 0.0
+    queue_last = 0.0
+
+    heappush = heapq.heappush
+    heappop = heapq.heappop
+    while events:
+        t, event, nr = heappop(events)
+        if event == EVENT_ARRIVAL:
+            rid = next_request
+            next_request += 1
+            if rid == warmup:
+                t_begin = t
+                queue_last = t
+            if rid == total - 1:
+                t_end = t
+            received[rid] = t
+            net_free = (t if t > net_free else net_free) + pre
+            heappush(events, (net_free, EVENT_ENQUEUED, rid))
+            continue
+
+        if t_begin >= 0.0 and t <= t_end:
+            queue_area += len(queue) * (t - queue_last)
+            queue_last = t
+
+        if event == EVENT_ENQUEUED:
+            enqueued[nr] = t
+            if not idle_workers:
+                queue.append(nr)
+                continue
+            w = idle_workers.pop()
+            rid = nr
+        else:
+            finished[nr] = t
+            if next_think < total:
+                heappush(events, (t + think[next_think], EVENT_ARRIVAL, 0))
+                next_think += 1
+            w = worker_of[nr]
+            if not queue:
+                idle_workers.append(w)
+                continue
+            rid = queue.popleft()
+
+        # worker w starts request rid
+        dequeued[rid] = t
+        worker_of[rid] = w
+        if is_set[rid]:
+            service = set_service[rid]
+        else:
+            server = round_robin[w]
+            row = rtt[rid]
+            longest = row[server]
+            for k in range(1, used_servers):
+                value = row[(server + k) % servers]
+                if value > longest:
+                    longest = value
+            round_robin[w] = (server + used_servers) % servers
+            service = processing + longest
+        if t_begin >= 0.0 and t <= t_end:
+            busy += processing
+        heappush(events, (t + service, EVENT_FINISHED, rid))
+
+    # statistics of the requests finished within the measurement window
+    response_sum = 0.0
+    queueing_sum = 0.0
+    count = 0
+    for rid in range(total):
+        if not t_begin <= finished[rid] <= t_end:
+            continue
+        response_sum += finished[rid] - received[rid]
+        queueing_sum += dequeued[rid] - enqueued[rid]
+        count += 1
+    duration = t_end - t_begin
+    if count == 0 or duration <= 0.0:
+        return None
+    response_time = response_sum / count
+    queueing_time = queueing_sum / count
+    return {
+        'Throughput': count / duration,
+        'ResponseTime': response_time,
+        'QueueingTime': queueing_time,
+        'ServiceTime': response_time - queueing_time,
+        'WorkerUtilization': busy / (workers * duration),
+        'QueueLen': queue_area / duration
+    }
+
+
+def get_histogram_distribution(exp_data, variable_name):
+    """:return distribution (see sample_distribution()) of the histogram of the variable; None if not available"""
+    raw_bins = exp_data['histograms']['raw_bins']
+    op_name = 'both' if 'both' in raw_bins else sorted(raw_bins)[0]
+    if variable_name not in raw_bins[op_name]:
+        return None
+    counts = {}
+    for instance_name, instance in raw_bins[op_name][variable_name].items():
+        valid_iterations = get_valid_iterations(exp_data, instance_name)
+        for iteration, bins in instance.items():
+            if not valid_iterations[int(iteration)]:
+                continue
+            for value, count in bins:
+                counts[value] = counts.get(value, 0) + count
+    values = sorted([v for v in counts if counts[v] > 0])
+    if len(values) == 0:
+        return None
+    total = float(sum([counts[v] for v in values]))
+    probabilities = [counts[v] / total for v in values]
+    resolution = min([b - a for a, b in zip(values[:-1], values[1:])]) if len(values) > 1 else 0.0
+    return [np.asarray(values), np.asarray(probabilities), resolution]
+
+
+def pool_distributions(distributions):
+    """:return distribution with equal weight of all given distributions"""
+    counts = {}
+    for values, probabilities, resolution in distributions:
+        for v, p in zip(values, probabilities):
+            counts[v] = counts.get(v, 0.0) + p / len(distributions)
+    values = sorted(counts)
+    return [np.asarray(values), np.asarray([counts[v] for v in values]),
+            min([d[2] for d in distributions])]
+
+
+def get_simulation_params(exp_data, variant):
+    """
+    :param variant: dict of replaced metadata (e.g. mt, sc); empty dict for the measured configuration
+    :return dict of parameters for simulate_middleware_system() and the number of middlewares; None, 0 if n/a
+    """
+    metadata = dict(exp_data['metadata'])
+    metadata.update(variant)
+    for key in ['cc', 'ci', 'ct', 'cv', 'mc', 'mt', 'sc', 'st', 'ck']:
+        metadata[key] = int(metadata[key])
+    cn = int(variant['cn']) if 'cn' in variant else metadata['cc'] * metadata['ci'] * metadata['ct'] * metadata['cv']
+    mc = max(1, metadata['mc'])
+    servers = metadata['sc'] * metadata['st']
+
+    measured = exp_data['windows']['stable_avg']['both']
+    distributions = []
+    measured_servers = int(exp_data['metadata']['sc']) * int(exp_data['metadata']['st'])
+    for k in range(1, measured_servers + 1):
+        distribution = get_histogram_distribution(exp_data, 'ServerRtt' + str(k))
+        if distribution is not None:
+            distributions.append(distribution)
+    if len(distributions) == 0 or cn < mc or servers < 1:
+        return None, 0
+    if servers > len(distributions):
+        distributions.append(pool_distributions(distributions))
+
+    op = PLOT_LABELS_OP_MAPPING[metadata['op']]
+    return {
+        'clients': cn // mc,
+        'workers': metadata['mt'],
+        'servers': servers,
+        'set_ratio': {'set': 1.0, 'get': 0.0}.get(op, SIMULATION_MIXED_SET_RATIO),
+        'keys': metadata['ck'],
+        'sharded': str(metadata['ms']).lower() == 'true',
+        'think_time': measured['ClientRTTAndProcessingTime']['all']['mean'],
+        'preprocessing_time': measured['PreprocessingTime']['all']['mean'],
+        'processing_time': measured['ProcessingTime']['all']['mean'],
+        'rtt_distributions': distributions
+    }, mc
+
+
+def simulate_configuration(exp_data, variant, seed):
+    """:return simulated variables of the configuration with the variant (all middlewares); None if n/a"""
+    params, mc = get_simulation_params(exp_data, variant)
+    if params is None:
+        return None
+    result = simulate_middleware_system(params, SIMULATION_REQUESTS, seed)
+    if result is not None:
+        result['Throughput'] *= mc
+    return result
+
+
+def simulate_middleware(ctx, datasets):
+    """
+    Simulates each measured middleware configuration as measured and with the variants of the -s flag
+    (see module documentation); the results are written into a summary file and into the database
+    """
+    print('### simulating the middleware ###')
+    if ctx['experiment_folder'] in FIGURES_MATRIX['no_middleware_involved']:
+        ctx['info'].append('middleware simulation skipped: no middleware involved in this experiment\n')
+        return
+    experiment = 'r_' + ctx['experiment_folder']
+    run = create_or_get_dict(datasets, experiment)
+    simulation = create_or_get_dict(run, 'simulation')
+
+    lines = [
+        'Middleware simulation for experiment {exp} ({n} requests per configuration; see middleware_simulation.py)'
+        .format(exp=ctx['experiment_folder'], n=SIMULATION_REQUESTS),
+        'measured: stable windows average; variants replace parameters of the measured configuration',
+        ''
+    ]
+    variants = [''] + [v for v in ctx['simulation_variants'] if len(extract_metadata(v)) > 0]
+    start = time.time()
+    simulated_requests = 0
+    for config in get_experiment_configurations(ctx['experiment_folder']):
+        exp_data, mapped_op_name = get_experiment_data(ctx, datasets, 'mw', config)
+        if exp_data is None:
+            continue
+        measured = exp_data['windows']['stable_avg']['both']
+        lines.append('{config}:'.format(config=config))
+        lines.append('  {name:20s} '.format(name='measured') + '  '.join(
+            ['{var} {value:8.3f}'.format(var=var, value=measured[var]['all']['mean'])
+             for var in SIMULATION_OUTPUT_VARIABLES if var in measured]))
+        for variant in variants:
+            result = simulate_configuration(exp_data, extract_metadata(variant), SIMULATION_SEED)
+            if result is None:
+                ctx['warning'].append('simulation {config} {variant}: no server RTT histograms available'
+                                      .format(config=config, variant=variant))
+                continue
+            simulated_requests += SIMULATION_REQUESTS
+            name = 'simulated' if variant == '' else variant
+            create_or_get_dict(simulation, config)[name] = result
+            lines.append('  {name:20s} '.format(name=name) + '  '.join(
+                ['{var} {value:8.3f}'.format(var=var, value=result[var]) for var in SIMULATION_OUTPUT_VARIABLES]))
+        lines.append('')
+
+    duration = time.time() - start
+    lines.append('{n} requests simulated in {t:.1f} s'.format(n=simulated_requests, t=duration))
+    processed_path = os.path.join(ctx['output_folder'], ctx['experiment_folder'], PROCESSED_FOLDER)
+    make_path(processed_path)
+    simulation_file = os.path.join(processed_path, ctx['prefix'] + ctx['experiment_folder'] + SIMULATION_SUMMARY_SUFFIX)
+    with open(simulation_file, 'w') as f:
+        for line in lines:
+            print(line, file=f)
+    print('    {n} requests simulated in {t:.1f} s'.format(n=simulated_requests, t=duration))
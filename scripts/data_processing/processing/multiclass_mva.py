@@ -0,0 +1,264 @@
+"""
+secondary processing: multi-class MVA of mixed get/set workloads
+
+Sets are replicated to all servers, gets are sent to one server (or sharded to several servers), and
+experiments such as e320 use two middlewares. Thus, each model name of LAWS_AND_MODELING_INPUT (e.g. mn_16;
+shared by all its ops) is modeled as closed multi-class network (middleware experiments only):
+- classes: the per-op windows of the middleware (set, get_<k>; get if no get_<k> window has data)
+  of the configurations of the model with the smallest number of clients; for each class c:
+  - think time Z_c: MVA_THINK_TIME_VARIABLE
+  - visit ratio of server i: V_ci = ServerUsage<i> / Throughput (replication and sharding are
+    reflected in the measured server usage)
+- stations:
+  - net-thread of each middleware: D_c = PreprocessingTime / mc
+  - worker pool of each middleware: D_c = ProcessingTime / (mc mt); one station as in the single-class MVA
+  - each server i: D_ci = V_ci S_c; the service time S_c follows from the bottleneck demand of the single-class
+    model of the op (D_server, or D_max if not mapped; operational laws graph) at the server with the largest
+    visit ratio: S_c = D_server / max_i V_ci; the remainder of the server RTT, V_ci max(0, ServerRtt<i> - S_c),
+    is a pure delay (network) of the class
+- populations: N = each measured number of clients of the model, split into the classes by the fractions
+  of MULTICLASS_MVA_SET_RATIOS (set clients; the get clients are split in the ratio of the measured
+  throughput of the get classes)
+
+Solver: Bard-Schweitzer approximate MVA [Schweitzer1979, Bard1979] for multiple classes
+  R_ck = D_ck (1 + Q_k - Q_ck / N_c);  X_c = N_c / (Z_c + sum_k R_ck);  Q_ck = X_c R_ck
+fixed-point iteration vectorized over all population mixes at once. The request ratio of the resulting
+throughput (X_set / X) is reported next to the client ratio.
+
+The predictions are stored in the database (run key 'multiclass_mva') and written into the summary.
+
+Units: demands, Z and R in ms; X in kop/s.
+
+see main program in ../process_raw_data.py for information
+
+version 2018-12-26
+"""
+
+import re
+
+import numpy as np
+
+from tools.config import *
+from tools.helpers import *
+from tools.operational_laws import *
+from processing.mean_value_analysis import get_model_configurations
+
+
+# --- processing :: multi-class MVA ----------------------------------------------------------------
+
+def solve_multiclass_schweitzer_mva(demands, think_times, populations):
+    """
+    multi-class Bard-Schweitzer approximate MVA; all population mixes are solved at once
+    :param demands: numpy array (classes x stations) of the service demands (ms)
+    :param think_times: numpy array (classes) of the think times Z (ms)
+    :param populations: numpy array (mixes x classes) of the numbers of clients of each class (>= 0)
+    :return numpy arrays X (mixes x classes; kop/s), R (mixes x classes; ms), Q (mixes x classes x stations); iterations
+    """
+    d = np.asarray(demands, dtype=float)[np.newaxis, :, :]
+    z = np.asarray(think_times, dtype=float)[np.newaxis, :]
+    n = np.asarray(populations, dtype=float)
+    active = n > 0.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inv_n = np.where(active, 1.0 / n, 0.0)[:, :, np.newaxis]
+    q = np.repeat((n / float(d.shape[2]))[:, :, np.newaxis], d.shape[2], axis=2)
+    for iteration in range(1, MVA_SCHWEITZER_MAX_ITERATIONS + 1):
+        r_ck = d * (1.0 + q.sum(axis=1, keepdims=True) - q * inv_n)
+        r = r_ck.sum(axis=2)
+        x = np.where(active, n / (z + r), 0.0)
+        q_new = x[:, :, np.newaxis] * r_ck
+        converged = np.max(np.abs(q_new - q)) < MVA_SCHWEITZER_TOLERANCE
+        q = q_new
+        if converged:
+            break
+    r_ck = d * (1.0 + q.sum(axis=1, keepdims=True) - q * inv_n)
+    r = r_ck.sum(axis=2)
+    x = np.where(active, n / (z + r), 0.0)
+    return x, r, q, iteration
+
+
+def get_class_windows(stable):
+    """:return list of the class names (per-op windows with data; see module documentation)"""
+    classes = []
+    if 'set' in stable and stable['set']['Throughput']['all']['mean'] > 0.0:
+        classes.append('set')
+    gets = sorted([w for w in stable if re.match('^get_[0-9]+$', w) and stable[w]['Throughput']['all']['mean'] > 0.0],
+                  key=lambda w: int(w[4:]))
+    if len(gets) == 0 and 'get' in stable and stable['get']['Throughput']['all']['mean'] > 0.0:
+        gets = ['get']
+    return classes + gets
+
+
+def collect_class_parameters(ctx, datasets, model):
+    """
+    :return dict class -> parameters (Z, S_net, S_proc, V and S of the servers, measured X), metadata of the
+            system; from the configurations of the model with the smallest number of clients; None if n/a
+    """
+    classes = {}
+    metadata = None
+    input_dict = CONFIGURATION['laws_and_modeling_input'][ctx['experiment_folder']]
+    for op_key in input_dict:
+        if model not in input_dict[op_key]['models']:
+            continue
+        configurations = get_model_configurations(ctx, op_key, model)
+        if len(configurations) == 0:
+            continue
+        exp_data, mapped_op_name = get_experiment_data(ctx, datasets, 'mw', configurations[0][1])
+        if exp_data is None:
+            continue
+        stable = exp_data['windows']['stable_avg']
+        servers = int(exp_data['metadata']['sc']) * int(exp_data['metadata']['st'])
+        for class_name in get_class_windows(stable):
+            if class_name in classes:
+                continue
+            window = stable[class_name]
+            x = window['Throughput']['all']['mean']
+            v = [window['ServerUsage' + str(i)]['all']['mean'] / x for i in range(1, servers + 1)]
+            d_server = get_ol_value(ctx, op_key, model, 'D_server')
+            if d_server is None:
+                d_server = get_ol_value(ctx, op_key, model, 'D_max')
+            if d_server is None or max(v) <= 0.0:
+                continue
+            classes[class_name] = {
+                'Z': window[MVA_THINK_TIME_VARIABLE]['all']['mean'],
+                'S_net': window['PreprocessingTime']['all']['mean'],
+                'S_proc': window['ProcessingTime']['all']['mean'],
+                'V_server': v,
+                'S_server': d_server / max(v),
+                'ServerRtt': [window['ServerRtt' + str(i)]['all']['mean'] for i in range(1, servers + 1)],
+                'X_measured': x,
+                'source': op_key + ' ' + configurations[0][1]
+            }
+            metadata = metadata or exp_data['metadata']
+    if len(classes) == 0:
+        return None, None
+    return classes, metadata
+
+
+def build_class_demands(classes, class_names, metadata):
+    """
+    :return list of station names, numpy array (classes x stations) of the demands, numpy array (classes) of the
+            delays (see module documentation)
+    """
+    mc = int(metadata['mc'])
+    mt = int(metadata['mt'])
+    servers = len(classes[class_names[0]]['V_server'])
+    stations = []
+    for m in range(1, mc + 1):
+        stations += ['middleware {m} net-thread'.format(m=m), 'middleware {m} workers'.format(m=m)]
+    stations += ['server {i}'.format(i=i) for i in range(1, servers + 1)]
+    demands = np.zeros((len(class_names), len(stations)))
+    delays = np.zeros(len(class_names))
+    for c, class_name in enumerate(class_names):
+        p = classes[class_name]
+        v = np.asarray(p['V_server'])
+        demands[c, 0:2 * mc:2] = p['S_net'] / mc
+        demands[c, 1:2 * mc:2] = p['S_proc'] / (mc * mt)
+        demands[c, 2 * mc:] = v * p['S_server']
+        delays[c] = (v * np.maximum(0.0, np.asarray(p['ServerRtt']) - p['S_server'])).sum()
+    return stations, demands, delays
+
+
+def build_population_mixes(classes, class_names, client_numbers):
+    """:return list of [N, set ratio], numpy array (mixes x classes) of the class populations"""
+    get_names = [c for c in class_names if c != 'set']
+    get_x = sum([classes[c]['X_measured'] for c in get_names])
+    ratios = MULTICLASS_MVA_SET_RATIOS if 'set' in classes and len(get_names) > 0 else \
+        [1.0 if 'set' in classes else 0.0]
+    mixes = []
+    populations = []
+    for n in client_numbers:
+        for ratio in ratios:
+            mixes.append([n, ratio])
+            populations.append([n * ratio if c == 'set' else n * (1.0 - ratio) * classes[c]['X_measured'] / get_x
+                                for c in class_names])
+    return mixes, np.asarray(populations)
+
+
+def calc_multiclass_model(ctx, datasets, model):
+    """:return dict with input and predictions of the multi-class model; None if the input is not available"""
+    classes, metadata = collect_class_parameters(ctx, datasets, model)
+    if classes is None:
+        return None
+    class_names = sorted(classes, key=lambda c: (c != 'set', c))
+    client_numbers = set()
+    input_dict = CONFIGURATION['laws_and_modeling_input'][ctx['experiment_folder']]
+    for op_key in input_dict:
+        if model in input_dict[op_key]['models']:
+            client_numbers.update([cn for cn, config in get_model_configurations(ctx, op_key, model)])
+    stations, demands, delays = build_class_demands(classes, class_names, metadata)
+    think_times = np.array([classes[c]['Z'] for c in class_names])
+    mixes, populations = build_population_mixes(classes, class_names, sorted(client_numbers))
+    x, r, q, iterations = solve_multiclass_schweitzer_mva(demands, think_times + delays, populations)
+    r = r + delays[np.newaxis, :]
+    if iterations == MVA_SCHWEITZER_MAX_ITERATIONS:
+        ctx['warning'].append('multi-class MVA {model}: approximate MVA did not converge'.format(model=model))
+
+    x_total = x.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_total = np.where(x_total > 0.0, (x * r).sum(axis=1) / x_total, np.nan)
+    return {
+        'classes': class_names,
+        'parameters': classes,
+        'stations': stations,
+        'demands': {c: [float(v) for v in demands[i]] for i, c in enumerate(class_names)},
+        'delays': {c: float(delays[i]) for i, c in enumerate(class_names)},
+        'N': [mix[0] for mix in mixes],
+        'set_ratio': [mix[1] for mix in mixes],
+        'X': {c: [float(v) for v in x[:, i]] for i, c in enumerate(class_names)},
+        'R': {c: [float(v) if populations[k, i] > 0.0 else None for k, v in enumerate(r[:, i])]
+              for i, c in enumerate(class_names)},
+        'X_total': [float(v) for v in x_total],
+        'R_total': [float(v) for v in r_total],
+        'request_set_ratio': [float(x[k, 0] / x_total[k]) if 'set' in classes and x_total[k] > 0.0 else 0.0
+                              for k in range(len(mixes))]
+    }
+
+
+def format_class_time(value):
+    return '{v:>8s}'.format(v='-') if value is None else '{v:8.3f}'.format(v=value)
+
+
+def write_multiclass_mva(ctx, datasets, f):
+    """Solves the multi-class MVA for all model names (see module documentation) and writes the predictions"""
+    if ctx['experiment_folder'] in FIGURES_MATRIX['no_middleware_involved']:
+        return
+    print('    multi-class mean value analysis')
+    results = {}
+    input_dict = CONFIGURATION['laws_and_modeling_input'][ctx['experiment_folder']]
+    models = []
+    for op_key in input_dict:
+        models += [model for model in input_dict[op_key]['models'] if model not in models]
+    for model in models:
+        result = calc_multiclass_model(ctx, datasets, model)
+        if result is not None:
+            results[model] = result
+    create_or_get_dict(datasets, 'r_' + ctx['experiment_folder'])['multiclass_mva'] = results
+    if len(results) == 0:
+        return
+
+    print('\n\n--------------------------------------------------------------------------------', file=f)
+    print('Multi-class MVA (Bard-Schweitzer): mixed get/set workloads', file=f)
+    print('--------------------------------------------------------------------------------\n', file=f)
+    print('classes from the per-op windows of the middleware; R without think time Z; set ratio of clients and requests', file=f)
+    for model in models:
+        if model not in results:
+            continue
+        result = results[model]
+        print('\n  {model}: classes {classes}; {k} stations'
+              .format(model=model, classes=', '.join(result['classes']), k=len(result['stations'])), file=f)
+        for c in result['classes']:
+            p = result['parameters'][c]
+            print('    {c:<6s} Z {z:7.3f} ms, delay {delay:6.3f} ms, D {d} ms, V_server {v} (from {src})'
+                  .format(c=c, z=p['Z'], delay=result['delays'][c],
+                          d=' '.join(['{v:.4f}'.format(v=v) for v in result['demands'][c]]),
+                          v=' '.join(['{v:.2f}'.format(v=v) for v in p['V_server']]), src=p['source']), file=f)
+        header = '    {n:>4s} {rc:>6s} {rr:>6s} {x:>8s}'.format(n='N', rc='set/N', rr='set/X', x='X')
+        for c in result['classes']:
+            header += ' {x:>8s} {r:>8s}'.format(x='X_' + c, r='R_' + c)
+        print(header, file=f)
+        for k, n in enumerate(result['N']):
+            line = '    {n:4d} {rc:6.2f} {rr:6.3f} {x:8.3f}'.format(n=n, rc=result['set_ratio'][k],
+                                                                    rr=result['request_set_ratio'][k], x=result['X_total'][k])
+            for c in result['classes']:
+                line += ' {x:8.3f} {r}'.format(x=result['X'][c][k], r=format_class_time(result['R'][c][k]))
+            print(line, file=f)
@@ -0,0 +1,225 @@
+"""
+secondary processing: network-normalized latency
+
+The latency between the Azure VMs drifted between the runs. To separate middleware (or server)
+regressions from such cloud network noise, the time-aligned ping RTT of the used connection is
+subtracted from the measured latencies:
+- memtier ResponseTime - RTT(client -> middleware) -> NetworkFreeResponseTime
+  (RTT(client -> server) if no middleware is involved); the used RTT is stored as ClientNetworkRtt
+- middleware ServerRtt<k> - RTT(middleware -> server k) -> NetworkFreeServerRtt<k>
+
+Time alignment: ping data are stored in 5 s windows for each iteration in the order of the experiment
+configurations (see get_experiment_configurations()). Each 1 s window of memtier / middleware is mapped
+to the 5 s ping window covering it; stable_avg uses the stable ping windows of the configuration
+and overall_avg all ping windows of the configuration (identical to the ping stats in the summary).
+
+The new variables are added to each instance; the 'all' instance is aggregated by throughput weighted mean
+as all other latency variables (see AGGREGATE_INSTANCES_BY_AVG). Mean and SD follow in calc_statistics().
+
+see main program in ../process_raw_data.py for information
+
+version 2018-12-15
+"""
+
+from tools.config import *
+from tools.helpers import *
+
+
+# --- processing :: network normalization ----------------------------------------------------------
+
+def get_memtier_connection_name(ctx, instance_name):
+    """
+    memtier instances 1-3 run on client VMs 1-3 and connect to middleware 1 (server 1 without middleware);
+    instances 4-6 are the second instances on client VMs 1-3 and connect to middleware 2 (server 2)
+    see scripts/experiments/run_memtier_two_instances.client.sh
+    :return connection name as used in the ping data, e.g. c2m1
+    """
+    instance_id = int(instance_name)
+    client_id = ((instance_id - 1) % 3) + 1
+    target_id = 1 if instance_id <= 3 else 2
+    target_type = 's' if ctx['experiment_folder'] in FIGURES_MATRIX['no_middleware_involved'] else 'm'
+    return 'c{client}{type}{target}'.format(client=client_id, type=target_type, target=target_id)
+
+
+def get_mw_connection_name(instance_name, server_id):
+    """:return connection name as used in the ping data, e.g. m1s3"""
+    return 'm{mw}s{server}'.format(mw=instance_name, server=server_id)
+
+
+def calc_ping_rtt_values(connection_data, config_nr, configs_count, window_name):
+    """
+    :return list with the time-aligned average ping RTT for each iteration (ms); 0.0 if no ping data
+            is available for an iteration
+    """
+    delta = int(len(connection_data) / configs_count)
+    base = config_nr * delta
+    if window_name == 'stable_avg':
+        window_nrs = range(base + NETWORK_NORMALIZATION_PING_STABLE_BEGIN, base + NETWORK_NORMALIZATION_PING_STABLE_END)
+    elif window_name == 'overall_avg':
+        window_nrs = range(base, base + delta)
+    else:
+        window_nrs = [base + min(int(window_name) // PING_WINDOW_DURATION, delta - 1)]
+
+    sums = [0.0] * MAX_ITERATIONS
+    counts = [0] * MAX_ITERATIONS
+    for window_nr in window_nrs:
+        if window_nr not in connection_data:
+            continue
+        window_data = connection_data[window_nr]
+        if NETWORK_NORMALIZATION_PING_VARIABLE not in window_data:
+            continue
+        for i, value in enumerate(window_data[NETWORK_NORMALIZATION_PING_VARIABLE]['all']['values']):
+            # 0.0: no ping data in this window (e.g. last window of the run)
+            if value > 0.0:
+                sums[i] += value
+                counts[i] += 1
+
+    result = [0.0] * MAX_ITERATIONS
+    for i in range(MAX_ITERATIONS):
+        if counts[i] > 0:
+            result[i] = sums[i] / float(counts[i])
+    return result
+
+
+def add_network_free_variable(op, variable_name, network_free_variable_name, instance_name, rtt_values):
+    """adds the network-free values of the instance; 0.0 if no data is available (value or RTT)"""
+    values = op[variable_name][instance_name]['values']
+    network_free_variable = create_or_get_dict(op, network_free_variable_name)
+    network_free_instance = create_or_get_dict(network_free_variable, instance_name)
+    network_free_values = create_or_get_list(network_free_instance, 'values', 0.0)
+    for i, value in enumerate(values):
+        if value > 0.0 and rtt_values[i] > 0.0:
+            network_free_values[i] = value - rtt_values[i]
+        else:
+            network_free_values[i] = 0.0
+
+
+def aggregate_network_free_variables(op, variable_names):
+    """
+    adds the 'all' instance as throughput weighted mean of the available instances;
+    instance iterations without data (0.0) get weight 0, i.e. the weights of the others are renormalized
+    """
+    for variable_name in variable_names:
+        if variable_name not in op:
+            continue
+        variable = op[variable_name]
+        instances = {name: instance for name, instance in variable.items() if name != 'all'}
+        weights = {}
+        for name, instance in instances.items():
+            throughput_values = op['Throughput'][name]['values']
+            weights[name] = {'values': [throughput_values[i] if value != 0.0 else 0.0
+                                        for i, value in enumerate(instance['values'])]}
+        weighted_means, n = calc_weighted_means(instances, weights)
+        variable['all'] = {'values': weighted_means}
+
+
+def normalize_app_windows(ctx, ping_app, exp_data, config_nr, configs_count, variables_mapping, missing_connections):
+    """
+    :param variables_mapping: dict input variable name -> list of [connection name function, network-free variable
+                              name, network RTT variable name or None]
+    """
+    cache = {}
+    output_variable_names = set()
+    for window_name, window in exp_data['windows'].items():
+        for op_name, op in window.items():
+            if 'Throughput' not in op:
+                continue
+            for variable_name, mapping in variables_mapping.items():
+                if variable_name not in op:
+                    continue
+                get_connection_name, network_free_variable_name, rtt_variable_name = mapping
+                for instance_name in list(op[variable_name]):
+                    if instance_name == 'all' or instance_name not in op['Throughput']:
+                        continue
+                    connection_name = get_connection_name(instance_name)
+                    if connection_name not in ping_app:
+                        missing_connections.add(connection_name)
+                        continue
+                    cache_key = (connection_name, window_name)
+                    if cache_key not in cache:
+                        cache[cache_key] = calc_ping_rtt_values(ping_app[connection_name], config_nr, configs_count, window_name)
+                    rtt_values = cache[cache_key]
+                    add_network_free_variable(op, variable_name, network_free_variable_name, instance_name, rtt_values)
+                    output_variable_names.add(network_free_variable_name)
+                    if rtt_variable_name is not None:
+                        rtt_variable = create_or_get_dict(op, rtt_variable_name)
+                        rtt_variable[instance_name] = {'values': list(rtt_values)}
+                        output_variable_names.add(rtt_variable_name)
+            aggregate_network_free_variables(op, output_variable_names)
+
+
+def normalize_network_latency(ctx, datasets):
+    """
+    Subtracts the time-aligned ping RTT from memtier and middleware latencies (see module docstring);
+    must be called after aggregation and before the calculation of the statistics.
+    """
+    print('### normalizing latencies by network RTT (ping) ###')
+    experiment = 'r_' + ctx['experiment_folder']
+    run = create_or_get_dict(datasets, experiment)
+    if 'app_ping' not in run or len(run['app_ping']) == 0:
+        ctx['warning'].append('no ping data available: network-normalized latencies are not calculated')
+        return
+    ping_app = run['app_ping']
+
+    configurations = get_experiment_configurations(ctx['experiment_folder'])
+    missing_connections = set()
+    count = 0
+    for config_nr, config in enumerate(configurations):
+        for app_name in ['memtier', 'mw']:
+            if app_name == 'mw' and ctx['experiment_folder'] in FIGURES_MATRIX['no_middleware_involved']:
+                continue
+            exp_data, mapped_op_name = get_experiment_data(ctx, datasets, app_name, config)
+            if exp_data is None:
+                continue
+            normalize_app_windows(ctx, ping_app, exp_data, config_nr, len(configurations),
+                                  get_variables_mapping(ctx, app_name), missing_connections)
+            count += 1
+
+    for connection_name in sorted(missing_connections):
+        ctx['info'].append(get_missing_connection_info_text(connection_name))
+    print('    {count} experiment data collections normalized'.format(count=count))
+
+
+def normalize_network_latency_for_exp(ctx, datasets, app_name, exp_data):
+    """normalizes the latencies of one exp_data collection (incremental update)"""
+    experiment = 'r_' + ctx['experiment_folder']
+    run = create_or_get_dict(datasets, experiment)
+    if 'app_ping' not in run or len(run['app_ping']) == 0:
+        return
+    config_nr = get_configuration_nr(ctx, exp_data)
+    if config_nr < 0:
+        return
+    missing_connections = set()
+    normalize_app_windows(ctx, run['app_ping'], exp_data, config_nr, len(get_experiment_configurations(ctx['experiment_folder'])),
+                          get_variables_mapping(ctx, app_name), missing_connections)
+    for connection_name in sorted(missing_connections):
+        text = get_missing_connection_info_text(connection_name)
+        if text not in ctx['info']:
+            ctx['info'].append(text)
+
+
+def get_variables_mapping(ctx, app_name):
+    """:return variables mapping for normalize_app_windows()"""
+    mapping = {}
+    if app_name == 'memtier':
+        for variable_name, network_free_variable_name in NETWORK_NORMALIZATION_MEMTIER_VARIABLES.items():
+            mapping[variable_name] = [lambda instance_name: get_memtier_connection_name(ctx, instance_name),
+                                      network_free_variable_name, 'ClientNetworkRtt']
+    else:
+        for variable_name, server_and_variable in NETWORK_NORMALIZATION_MW_VARIABLES.items():
+            server_id, network_free_variable_name = server_and_variable
+            mapping[variable_name] = [lambda instance_name, server_id=server_id: get_mw_connection_name(instance_name, server_id),
+                                      network_free_variable_name, None]
+    return mapping
+
+
+def get_network_normalization_variable_names():
+    """:return set of the variable names calculated by the network normalization"""
+    names = {'ClientNetworkRtt'}
+    names.update(NETWORK_NORMALIZATION_MEMTIER_VARIABLES.values())
+    names.update([server_and_variable[1] for server_and_variable in NETWORK_NORMALIZATION_MW_VARIABLES.values()])
+    return names
+
+
+def get_missing_connection_info_text(connection_name):
+    return '  - no ping data for connection {connection}: latencies of this connection are not network-normalized\n'.format(connection=connection_name)
@@ -0,0 +1,192 @@
+"""
+secondary processing: analysis of open-loop (rate-limited) runs
+
+Closed-loop runs are analyzed with the interactive response time law (number of clients cn, thinking time Z).
+Open-loop runs (rate-limited memtier or a replay generator) are marked by the request rate cr (op/s per client)
+in the experiment key; their offered load is lambda = cn cr (kop/s; see calc_metadata_keys()). In an open system,
+the arrival rate does not adapt to the response time. Thus, overload leads to a queueing collapse instead of a
+throughput plateau. For each open-loop configuration (memtier stable windows, valid iterations):
+- arrival rate vs. throughput: X / lambda; requests are dropped (or delayed by the client) if
+  1 - X / lambda > OPEN_SYSTEM_DROP_TOLERANCE (flow balance X = lambda [Jain1991] does not hold)
+- backlog: least squares trend of the memtier ResponseTime and of the middleware QueueLen (if available) over
+  the stable windows (all iterations at once); a backlog builds up if the response time grows by more than
+  OPEN_SYSTEM_BACKLOG_RESPONSE_TIME_GROWTH (relative) or the queue by more than OPEN_SYSTEM_BACKLOG_QUEUE_GROWTH
+  (requests) during the stable windows
+- response time vs. offered load: mean and percentiles (memtier histograms, see sla_analysis.py) for each
+  configuration group (all parameters but cn and cr), ordered by lambda; the largest offered load without
+  drop and backlog (sustainable) and the first offered load with drop or backlog (collapse) are reported;
+  percentiles within the histogram overflow bin are n/a
+Configurations without a response time trend (e.g. all iterations invalid) are not evaluable (status n/e); they
+do not change the sustainable and collapse loads of their group.
+
+The results are stored in the database (run key 'open_system') and written into the summary.
+
+Units: times in ms; throughput and offered load in kop/s.
+
+see main program in ../process_raw_data.py for information
+
+References
+[Jain1991]  Jain R. The art of computer systems performance analysis. Wiley, 1991
+
+version 2019-01-05
+"""
+
+import re
+import warnings
+
+import numpy as np
+
+from tools.config import *
+from tools.helpers import *
+from processing.sla_analysis import collect_response_time_counts, calc_histogram_cdfs, calc_histogram_quantiles
+
+
+# --- processing :: open-loop runs -----------------------------------------------------------------
+
+OPEN_SYSTEM_PERCENTILES = {'p95': 0.95, 'p99': 0.99}
+
+
+def get_open_loop_group(config):
+    """:return configuration without the number of clients and the request rate, e.g. op_read_mn_16"""
+    return re.sub('_c[nr]_[0-9.]+', '', config)
+
+
+def get_stable_window_matrix(exp_data, op_name, variable_name, begin, end):
+    """:return numpy array (iterations x stable windows) of the instance 'all'; NaN for missing values and invalid iterations"""
+    matrix = np.full((MAX_ITERATIONS, end - begin), np.nan)
+    if exp_data is None:
+        return matrix
+    for w in range(begin, end):
+        variable = exp_data['windows'].get(str(w), {}).get(op_name, {}).get(variable_name, {})
+        if 'all' in variable:
+            values = variable['all']['values']
+            matrix[:len(values), w - begin] = values
+    matrix[~np.array(get_valid_iterations(exp_data)[:MAX_ITERATIONS]), :] = np.nan
+    return matrix
+
+
+def calc_trend_growth(tensor):
+    """
+    :param tensor: numpy array (configurations x iterations x windows)
+    :return numpy array (configurations) of the least squares growth over all windows (slope x (windows - 1)),
+            mean of the iterations
+    """
+    t = np.arange(tensor.shape[-1], dtype=float)
+    with warnings.catch_warnings():
+        # NaN of missing values and invalid iterations are expected
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        valid = np.isfinite(tensor)
+        t_centered = np.where(valid, t - np.nanmean(np.where(valid, t, np.nan), axis=-1, keepdims=True), 0.0)
+        y_centered = np.where(valid, tensor - np.nanmean(tensor, axis=-1, keepdims=True), 0.0)
+        slopes = (t_centered * y_centered).sum(axis=-1) / (t_centered * t_centered).sum(axis=-1)
+        return np.nanmean(slopes, axis=-1) * (len(t) - 1)
+
+
+def format_open_loop_value(value, template, width=8):
+    return '{v:>{w}s}'.format(v='n/a', w=width) if value is None else template.format(v=value)
+
+
+def get_open_loop_status(drop, response_time_growth, queue_growth):
+    """:return status text: ok, drop, backlog, drop, backlog or n/e (see module documentation)"""
+    if response_time_growth is None:
+        return 'n/e'
+    status = []
+    if drop > OPEN_SYSTEM_DROP_TOLERANCE:
+        status.append('drop')
+    if response_time_growth > OPEN_SYSTEM_BACKLOG_RESPONSE_TIME_GROWTH or \
+            (np.isfinite(queue_growth) and queue_growth > OPEN_SYSTEM_BACKLOG_QUEUE_GROWTH):
+        status.append('backlog')
+    return ', '.join(status) if len(status) > 0 else 'ok'
+
+
+def calc_open_system_analysis(ctx, datasets):
+    """:return dict with the open-loop analysis (see module documentation); None if there are no open-loop runs"""
+    rows = []
+    for config in get_experiment_configurations(ctx['experiment_folder']):
+        exp_data, mapped_op_name = get_experiment_data(ctx, datasets, 'memtier', config)
+        if exp_data is None or not is_open_loop(exp_data['metadata']):
+            continue
+        mw_data, mapped_op_name = get_experiment_data(ctx, datasets, 'mw', config)
+        stable = exp_data['windows']['stable_avg']['both']
+        rows.append({
+            'config': config,
+            'group': get_open_loop_group(config),
+            'lambda': exp_data['metadata']['offered_load'],
+            'X': stable['Throughput']['all']['mean'],
+            'R': stable['ResponseTime']['all']['mean'],
+            'counts': collect_response_time_counts(exp_data).sum(axis=0),
+            'R_windows': get_stable_window_matrix(exp_data, 'both', 'ResponseTime', MEMTIER_STABLE_BEGIN, MEMTIER_STABLE_END),
+            'Q_windows': get_stable_window_matrix(mw_data, 'both', 'QueueLen', LAW_CHECK_STABLE_BEGIN, LAW_CHECK_STABLE_END)
+        })
+    if len(rows) == 0:
+        return None
+
+    cdf, _ = calc_histogram_cdfs(np.stack([row['counts'] for row in rows]))
+    percentiles = {name: calc_histogram_quantiles(cdf, q) for name, q in OPEN_SYSTEM_PERCENTILES.items()}
+    response_time_growth = calc_trend_growth(np.stack([row['R_windows'] for row in rows]))
+    queue_growth = calc_trend_growth(np.stack([row['Q_windows'] for row in rows]))
+
+    result = {'configurations': {}, 'groups': {}}
+    for i, row in enumerate(rows):
+        drop = 1.0 - row['X'] / row['lambda']
+        relative_growth = None
+        if np.isfinite(response_time_growth[i]):
+            relative_growth = float(response_time_growth[i] / row['R']) if row['R'] > 0.0 else 0.0
+        result['configurations'][row['config']] = {
+            'group': row['group'],
+            'offered_load': row['lambda'],
+            'X': row['X'],
+            'throughput_ratio': row['X'] / row['lambda'],
+            'drop': drop,
+            'R': row['R'],
+            'percentiles': {name: float(values[i]) if np.isfinite(values[i]) else None for name, values in percentiles.items()},
+            'R_growth': relative_growth,
+            'queue_growth': float(queue_growth[i]) if np.isfinite(queue_growth[i]) else None,
+            'status': get_open_loop_status(drop, relative_growth, queue_growth[i])
+        }
+
+    for row in sorted(rows, key=lambda r: (r['group'], r['lambda'])):
+        if row['group'] not in result['groups']:
+            result['groups'][row['group']] = {'configurations': [], 'sustainable_load': None, 'collapse_load': None}
+        group = result['groups'][row['group']]
+        group['configurations'].append(row['config'])
+        status = result['configurations'][row['config']]['status']
+        if group['collapse_load'] is not None or status == 'n/e':
+            continue
+        if status == 'ok':
+            group['sustainable_load'] = row['lambda']
+        else:
+            group['collapse_load'] = row['lambda']
+    return result
+
+
+def write_open_system_analysis(ctx, datasets, f):
+    """Analyzes the open-loop runs (see module documentation) and writes them into the summary"""
+    result = calc_open_system_analysis(ctx, datasets)
+    if result is None:
+        return
+    print('    open-loop analysis')
+    create_or_get_dict(datasets, 'r_' + ctx['experiment_folder'])['open_system'] = result
+
+    names = list(OPEN_SYSTEM_PERCENTILES)
+    print('\n\n--------------------------------------------------------------------------------', file=f)
+    print('Open-loop runs: response time vs. offered load', file=f)
+    print('--------------------------------------------------------------------------------\n', file=f)
+    print('offered load lambda = cn cr; drop: 1 - X / lambda > {d:.0%}; backlog: growth during the stable windows of'
+          .format(d=OPEN_SYSTEM_DROP_TOLERANCE), file=f)
+    print('the response time > {r:.0%} or of the middleware queue length > {q:g} requests (least squares trends)'
+          .format(r=OPEN_SYSTEM_BACKLOG_RESPONSE_TIME_GROWTH, q=OPEN_SYSTEM_BACKLOG_QUEUE_GROWTH), file=f)
+    for group_name, group in result['groups'].items():
+        print('\n  {group}: sustainable offered load {s}, collapse at {c}'
+              .format(group=group_name, s=format_open_loop_value(group['sustainable_load'], '{v:.3f} kop/s', width=0),
+                      c=format_open_loop_value(group['collapse_load'], '{v:.3f} kop/s', width=0)), file=f)
+        print('    {l:>9s} {x:>9s} {ratio:>7s} {r:>8s} '.format(l='lambda', x='X', ratio='X/lam', r='R mean') +
+              ' '.join(['{n:>8s}'.format(n=n) for n in names]) +
+              ' {rg:>8s} {qg:>8s}  {status}'.format(rg='R growth', qg='Q growth', status='status'), file=f)
+        for config in group['configurations']:
+            c = result['configurations'][config]
+            print('    {l:9.3f} {x:9.3f} {ratio:7.3f} {r:8.3f} '.format(l=c['offered_load'], x=c['X'], ratio=c['throughput_ratio'], r=c['R']) +
+                  ' '.join([format_open_loop_value(c['percentiles'][n], '{v:8.3f}') for n in names]) +
+                  ' {rg} {qg:>8s}  {status}'.format(rg=format_open_loop_value(c['R_growth'], '{v:>+8.1%}'),
+                                                    qg=format_open_loop_value(c['queue_growth'], '{v:8.2f}'),
+                                                    status=c['status']), file=f)
@@ -0,0 +1,176 @@
+"""
+secondary processing: detection of outlier iterations
+
+Cloud noise (e.g. a noisy neighbor VM) may turn one of the MAX_ITERATIONS repetitions of an experiment
+into an outlier, which inflates the SD of all derived values. Robust statistics are applied to the
+stable windows average of each instance in each iteration: the modified z-score uses the median of the
+iterations of each instance and the MAD pooled over all instances and iterations [Iglewicz1993].
+All experiment keys of an app are handled at once as a 4D tensor (exp_key, variable, instance, iteration).
+
+An iteration is suspect if the median of the absolute z-scores of all instances is above the threshold
+in any of the OUTLIER_DETECTION_VARIABLES, i.e. the deviation affects the iteration and not only a single
+instance. Suspect iterations are always reported. With the -o flag, they are also excluded from
+mean and SD of all variables and from the aggregated percentiles (see 'valid_iterations').
+
+see main program in ../process_raw_data.py for information
+
+References
+[Croux1992]    Croux C, Rousseeuw PJ. Time-efficient algorithms for two highly robust estimators of scale.
+               Computational Statistics 1992; 1:411-428
+[Iglewicz1993] Iglewicz B, Hoaglin DC. How to detect and handle outliers. ASQC Quality Press, 1993
+
+version 2018-12-14
+"""
+
+import numpy as np
+import warnings
+
+from tools.config import *
+from tools.helpers import *
+
+
+# --- processing :: outlier detection --------------------------------------------------------------
+
+OUTLIER_WARNING_SUSPECT = 'suspect outlier iteration'
+OUTLIER_WARNING_TOO_MANY = 'too many suspect iterations; no iteration excluded'
+
+
+def is_outlier_detection_text(text):
+    """:return True if the warning text was added by the outlier detection (replaced in incremental updates)"""
+    return OUTLIER_WARNING_SUSPECT in text or OUTLIER_WARNING_TOO_MANY in text
+
+
+def build_stable_avg_tensor(app, exp_keys, variable_names):
+    """
+    :return: tensor (numpy array) with shape (exp_keys, variables, instances, iterations) of the stable windows
+             average of the individual instances (not 'all'); missing values (incl. missing cells of the
+             tolerant mode) are NaN;
+             instance names for each exp_key
+    """
+    instance_names = []
+    for exp_key in exp_keys:
+        op = app[exp_key]['windows']['stable_avg']['both']
+        instance_names.append(sorted([name for name in op['Throughput'] if name != 'all']))
+    n_instances = max([len(names) for names in instance_names])
+
+    tensor = np.full((len(exp_keys), len(variable_names), n_instances, MAX_ITERATIONS), np.nan)
+    for e, exp_key in enumerate(exp_keys):
+        op = app[exp_key]['windows']['stable_avg']['both']
+        for v, variable_name in enumerate(variable_names):
+            if variable_name not in op:
+                continue
+            variable = op[variable_name]
+            for i, instance_name in enumerate(instance_names[e]):
+                if instance_name not in variable:
+                    continue
+                values = variable[instance_name]['values']
+                tensor[e, v, i, :len(values)] = values
+        for i, instance_name in enumerate(instance_names[e]):
+            for iteration in app[exp_key].get('missing_cells', {}).get(instance_name, []):
+                tensor[e, :, i, iteration] = np.nan
+    return tensor, instance_names
+
+
+def calc_modified_z_scores(tensor):
+    """
+    Vectorized modified z-scores over the last two axes (instances, iterations) of the tensor.
+    The median is taken over the iterations of each instance; the MAD is pooled over all instances
+    and iterations of the same exp_key and variable (only 4 iterations are available per instance).
+    The MAD is corrected for the small sample size [Croux1992]. The relative MAD pooled over all exp_keys
+    (and OUTLIER_DETECTION_MIN_RELATIVE_MAD) serves as lower limit.
+    :return: z-scores with the same shape as the tensor; NaN for missing values
+    """
+    with warnings.catch_warnings():
+        # all-NaN slices of padded instances are expected
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        medians = np.nanmedian(tensor, axis=-1, keepdims=True)
+        deviations = tensor - medians
+        mads = OUTLIER_DETECTION_MAD_CORRECTION * np.nanmedian(np.abs(deviations), axis=(-2, -1), keepdims=True)
+        # with only 4 iterations, the MAD of an individual exp_key may be very small by chance;
+        # thus, the relative MAD pooled over all exp_keys serves as lower limit
+        center = np.nanmedian(np.abs(medians), axis=(-2, -1), keepdims=True)
+        pooled_relative_mads = np.nanmedian(mads / center, axis=0, keepdims=True)
+        floors = np.fmax(pooled_relative_mads, OUTLIER_DETECTION_MIN_RELATIVE_MAD) * center
+        mads = np.fmax(mads, floors)
+        mads[~(mads > 0.0)] = np.inf  # no variation at all: z-score 0
+        return OUTLIER_DETECTION_Z_SCORE_FACTOR * deviations / mads
+
+
+def detect_outlier_iterations_for_app(ctx, app, app_name):
+    """:return dict exp_key -> set of suspect iterations; detection results are stored in each exp_data"""
+    suspects = {}
+    exp_keys = sorted(app)
+    if len(exp_keys) == 0:
+        return suspects
+
+    variable_names = OUTLIER_DETECTION_VARIABLES
+    tensor, instance_names = build_stable_avg_tensor(app, exp_keys, variable_names)
+    z_scores = calc_modified_z_scores(tensor)
+    abs_z_scores = np.abs(z_scores)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        iteration_scores = np.nan_to_num(np.nanmedian(abs_z_scores, axis=2))  # (exp_keys, variables, iterations)
+    suspect_iterations = (iteration_scores > OUTLIER_DETECTION_THRESHOLD).any(axis=1)
+    suspect_cells = np.nan_to_num(abs_z_scores) > OUTLIER_DETECTION_THRESHOLD
+
+    for e, exp_key in enumerate(exp_keys):
+        result = {
+            'scores': {},
+            'suspect_iterations': [],
+            'suspect_cells': []
+        }
+        for v, variable_name in enumerate(variable_names):
+            result['scores'][variable_name] = [float(x) for x in iteration_scores[e, v]]
+        for iteration in np.flatnonzero(suspect_iterations[e]):
+            iteration = int(iteration)
+            result['suspect_iterations'].append(iteration)
+            ctx['warning'].append(('{app} exp {exp}: ' + OUTLIER_WARNING_SUSPECT + ' {iteration} (modified z-scores {scores})')
+                                  .format(app=app_name, exp=exp_key, iteration=iteration + 1,
+                                          scores=', '.join(['{var} {score:.1f}'.format(var=variable_name, score=iteration_scores[e, v, iteration])
+                                                            for v, variable_name in enumerate(variable_names)])))
+        for v, i, iteration in np.argwhere(suspect_cells[e]):
+            result['suspect_cells'].append({
+                'variable': variable_names[v],
+                'instance': instance_names[e][i],
+                'iteration': int(iteration),
+                'z': float(z_scores[e, v, i, iteration])
+            })
+        app[exp_key]['outlier_detection'] = result
+        if len(result['suspect_iterations']) > 0:
+            suspects[exp_key] = set(result['suspect_iterations'])
+    return suspects
+
+
+def detect_outlier_iterations(ctx, datasets):
+    """
+    Detects suspect outlier iterations in memtier and middleware data; must be called after aggregation
+    (stable windows average of memtier) and before the calculation of the statistics.
+    Memtier and middleware data of an exp_key come from the same iterations. Thus, the union
+    of the suspect iterations of both apps is excluded in both apps (only with -o flag).
+    """
+    print('### detecting outlier iterations ###')
+    experiment = 'r_' + ctx['experiment_folder']
+    run = create_or_get_dict(datasets, experiment)
+
+    suspects = {}
+    for app_name in ['memtier', 'mw']:
+        app = create_or_get_dict(run, 'app_' + app_name)
+        for exp_key, iterations in detect_outlier_iterations_for_app(ctx, app, app_name).items():
+            suspects[exp_key] = suspects.get(exp_key, set()).union(iterations)
+    print('    {count} experiment keys with suspect iterations'.format(count=len(suspects)))
+
+    if not ctx['exclude_outliers']:
+        return
+
+    excluded_count = 0
+    for exp_key, iterations in suspects.items():
+        valid_iterations = [i not in iterations for i in range(MAX_ITERATIONS)]
+        if sum(valid_iterations) < 2:
+            ctx['warning'].append('exp {exp}: '.format(exp=exp_key) + OUTLIER_WARNING_TOO_MANY)
+            continue
+        for app_name in ['memtier', 'mw']:
+            app = run['app_' + app_name]
+            if exp_key in app:
+                app[exp_key]['valid_iterations'] = valid_iterations
+        excluded_count += len(iterations)
+    print('    {count} suspect iterations excluded from the statistics (see -o flag)'.format(count=excluded_count))
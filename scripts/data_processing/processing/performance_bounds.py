@@ -0,0 +1,114 @@
+"""
+secondary processing: asymptotic bounds (ABA) and balanced job bounds (BJB)
+
+Bounds for throughput X(N) and response time R(N) of each model of LAWS_AND_MODELING_INPUT for
+N = 1 .. max. number of clients of the model [Jain1991, Ch. 33; Lazowska1984, Ch. 5].
+The input follows the operational laws output of scan_memtier_windows() and the MVA devices (memtier view):
+- D = sum of the device demands of the MVA model (see get_mva_demands()); M = number of devices; D_avg = D / M
+- D_max = max(1 / X_max, max. device demand): demand of the bottleneck device
+- Z = R_min - D: the part of the minimal response time that is not spent in the devices (network, client);
+  thus, N* = (D + Z) / D_max = R_min / D_max as N*_DbyRmin of the operational laws output
+
+ABA:  N / (N D + Z) <= X(N) <= min(N / (D + Z), 1 / D_max)
+      max(D, N D_max - Z) <= R(N) <= N D
+BJB:  N / (D + Z + (N - 1) D_max / (1 + Z / (N D))) <= X(N) <= min(1 / D_max, N / (D + Z + (N - 1) D_avg / (1 + Z / D)))
+      max(N D_max - Z, D + (N - 1) D_avg / (1 + Z / D)) <= R(N) <= D + (N - 1) D_max / (1 + Z / (N D))
+
+Configurations with N >= N* = (D + Z) / D_max are bound by the bottleneck device (marked in the
+operational laws output). The bound curves are stored in CONFIGURATION['bounds_output'] and in the
+database (run key 'bounds') and drawn as envelopes on the memtier numclients figures.
+
+Units: demands, Z and R in ms; X in kop/s.
+
+see main program in ../process_raw_data.py for information
+
+References
+[Lazowska1984]  Lazowska ED, Zahorjan J, Graham GS, Sevcik KC. Quantitative system performance.
+                Prentice-Hall, 1984
+
+version 2018-12-19
+"""
+
+import numpy as np
+
+from tools.config import *
+from tools.helpers import *
+from tools.operational_laws import *
+from processing.mean_value_analysis import get_model_configurations, get_mva_demands
+
+
+# --- processing :: performance bounds -------------------------------------------------------------
+
+def calc_bounds(populations, d, d_max, d_avg, z):
+    """:return dict of numpy arrays with the ABA and BJB bounds for the populations (see module documentation)"""
+    n = np.asarray(populations, dtype=float)
+    x_bottleneck = np.full(len(n), 1.0 / d_max)
+    return {
+        'ABA_X_lower': n / (n * d + z),
+        'ABA_X_upper': np.minimum(n / (d + z), x_bottleneck),
+        'ABA_R_lower': np.maximum(d, n * d_max - z),
+        'ABA_R_upper': n * d,
+        'BJB_X_lower': n / (d + z + (n - 1.0) * d_max / (1.0 + z / (n * d))),
+        'BJB_X_upper': np.minimum(x_bottleneck, n / (d + z + (n - 1.0) * d_avg / (1.0 + z / d))),
+        'BJB_R_lower': np.maximum(n * d_max - z, d + (n - 1.0) * d_avg / (1.0 + z / d)),
+        'BJB_R_upper': d + (n - 1.0) * d_max / (1.0 + z / (n * d))
+    }
+
+
+def calc_model_bounds(ctx, op_key, model):
+    """:return dict with input and bounds of the model; None if the input is not available"""
+    configurations = get_model_configurations(ctx, op_key, model)
+    demands = get_mva_demands(ctx, op_key, model)
+    d_max = get_ol_value(ctx, op_key, model, 'D_max')
+    r_min = get_ol_value(ctx, op_key, model, 'R_min')
+    if len(configurations) == 0 or len(demands) == 0 or d_max is None or r_min is None:
+        return None
+    d = sum(demands.values())
+    d_max = max(d_max, max(demands.values()))
+    m = len(demands)
+    z = max(0.0, r_min - d)
+    populations = list(range(1, configurations[-1][0] + 1))
+    result = {
+        'D': d,
+        'D_max': d_max,
+        'D_avg': d / m,
+        'M': m,
+        'Z': z,
+        'N*': (d + z) / d_max,
+        'client_numbers': [cn for cn, config in configurations],
+        'N': populations
+    }
+    for name, values in calc_bounds(populations, d, d_max, d / m, z).items():
+        result[name] = [float(v) for v in values]
+    return result
+
+
+def calc_performance_bounds(ctx, datasets):
+    """
+    Calculates ABA and BJB for all models of the current experiment (see module documentation);
+    must be called after the operational laws variables have been collected
+    """
+    print('    asymptotic and balanced job bounds')
+    bounds_dict = create_or_get_dict(CONFIGURATION['bounds_output'], ctx['experiment_folder'])
+    create_or_get_dict(datasets, 'r_' + ctx['experiment_folder'])['bounds'] = bounds_dict
+    input_dict = CONFIGURATION['laws_and_modeling_input'][ctx['experiment_folder']]
+    for op_key, op_data in input_dict.items():
+        for model in op_data['models']:
+            result = calc_model_bounds(ctx, op_key, model)
+            if result is None:
+                continue
+            create_or_get_dict(bounds_dict, op_key)[model] = result
+
+            config_dict = extract_metadata(model)
+            config_dict['op'] = op_key
+            add_ol_variable(ctx, config_dict, 'bounds_N*', result['N*'], d=result['D'], d_max=result['D_max'], m=result['M'])
+            for cn in result['client_numbers']:
+                config_dict['cn'] = str(cn)
+                i = cn - 1
+                bottleneck_text = ' (bottleneck bound)' if cn >= result['N*'] else ''
+                add_ol_variable(ctx, config_dict, 'bounds_X', result['BJB_X_upper'][i],
+                                a_lo=result['ABA_X_lower'][i], a_hi=result['ABA_X_upper'][i],
+                                b_lo=result['BJB_X_lower'][i], b_hi=result['BJB_X_upper'][i], bottleneck=bottleneck_text)
+                add_ol_variable(ctx, config_dict, 'bounds_R', result['BJB_R_lower'][i],
+                                a_lo=result['ABA_R_lower'][i], a_hi=result['ABA_R_upper'][i],
+                                b_lo=result['BJB_R_lower'][i], b_hi=result['BJB_R_upper'][i])
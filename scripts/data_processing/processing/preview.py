@@ -0,0 +1,223 @@
+"""
+preview mode: approximate quick-look results (-q flag)
+
+During a cloud session, a rough answer is needed within seconds whether a configuration saturated.
+Instead of the full processing, only a subsample is read:
+- memtier stderr files of PREVIEW_MEMTIER_INSTANCES in PREVIEW_ITERATIONS; parsing stops after the
+  stable windows (MEMTIER_STABLE_BEGIN to MEMTIER_STABLE_END)
+- middleware summary json files (percentiles) of PREVIEW_ITERATIONS
+No database, no histograms and no figures are created (figures of the preview on request with -f).
+
+Estimates for each configuration from the k sampled instance-iteration cells (n instances in total):
+- total throughput X = n * mean(cell throughput); standard error n * SD / sqrt(k)
+- response time R = throughput weighted mean of the cells; standard error SD / sqrt(k)
+The standard error covers the variation between instances and between iterations of the subsample.
+
+Saturation hint: scaling efficiency (X / X_prev - 1) / (cn / cn_prev - 1) compared with the configuration with
+the next lower number of clients cn (all other parameters identical); below PREVIEW_SATURATION_EFFICIENCY,
+the configuration is marked as saturated.
+
+see main program in ../process_raw_data.py for information
+
+version 2018-12-17
+"""
+
+import json
+import math
+import os
+
+from tools.config import *
+from tools.helpers import *
+
+
+# --- processing :: preview ------------------------------------------------------------------------
+
+def read_memtier_stable_windows(file):
+    """
+    parses the stable windows of a memtier stderr file (see process_memtier_stderr()); stops after the stable windows
+    :return average throughput (kop/s) and response time (ms) of the stable windows; None, None if incomplete
+    """
+    throughput_sum = 0.0
+    response_time_sum = 0.0
+    count = 0
+    with open(file) as f:
+        for line in f:
+            tokens = line.strip('\n').split()
+            if len(tokens) < 20:
+                continue
+            nr = int(tokens[3])
+            if nr < MEMTIER_STABLE_BEGIN:
+                continue
+            if nr >= MEMTIER_STABLE_END:
+                break
+            throughput_sum += scale_variable('Throughput', int(tokens[9]))
+            response_time_sum += float(tokens[16])
+            count += 1
+
+    if count < MEMTIER_STABLE_END - MEMTIER_STABLE_BEGIN:
+        return None, None
+    return throughput_sum / float(count), response_time_sum / float(count)
+
+
+def read_mw_summary_json(file):
+    """:return dict percentile name -> response time (ms) of all requests; None if not available"""
+    with open(file) as f:
+        try:
+            data = json.load(f)
+        except json.decoder.JSONDecodeError:
+            return None
+    try:
+        summary = data['histograms_summary']['mw_response_time']['avg_all_requests']['0']
+    except KeyError:
+        return None
+    return {name: summary[name] for name in PREVIEW_MW_PERCENTILES}
+
+
+def get_preview_instances(n_instances):
+    """:return list of the sampled memtier instance names"""
+    instances = [name for name in PREVIEW_MEMTIER_INSTANCES if int(name) <= n_instances]
+    if len(instances) == 0:
+        instances = ['1']
+    return instances
+
+
+def collect_preview_samples(ctx):
+    """:return dict exp_key -> dict with metadata, n_instances, memtier cells and mw percentiles of the subsample"""
+    samples = {}
+    skipped = 0
+    folder = os.path.join(ctx['input_folder'], ctx['experiment_folder'], RAW_FOLDER, CLIENT_FOLDER)
+    for file in get_all_files(folder, MEMTIER_STDERR_SUFFIX):
+        metadata = parse_filename(file)
+        calc_metadata_keys(metadata)
+        if metadata['iteration_index'] not in PREVIEW_ITERATIONS:
+            continue
+        n_instances = int(metadata['cc']) * int(metadata['ci'])
+        if metadata['id'] not in get_preview_instances(n_instances):
+            continue
+        throughput, response_time = read_memtier_stable_windows(file)
+        if throughput is None:
+            skipped += 1
+            continue
+        sample = create_or_get_template(samples, metadata['exp_key'], {'cells': [], 'mw': []})
+        sample['metadata'] = select_exp_metadata(metadata)
+        sample['n_instances'] = n_instances
+        sample['cells'].append([metadata['id'], metadata['iteration_index'], throughput, response_time])
+
+    folder = os.path.join(ctx['input_folder'], ctx['experiment_folder'], RAW_FOLDER, MW_FOLDER)
+    for file in get_all_files(folder, MW_JSON_SUFFIX):
+        metadata = parse_filename(file)
+        calc_metadata_keys(metadata)
+        if metadata['iteration_index'] not in PREVIEW_ITERATIONS or metadata['exp_key'] not in samples:
+            continue
+        percentiles = read_mw_summary_json(file)
+        if percentiles is not None:
+            samples[metadata['exp_key']]['mw'].append(percentiles)
+
+    if skipped > 0:
+        ctx['warning'].append('preview: {count} memtier files without complete stable windows skipped'.format(count=skipped))
+    return samples
+
+
+def calc_preview_estimates(sample):
+    """:return dict with the estimates of the sample (see module documentation)"""
+    n = sample['n_instances']
+    throughputs = [cell[2] for cell in sample['cells']]
+    response_times = [cell[3] for cell in sample['cells']]
+    k = len(throughputs)
+    x_mean, x_sd, x_n = calc_mean_and_sd(throughputs)
+    r_mean, r_sd, r_n = calc_mean_and_sd(response_times)
+    weight_sum = sum(throughputs)
+    if weight_sum > 0.0:
+        r_mean = sum([x * r for x, r in zip(throughputs, response_times)]) / weight_sum
+
+    estimates = {
+        'cn': sample['metadata']['cn'],
+        'k': k,
+        'n_instances': n,
+        'X': n * x_mean,
+        'X_se': n * x_sd / math.sqrt(k),
+        'R': r_mean,
+        'R_se': r_sd / math.sqrt(k),
+        'mw': {}
+    }
+    for name in PREVIEW_MW_PERCENTILES:
+        values = sorted([p[name] for p in sample['mw']])
+        if len(values) > 0:
+            estimates['mw'][name] = values[len(values) // 2]
+    return estimates
+
+
+def get_preview_group_key(metadata):
+    """:return key of the metadata without the number of virtual clients (for the saturation hint)"""
+    return '_'.join([k + '_' + str(metadata[k]) for k in sorted(metadata)
+                     if k in ['cc', 'ci', 'ct', 'ck', 'op', 'mc', 'mt', 'ms', 'sc', 'st']])
+
+
+def add_saturation_hints(samples, estimates):
+    groups = {}
+    for exp_key, sample in samples.items():
+        create_or_get_template(groups, get_preview_group_key(sample['metadata']), []).append(exp_key)
+    for group_key, exp_keys in groups.items():
+        exp_keys = sorted(exp_keys, key=lambda e: estimates[e]['cn'])
+        for previous, current in zip(exp_keys[:-1], exp_keys[1:]):
+            p = estimates[previous]
+            c = estimates[current]
+            if p['X'] <= 0.0 or c['cn'] <= p['cn']:
+                continue
+            efficiency = (c['X'] / p['X'] - 1.0) / (float(c['cn']) / float(p['cn']) - 1.0)
+            c['efficiency'] = efficiency
+            c['saturated'] = efficiency < PREVIEW_SATURATION_EFFICIENCY
+
+
+def write_preview(ctx, samples, estimates):
+    """prints the preview table and writes it into the processed folder"""
+    processed_path = os.path.join(ctx['output_folder'], ctx['experiment_folder'], PROCESSED_FOLDER)
+    make_path(processed_path)
+    preview_file = os.path.join(processed_path, ctx['prefix'] + ctx['experiment_folder'] + PREVIEW_SUMMARY_SUFFIX)
+    lines = [
+        'Preview for experiment {exp} (approximate; subsample of instances {instances} and iterations {iterations})'
+        .format(exp=ctx['experiment_folder'], instances=', '.join(PREVIEW_MEMTIER_INSTANCES),
+                iterations=', '.join([str(i + 1) for i in PREVIEW_ITERATIONS])),
+        'memtier stable windows: X = estimated total throughput, R = response time; mean ± standard error (k cells)',
+        'mw: median of the summary json percentiles of the response time; eff: scaling efficiency (see preview.py)',
+        ''
+    ]
+    for config in get_experiment_configurations(ctx['experiment_folder']):
+        config_dict = extract_metadata(config)
+        exp_key = None
+        for key, sample in samples.items():
+            if metadata_matches_requested_config(sample['metadata'], config_dict):
+                exp_key = key
+                break
+        if exp_key is None:
+            lines.append('{config}: no data'.format(config=config))
+            continue
+        e = estimates[exp_key]
+        mw_text = ', '.join(['{name} {value:.3f}'.format(name=name, value=e['mw'][name]) for name in PREVIEW_MW_PERCENTILES if name in e['mw']])
+        hint = ''
+        if 'efficiency' in e:
+            hint = ', eff {eff:5.2f}{saturated}'.format(eff=e['efficiency'], saturated=' SATURATED' if e['saturated'] else '')
+        lines.append('{config}: cn {cn:4d}, X {x:7.3f} ± {x_se:6.3f} kop/s, R {r:7.3f} ± {r_se:6.3f} ms, k {k}{mw}{hint}'
+                     .format(config=config, cn=e['cn'], x=e['X'], x_se=e['X_se'], r=e['R'], r_se=e['R_se'], k=e['k'],
+                             mw=', mw ms ' + mw_text if len(mw_text) > 0 else '', hint=hint))
+
+    with open(preview_file, 'w') as f:
+        for line in lines:
+            print(line, file=f)
+    for line in lines:
+        print('    ' + line)
+
+
+def preview(ctx):
+    """
+    Approximate quick-look results for the current experiment folder (see module documentation)
+    :return dict exp_key -> estimates (used by plot_preview())
+    """
+    print('### preview of memtier stable windows (subsample) ###')
+    samples = collect_preview_samples(ctx)
+    estimates = {exp_key: calc_preview_estimates(sample) for exp_key, sample in samples.items()}
+    add_saturation_hints(samples, estimates)
+    for exp_key, sample in samples.items():
+        estimates[exp_key]['metadata'] = sample['metadata']
+    write_preview(ctx, samples, estimates)
+    return estimates
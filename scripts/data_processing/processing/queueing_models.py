@@ -0,0 +1,139 @@
+"""
+secondary processing: M/M/1 and M/M/m models of the middleware
+
+Each configuration of a model of LAWS_AND_MODELING_INPUT (middleware experiments only) is modeled as
+- M/M/1: one server with service rate mu = X_max
+- M/M/m: m = mn worker threads (all middlewares) with service rate mu = X_max / m each
+Arrival rate lambda: measured memtier throughput X of the configuration (operational laws output);
+X_max: maximum throughput of the model (see scan_memtier_windows()).
+
+All configurations are solved in one batched call (numpy arrays). The Erlang-C waiting probability is
+calculated by the numerically stable Erlang-B recursion B(k) = a B(k-1) / (k + a B(k-1)) with a = lambda / mu
+and C = m B / (m - a (1 - B)) [Jain1991, Ch. 31]; no factorials or powers of a are needed.
+Unstable configurations (rho >= 1) are reported as such.
+
+Units: rates in kop/s; times in ms.
+
+see main program in ../process_raw_data.py for information
+
+version 2018-12-19
+"""
+
+import numpy as np
+
+from tools.config import *
+from tools.helpers import *
+from tools.operational_laws import *
+from processing.mean_value_analysis import get_model_configurations
+
+
+# --- processing :: M/M/1 and M/M/m models ---------------------------------------------------------
+
+def calc_mmm_metrics(arrival_rates, service_rates, servers):
+    """
+    batched M/M/m model; M/M/1 with servers == 1
+    :param arrival_rates: lambda for each configuration (kop/s)
+    :param service_rates: mu of each server for each configuration (kop/s)
+    :param servers: number of servers m for each configuration
+    :return dict of numpy arrays: rho, C (Erlang-C), Nq (mean queue length), W (waiting time, ms),
+            R (response time, ms); NaN for unstable configurations (rho >= 1)
+    """
+    lam = np.asarray(arrival_rates, dtype=float)
+    mu = np.asarray(service_rates, dtype=float)
+    m = np.asarray(servers, dtype=int)
+    a = lam / mu
+    rho = a / m
+
+    b = np.ones(len(lam))
+    for k in range(1, int(m.max()) + 1):
+        b = np.where(k <= m, a * b / (k + a * b), b)
+
+    stable = rho < 1.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        c = np.where(stable, m * b / (m - a * (1.0 - b)), np.nan)
+        nq = np.where(stable, c * rho / (1.0 - rho), np.nan)
+        w = np.where(stable, c / (m * mu * (1.0 - rho)), np.nan)
+    r = w + 1.0 / mu
+    return {'rho': rho, 'C': c, 'Nq': nq, 'W': w, 'R': r}
+
+
+def get_mw_stable_mean(ctx, datasets, config, variable_name):
+    """:return measured mean of the variable of the middleware (stable windows, all instances); None if n/a"""
+    exp_data, mapped_op_name = get_experiment_data(ctx, datasets, 'mw', config)
+    if exp_data is None:
+        return None
+    op = exp_data['windows']['stable_avg']['both']
+    if variable_name not in op:
+        return None
+    return op[variable_name]['all']['mean']
+
+
+def collect_queueing_model_rows(ctx, datasets):
+    """:return list of dicts (one for each configuration) with the model input and the measured values"""
+    rows = []
+    input_dict = CONFIGURATION['laws_and_modeling_input'][ctx['experiment_folder']]
+    for op_key in sorted(input_dict):
+        for model in sorted(input_dict[op_key]['models']):
+            m = int(extract_metadata(model).get('mn', '0'))
+            x_max = get_ol_value(ctx, op_key, model, 'X_max')
+            if m <= 0 or x_max is None or x_max <= 0.0:
+                continue
+            for cn, config in get_model_configurations(ctx, op_key, model):
+                x = get_ol_value(ctx, op_key, model, 'X', cn)
+                if x is None:
+                    continue
+                rows.append({
+                    'op': op_key,
+                    'model': model,
+                    'cn': cn,
+                    'm': m,
+                    'lambda': x,
+                    'X_max': x_max,
+                    'QueueingTime': get_mw_stable_mean(ctx, datasets, config, 'QueueingTime'),
+                    'ResponseTime': get_mw_stable_mean(ctx, datasets, config, 'ResponseTime')
+                })
+    return rows
+
+
+def format_time(value):
+    if value is None:
+        return '{v:>9s}'.format(v='n/a')
+    if np.isnan(value):
+        return '{v:>9s}'.format(v='unstable')
+    return '{v:9.3f}'.format(v=value)
+
+
+def write_queueing_model_stats(ctx, datasets, f):
+    """Writes M/M/1 and M/M/m model values next to the measured middleware times (see module documentation)"""
+    if ctx['experiment_folder'] in FIGURES_MATRIX['no_middleware_involved']:
+        return
+    rows = collect_queueing_model_rows(ctx, datasets)
+    if len(rows) == 0:
+        return
+
+    lam = [row['lambda'] for row in rows]
+    mm1 = calc_mmm_metrics(lam, [row['X_max'] for row in rows], [1] * len(rows))
+    mmm = calc_mmm_metrics(lam, [row['X_max'] / row['m'] for row in rows], [row['m'] for row in rows])
+
+    print('\n\n--------------------------------------------------------------------------------', file=f)
+    print('Queueing models of the middleware: M/M/1 and M/M/m', file=f)
+    print('--------------------------------------------------------------------------------\n', file=f)
+    print('lambda = measured memtier throughput X; M/M/1 with mu = X_max; M/M/m with m = mn workers and mu = X_max / m', file=f)
+    print('rho: utilization; C: Erlang-C waiting probability; Nq: mean queue length; W: waiting time; R: response time', file=f)
+    print('measured values (meas.): middleware queueing time Q and response time R (stable windows)', file=f)
+
+    header = '    {cn:>4s} {lam:>8s} {rho:>6s} {c:>6s} {nq:>8s} | {q:>9s} {q1:>9s} {qm:>9s} | {r:>9s} {r1:>9s} {rm:>9s}'.format(
+        cn='cn', lam='lambda', rho='rho', c='C', nq='Nq', q='Q meas.', q1='W M/M/1', qm='W M/M/m',
+        r='R meas.', r1='R M/M/1', rm='R M/M/m')
+    previous = None
+    for i, row in enumerate(rows):
+        if previous != (row['op'], row['model']):
+            previous = (row['op'], row['model'])
+            print('\n  {op} {model} (m = {m}, X_max = {x_max:6.3f} kop/s); rho, C, Nq of M/M/m; times in ms'
+                  .format(op=row['op'], model=row['model'], m=row['m'], x_max=row['X_max']), file=f)
+            print(header, file=f)
+        print('    {cn:4d} {lam:8.3f} {rho:6.3f} {c:6.3f} {nq:8.3f} | {q} {q1} {qm} | {r} {r1} {rm}'
+              .format(cn=row['cn'], lam=row['lambda'], rho=mmm['rho'][i], c=mmm['C'][i], nq=mmm['Nq'][i],
+                      q=format_time(row['QueueingTime']), q1=format_time(mm1['W'][i]), qm=format_time(mmm['W'][i]),
+                      r=format_time(row['ResponseTime']), r1=format_time(mm1['R'][i]), rm=format_time(mmm['R'][i])),
+              file=f)
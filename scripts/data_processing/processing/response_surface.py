@@ -0,0 +1,265 @@
+"""
+secondary processing: response surface regression over the configuration parameters
+
+Only a sparse subset of the combinations of the configuration parameters (RESPONSE_SURFACE_FACTORS, e.g.
+cn, mc, mt, sc, ck) is measured. For each op of the experiment, a second-order response surface is fitted to
+the memtier responses of all measured configurations (RESPONSE_SURFACE_RESPONSES):
+- Throughput, ResponseTime: stable windows mean of the valid iterations
+- p99: 99th percentile of the ResponseTime histogram of each valid iteration (see sla_analysis.py), averaged
+The factors that vary within the op are coded x = (log2 v - c) / h to [-1, 1] (levels are mostly doubled);
+the model is multiplicative, i.e. fitted to ln y (as the multiplicative model of factorial_analysis.py), which
+follows the saturation of the throughput and the linear growth of the response time with cn more closely.
+Terms: I, the linear terms, the two-factor interactions and the quadratic terms (factors with >= 3 levels),
+in this order as long as at least RESPONSE_SURFACE_MIN_DF degrees of freedom remain.
+
+Weighted least squares [Montgomery2012]: weight w = r y^2 / s^2 of each configuration with the variance s^2
+of the r iterations (s^2 / r: variance of the mean; / y^2: variance of ln y by the delta method); s is at least RESPONSE_SURFACE_MIN_RELATIVE_SD of the mean
+to avoid excessive weights of configurations with nearly identical iterations. All responses share the
+design matrix and are solved at once (stacked normal equations, pseudo-inverse):
+- coefficients b = (X^T W X)^-1 X^T W ln y; weighted residual variance s_w^2 = SSE_w / (n - p)
+- leave-one-out cross-validation by the hat matrix: e_(i) = e_i / (1 - h_ii) (PRESS residuals); reported as
+  RMSE and mean relative error of y
+- prediction interval at an untested point x0: exp(ln y0 -/+ t s_w sqrt(x0^T (X^T W X)^-1 x0 + mean(1 / w)))
+  with the two-sided t-value of RESPONSE_SURFACE_CONFIDENCE and n - p degrees of freedom
+
+What-if predictions (see predict_response_surface()) use the stored surfaces of the database. The summary
+lists the predictions at the geometric midpoints between consecutive measured levels of each factor
+(other factors at their median level); predictions are not extrapolated beyond the measured range.
+
+The results are stored in the database (run key 'response_surface') and written into the summary.
+
+Units: times in ms; throughput in kop/s.
+
+see main program in ../process_raw_data.py for information
+
+References
+[Montgomery2012]  Montgomery DC. Design and analysis of experiments. 8th ed. Wiley, 2012
+
+version 2018-12-30
+"""
+
+import itertools
+import math
+
+import numpy as np
+
+from tools.config import *
+from tools.helpers import *
+from processing.factorial_analysis import calc_student_t_value
+from processing.sla_analysis import collect_response_time_counts, calc_histogram_cdfs, calc_histogram_quantiles
+
+
+# --- processing :: response surface ---------------------------------------------------------------
+
+def collect_configuration_responses(exp_data):
+    """:return dict response -> list of the values of the valid iterations (see module documentation)"""
+    valid_iterations = get_valid_iterations(exp_data)
+    stable = exp_data['windows']['stable_avg']['both']
+    responses = {}
+    for name in RESPONSE_SURFACE_RESPONSES:
+        if name == 'p99':
+            cdf, total = calc_histogram_cdfs(collect_response_time_counts(exp_data))
+            values = calc_histogram_quantiles(cdf, 0.99)
+            values = values[np.isfinite(values)]
+        else:
+            values = [v for i, v in enumerate(stable[name]['all']['values'])
+                      if i >= len(valid_iterations) or valid_iterations[i]]
+        responses[name] = [float(v) for v in values]
+    return responses
+
+
+def code_factors(levels, factors, coding):
+    """:return numpy array (points x factors) of the coded factors (see module documentation)"""
+    values = np.log2(np.asarray(levels, dtype=float))
+    center = np.array([coding[f][0] for f in factors])
+    half = np.array([coding[f][1] for f in factors])
+    return (values - center) / half
+
+
+def build_terms(factors, level_counts, n):
+    """:return list of the terms (tuples of factor indices; () for I) of the model (see module documentation)"""
+    terms = [()] + [(i,) for i in range(len(factors))]
+    if len(terms) > n - RESPONSE_SURFACE_MIN_DF:
+        return None
+    candidates = list(itertools.combinations(range(len(factors)), 2)) + \
+        [(i, i) for i in range(len(factors)) if level_counts[i] >= 3]
+    for term in candidates:
+        if len(terms) + 1 > n - RESPONSE_SURFACE_MIN_DF:
+            break
+        terms.append(term)
+    return terms
+
+
+def build_design_matrix(x, terms):
+    """:return numpy array (points x terms) of the design matrix for the coded factors x"""
+    return np.column_stack([np.prod(x[:, list(term)], axis=1) if len(term) > 0 else np.ones(len(x)) for term in terms])
+
+
+def fit_response_surfaces(design, y, weights):
+    """
+    weighted least squares of all responses at once (see module documentation)
+    :param design: numpy array (points x terms)
+    :param y: numpy array (responses x points); weights: numpy array (responses x points)
+    :return dict of numpy arrays (first dimension: responses): b, cov (unscaled, terms x terms), s2, R2 and
+            loo (leave-one-out residuals; NaN for h_ii = 1)
+    """
+    n, p = design.shape
+    a = np.sqrt(weights)[:, :, np.newaxis] * design[np.newaxis, :, :]
+    cov = np.linalg.pinv(np.einsum('rnp,rnq->rpq', a, a))
+    b = np.einsum('rpq,rnq,rn->rp', cov, a, np.sqrt(weights) * y)
+    residuals = y - np.einsum('np,rp->rn', design, b)
+    sse = (weights * residuals ** 2).sum(axis=1)
+    y_mean = (weights * y).sum(axis=1) / weights.sum(axis=1)
+    sst = (weights * (y - y_mean[:, np.newaxis]) ** 2).sum(axis=1)
+    h = weights * np.einsum('np,rpq,nq->rn', design, cov, design)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'b': b,
+            'cov': cov,
+            's2': sse / (n - p),
+            'R2': np.where(sst > 0.0, 1.0 - sse / sst, np.nan),
+            'loo': np.where(h < 1.0 - 1e-9, residuals / (1.0 - h), np.nan)
+        }
+
+
+def predict_response_surface(surface, points):
+    """
+    what-if predictions of a stored response surface (database: response_surface -> op)
+    :param points: list of dicts factor -> value; missing factors use the median level of the measurements
+    :return list of dicts response -> dict with y and the prediction interval lo, hi; None for points outside of
+            the measured range
+    """
+    factors = surface['factors']
+    levels = []
+    for point in points:
+        levels.append([float(point.get(factor, surface['median_levels'][factor])) for factor in factors])
+    levels = np.array(levels).reshape(len(points), len(factors))
+    x = code_factors(levels, factors, surface['coding'])
+    design = build_design_matrix(x, [tuple(term) for term in surface['terms']])
+    inside = np.all(np.abs(x) <= 1.0 + 1e-9, axis=1)
+    results = [{} if inside[i] else None for i in range(len(points))]
+    for name, response in surface['responses'].items():
+        y = design.dot(np.asarray(response['b']))
+        variance = np.einsum('mp,pq,mq->m', design, np.asarray(response['cov']), design) + response['mean_inverse_weight']
+        delta = surface['t'] * np.sqrt(response['s2'] * variance)
+        for i in range(len(points)):
+            if inside[i]:
+                results[i][name] = {'y': float(np.exp(y[i])), 'lo': float(np.exp(y[i] - delta[i])),
+                                    'hi': float(np.exp(y[i] + delta[i]))}
+    return results
+
+
+def get_what_if_points(surface, measured):
+    """:return list of the untested points (dicts) at the geometric midpoints between consecutive levels"""
+    points = []
+    for factor in surface['factors']:
+        levels = sorted(set([point[factor] for point in measured]))
+        for lower, upper in zip(levels[:-1], levels[1:]):
+            point = dict(surface['median_levels'])
+            point[factor] = int(round(math.sqrt(lower * upper)))
+            if point[factor] not in [lower, upper] and point not in measured and point not in points:
+                points.append(point)
+    return points
+
+
+def calc_response_surface(ctx, datasets, op, rows):
+    """:return dict with the response surface of the op (see module documentation); None if not available"""
+    factors = [f for f in RESPONSE_SURFACE_FACTORS if len(set([row['levels'][f] for row in rows])) > 1]
+    if len(factors) == 0:
+        return None
+    level_counts = [len(set([row['levels'][f] for row in rows])) for f in factors]
+    terms = build_terms(factors, level_counts, len(rows))
+    if terms is None:
+        ctx['info'].append('  - response surface of op {op}: not enough configurations ({n})\n'.format(op=op, n=len(rows)))
+        return None
+
+    coding = {}
+    median_levels = {}
+    for f in factors:
+        logs = np.log2([float(row['levels'][f]) for row in rows])
+        coding[f] = [float(0.5 * (logs.max() + logs.min())), float(0.5 * (logs.max() - logs.min()))]
+        median_levels[f] = min([row['levels'][f] for row in rows], key=lambda v: abs(math.log2(v) - np.median(logs)))
+    levels = np.array([[float(row['levels'][f]) for f in factors] for row in rows])
+    design = build_design_matrix(code_factors(levels, factors, coding), terms)
+
+    y = np.array([[np.mean(row['responses'][name]) for row in rows] for name in RESPONSE_SURFACE_RESPONSES])
+    variance = np.array([[np.var(row['responses'][name], ddof=1) / len(row['responses'][name])
+                          if len(row['responses'][name]) > 1 else 0.0 for row in rows] for name in RESPONSE_SURFACE_RESPONSES])
+    variance = np.maximum(variance, (RESPONSE_SURFACE_MIN_RELATIVE_SD * y) ** 2)
+    # multiplicative model: ln y with Var(ln y) = Var(y) / y^2 (delta method)
+    weights = y * y / variance
+    fits = fit_response_surfaces(design, np.log(y), weights)
+    loo_relative = np.exp(-fits['loo']) - 1.0
+
+    df = len(rows) - len(terms)
+    surface = {
+        'factors': factors,
+        'coding': coding,
+        'median_levels': median_levels,
+        'terms': [list(term) for term in terms],
+        'term_names': ['I' if len(term) == 0 else '*'.join([factors[i] for i in term]) for term in terms],
+        'n': len(rows),
+        'df': df,
+        't': calc_student_t_value(RESPONSE_SURFACE_CONFIDENCE, df),
+        'responses': {}
+    }
+    for j, name in enumerate(RESPONSE_SURFACE_RESPONSES):
+        surface['responses'][name] = {
+            'b': [float(v) for v in fits['b'][j]],
+            'cov': fits['cov'][j].tolist(),
+            's2': float(fits['s2'][j]),
+            'mean_inverse_weight': float(np.mean(1.0 / weights[j])),
+            'R2': float(fits['R2'][j]),
+            'loo_rmse': float(np.sqrt(np.nanmean((y[j] * loo_relative[j]) ** 2))),
+            'loo_relative': float(np.nanmean(np.abs(loo_relative[j])))
+        }
+    measured = [dict([(f, row['levels'][f]) for f in factors]) for row in rows]
+    points = get_what_if_points(surface, measured)
+    surface['predictions'] = [{'point': point, 'values': values}
+                              for point, values in zip(points, predict_response_surface(surface, points))]
+    return surface
+
+
+def write_response_surfaces(ctx, datasets, f):
+    """Fits the response surfaces of all ops (see module documentation) and writes them into the summary"""
+    print('    response surface regression')
+    rows = {}
+    for config in get_experiment_configurations(ctx['experiment_folder']):
+        exp_data, mapped_op_name = get_experiment_data(ctx, datasets, 'memtier', config)
+        if exp_data is None:
+            continue
+        metadata = exp_data['metadata']
+        responses = collect_configuration_responses(exp_data)
+        if min([len(values) for values in responses.values()]) == 0:
+            continue
+        rows.setdefault(metadata['op'], []).append({
+            'config': config,
+            'levels': dict([(factor, int(metadata[factor])) for factor in RESPONSE_SURFACE_FACTORS]),
+            'responses': responses
+        })
+    surfaces = {}
+    for op in sorted(rows):
+        surface = calc_response_surface(ctx, datasets, op, rows[op])
+        if surface is not None:
+            surfaces[op] = surface
+    create_or_get_dict(datasets, 'r_' + ctx['experiment_folder'])['response_surface'] = surfaces
+    if len(surfaces) == 0:
+        return
+
+    print('\n\n--------------------------------------------------------------------------------', file=f)
+    print('Response surface regression over the configuration parameters', file=f)
+    print('--------------------------------------------------------------------------------\n', file=f)
+    print('weighted least squares of ln y (w = r y^2 / s^2 of the iterations) on log2-coded factors; leave-one-out cross-validation;', file=f)
+    print('what-if predictions with {c:.0%} prediction intervals at untested points'.format(c=RESPONSE_SURFACE_CONFIDENCE), file=f)
+    for op, surface in surfaces.items():
+        print('\n  op {op}: n = {n} configurations, df = {df}, factors {factors}'
+              .format(op=op, n=surface['n'], df=surface['df'], factors=', '.join(surface['factors'])), file=f)
+        print('    terms: ' + ', '.join(surface['term_names']), file=f)
+        for name, response in surface['responses'].items():
+            print('    {name:<12s} R^2 (ln y) {r2:6.3f}, LOO RMSE {rmse:8.4f}, LOO mean relative error {rel:6.2%}'
+                  .format(name=name, r2=response['R2'], rmse=response['loo_rmse'], rel=response['loo_relative']), file=f)
+        for prediction in surface['predictions']:
+            point = ', '.join(['{k} {v}'.format(k=k, v=prediction['point'][k]) for k in surface['factors']])
+            values = '; '.join(['{name} {y:.3f} [{lo:.3f}, {hi:.3f}]'.format(name=name, **value)
+                                for name, value in prediction['values'].items()])
+            print('    what-if {point}: {values}'.format(point=point, values=values), file=f)
@@ -0,0 +1,230 @@
+"""
+secondary processing: tail-latency SLA surface and throughput/latency Pareto frontier
+
+For each configuration of the experiment, the memtier ResponseTime histograms (op of the run: set for write,
+get for read, both for mixed; all instances, valid iterations) are binned into one histogram
+(PERCENTILES_HISTOGRAM_TIME_RESOLUTION up to PERCENTILES_HISTOGRAM_MAX_TIME); the cumulative histograms of all
+configurations are calculated at once (one matrix). An SLA (metric <= T) holds for a configuration if
+- mean: stable windows mean of ResponseTime <= T
+- pXX: cumulative fraction of the requests with response time <= T is >= XX / 100
+with the metrics SLA_METRICS and the thresholds SLA_THRESHOLDS (ms); all pairs are evaluated in one step.
+The last histogram bin collects all response times >= PERCENTILES_HISTOGRAM_MAX_TIME (overflow). Thus, percentile
+SLAs with T >= PERCENTILES_HISTOGRAM_MAX_TIME are not evaluable, and percentiles within the overflow bin are n/a.
+
+SLA surface: maximum sustainable throughput (stable windows mean of Throughput) of each configuration group
+(all parameters but the number of clients cn, e.g. op_write_mn_16) under each SLA; reported with the cn
+reaching it.
+Pareto frontier: for each op and each metric, the configurations that are not dominated by another
+configuration with higher throughput and lower (or equal) latency.
+
+The results are stored in the database (run key 'sla') and written into the summary.
+
+Units: times in ms; throughput in kop/s.
+
+see main program in ../process_raw_data.py for information
+
+version 2018-12-28
+"""
+
+import re
+
+import numpy as np
+
+from tools.config import *
+from tools.helpers import *
+
+
+# --- processing :: SLA surface and Pareto frontier ------------------------------------------------
+
+SLA_RUN_OPS = {
+    'write': ['set'],
+    'read': ['get'],
+    'mixed': ['set', 'get']
+}
+
+
+def get_configuration_group(config):
+    """:return configuration without the number of clients, e.g. op_write_mn_16 for op_write_cn_6_mn_16"""
+    return re.sub('_cn_[0-9]+', '', config)
+
+
+def collect_response_time_counts(exp_data):
+    """
+    :return numpy array (iterations x bins) of the counts of the ResponseTime histogram (see module documentation);
+            rows of invalid iterations are 0
+    """
+    counts = {}
+    raw_bins = exp_data['histograms']['raw_bins']
+    for op_name in SLA_RUN_OPS[exp_data['metadata']['op']]:
+        variable = raw_bins.get(op_name, {}).get('ResponseTime', {})
+        for instance_name, instance in variable.items():
+            valid_iterations = get_valid_iterations(exp_data, instance_name)
+            for iteration, bins in instance.items():
+                if not valid_iterations[int(iteration)]:
+                    continue
+                iteration_counts = counts.setdefault(int(iteration), np.zeros(PERCENTILES_HISTOGRAM_MAX_BIN_NR + 1))
+                for time, count in bins:
+                    bin_nr = min(int(float(time) / PERCENTILES_HISTOGRAM_TIME_RESOLUTION), PERCENTILES_HISTOGRAM_MAX_BIN_NR)
+                    iteration_counts[bin_nr] += count
+    result = np.zeros((max(counts) + 1 if len(counts) > 0 else 1, PERCENTILES_HISTOGRAM_MAX_BIN_NR + 1))
+    for iteration, iteration_counts in counts.items():
+        result[iteration] = iteration_counts
+    return result
+
+
+def calc_histogram_cdfs(counts):
+    """:return numpy arrays of the cumulative distributions (rows of counts) and of the totals (column vector)"""
+    total = counts.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cdf = np.where(total > 0, np.cumsum(counts, axis=1) / total, 0.0)
+    return cdf, total
+
+
+def calc_histogram_quantiles(cdf, quantile):
+    """
+    :return numpy array of the quantile (ms; upper bin limit) of each cumulative distribution;
+            NaN if it is within the overflow bin (see module documentation) or if the histogram is empty
+    """
+    bin_nrs = np.argmax(cdf >= quantile - 1e-12, axis=1)
+    evaluable = (bin_nrs < PERCENTILES_HISTOGRAM_MAX_BIN_NR) & (cdf[:, -1] > 0.0)
+    return np.where(evaluable, PERCENTILES_HISTOGRAM_TIME_RESOLUTION * (bin_nrs + 1.0), np.nan)
+
+
+def get_evaluable_thresholds(quantile):
+    """:return numpy array (thresholds) of bool: False for percentile SLAs within the overflow bin"""
+    thresholds = np.asarray(SLA_THRESHOLDS, dtype=float)
+    return np.full(len(thresholds), True) if quantile is None else thresholds < PERCENTILES_HISTOGRAM_MAX_TIME
+
+
+def calc_sla_table(counts, mean_response_times):
+    """
+    :param counts: numpy array (configurations x bins) of the ResponseTime histograms
+    :param mean_response_times: numpy array (configurations) of the mean response times (ms)
+    :return dict metric -> numpy arrays latency (configurations; NaN if n/a), holds (configurations x thresholds)
+            and evaluable (thresholds; see get_evaluable_thresholds())
+    """
+    cdf, total = calc_histogram_cdfs(counts)
+    thresholds = np.asarray(SLA_THRESHOLDS, dtype=float)
+    # bin b holds the response times in [b, b + 1) resolution; thus, cdf[:, b] = fraction <= (b + 1) resolution
+    threshold_bins = np.clip(np.floor(thresholds / PERCENTILES_HISTOGRAM_TIME_RESOLUTION + 1e-9).astype(int) - 1,
+                             0, PERCENTILES_HISTOGRAM_MAX_BIN_NR)
+    table = {}
+    for metric, quantile in SLA_METRICS.items():
+        if quantile is None:
+            latency = np.asarray(mean_response_times, dtype=float)
+            holds = latency[:, np.newaxis] <= thresholds[np.newaxis, :]
+        else:
+            latency = calc_histogram_quantiles(cdf, quantile)
+            holds = cdf[:, threshold_bins] >= quantile - 1e-12
+        evaluable = get_evaluable_thresholds(quantile)
+        holds &= (total > 0) & evaluable[np.newaxis, :]
+        table[metric] = {'latency': latency, 'holds': holds, 'evaluable': evaluable}
+    return table
+
+
+def calc_pareto_frontier(throughputs, latencies):
+    """:return list of the indices of the non-dominated points (higher throughput, lower latency), by throughput"""
+    order = np.lexsort((np.asarray(latencies), -np.asarray(throughputs)))
+    frontier = []
+    best = np.inf
+    for i in order:
+        if latencies[i] < best:
+            frontier.append(int(i))
+            best = latencies[i]
+    return sorted(frontier, key=lambda i: throughputs[i])
+
+
+def calc_sla_analysis(ctx, datasets):
+    """:return dict with the SLA surface and the Pareto frontiers (see module documentation); None if not available"""
+    rows = []
+    for config in get_experiment_configurations(ctx['experiment_folder']):
+        exp_data, mapped_op_name = get_experiment_data(ctx, datasets, 'memtier', config)
+        if exp_data is None:
+            continue
+        stable = exp_data['windows']['stable_avg']['both']
+        rows.append({
+            'config': config,
+            'group': get_configuration_group(config),
+            'op': exp_data['metadata']['op'],
+            'cn': int(exp_data['metadata']['cn']),
+            'X': stable['Throughput']['all']['mean'],
+            'R': stable['ResponseTime']['all']['mean'],
+            'counts': collect_response_time_counts(exp_data).sum(axis=0)
+        })
+    if len(rows) == 0:
+        return None
+
+    table = calc_sla_table(np.stack([row['counts'] for row in rows]), [row['R'] for row in rows])
+    result = {'thresholds': SLA_THRESHOLDS, 'configurations': {}, 'surface': {}, 'pareto': {},
+              'evaluable': {m: [bool(e) for e in table[m]['evaluable']] for m in SLA_METRICS}}
+    for i, row in enumerate(rows):
+        result['configurations'][row['config']] = {'X': row['X'], 'cn': row['cn'], 'latency': {
+            m: None if np.isnan(table[m]['latency'][i]) else round(float(table[m]['latency'][i]), 6) for m in SLA_METRICS}}
+
+    groups = []
+    for row in rows:
+        if row['group'] not in groups:
+            groups.append(row['group'])
+    for group in groups:
+        indices = [i for i, row in enumerate(rows) if row['group'] == group]
+        group_dict = create_or_get_dict(result['surface'], group)
+        for metric in SLA_METRICS:
+            entries = []
+            for t in range(len(SLA_THRESHOLDS)):
+                candidates = [i for i in indices if table[metric]['holds'][i, t]]
+                if len(candidates) == 0:
+                    entries.append(None)
+                    continue
+                best = max(candidates, key=lambda i: rows[i]['X'])
+                entries.append({'X': rows[best]['X'], 'cn': rows[best]['cn']})
+            group_dict[metric] = entries
+
+    for op in sorted(set([row['op'] for row in rows])):
+        indices = [i for i, row in enumerate(rows) if row['op'] == op]
+        op_dict = create_or_get_dict(result['pareto'], op)
+        for metric in SLA_METRICS:
+            evaluated = [i for i in indices if not np.isnan(table[metric]['latency'][i])]
+            throughputs = [rows[i]['X'] for i in evaluated]
+            latencies = [float(table[metric]['latency'][i]) for i in evaluated]
+            op_dict[metric] = [rows[evaluated[k]]['config'] for k in calc_pareto_frontier(throughputs, latencies)]
+    return result
+
+
+def write_sla_analysis(ctx, datasets, f):
+    """Calculates SLA surface and Pareto frontiers (see module documentation) and writes them into the summary"""
+    print('    SLA surface and Pareto frontier')
+    result = calc_sla_analysis(ctx, datasets)
+    if result is None:
+        return
+    create_or_get_dict(datasets, 'r_' + ctx['experiment_folder'])['sla'] = result
+
+    print('\n\n--------------------------------------------------------------------------------', file=f)
+    print('SLA surface: maximum sustainable throughput under latency SLAs', file=f)
+    print('--------------------------------------------------------------------------------\n', file=f)
+    print('X in kop/s (cn reaching it) for SLA metric <= T; memtier response time (mean: stable windows; '
+          'percentiles: cumulative histogram)', file=f)
+    print('-: no configuration meets the SLA; n/e: not evaluable (percentile threshold >= histogram limit {t:g} ms)'
+          .format(t=PERCENTILES_HISTOGRAM_MAX_TIME), file=f)
+    header = '  {g:<28s} {m:>5s}'.format(g='configuration', m='SLA') + \
+             ''.join([' {t:>14s}'.format(t='<= {t:g} ms'.format(t=t)) for t in SLA_THRESHOLDS])
+    print(header, file=f)
+    for group, group_dict in result['surface'].items():
+        for metric in SLA_METRICS:
+            line = '  {g:<28s} {m:>5s}'.format(g=group, m=metric)
+            for entry, evaluable in zip(group_dict[metric], result['evaluable'][metric]):
+                if not evaluable:
+                    line += ' {v:>14s}'.format(v='n/e')
+                elif entry is None:
+                    line += ' {v:>14s}'.format(v='-')
+                else:
+                    line += ' {v:>14s}'.format(v='{x:.3f} ({cn})'.format(x=entry['X'], cn=entry['cn']))
+            print(line, file=f)
+
+    print('\n\nPareto frontier of throughput and latency (non-dominated configurations by increasing throughput)', file=f)
+    for op, op_dict in result['pareto'].items():
+        for metric in SLA_METRICS:
+            print('\n  op {op}, latency {metric}'.format(op=op, metric=metric), file=f)
+            for config in op_dict[metric]:
+                c = result['configurations'][config]
+                print('    {config:<36s} X {x:8.3f} kop/s, {metric} {lat:8.3f} ms'
+                      .format(config=config, x=c['X'], metric=metric, lat=c['latency'][metric]), file=f)
@@ -33,6 +33,12 @@ PING_SUFFIX = '.ping.data'
 
 DATABASE_SUFFIX = '_database.json'
 STATISTICS_SUMMARY_SUFFIX = '_statistics_summary.txt'
+PREVIEW_SUMMARY_SUFFIX = '_preview.txt'
+SIMULATION_SUMMARY_SUFFIX = '_simulation.txt'
+LOAD_BALANCING_SUMMARY_SUFFIX = '_load_balancing.txt'
+SWEEP_CACHE_SUFFIX = '_sweep_cache.json'
+SWEEP_TABLE_SUFFIX = '_sweep.tsv'
+CAPACITY_PLAN_SUFFIX = '_capacity_plan.txt'
 
 # note: stable definition is a bit shifted compared to the stable definition in the middleware
 # memtier clients are started approx 1 later than the middleware(s); thus, stable starts 1 s earlier
@@ -83,6 +89,7 @@ AGGREGATE_INSTANCES_BY_AVG = {
     'ClientListenerWaitTimePerRequest': True,
     'ClientListenerWaitTimePerSecond': True,
     'ClientListenerUtilization': True,
+    'ClientNetworkRtt': True,
     'ClientRTTAndProcessingTime': True,
     'ClientReadingTime': True,
     'ClientParsingTime': True,
@@ -94,6 +101,10 @@ AGGREGATE_INSTANCES_BY_AVG = {
     'GetMissRate': True,
     'LoadAverage': True,
     'LoadAveragePerProcessor': True,
+    'NetworkFreeResponseTime': True,
+    'NetworkFreeServerRtt1': True,
+    'NetworkFreeServerRtt2': True,
+    'NetworkFreeServerRtt3': True,
     'PreprocessingTime': True,
     'ProcessingTime': True,
     'QueueingTime': True,
@@ -208,6 +219,134 @@ MEMTIER_AND_MIDDLEWARE_SCALE_COLUMNS = {
 }
 
 
+# --- operational laws consistency ----------------------------------------------------------------
+# see processing/law_consistency.py
+LAW_CHECK_RELATIVE_TOLERANCE = 0.1
+LAW_CHECK_ABSOLUTE_TOLERANCE = {
+    'queue': 0.5,           # requests
+    'workers': 0.5,         # requests
+    'utilization': 0.02     # ratio
+}
+LAW_CHECK_MIN_THROUGHPUT = 0.01     # kop/s; windows with less throughput (e.g. after the end of the run) are skipped
+LAW_CHECK_STABLE_BEGIN = 20         # inclusive; stable windows of the middleware (see MyMiddleware.java)
+LAW_CHECK_STABLE_END = 80           # exclusive
+LAW_CHECK_MAX_LISTED_WINDOWS = 10   # per experiment key in the summary
+
+
+# --- forced flow law validation -------------------------------------------------------------------
+# see processing/forced_flow.py; relative discrepancy of the measured flows
+FORCED_FLOW_TOLERANCE = 0.02            # stable windows average
+FORCED_FLOW_WINDOW_TOLERANCE = 0.1      # individual windows (window borders of the apps are not aligned exactly)
+FORCED_FLOW_MEMTIER_WINDOW_OFFSET = LAW_CHECK_STABLE_BEGIN - MEMTIER_STABLE_BEGIN  # see MEMTIER_STABLE_BEGIN
+
+
+# --- open-loop runs -------------------------------------------------------------------------------
+# see processing/open_system.py; open-loop runs are marked by the request rate cr in the experiment key
+OPEN_SYSTEM_DROP_TOLERANCE = 0.02                   # 1 - X / lambda
+OPEN_SYSTEM_BACKLOG_RESPONSE_TIME_GROWTH = 0.25     # relative growth of the response time during the stable windows
+OPEN_SYSTEM_BACKLOG_QUEUE_GROWTH = 5.0              # growth of the middleware queue length during the stable windows
+
+
+# --- outlier detection ----------------------------------------------------------------------------
+# robust detection of outlier iterations (e.g. caused by a noisy neighbor VM in the cloud)
+# using the modified z-score based on median and MAD [Iglewicz1993]
+# of the stable windows average of each instance in each iteration
+
+OUTLIER_DETECTION_VARIABLES = ['Throughput', 'ResponseTime']
+OUTLIER_DETECTION_Z_SCORE_FACTOR = 0.6745  # modified z-score: 0.6745 * (x - median) / MAD
+OUTLIER_DETECTION_THRESHOLD = 3.5          # recommended cutoff for the modified z-score
+# small sample bias correction of the MAD for n = MAX_ITERATIONS = 4 [Croux1992]
+OUTLIER_DETECTION_MAD_CORRECTION = 1.363
+# lower limit for the MAD relative to the median; avoids flagging iterations for
+# tiny deviations in case of very low variation between the iterations
+OUTLIER_DETECTION_MIN_RELATIVE_MAD = 0.01
+
+
+# --- network normalization ------------------------------------------------------------------------
+# the time-aligned ping RTT of the used connection is subtracted from memtier ResponseTime
+# (connection client -> middleware, or client -> server without middleware) and from the middleware
+# ServerRtt1..3 (connection middleware -> server) to separate service times from network latency drift
+# ping data are stored in 5 s windows: stable windows of each configuration are 4 (inclusive) to 16 (exclusive)
+
+NETWORK_NORMALIZATION_PING_VARIABLE = 'DefaultPing'
+NETWORK_NORMALIZATION_PING_STABLE_BEGIN = 4   # inclusive
+NETWORK_NORMALIZATION_PING_STABLE_END = 16    # exclusive
+# memtier: input variable -> network-free variable (the used RTT is stored as ClientNetworkRtt)
+NETWORK_NORMALIZATION_MEMTIER_VARIABLES = {
+    'ResponseTime': 'NetworkFreeResponseTime'
+}
+# middleware: input variable -> [server id, network-free variable]
+NETWORK_NORMALIZATION_MW_VARIABLES = {
+    'ServerRtt1': [1, 'NetworkFreeServerRtt1'],
+    'ServerRtt2': [2, 'NetworkFreeServerRtt2'],
+    'ServerRtt3': [3, 'NetworkFreeServerRtt3']
+}
+
+
+# --- preview mode ---------------------------------------------------------------------------------
+# quick-look estimates from a subsample (-q flag); see processing/preview.py
+# instances 1 and 4 run on client VM 1 and use middleware / server 1 and 2, respectively
+
+PREVIEW_MEMTIER_INSTANCES = ['1', '4']
+PREVIEW_ITERATIONS = [0, 1]    # zero based
+PREVIEW_MW_PERCENTILES = ['p50', 'p90', 'p99']
+# throughput gain relative to the gain of clients; below -> marked as saturated
+PREVIEW_SATURATION_EFFICIENCY = 0.2
+
+
+# --- middleware simulation ------------------------------------------------------------------------
+# discrete-event simulation of the middleware (-s flag); see processing/middleware_simulation.py
+
+SIMULATION_REQUESTS = 200000           # simulated requests for each configuration (one middleware)
+SIMULATION_WARMUP_FRACTION = 0.1       # of the simulated requests; excluded from the results
+SIMULATION_SEED = 2018
+SIMULATION_MIXED_SET_RATIO = 0.5       # fraction of set requests for op mixed
+
+
+# --- load-balancing simulation --------------------------------------------------------------------
+# see processing/load_balancing_simulation.py (-l flag)
+
+LOAD_BALANCING_REQUESTS = 20000         # simulated requests for each configuration, mix and policy
+LOAD_BALANCING_POLICIES = ['round_robin', 'join_shortest_queue', 'power_of_two', 'key_aware']
+LOAD_BALANCING_SERVER_THREADS = 4       # memcached worker threads (default -t 4)
+LOAD_BALANCING_PERCENTILES = [50, 95, 99]
+# request mixes: None for the measured mix; otherwise list of key counts of the gets (uniform)
+LOAD_BALANCING_KEY_MIXES = {
+    'measured': None,
+    'mixed_1_10': list(range(1, 11))
+}
+
+
+# --- configuration sweep --------------------------------------------------------------------------
+# closed-form evaluation of a configuration grid (-w flag); see processing/configuration_sweep.py
+# op uses the metadata values (write, read, mixed)
+
+SWEEP_GRID = {
+    'op': ['write', 'read', 'mixed'],
+    'cn': [6, 12, 24, 48, 72, 96, 144, 192, 288, 384, 512],
+    'mc': [1, 2, 3],
+    'mt': [8, 16, 32, 64, 128, 256],
+    'sc': [1, 2, 3, 5],
+    'ck': [1, 3, 6, 9]
+}
+SWEEP_PROCESSES = None      # None: number of CPUs
+SWEEP_CHUNK_SIZE = 500      # grid points evaluated together (vectorized) in one process
+# figures: one line for each mt; fixed values of the other dimensions
+SWEEP_PLOT_FIXED = {'mc': 2, 'sc': 3, 'ck': 1}
+
+
+# --- capacity planner -----------------------------------------------------------------------------
+# cheapest configurations for throughput and response time targets (-c flag); see processing/capacity_planner.py
+
+PLANNER_SPACE = {
+    'mc': [1, 2, 3, 4],
+    'mt': [1, 2, 4, 8, 16, 32, 64, 128, 256],
+    'sc': [1, 2, 3, 4, 5]
+}
+PLANNER_VM_COSTS = {'mc': 1.0, 'sc': 1.0}   # relative cost of a middleware VM and of a server VM
+PLANNER_RESULTS = 5                         # reported configurations for each target
+
+
 # --- dstat configuration --------------------------------------------------------------------------
 
 DSTAT_MAPPED_COLUMNS = {
@@ -346,6 +485,9 @@ PLOT_COLORS = ['C' + str(x) for x in range(10)]  # the new default colors
 # color adjustment for values of the interactive law
 PLOT_ADJUST_LUMINOSITY_FOR_EXPECTED = 1.6
 
+# transparency of the bound envelopes (see processing/performance_bounds.py)
+PLOT_BOUNDS_ALPHA = 0.15
+
 PLOT_LABELS_OP_MAPPING = {
     'read': 'get',
     'write': 'set',
@@ -363,6 +505,7 @@ PLOT_LABELS_VARIABLE_NAME_MAPPING = {
     'ClientListenerUtilization': 'Client thread (net-thread) utilization',
     'ClientListenerWaitTimePerRequest': 'Client thread (net-thread) wait time per request',
     'ClientListenerWaitTimePerSecond': 'Client thread (net-thread) wait time per second',
+    'ClientNetworkRtt': 'Client network RTT (ping)',
     'ClientParsingTime': 'Client request parsing time',
     'ClientReadingTime': 'Client request reading time',
     'ClientRTTAndProcessingTime': 'Client RTT and processing time',
@@ -389,6 +532,11 @@ PLOT_LABELS_VARIABLE_NAME_MAPPING = {
     'MemoryFree': 'Free memory',
     'MemoryTotal': 'Total memory',
     'MemoryUsed': 'Used memory',
+    'NetworkFreeResponseTime': 'Network-free response time',
+    'NetworkFreeServerRtt1': 'Server 1 network-free RTT',
+    'NetworkFreeServerRtt2': 'Server 2 network-free RTT',
+    'NetworkFreeServerRtt3': 'Server 3 network-free RTT',
+    'OfferedLoad': 'Offered load',
     'PreprocessingTime': 'Preprocessing time',
     'ProcessingTime': 'Processing time',
     'QueueInfoPerSecond': 'Queue info per second',
@@ -439,6 +587,7 @@ PLOT_LABELS_VARIABLE_UNITS_MAPPING = {
     'ClientListenerUtilization': 'ratio',
     'ClientListenerWaitTimePerRequest': 'ms',
     'ClientListenerWaitTimePerSecond': 'ms',
+    'ClientNetworkRtt': 'ms',
     'ClientParsingTime': 'ms',
     'ClientReadingTime': 'ms',
     'ClientRTTAndProcessingTime': 'ms',
@@ -468,6 +617,11 @@ PLOT_LABELS_VARIABLE_UNITS_MAPPING = {
     'MemoryFree': 'MB',
     'MemoryTotal': 'MB',
     'MemoryUsed': 'MB',
+    'NetworkFreeResponseTime': 'ms',
+    'NetworkFreeServerRtt1': 'ms',
+    'NetworkFreeServerRtt2': 'ms',
+    'NetworkFreeServerRtt3': 'ms',
+    'OfferedLoad': 'kop/s',
     'PreprocessingTime': 'ms',
     'ProcessingTime': 'ms',
     'QueueInfoPerSecond': 'count',
@@ -517,6 +671,8 @@ FIGURE_DETAILED_PLOT_VARIABLE_IN_TIME = [
     ['Times', 'Times', 'Time [ms]', ['ResponseTime', 'QueueingTime', 'ServiceTime', 'ProcessingTime', 'ServersOverallResponseTime', 'ServersNettoResponseTime', 'ServerRttMax', 'ClientRTTAndProcessingTime']],
     ['QueueLen', 'Queue length', 'Queue length [count]', ['QueueLen']],
     ['ServerRTT', 'Server RTT', 'Server RTT [ms]', ['ServerRttMax', 'ServerRtt1', 'ServerRtt2', 'ServerRtt3']],
+    ['NetworkFree', 'Network-free times', 'Time [ms]', ['ResponseTime', 'ClientNetworkRtt', 'NetworkFreeResponseTime',
+                                                        'NetworkFreeServerRtt1', 'NetworkFreeServerRtt2', 'NetworkFreeServerRtt3']],
 ]
 
 FIGURE_MORE_DETAILED_PLOT_VARIABLE_IN_TIME = [
@@ -546,6 +702,8 @@ FIGURES_MATRIX = {
 # --- utilization laws and modeling ----------------------------------------------------------------
 # note: V_ variables are stored as their inverse (invV) here (easier to write) and then calculated
 # properly during the run of the program
+# note: N_uc is detected from the measurements (see processing/knee_detection.py); an optional 'N_uc_override'
+# of a model replaces it (a warning is logged if the override is outside the confidence interval of the knee)
 
 LAWS_AND_MODELING_INPUT = {
     'e210': {
@@ -565,7 +723,6 @@ LAWS_AND_MODELING_INPUT = {
                 'mn_0': {
                     'invV_client': 6,
                     'invV_server': 1,
-                    'N_uc': 72,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -589,7 +746,6 @@ LAWS_AND_MODELING_INPUT = {
                 'mn_0': {
                     'invV_client': 6,
                     'invV_server': 1,
-                    'N_uc': 6,
                     'bandwidth_limit': 100,
                     'mapping': {}
                 }
@@ -614,7 +770,6 @@ LAWS_AND_MODELING_INPUT = {
                 'mn_0': {
                     'invV_client': 2,
                     'invV_server': 2,
-                    'N_uc': 6,
                     'bandwidth_limit': 200,
                     'mapping': {}
                 }
@@ -636,7 +791,6 @@ LAWS_AND_MODELING_INPUT = {
                 'mn_0': {
                     'invV_client': 2,
                     'invV_server': 2,
-                    'N_uc': 6,
                     'bandwidth_limit': 200,
                     'mapping': {}
                 }
@@ -662,7 +816,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 8,
                     'invV_server': 1,
-                    'N_uc': 24,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -672,7 +825,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 8,
                     'invV_server': 1,
-                    'N_uc': 48,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -682,7 +834,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 8,
                     'invV_server': 1,
-                    'N_uc': 72,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -692,7 +843,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 8,
                     'invV_server': 1,
-                    'N_uc': 192,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -702,7 +852,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 8,
                     'invV_server': 1,
-                    'N_uc': 288,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -727,7 +876,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 8,
                     'invV_server': 1,
-                    'N_uc': 6,
                     'bandwidth_limit': 100,
                     'mapping': {}
                 },
@@ -735,7 +883,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 8,
                     'invV_server': 1,
-                    'N_uc': 6,
                     'bandwidth_limit': 100,
                     'mapping': {}
                 },
@@ -743,7 +890,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 8,
                     'invV_server': 1,
-                    'N_uc': 6,
                     'bandwidth_limit': 100,
                     'mapping': {}
                 },
@@ -751,7 +897,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 8,
                     'invV_server': 1,
-                    'N_uc': 6,
                     'bandwidth_limit': 100,
                     'mapping': {}
                 },
@@ -759,7 +904,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 8,
                     'invV_server': 1,
-                    'N_uc': 6,
                     'bandwidth_limit': 100,
                     'mapping': {}
                 }
@@ -785,7 +929,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 48,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -795,7 +938,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 72,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -805,7 +947,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 144,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -815,7 +956,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 192,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -828,7 +968,6 @@ LAWS_AND_MODELING_INPUT = {
                     # note: this N is lower than number of workers in this model
                     # as confirmed then in the data, server becomes bottleneck before queueing even starts
                     # in middleware, which could handle much more requests.
-                    'N_uc': 192,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -853,7 +992,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 6,
                     'bandwidth_limit': 100,
                     'mapping': {}
                 },
@@ -861,7 +999,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 6,
                     'bandwidth_limit': 100,
                     'mapping': {}
                 },
@@ -869,7 +1006,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 6,
                     'bandwidth_limit': 100,
                     'mapping': {}
                 },
@@ -877,7 +1013,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 6,
                     'bandwidth_limit': 100,
                     'mapping': {}
                 },
@@ -885,7 +1020,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 6,
                     'bandwidth_limit': 100,
                     'mapping': {}
                 }
@@ -912,7 +1046,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_middleware': 16,
                     # note: all servers are involved for each write request; thus V_server = 1
                     'invV_server': 1,
-                    'N_uc': 48,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -922,7 +1055,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 48,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -932,7 +1064,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 96,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -942,7 +1073,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 144,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -963,7 +1093,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_middleware': 16,
                     # note: all servers are involved for each write request; thus V_server = 1
                     'invV_server': 1,
-                    'N_uc': 192,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -988,7 +1117,6 @@ LAWS_AND_MODELING_INPUT = {
                     # note: all servers are involved for each write request; thus V_server = 1
                     # note: all servers are involved for each sharded get request; thus V_server = 1
                     'invV_server': 1,
-                    'N_uc': 12,
                     'bandwidth_limit': 600,
                     'bandwidth_limit2': 300,
                     'mapping': {
@@ -999,7 +1127,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 12,
                     'bandwidth_limit': 600,
                     'bandwidth_limit2': 300,
                     'mapping': {
@@ -1010,7 +1137,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 12,
                     'bandwidth_limit': 600,
                     'bandwidth_limit2': 300,
                     'mapping': {
@@ -1021,7 +1147,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 12,
                     'bandwidth_limit': 600,
                     'bandwidth_limit2': 300,
                     'mapping': {
@@ -1032,7 +1157,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 12,
                     'bandwidth_limit': 600,
                     'bandwidth_limit2': 300,
                     'mapping': {
@@ -1043,7 +1167,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 12,
                     'bandwidth_limit': 600,
                     'bandwidth_limit2': 300,
                     'mapping': {
@@ -1054,7 +1177,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 12,
                     'bandwidth_limit': 600,
                     'bandwidth_limit2': 300,
                     'mapping': {
@@ -1065,7 +1187,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 12,
                     'bandwidth_limit': 600,
                     'bandwidth_limit2': 300,
                     'mapping': {
@@ -1097,7 +1218,6 @@ LAWS_AND_MODELING_INPUT = {
                     # requests with specified get key count, V_server = 1/2 * (V_server,write + V_server,read)
                     # = 1/2 * (4/3) = 4/6 = 2/3, which is stored here as invV = 3/2 = 1.5
                     'invV_server': 1.5,
-                    'N_uc': 12,
                     'bandwidth_limit': 600,
                     'bandwidth_limit2': 300,
                     'mapping': {
@@ -1108,7 +1228,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1.5,
-                    'N_uc': 12,
                     'bandwidth_limit': 600,
                     'bandwidth_limit2': 300,
                     'mapping': {
@@ -1119,7 +1238,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1.5,
-                    'N_uc': 12,
                     'bandwidth_limit': 600,
                     'bandwidth_limit2': 300,
                     'mapping': {
@@ -1130,7 +1248,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1.5,
-                    'N_uc': 12,
                     'bandwidth_limit': 600,
                     'bandwidth_limit2': 300,
                     'mapping': {
@@ -1141,7 +1258,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1.5,
-                    'N_uc': 12,
                     'bandwidth_limit': 600,
                     'bandwidth_limit2': 300,
                     'mapping': {
@@ -1152,7 +1268,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1.5,
-                    'N_uc': 12,
                     'bandwidth_limit': 600,
                     'bandwidth_limit2': 300,
                     'mapping': {
@@ -1163,7 +1278,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1.5,
-                    'N_uc': 12,
                     'bandwidth_limit': 600,
                     'bandwidth_limit2': 300,
                     'mapping': {
@@ -1174,7 +1288,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1.5,
-                    'N_uc': 12,
                     'bandwidth_limit': 600,
                     'bandwidth_limit2': 300,
                     'mapping': {
@@ -1198,7 +1311,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 8,
                     'invV_server': 1,
-                    'N_uc': 192,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -1209,7 +1321,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_middleware': 8,
                     # note: all servers are involved for each write request; thus V_server = 1 despite 3 servers
                     'invV_server': 1,
-                    'N_uc': 192,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -1219,7 +1330,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 192,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -1229,7 +1339,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 192,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -1239,7 +1348,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 8,
                     'invV_server': 1,
-                    'N_uc': 192,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -1249,7 +1357,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 8,
                     'invV_server': 1,
-                    'N_uc': 192,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -1259,7 +1366,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 192,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -1269,7 +1375,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 192,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -1290,7 +1395,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 8,
                     'invV_server': 1,
-                    'N_uc': 192,
                     'bandwidth_limit': 100,
                     'mapping': {}
                 },
@@ -1299,7 +1403,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_middleware': 8,
                     # note: only 1/3 of all servers are involved for each non-sharded get request; thus V_server = 1/3
                     'invV_server': 3,
-                    'N_uc': 192,
                     'bandwidth_limit': 300,
                     'mapping': {}
                 },
@@ -1307,7 +1410,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 192,
                     'bandwidth_limit': 100,
                     'mapping': {}
                 },
@@ -1315,7 +1417,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 3,
-                    'N_uc': 192,
                     'bandwidth_limit': 300,
                     'mapping': {}
                 },
@@ -1323,7 +1424,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 8,
                     'invV_server': 1,
-                    'N_uc': 192,
                     'bandwidth_limit': 100,
                     'mapping': {}
                 },
@@ -1331,7 +1431,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 8,
                     'invV_server': 3,
-                    'N_uc': 192,
                     'bandwidth_limit': 300,
                     'mapping': {}
                 },
@@ -1339,7 +1438,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 192,
                     'bandwidth_limit': 100,
                     'mapping': {}
                 },
@@ -1347,7 +1445,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 3,
-                    'N_uc': 192,
                     'bandwidth_limit': 300,
                     'mapping': {}
                 }
@@ -1367,7 +1464,6 @@ LAWS_AND_MODELING_INPUT = {
                     # note: all servers are involved for each write request; thus V_server = 1
                     # note: all servers are involved for each sharded get request; thus V_server = 1
                     'invV_server': 1,
-                    'N_uc': 12,
                     'bandwidth_limit': 600,
                     'bandwidth_limit2': 300,
                     'mapping': {
@@ -1398,7 +1494,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_middleware': 16,
                     # note: all servers are involved for each write request; thus V_server = 1
                     'invV_server': 1,
-                    'N_uc': 96,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -1408,7 +1503,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 144,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -1419,7 +1513,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_middleware': 16,
 
                     'invV_server': 1,
-                    'N_uc': 288,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -1429,7 +1522,6 @@ LAWS_AND_MODELING_INPUT = {
                     'invV_client': 6,
                     'invV_middleware': 16,
                     'invV_server': 1,
-                    'N_uc': 384,
                     'bandwidth_limit': 600,
                     'mapping': {
                         'D_max': 'D_server'
@@ -1440,6 +1532,160 @@ LAWS_AND_MODELING_INPUT = {
     }
 }
 
+# --- operational laws graph -----------------------------------------------------------------------
+# types of the operational law variables (see tools/operational_laws.py); exact names first, then the longest prefix
+# output format of each type: v is the original value; other fields are passed as details to add_ol_variable();
+# None: the original value is used as output
+OL_TYPE_FORMATS = {
+    'time': '{v:6.3f} ms',
+    'rate': '{v:6.3f} kop/s',
+    'ratio': '{v:6.3f}',
+    'count': None,
+    'bandwidth': '{v} Mbit/s',
+    'measured': '{v:6.3f} ± {sd:6.3f} {unit}, n={n}',
+    'time_with_source': '{v:6.3f} ms ({source})',
+    'bounds_n_star': '{v:6.3f} (D = {d:6.3f} ms, D_max = {d_max:6.3f} ms, M = {m})',
+    'bounds_throughput': 'ABA [{a_lo:6.3f}, {a_hi:6.3f}], BJB [{b_lo:6.3f}, {b_hi:6.3f}] kop/s{bottleneck}',
+    'bounds_response_time': 'ABA [{a_lo:6.3f}, {a_hi:6.3f}], BJB [{b_lo:6.3f}, {b_hi:6.3f}] ms',
+    'knee': '{v:6.1f} (CI [{lo:6.1f}, {hi:6.1f}])'
+}
+OL_VARIABLE_TYPES = {
+    'X': 'measured',
+    'R': 'measured',
+    'X_max': 'rate',
+    'X_network_limit': 'rate',
+    'R_min': 'time',
+    'N*_DbyRmin': 'ratio',
+    'N_uc': 'count',
+    'N_uc_detected': 'knee',
+    'N_uc_override': 'count',
+    'network_bandwidth_limit': 'bandwidth',
+    'MVA_Z': 'time_with_source',
+    'MVA_X': 'rate',
+    'MVA_R': 'time',
+    'MVA_X_Schweitzer': 'rate',
+    'MVA_R_Schweitzer': 'time',
+    'MVA_X_LoadDependent': 'rate',
+    'MVA_R_LoadDependent': 'time',
+    'bounds_N*': 'bounds_n_star',
+    'bounds_X': 'bounds_throughput',
+    'bounds_R': 'bounds_response_time'
+}
+OL_VARIABLE_PREFIX_TYPES = {
+    'S_': 'time',
+    'V_': 'ratio',
+    'D_': 'time',
+    'U_': 'ratio',
+    'MVA_D_': 'time'
+}
+
+
+# --- bottleneck analysis --------------------------------------------------------------------------
+# see processing/bottleneck_analysis.py; VM types of dstat with the letter used in the iperf connection names
+# and the metadata key of the number of VMs
+BOTTLENECK_VM_TYPES = {
+    'client': {'letter': 'c', 'count_key': 'cc'},
+    'middleware': {'letter': 'm', 'count_key': 'mc'},
+    'server': {'letter': 's', 'count_key': 'sc'}
+}
+# resource name -> utilization variable of the middleware
+BOTTLENECK_MIDDLEWARE_RESOURCES = {
+    'middleware net-thread': 'ClientListenerUtilization',
+    'middleware worker threads': 'WorkerUtilization'
+}
+# dstat data are stored in 5 s windows: stable windows of each configuration
+BOTTLENECK_DSTAT_STABLE_BEGIN = 4   # inclusive
+BOTTLENECK_DSTAT_STABLE_END = 16    # exclusive
+
+
+# --- load-dependent service demands ---------------------------------------------------------------
+# see processing/load_dependent_demands.py; stations with a model-wide demand only are scaled by the
+# relative growth of the mean of these middleware variables (prefix<k>, k = 1, 2, ...)
+DEMAND_CURVE_SCALING = {
+    'server': 'ServerRtt'
+}
+# minimum number of measured client numbers for a fitted curve; constant demand otherwise
+DEMAND_CURVE_MIN_POINTS = 3
+
+
+# --- distribution fitting -------------------------------------------------------------------------
+# see processing/distribution_fitting.py; histograms of the middleware that are fitted
+DISTRIBUTION_FIT_VARIABLES = ['ServiceTime', 'QueueingTime', 'ServerRtt1', 'ServerRtt2', 'ServerRtt3']
+DISTRIBUTION_FIT_MAX_ERLANG_K = 50
+# squared coefficient of variation of the arrivals at the middleware queue (1: Poisson)
+DISTRIBUTION_FIT_ARRIVAL_SCV = 1.0
+
+
+# --- saturation knee detection --------------------------------------------------------------------
+# see processing/knee_detection.py
+KNEE_DETECTION_MIN_POINTS = 4
+KNEE_DETECTION_GRID_POINTS = 200
+KNEE_DETECTION_BOOTSTRAP_REPLICATES = 500
+KNEE_DETECTION_CONFIDENCE = 0.95
+KNEE_DETECTION_SEED = 2018
+
+
+# --- SLA surface ----------------------------------------------------------------------------------
+# see processing/sla_analysis.py; metric -> quantile of the response time (None: mean)
+SLA_METRICS = {
+    'mean': None,
+    'p95': 0.95,
+    'p99': 0.99
+}
+SLA_THRESHOLDS = [2.0, 5.0, 10.0, 20.0, 50.0]  # ms
+
+
+# --- response surface -----------------------------------------------------------------------------
+# see processing/response_surface.py; factors: metadata keys of the configuration
+RESPONSE_SURFACE_FACTORS = ['cn', 'mc', 'mt', 'sc', 'ck']
+RESPONSE_SURFACE_RESPONSES = ['Throughput', 'ResponseTime', 'p99']
+RESPONSE_SURFACE_MIN_DF = 2
+RESPONSE_SURFACE_MIN_RELATIVE_SD = 0.01
+RESPONSE_SURFACE_CONFIDENCE = 0.95
+
+
+# --- fork-join latency prediction -----------------------------------------------------------------
+# see processing/fork_join.py; grid of the histogram algebra
+FORK_JOIN_RESOLUTION = 0.01             # ms
+FORK_JOIN_MAX_TIME = 100.0              # ms; larger times are counted in the last grid point
+FORK_JOIN_KEY_COUNTS = list(range(1, 13))
+FORK_JOIN_SERVER_COUNTS = [1, 2, 3, 4, 5]
+FORK_JOIN_PERCENTILES = [50, 95, 99]
+
+
+# --- mean value analysis --------------------------------------------------------------------------
+# closed queueing network model for each model of LAWS_AND_MODELING_INPUT (see processing/mean_value_analysis.py)
+# queueing stations: service demands D_<station> of the operational laws output; middleware client threads
+# and worker threads are used separately (D_middleware is their sum)
+MVA_STATIONS = ['middleware,clientthread', 'middleware,workerthread', 'server']
+# think time Z: measured in the middleware (client RTT and client processing time)
+MVA_THINK_TIME_VARIABLE = 'ClientRTTAndProcessingTime'
+# Bard-Schweitzer approximate MVA: fixed-point iteration
+MVA_SCHWEITZER_TOLERANCE = 1e-9
+MVA_SCHWEITZER_MAX_ITERATIONS = 10000
+# multi-class MVA (see processing/multiclass_mva.py): fractions of set clients of the evaluated population mixes
+MULTICLASS_MVA_SET_RATIOS = [0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0]
+
+
+# --- 2^k r factorial analysis ---------------------------------------------------------------------
+# see processing/factorial_analysis.py; factors in the order A, B, C, ... with their 2 levels (low, high)
+# as metadata values; ops use the metadata values (write, read, mixed)
+FACTORIAL_DESIGNS = {
+    'e610': {
+        'app': 'memtier',
+        'ops': ['write', 'read'],
+        'factors': [
+            {'key': 'sc', 'levels': ['1', '3']},
+            {'key': 'mc', 'levels': ['1', '2']},
+            {'key': 'mt', 'levels': ['8', '32']}
+        ],
+        'variables': ['Throughput', 'ResponseTime']
+    }
+}
+FACTORIAL_MODELS = ['additive', 'multiplicative']
+FACTORIAL_CONFIDENCE = 0.95
+
+
 # --- configuration summary ------------------------------------------------------------------------
 #     this configuration summary is stored inside of the JSON database
 
@@ -1461,6 +1707,9 @@ CONFIGURATION = {
     'plot_labels_variable_units_mapping': PLOT_LABELS_VARIABLE_UNITS_MAPPING,
     'laws_and_modeling_input': {},  # the relevant parts are added for each experiment of a run
     'laws_and_modeling_output': {},
+    'laws_and_modeling_values': {},  # original values of the output (op -> model -> variable -> cn or 'all')
+    'mva_output': {},  # mean value analysis predictions (see processing/mean_value_analysis.py)
+    'bounds_output': {},  # asymptotic and balanced job bounds (see processing/performance_bounds.py)
     'section7_output': {}  # for M/M/1, M/M/m and NQ modeling
 }
 
@@ -32,7 +32,7 @@ def get_all_files(folder, suffix):
 # for detailed explanation about these experiment configuration parameters
 known_filename_tokens = [
     'r', 'i',
-    'cc', 'ci', 'ct', 'cv', 'ck', 'op',
+    'cc', 'ci', 'ct', 'cv', 'ck', 'op', 'cr',
     'mc', 'mt', 'ms',
     'sc', 'st',
     'app', 'id', 't',
@@ -75,12 +75,21 @@ def calc_metadata_keys(metadata):
         k = 'r_' + metadata['r']
         k += '_cc_' + metadata['cc'] + '_ci_' + metadata['ci'] + '_ct_' + metadata['ct'] + '_cv_' + metadata['cv']
         k += '_ck_' + metadata['ck'] + '_op_' + metadata['op']
+        if 'cr' in metadata:
+            k += '_cr_' + metadata['cr']
         k += '_mc_' + metadata['mc'] + '_mt_' + metadata['mt'] + '_ms_' + metadata['ms']
         k += '_sc_' + metadata['sc'] + '_st_' + metadata['st']
         metadata['exp_key'] = k
         metadata['cn'] = int(metadata['cc']) * int(metadata['ci']) * int(metadata['ct']) * int(metadata['cv'])
         metadata['mn'] = int(metadata['mc']) * int(metadata['mt'])
         metadata['sn'] = int(metadata['sc']) * int(metadata['st'])
+        if is_open_loop(metadata):
+            metadata['offered_load'] = metadata['cn'] * float(metadata['cr']) * 0.001  # kop/s
+
+
+def is_open_loop(metadata):
+    """:return True for open-loop runs, i.e. rate-limited clients with request rate cr (op/s per client) > 0"""
+    return float(metadata.get('cr', 0)) > 0.0
 
 
 def select_exp_metadata(metadata):
@@ -228,82 +237,43 @@ def get_experiment_data(ctx, datasets, app_name, config_str):
     return result, PLOT_LABELS_OP_MAPPING[config['op']]
 
 
-def add_ol_variable(ctx, config_dict_op_or_none, name, formatted_value, original_value):
+def get_configuration_nr(ctx, exp_data):
+    """:return index of the configuration of exp_data in the order of the experiment run; -1 if not found"""
+    for config_nr, config in enumerate(get_experiment_configurations(ctx['experiment_folder'])):
+        if metadata_matches_requested_config(exp_data['metadata'], extract_metadata(config)):
+            return config_nr
+    return -1
+
+
+def get_valid_iterations(exp_data, instance_name=None):
     """
-    Adds a defined operational law variable to the output dict.
-    Looks for the proper model based on config_dict.
-    if config_dict_op_or_none == None, adds variable to all models.
-    if config_dict_op_or_none == 'set' or 'get' or 'mixed', adds variable to all models of this type
-    if config_dict_op_or_none == a dict, adds variable to matching model
-    note: it does some indirectly recursive adding of additional variables (D_ and V_ for S_)
+    :param instance_name: optional; an individual instance only loses its own missing iterations in tolerant
+                          mode (-t flag), the aggregated 'all' instance (default) all iterations with a missing cell
+    :return list of bool (one for each iteration); False marks iterations that are excluded from mean and SD,
+            see 'valid_iterations' and 'missing_cells' in the documentation of the database in ../process_raw_data.py
     """
-    input_dict = CONFIGURATION['laws_and_modeling_input'][ctx['experiment_folder']]
-    ol_dict = create_or_get_dict(CONFIGURATION['laws_and_modeling_output'], ctx['experiment_folder'])
-    if config_dict_op_or_none is None:
-        for op_key, op_data in input_dict.items():
-            op_dict = create_or_get_dict(ol_dict, op_key)
-            any_model_key = None
-            for model_key in op_data['models']:
-                output_dict = create_or_get_dict(op_dict, model_key)
-                output_dict[name] = formatted_value
-                any_model_key = model_key
-            if any_model_key is not None and name in input_dict[op_key]['models'][any_model_key]['mapping']:
-                add_ol_variable(ctx, config_dict_op_or_none, input_dict[op_key]['models'][any_model_key]['mapping'][name], formatted_value, original_value)
-    elif config_dict_op_or_none in ['get', 'set', 'mixed']:
-        op_dict = create_or_get_dict(ol_dict, config_dict_op_or_none)
-        for model_key in input_dict[config_dict_op_or_none]['models']:
-            output_dict = create_or_get_dict(op_dict, model_key)
-            output_dict[name] = formatted_value
-            any_model_key = model_key
-        if any_model_key is not None and name in input_dict[config_dict_op_or_none]['models'][any_model_key]['mapping']:
-            add_ol_variable(ctx, config_dict_op_or_none, input_dict[config_dict_op_or_none]['models'][any_model_key]['mapping'][name], formatted_value, original_value)
+    if 'valid_iterations' in exp_data:
+        valid_iterations = exp_data['valid_iterations']
     else:
-        op_key = PLOT_LABELS_OP_MAPPING[config_dict_op_or_none['op']]
-        op_dict = create_or_get_dict(ol_dict, op_key)
-        models = get_experiment_models(ctx['experiment_folder'], op_key)
-        for model in models:
-            model_dict = extract_metadata(model)
-            if metadata_matches_requested_config(config_dict_op_or_none, model_dict):
-                output_dict = create_or_get_dict(op_dict, model)
-                name2 = name
-                if 'cn' in config_dict_op_or_none:
-                    name2 += ',cn={cn:3d}'.format(cn=int(config_dict_op_or_none['cn']))
-                    if int(config_dict_op_or_none['cn']) == input_dict[op_key]['models'][model]['N_uc']:
-                        name2 += '(=N_uc)'
-                output_dict[name2] = formatted_value
-
-                # export some data for external modeling (section 7)
-                # X_max => service rate mu for given model
-                # X,cn  => arrival rate lambda for given model and client number cn
-                if name in ['X_max', 'X'] and ctx['experiment_folder'] in ['e310', 'e320', 'e410', 'e820']:
-                    export_list = create_or_get_template(CONFIGURATION['section7_output'], ctx['experiment_folder'], set())
-                    export_clients = 'all' if name == 'X_max' else config_dict_op_or_none['cn']
-                    export_string = op_key + '\t' + model + '\t' + name + '\t' + export_clients + '\t' + str(original_value)
-                    export_list.add(export_string)
-
-                if name in input_dict[op_key]['models'][model]['mapping']:
-                    add_ol_variable(ctx, config_dict_op_or_none, input_dict[op_key]['models'][model]['mapping'][name], formatted_value, original_value)
-
-                if name.startswith('S_') and 'invV_' + name[2:] in input_dict[op_key]['models'][model]:
-                    # add V_ and D_
-                    inv_v = input_dict[op_key]['models'][model]['invV_' + name[2:]]
-                    v = 1.0 / float(inv_v)
-                    d = v * original_value
-                    add_ol_variable(ctx, config_dict_op_or_none, 'V_' + name[2:], '{value:6.3f}'.format(value=v), v)
-                    add_ol_variable(ctx, config_dict_op_or_none, 'D_' + name[2:], '{value:6.3f} ms'.format(value=d), d)
-
-                if name.startswith('D_') and 'cn' in config_dict_op_or_none:
-                    # note: the 1000 from kop/s and ms cancel each other out
-                    x = ctx['throughput_cache'][op_key][model][config_dict_op_or_none['cn']]  # in kop/s
-                    u = x * original_value
-                    add_ol_variable(ctx, config_dict_op_or_none, 'U_' + name[2:], '{value:6.3f}'.format(value=u), u)
-
-                if name == 'D_server' and 'D_server' not in ctx['global_cache']:
-                    # this is a workaround to calculate U_server later
-                    global_cache = ctx['global_cache']
-                    global_cache_op_dict = create_or_get_dict(global_cache, op_key)
-                    global_cache_model_dict = create_or_get_dict(global_cache_op_dict, model)
-                    global_cache_model_dict['D_server'] = original_value
+        valid_iterations = [True] * MAX_ITERATIONS
+    if 'missing_cells' not in exp_data:
+        return valid_iterations
+
+    valid_iterations = list(valid_iterations)
+    for missing_instance_name, iterations in exp_data['missing_cells'].items():
+        if instance_name is not None and instance_name != 'all' and instance_name != missing_instance_name:
+            continue
+        for iteration in iterations:
+            valid_iterations[iteration] = False
+    return valid_iterations
+
+
+def get_missing_iterations(exp_data):
+    """:return set of the iterations with at least one missing instance (tolerant mode, see -t flag)"""
+    result = set()
+    for iterations in exp_data.get('missing_cells', {}).values():
+        result.update(iterations)
+    return result
 
 
 def calc_percentiles(count_list, total_count, result_dict):
@@ -366,15 +336,19 @@ def calc_percentiles(count_list, total_count, result_dict):
     result_dict['p99'] = p99
 
 
-def calc_mean_and_sd(values_list):
+def calc_mean_and_sd(values_list, valid_list=None):
     """
     Calculates arithmetic mean and SD of provided data. Used to aggregate variable values of
     iterations/repetitions of an experiment. Thanks to the database check, all values are available and valid.
     Handwritten function to allow usage of the specific storage format used in this database.
     Textbook implementation following ref [Press2002] (identical to standard statistics definition)
     :param values_list: list of ints or floats
+    :param valid_list: optional list of bool (one for each value); values marked False are excluded,
+                       e.g. outlier iterations (see processing/outlier_detection.py)
     :return: mean (float), sd (float), n (int)
     """
+    if valid_list is not None:
+        values_list = [v for i, v in enumerate(values_list) if valid_list[i]]
     n = 0
     sum = 0.0
     for value in values_list:
@@ -396,6 +370,38 @@ def calc_mean_and_sd(values_list):
     return mean, math.sqrt(variance), n
 
 
+def update_mean_and_sd(instance, old_value, new_value):
+    """
+    Replaces old_value by new_value in the mean and SD of the instance (dict with mean, sd, n) without access
+    to the other values: the state (n, mean, M2) of Welford's online algorithm is restored from mean, sd and n;
+    old_value is removed and new_value is added [Welford1962]. Used for incremental updates of the database.
+    """
+    n = instance['n']
+    mean = instance['mean']
+    m2 = instance['sd'] * instance['sd'] * float(n - 1) if n > 1 else 0.0
+
+    # remove old value
+    if n <= 1:
+        n = 0
+        mean = 0.0
+        m2 = 0.0
+    else:
+        delta = float(old_value) - mean
+        n -= 1
+        mean -= delta / float(n)
+        m2 -= delta * (float(old_value) - mean)
+
+    # add new value
+    n += 1
+    delta = float(new_value) - mean
+    mean += delta / float(n)
+    m2 += delta * (float(new_value) - mean)
+
+    instance['mean'] = mean
+    instance['sd'] = math.sqrt(max(m2, 0.0) / float(n - 1)) if n > 1 else 0.0
+    instance['n'] = n
+
+
 def calc_sums(variable):
     """
     Aggregates the instance dimension of the variable tensor object (see documentation in ../process_raw_data.py)
@@ -550,12 +556,54 @@ def lighten_color(color, amount=0.5):
     return colorsys.hls_to_rgb(c[0], 1 - amount * (1 - c[1]), c[2])
 
 
+def parse_capacity_target(target_str):
+    """:return dict with x, r, p (None for mean), op, ck of the target string (see module documentation); None if invalid"""
+    tokens = target_str.split('_')
+    if len(tokens) % 2 != 0:
+        return None
+    values = {tokens[i]: tokens[i + 1] for i in range(0, len(tokens), 2)}
+    try:
+        target = {
+            'x': float(values['x']),
+            'r': float(values['r']),
+            'p': float(values['p']) if 'p' in values else None,
+            'op': values.get('op'),
+            'ck': int(values.get('ck', '1')),
+            'name': target_str
+        }
+    except (KeyError, ValueError):
+        return None
+    if target['x'] <= 0.0 or target['r'] <= 0.0 or (target['p'] is not None and not 0.0 < target['p'] < 100.0):
+        return None
+    return target
+
+
 def error_exit(message):
     print('\nERROR: {message}\n'.format(message=message))
-    print('Usage: {name} path_to_run_folder [-p prefix] [-e experiment]* [-x]\n'
-          '-p, -e, and -x are optional\n-p shall only be used once\n'
+    print('Usage: {name} path_to_run_folder [-p prefix] [-e experiment]* [-x] [-o] [-t] [-u path_to_replaced_file]* [-q [-f]]\n'
+          '       [-s variant]* [-l] [-w] [-c target]*\n'
+          '-p, -e, -x, -o, -t, -u, -q, -f, -s, -l, -w, and -c are optional\n-p shall only be used once\n'
           '-e can be used several times with different experiments each\n'
-          '-x excludes some parts from printing/plotting to save space for submission, if needed'.format(name=sys.argv[0]))
+          '-x excludes some parts from printing/plotting to save space for submission, if needed\n'
+          '-o excludes suspect outlier iterations from the statistics (they are always reported)\n'
+          '-t tolerant mode: missing instance iterations are excluded from the statistics and listed in the summary\n'
+          '   instead of skipping the entire experiment\n'
+          '-u incremental update of the database with a replaced memtier or middleware file set (any file of the set);\n'
+          '   can be used several times; only the experiments of these files are processed; cannot be combined with -x\n'
+          '-q preview mode: approximate throughput and response time from a subsample within seconds (no database)\n'
+          '-f plots the figures of the preview mode (only with -q)\n'
+          '-s discrete-event simulation of the middleware for each measured configuration: as measured and with the\n'
+          '   given variant of the configuration parameters, e.g. -s mt_256_sc_5; -s measured simulates the measured\n'
+          '   configurations only; can be used several times; not with -q\n'
+          '-l load-balancing policy simulation (round-robin, join-shortest-queue, power-of-two-choices, key-aware)\n'
+          '   with the measured request mix and server RTT distributions; not with -q\n'
+          '-w configuration sweep: closed-form evaluation of the grid cn x mc x mt x sc x ck x op based on the\n'
+          '   measured data; evaluated points are memoized; not with -q\n'
+          '-c capacity planning: cheapest configurations (mc, mt, sc, ms) that meet a throughput and response time\n'
+          '   target x_<kop/s>_r_<ms>[_p_<percentile>][_op_<read|write>][_ck_<keys>], e.g. -c x_30_r_2 (30 kop/s,\n'
+          '   mean <= 2 ms) or -c x_30_r_5_p_99_op_read_ck_6 (p99 <= 5 ms for multi-gets with 6 keys);\n'
+          '   can be used several times; not with -q'
+          .format(name=sys.argv[0]))
     exit(1)
 
 
@@ -575,6 +623,15 @@ def parse_arguments(ctx):
     ctx['prefix'] = ''
     ctx['selected_experiments'] = []
     ctx['conserve_output_space'] = False
+    ctx['exclude_outliers'] = False
+    ctx['tolerant'] = False
+    ctx['preview'] = False
+    ctx['preview_figures'] = False
+    ctx['update_files'] = {}  # experiment -> list of replaced files for incremental update
+    ctx['simulation_variants'] = []  # see -s
+    ctx['sweep'] = False
+    ctx['load_balancing'] = False
+    ctx['capacity_targets'] = []  # see -c
 
     i = 2
     while i < argc:
@@ -590,6 +647,59 @@ def parse_arguments(ctx):
             ctx['selected_experiments'].append(sys.argv[i])
         elif sys.argv[i] == '-x':
             ctx['conserve_output_space'] = True
+        elif sys.argv[i] == '-o':
+            ctx['exclude_outliers'] = True
+        elif sys.argv[i] == '-t':
+            ctx['tolerant'] = True
+        elif sys.argv[i] == '-q':
+            ctx['preview'] = True
+        elif sys.argv[i] == '-f':
+            ctx['preview_figures'] = True
+        elif sys.argv[i] == '-w':
+            ctx['sweep'] = True
+        elif sys.argv[i] == '-l':
+            ctx['load_balancing'] = True
+        elif sys.argv[i] == '-s':
+            i += 1
+            if i == argc:
+                error_exit('missing configuration variant with optional argument -s')
+            if sys.argv[i] not in ctx['simulation_variants']:
+                ctx['simulation_variants'].append(sys.argv[i])
+        elif sys.argv[i] == '-c':
+            i += 1
+            if i == argc:
+                error_exit('missing capacity target with optional argument -c')
+            target = parse_capacity_target(sys.argv[i])
+            if target is None:
+                error_exit('invalid capacity target {name}, e.g. x_30_r_2 or x_30_r_5_p_99_op_read_ck_6'.format(name=sys.argv[i]))
+            ctx['capacity_targets'].append(target)
+        elif sys.argv[i] == '-u':
+            i += 1
+            if i == argc:
+                error_exit('missing path to the replaced file with optional argument -u')
+            if not os.path.isfile(sys.argv[i]):
+                error_exit('{name} is not a file'.format(name=sys.argv[i]))
+            metadata = parse_filename(sys.argv[i])
+            if 'r' not in metadata or 'i' not in metadata or 'id' not in metadata:
+                error_exit('{name} is not a memtier or middleware data file'.format(name=sys.argv[i]))
+            create_or_get_template(ctx['update_files'], metadata['r'], []).append(sys.argv[i])
         else:
             error_exit('unknown optional argument {name}'.format(name=sys.argv[i]))
         i += 1
+
+    if len(ctx['update_files']) > 0:
+        if ctx['conserve_output_space']:
+            error_exit('-u cannot be combined with -x (the updated database json file is needed)')
+        ctx['selected_experiments'].extend(ctx['update_files'].keys())
+    if ctx['preview_figures'] and not ctx['preview']:
+        error_exit('-f can only be used with -q')
+    if ctx['preview'] and len(ctx['update_files']) > 0:
+        error_exit('-q cannot be combined with -u')
+    if ctx['preview'] and len(ctx['simulation_variants']) > 0:
+        error_exit('-q cannot be combined with -s')
+    if ctx['preview'] and ctx['sweep']:
+        error_exit('-q cannot be combined with -w')
+    if ctx['preview'] and ctx['load_balancing']:
+        error_exit('-q cannot be combined with -l')
+    if ctx['preview'] and len(ctx['capacity_targets']) > 0:
+        error_exit('-q cannot be combined with -c')
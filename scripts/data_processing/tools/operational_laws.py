@@ -0,0 +1,228 @@
+"""
+operational laws: typed dependency graph of the operational law variables
+
+The variables are stored as nodes of a graph for each op and model (see LAWS_AND_MODELING_INPUT):
+- base variables are added by add_ol_variable() with their original (float) value for one scope:
+  the number of clients cn or 'all' for model-wide values; each variable name has a type
+  (see OL_VARIABLE_TYPES and OL_VARIABLE_PREFIX_TYPES) that defines its output format (OL_TYPE_FORMATS)
+- derived variables are evaluated lazily from their dependencies and memoized as floats:
+  - mapped variables of the model input, e.g. D_server = D_max
+  - V_<device> = 1 / invV_<device> of the model input (for each scope of S_<device>)
+  - D_<device> = V_<device> S_<device>                   (service demand law)
+  - U_<device> = X D_<device> for each cn with throughput X  (utilization law)
+  adding a base variable invalidates the memoized values of its model
+Formatting happens only at output: render_ol_output() writes the formatted values into
+CONFIGURATION['laws_and_modeling_output'] and the original values into CONFIGURATION['laws_and_modeling_values'].
+
+The graph of the current experiment is stored in ctx['ol_graph']: op -> model -> nodes (name -> scope -> node) and memo.
+
+see main program in ../process_raw_data.py for information
+
+version 2018-12-23
+"""
+
+from tools.config import *
+from tools.helpers import *
+
+
+# --- operational laws graph -----------------------------------------------------------------------
+
+def get_ol_type(name):
+    """:return type of the operational law variable (see OL_VARIABLE_TYPES)"""
+    if name in OL_VARIABLE_TYPES:
+        return OL_VARIABLE_TYPES[name]
+    for prefix in sorted(OL_VARIABLE_PREFIX_TYPES, key=len, reverse=True):
+        if name.startswith(prefix):
+            return OL_VARIABLE_PREFIX_TYPES[prefix]
+    error_exit('operational law variable {name} has no type; see OL_VARIABLE_TYPES'.format(name=name))
+
+
+def get_ol_model_graph(ctx, op_key, model_key):
+    """:return graph dict (nodes and memo) of the model"""
+    model_graph = create_or_get_dict(create_or_get_dict(ctx['ol_graph'], op_key), model_key)
+    if 'nodes' not in model_graph:
+        model_graph['nodes'] = {}
+        model_graph['memo'] = {}
+    return model_graph
+
+
+def set_ol_node(ctx, op_key, model_key, name, cn, value, details):
+    """stores a base variable; cn: None for model-wide values"""
+    model_graph = get_ol_model_graph(ctx, op_key, model_key)
+    node = {'type': get_ol_type(name), 'value': value, 'details': details}
+    create_or_get_dict(model_graph['nodes'], name)['all' if cn is None else str(cn)] = node
+    model_graph['memo'] = {}
+
+
+def add_ol_variable(ctx, config_dict_op_or_none, name, original_value, **details):
+    """
+    Adds a defined operational law variable (base variable of the graph).
+    Looks for the proper model based on config_dict.
+    if config_dict_op_or_none == None, adds variable to all models.
+    if config_dict_op_or_none == 'set' or 'get' or 'mixed', adds variable to all models of this type
+    if config_dict_op_or_none == a dict, adds variable to matching model (for the given cn or model-wide)
+    details: additional values for the output format of the type of the variable (see OL_TYPE_FORMATS)
+    note: derived variables (mapped, V_, D_, U_) are evaluated lazily (see evaluate_ol_node())
+    """
+    input_dict = CONFIGURATION['laws_and_modeling_input'][ctx['experiment_folder']]
+    if config_dict_op_or_none is None:
+        for op_key, op_data in input_dict.items():
+            for model_key in op_data['models']:
+                set_ol_node(ctx, op_key, model_key, name, None, original_value, details)
+    elif config_dict_op_or_none in ['get', 'set', 'mixed']:
+        for model_key in input_dict[config_dict_op_or_none]['models']:
+            set_ol_node(ctx, config_dict_op_or_none, model_key, name, None, original_value, details)
+    else:
+        op_key = PLOT_LABELS_OP_MAPPING[config_dict_op_or_none['op']]
+        models = get_experiment_models(ctx['experiment_folder'], op_key)
+        for model in models:
+            model_dict = extract_metadata(model)
+            if metadata_matches_requested_config(config_dict_op_or_none, model_dict):
+                set_ol_node(ctx, op_key, model, name, config_dict_op_or_none.get('cn'), original_value, details)
+
+                # export some data for external modeling (section 7)
+                # X_max => service rate mu for given model
+                # X,cn  => arrival rate lambda for given model and client number cn
+                if name in ['X_max', 'X'] and ctx['experiment_folder'] in ['e310', 'e320', 'e410', 'e820']:
+                    export_list = create_or_get_template(CONFIGURATION['section7_output'], ctx['experiment_folder'], set())
+                    export_clients = 'all' if name == 'X_max' else config_dict_op_or_none['cn']
+                    export_string = op_key + '\t' + model + '\t' + name + '\t' + export_clients + '\t' + str(original_value)
+                    export_list.add(export_string)
+
+
+def get_ol_derived_node(ctx, op_key, model_key, name, scope):
+    """:return derived node of the variable for the scope (see module documentation); None if not available"""
+    model_input = CONFIGURATION['laws_and_modeling_input'][ctx['experiment_folder']][op_key]['models'][model_key]
+    for source, target in model_input['mapping'].items():
+        if target == name:
+            node = evaluate_ol_node(ctx, op_key, model_key, source, scope)
+            if node is not None:
+                return node
+
+    prefix = name[:2]
+    device = name[2:]
+    if prefix not in ['V_', 'D_', 'U_'] or 'invV_' + device not in model_input:
+        return None
+    if prefix == 'V_':
+        if evaluate_ol_node(ctx, op_key, model_key, 'S_' + device, scope) is None:
+            return None
+        value = 1.0 / float(model_input['invV_' + device])
+    elif prefix == 'D_':
+        v = evaluate_ol_node(ctx, op_key, model_key, 'V_' + device, scope)
+        s = evaluate_ol_node(ctx, op_key, model_key, 'S_' + device, scope)
+        if v is None or s is None:
+            return None
+        value = v['value'] * s['value']
+    else:
+        if scope == 'all':
+            return None
+        # note: the 1000 from kop/s and ms cancel each other out
+        x = evaluate_ol_node(ctx, op_key, model_key, 'X', scope)
+        d = evaluate_ol_node(ctx, op_key, model_key, 'D_' + device, scope)
+        if d is None:
+            d = evaluate_ol_node(ctx, op_key, model_key, 'D_' + device, 'all')
+        if x is None or d is None:
+            return None
+        value = x['value'] * d['value']
+    return {'type': get_ol_type(name), 'value': value, 'details': {}}
+
+
+def evaluate_ol_node(ctx, op_key, model_key, name, scope):
+    """:return node of the variable for the scope (cn as str or 'all'); base or derived (memoized); None if not available"""
+    model_graph = get_ol_model_graph(ctx, op_key, model_key)
+    key = (name, scope)
+    if key not in model_graph['memo']:
+        node = model_graph['nodes'].get(name, {}).get(scope)
+        if node is None:
+            node = get_ol_derived_node(ctx, op_key, model_key, name, scope)
+        model_graph['memo'][key] = node
+    return model_graph['memo'][key]
+
+
+def get_ol_names(ctx, op_key, model_key):
+    """:return set of the names of all base and derived variables of the model"""
+    model_input = CONFIGURATION['laws_and_modeling_input'][ctx['experiment_folder']][op_key]['models'][model_key]
+    names = set(get_ol_model_graph(ctx, op_key, model_key)['nodes'])
+    names.update([target for source, target in model_input['mapping'].items() if source in names])
+    for name in list(names):
+        if name.startswith('S_') and 'invV_' + name[2:] in model_input:
+            names.update(['V_' + name[2:], 'D_' + name[2:]])
+    for name in list(names):
+        if name.startswith('D_') and 'invV_' + name[2:] in model_input:
+            names.add('U_' + name[2:])
+    return names
+
+
+def get_ol_scopes(ctx, op_key, model_key, name):
+    """:return list of the scopes (cn as str, or 'all') for which the variable is available"""
+    nodes = get_ol_model_graph(ctx, op_key, model_key)['nodes']
+    candidates = set(['all'])
+    for scopes in nodes.values():
+        candidates.update(scopes)
+    return [scope for scope in candidates if evaluate_ol_node(ctx, op_key, model_key, name, scope) is not None]
+
+
+def get_ol_value(ctx, op_key, model_key, name, cn=None):
+    """
+    :return original value of an operational law variable (see add_ol_variable()); model-wide value if available,
+            otherwise the value of the given cn or of the smallest cn if cn is None; None if not available
+    """
+    if op_key not in ctx['ol_graph'] or model_key not in ctx['ol_graph'][op_key]:
+        return None
+    node = evaluate_ol_node(ctx, op_key, model_key, name, 'all')
+    if node is None and cn is not None:
+        node = evaluate_ol_node(ctx, op_key, model_key, name, str(cn))
+    elif node is None:
+        scopes = get_ol_scopes(ctx, op_key, model_key, name)
+        if len(scopes) > 0:
+            node = evaluate_ol_node(ctx, op_key, model_key, name, min(scopes, key=int))
+    return None if node is None else node['value']
+
+
+def get_ol_values(ctx, name, op_key=None):
+    """:return dict op -> model -> scope (cn as str, or 'all') -> original value of the variable for all models"""
+    result = {}
+    for op in ctx['ol_graph']:
+        if op_key is not None and op != op_key:
+            continue
+        for model_key in ctx['ol_graph'][op]:
+            for scope in get_ol_scopes(ctx, op, model_key, name):
+                model_dict = create_or_get_dict(create_or_get_dict(result, op), model_key)
+                model_dict[scope] = evaluate_ol_node(ctx, op, model_key, name, scope)['value']
+    return result
+
+
+def format_ol_node(node):
+    """:return formatted value of the node (see OL_TYPE_FORMATS); the original value for types without format"""
+    template = OL_TYPE_FORMATS[node['type']]
+    if template is None:
+        return node['value']
+    return template.format(v=node['value'], **node['details'])
+
+
+def render_ol_output(ctx):
+    """
+    Writes all base and derived variables of the graph into CONFIGURATION['laws_and_modeling_output'] (formatted)
+    and CONFIGURATION['laws_and_modeling_values'] (original values); in the order of the model input
+    """
+    input_dict = CONFIGURATION['laws_and_modeling_input'][ctx['experiment_folder']]
+    ol_dict = create_or_get_dict(CONFIGURATION['laws_and_modeling_output'], ctx['experiment_folder'])
+    values_dict = create_or_get_dict(CONFIGURATION['laws_and_modeling_values'], ctx['experiment_folder'])
+    for op_key, op_data in input_dict.items():
+        op_dict = create_or_get_dict(ol_dict, op_key)
+        for model_key in op_data['models']:
+            if model_key not in ctx['ol_graph'].get(op_key, {}):
+                continue
+            n_uc = get_ol_value(ctx, op_key, model_key, 'N_uc')
+            output_dict = create_or_get_dict(op_dict, model_key)
+            model_values_dict = create_or_get_dict(create_or_get_dict(values_dict, op_key), model_key)
+            for name in get_ol_names(ctx, op_key, model_key):
+                for scope in get_ol_scopes(ctx, op_key, model_key, name):
+                    node = evaluate_ol_node(ctx, op_key, model_key, name, scope)
+                    create_or_get_dict(model_values_dict, name)[scope] = node['value']
+                    output_name = name
+                    if scope != 'all':
+                        output_name += ',cn={cn:3d}'.format(cn=int(scope))
+                        if int(scope) == n_uc:
+                            output_name += '(=N_uc)'
+                    output_dict[output_name] = format_ol_node(node)